@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Batch Runner
+Runs every request in a JSONL file through root_agent concurrently and
+writes one JSON result per line as requests finish. Each input line is a
+JSON string or an object with a message/prompt/text/query/body field (and
+optionally id and user_id). Rerunning the same command after a crash or
+Ctrl-C resumes where the run stopped; --retry-failed also reruns failures.
+
+Usage: python batch_runner.py requests.jsonl [--output results.jsonl] [--workers 8] [--processes 1]
+       [--timeout 300] [--retry-failed] [--limit N] [--report report.json] [--init MODULE:FUNCTION]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+
+from dotenv import load_dotenv
+
+
+def print_report(report, output):
+    print(f"\n📦 Batch finished: {report['processed']} requests in {report['elapsed_seconds']}s "
+          f"({report['requests_per_sec']} req/s), results in {output}")
+    print(f"   ok {report['ok']}, failed {report['failed']}, invalid {report['invalid']}, "
+          f"already done {report['skipped']}")
+    latency = report['latency_ms']
+    if latency['p50'] is not None:
+        print(f"   latency p50 {latency['p50']:.0f} ms, p95 {latency['p95']:.0f} ms, p99 {latency['p99']:.0f} ms")
+    for error, count in report['top_errors']:
+        print(f'   ❌ {count} x {error}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a JSONL file of requests through root_agent')
+    parser.add_argument('input', help='JSONL file of requests')
+    parser.add_argument('--output', help='Results JSONL (default: <input>.results.jsonl)')
+    parser.add_argument('--workers', type=int, default=int(os.getenv('BATCH_WORKERS', '8')),
+                        help='Concurrent requests per process')
+    parser.add_argument('--processes', type=int, default=int(os.getenv('BATCH_PROCESSES', '1')),
+                        help='Pool processes, each with its own agents and connections')
+    parser.add_argument('--timeout', type=float, default=float(os.getenv('BATCH_TIMEOUT', '300')),
+                        help='Seconds before a request is recorded as failed')
+    parser.add_argument('--retry-failed', action='store_true', help='Also rerun requests that failed before')
+    parser.add_argument('--limit', type=int, help='Run at most this many requests now')
+    parser.add_argument('--report', help='Also write the run report as JSON to this file')
+    parser.add_argument('--init', metavar='MODULE:FUNCTION',
+                        help='Call this first in every process, e.g. to register test models')
+    args = parser.parse_args()
+
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(message)s', stream=sys.stderr)
+    # Only the runner's own progress, not every agent's
+    logging.getLogger().setLevel(logging.WARNING)
+    logging.getLogger('carbon_agent.batch').setLevel(logging.INFO)
+    from carbon_agent.batch import run_batch
+
+    output = args.output or os.path.splitext(args.input)[0] + '.results.jsonl'
+    report = asyncio.run(run_batch(
+        args.input, output, workers=args.workers, processes=args.processes, timeout=args.timeout,
+        retry_failed=args.retry_failed, limit=args.limit, initializer=args.init,
+    ))
+    print_report(report, output)
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    if report['failed'] or report['invalid']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Burst benchmark for per-upstream admission control
+Two rate-limited fakes: the fake GitHub MCP server started with
+--max-concurrency (HTTP 429 beyond it) and ThrottledGemini, a model that
+raises a 429 ClientError when more than --model-capacity calls are in
+flight. A burst of tool calls and a burst of model calls (batch work first,
+then interactive requests) are sent with admission control off and on.
+Reports successes, failures, requests that reached each upstream
+(including rejected ones), latency percentiles per priority class and the
+concurrency limit the controller settled on.
+
+Usage: python benchmarks/admission_benchmark.py [--calls 60] [--server-capacity 4] [--model-capacity 4]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import urllib.request
+import warnings
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from google.adk.models import BaseLlm, LLMRegistry, LlmRequest, LlmResponse
+from google.genai import errors, types
+
+MODEL_STATS = defaultdict(int)
+MODEL_LIMITS = {'latency': 0.1, 'capacity': 4}
+
+
+class ThrottledGemini(BaseLlm):
+    """Answers after MODEL_LIMITS['latency'] seconds, or raises a 429 above MODEL_LIMITS['capacity'] concurrent calls"""
+
+    model: str = 'throttled-gemini'
+
+    @classmethod
+    def supported_models(cls):
+        return [r'throttled-gemini.*']
+
+    async def generate_content_async(self, llm_request, stream=False):
+        MODEL_STATS['requests'] += 1
+        if MODEL_STATS['in_flight'] >= MODEL_LIMITS['capacity']:
+            MODEL_STATS['throttled'] += 1
+            raise errors.ClientError(429, {'error': {'code': 429, 'message': 'Resource exhausted', 'status': 'RESOURCE_EXHAUSTED'}})
+        MODEL_STATS['in_flight'] += 1
+        try:
+            await asyncio.sleep(MODEL_LIMITS['latency'])
+        finally:
+            MODEL_STATS['in_flight'] -= 1
+        yield LlmResponse(content=types.Content(role='model', parts=[types.Part.from_text(text='ok')]))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else float('nan')
+
+
+async def timed(coro_fn, level, results):
+    from carbon_agent.admission import priority
+
+    start = time.perf_counter()
+    try:
+        with priority(level):
+            await coro_fn()
+        results[level]['ok'].append(time.perf_counter() - start)
+    except Exception as e:
+        results[level]['failed'].append(type(e).__name__)
+
+
+async def tool_burst(args, admitted):
+    from carbon_agent.admission import BATCH, INTERACTIVE
+    from carbon_agent.http_pool import PooledHttpMcpToolset
+    from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnectionParams
+
+    os.environ['ADMISSION_ENABLED'] = 'true' if admitted else 'false'
+    toolset = PooledHttpMcpToolset(
+        connection_params=StreamableHTTPConnectionParams(url=f'http://127.0.0.1:{args.port}/mcp/'),
+        upstream=f'github-{"admitted" if admitted else "direct"}',
+    )
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        tools = {tool.name: tool for tool in await toolset.get_tools()}
+    tool = tools['list_issues']
+    urllib.request.urlopen(urllib.request.Request(f'http://127.0.0.1:{args.port}/stats/reset', method='POST'))
+
+    def call():
+        return tool._run_async_impl(args={'owner': 'octo', 'repo': 'demo'}, tool_context=None, credential=None)
+
+    results = defaultdict(lambda: {'ok': [], 'failed': []})
+    start = time.perf_counter()
+    await asyncio.gather(*(
+        timed(call, BATCH if i < args.calls * 3 // 4 else INTERACTIVE, results) for i in range(args.calls)
+    ))
+    elapsed = time.perf_counter() - start
+    with urllib.request.urlopen(f'http://127.0.0.1:{args.port}/stats') as response:
+        server = json.load(response)
+    return results, elapsed, {'served': server['total'], 'throttled': server['throttled']}, toolset._admission
+
+
+async def model_burst(args, admitted):
+    from carbon_agent.admission import BATCH, INTERACTIVE, AdmittedLlm, get_admission_controller
+
+    MODEL_STATS.clear()
+    name = f'throttled-gemini-{"admitted" if admitted else "direct"}'
+    llm = AdmittedLlm(model=name) if admitted else LLMRegistry.new_llm(name)
+    request = LlmRequest(model=name, contents=[types.Content(role='user', parts=[types.Part.from_text(text='hi')])])
+
+    async def call():
+        async for _ in llm.generate_content_async(request):
+            pass
+
+    results = defaultdict(lambda: {'ok': [], 'failed': []})
+    start = time.perf_counter()
+    batch = [asyncio.create_task(timed(call, BATCH, results)) for _ in range(args.calls * 3 // 4)]
+    await asyncio.sleep(0.05)
+    interactive = [asyncio.create_task(timed(call, INTERACTIVE, results)) for _ in range(args.calls // 4)]
+    await asyncio.gather(*batch, *interactive)
+    elapsed = time.perf_counter() - start
+    upstream = {'served': MODEL_STATS['requests'] - MODEL_STATS['throttled'], 'throttled': MODEL_STATS['throttled']}
+    return results, elapsed, upstream, get_admission_controller(name, 'gemini') if admitted else None
+
+
+def report(title, runs):
+    from carbon_agent.admission import PRIORITY_NAMES
+
+    print(f'\n{title}')
+    print(f"{'mode':<10}{'class':<13}{'ok':>5}{'failed':>8}{'p50 ms':>9}{'p95 ms':>9}{'upstream served/429':>22}{'wall s':>8}")
+    for mode, (results, elapsed, upstream, controller) in runs.items():
+        for level in sorted(results):
+            stats = results[level]
+            print(f"{mode:<10}{PRIORITY_NAMES[level]:<13}{len(stats['ok']):>5}{len(stats['failed']):>8}"
+                  f"{percentile(stats['ok'], 0.5):>9.0f}{percentile(stats['ok'], 0.95):>9.0f}"
+                  f"{upstream['served']:>13}/{upstream['throttled']:<8}{elapsed:>8.2f}")
+        if controller is not None:
+            metrics = controller.metrics()
+            print(f"{'':<10}limit {metrics['limit']}, retries {metrics['retries']}, "
+                  f"budget exhausted {metrics['retry_budget_exhausted']}, peak queue {metrics['peak_queued']}, "
+                  f"queue wait p95 {metrics['queue_wait_ms_p95']} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=60, help='Calls per burst (3/4 batch, 1/4 interactive)')
+    parser.add_argument('--server-capacity', type=int, default=4, help='Requests the fake MCP server accepts at once')
+    parser.add_argument('--model-capacity', type=int, default=4, help='Calls the fake model accepts at once')
+    parser.add_argument('--latency', type=float, default=0.1, help='Fake upstream latency per call (s)')
+    parser.add_argument('--port', type=int, default=8772, help='Port for the fake GitHub MCP server')
+    args = parser.parse_args()
+
+    os.environ.setdefault('ADMISSION_MCP_MAX_ATTEMPTS', '6')
+    os.environ.setdefault('ADMISSION_GEMINI_MAX_ATTEMPTS', '6')
+    MODEL_LIMITS.update(latency=args.latency, capacity=args.model_capacity)
+    LLMRegistry.register(ThrottledGemini)
+
+    from carbon_agent.http_pool import close_all_transports
+    from http_pool_benchmark import FAKE_SERVER
+    import subprocess
+
+    server = subprocess.Popen(
+        [sys.executable, FAKE_SERVER, '--port', str(args.port), '--latency', str(args.latency),
+         '--max-concurrency', str(args.server_capacity)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    async def run_all():
+        for _ in range(100):
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{args.port}/stats')
+                break
+            except OSError:
+                await asyncio.sleep(0.1)
+        try:
+            tools = {mode: await tool_burst(args, mode == 'admitted') for mode in ('direct', 'admitted')}
+            models = {mode: await model_burst(args, mode == 'admitted') for mode in ('direct', 'admitted')}
+        finally:
+            await close_all_transports()
+        return tools, models
+
+    try:
+        tools, models = asyncio.run(run_all())
+    finally:
+        server.kill()
+    report(f'MCP tool calls (server accepts {args.server_capacity} at once)', tools)
+    report(f'Model calls (model accepts {args.model_capacity} at once)', models)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Throughput and resume benchmark for the JSONL batch runner
+Writes a nightly-report style input (GitHub issue summaries across many
+repos, market analyses across many tickers, a few invalid lines) and runs it
+through the real root_agent tree with ScriptedGemini and the local fake MCP
+servers: one request at a time (on the first --sequential requests, then
+extrapolated), with a worker pool, and with a worker pool in several
+processes (which pays for process start-up and only helps when one event
+loop saturates a core and more cores are free). Then runs batch_runner.py
+as a subprocess, kills it partway, reruns it and checks that every input
+line has exactly one result.
+
+Usage: python benchmarks/batch_benchmark.py [--requests 200] [--workers 16] [--processes 2] [--model-latency 0.2]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, REPO_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+TICKERS = ['Tesla', 'Nvidia', 'Apple', 'AMD', 'Intel', 'Microsoft', 'Amazon', 'Netflix']
+
+
+def write_input(path, count):
+    with open(path, 'w') as f:
+        for i in range(count):
+            if i % 50 == 49:
+                f.write('{"id": "broken", "note": "no prompt"}\n')
+            elif i % 2:
+                f.write(json.dumps({'id': f'market-{i}', 'message': f'Analyze {TICKERS[i % len(TICKERS)]} stock'}) + '\n')
+            else:
+                f.write(json.dumps({'id': f'github-{i}', 'message': f'Summarize the open issues in the octo/repo{i} repo'}) + '\n')
+
+
+def count_results(path):
+    lines = {}
+    with open(path) as f:
+        for raw in f:
+            if raw.strip():
+                result = json.loads(raw)
+                lines[result['line']] = lines.get(result['line'], 0) + 1
+    return lines
+
+
+async def run_modes(args, input_path, workdir):
+    from carbon_agent.batch import run_batch
+
+    modes = [
+        ('sequential', {'workers': 1, 'limit': args.sequential}),
+        (f'{args.workers} workers', {'workers': args.workers}),
+        (f'{args.processes}x{args.workers} workers', {'workers': args.workers, 'processes': args.processes,
+                                                     'initializer': 'fake_gemini:register_scripted'}),
+    ]
+    reports = {}
+    for name, options in modes:
+        output = os.path.join(workdir, name.replace(' ', '_') + '.jsonl')
+        reports[name] = await run_batch(input_path, output, timeout=60, progress_seconds=3600, **options)
+    return reports
+
+
+def kill_and_resume(args, input_path, workdir, env):
+    output = os.path.join(workdir, 'resumed.jsonl')
+    command = [sys.executable, os.path.join(REPO_DIR, 'batch_runner.py'), input_path, '--output', output,
+               '--workers', str(args.workers), '--init', 'fake_gemini:register_scripted']
+    first = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while first.poll() is None:
+        if os.path.exists(output) and sum(count_results(output).values()) >= args.requests // 3:
+            first.send_signal(signal.SIGKILL)
+            break
+        time.sleep(0.05)
+    first.wait()
+    before = sum(count_results(output).values())
+    start = time.perf_counter()
+    second = subprocess.run(command, env=env, capture_output=True, text=True)
+    resumed_seconds = time.perf_counter() - start
+    results = count_results(output)
+    return {
+        'results_before_kill': before,
+        'resume_seconds': resumed_seconds,
+        'lines_with_result': len(results),
+        'duplicates': sum(count - 1 for count in results.values()),
+        'resume_summary': [line.strip() for line in second.stdout.splitlines() if line.strip()][:2],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help='Lines in the generated input')
+    parser.add_argument('--sequential', type=int, default=20, help='Requests run one at a time for the baseline')
+    parser.add_argument('--workers', type=int, default=16, help='Concurrent requests per process')
+    parser.add_argument('--processes', type=int, default=2, help='Processes for the pool run')
+    parser.add_argument('--model-latency', type=float, default=0.2, help='Fake model time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=1000, help='Fake model output rate')
+    parser.add_argument('--mcp-latency', type=float, default=0.02, help='Fake MCP server latency per tool call (s)')
+    parser.add_argument('--port', type=int, default=8774, help='Port for the fake GitHub MCP server')
+    args = parser.parse_args()
+    args.output_tokens = 200
+
+    os.environ.update({'MARKET_CACHE_ENABLED': 'false', 'GITHUB_TOOL_CACHE_ENABLED': 'false'})
+    from load_test import configure_environment
+
+    configure_environment(args)
+    from http_pool_benchmark import start_fake_server
+
+    server = start_fake_server(args.port, args.mcp_latency)
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            input_path = os.path.join(workdir, 'nightly.jsonl')
+            write_input(input_path, args.requests)
+            reports = asyncio.run(run_modes(args, input_path, workdir))
+            env = {**os.environ, 'PYTHONPATH': os.pathsep.join([REPO_DIR, BENCH_DIR])}
+            resume = kill_and_resume(args, input_path, workdir, env)
+    finally:
+        server.kill()
+
+    print(f"{'mode':<16}{'requests':>9}{'ok':>6}{'failed':>8}{'invalid':>9}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}"
+          f"{'full run s':>12}")
+    for name, report in reports.items():
+        latency = report['latency_ms']
+        print(f"{name:<16}{report['processed']:>9}{report['ok']:>6}{report['failed']:>8}{report['invalid']:>9}"
+              f"{report['requests_per_sec']:>8.1f}{latency['p50']:>9.0f}{latency['p95']:>9.0f}"
+              f"{args.requests / report['requests_per_sec']:>12.1f}")
+    sequential = reports['sequential']['requests_per_sec']
+    best = max(report['requests_per_sec'] for report in reports.values())
+    print(f'\nspeed-up over one request at a time: {best / sequential:.1f}x ({os.cpu_count()} CPUs)')
+    print(f"kill/resume: {resume['results_before_kill']} results before the kill, "
+          f"{resume['lines_with_result']}/{args.requests} lines with a result after resuming "
+          f"({resume['resume_seconds']:.1f}s), {resume['duplicates']} duplicates")
+    for line in resume['resume_summary']:
+        print(f'  {line}')
+
+
+if __name__ == "__main__":
+    main()
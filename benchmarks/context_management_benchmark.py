@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Per-turn input token benchmark for rolling summarization and prefix caching
+Runs one long root_agent session against ScriptedGemini (registered for every
+gemini-* model), alternating market questions (routed to market_analyzer)
+and general questions answered by root_agent, first with the full history
+sent every turn and then with ContextManagerPlugin folding older turns into
+a rolling summary. Reports, per turn, the input tokens sent (instruction,
+tools and contents, estimated at 4 characters per token) and how many of
+them a provider-side prefix cache could not serve: everything after the
+longest prefix shared with the same agent's previous call. The app uses
+the same context cache config as carbon_agent.app, and the context manager's
+cached_tokens are what ScriptedGemini's simulated cache served.
+
+Usage: python benchmarks/context_management_benchmark.py [--turns 40] [--token-budget 8000] [--keep-turns 3]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+PROMPTS = [
+    'Analyze the outlook for {topic} stock',
+    'Hello again! Can you remind me what you can help me with regarding {topic}?',
+    'What is the market outlook for the {topic} sector?',
+    'Thanks. Can you explain that last point about {topic} more simply?',
+]
+TOPICS = ['Tesla', 'semiconductor', 'Nvidia', 'banking', 'energy', 'Apple', 'biotech', 'retail']
+
+
+class RequestSizePlugin(BasePlugin):
+    """Records the size of every model request and the part a prefix cache would not cover"""
+
+    def __init__(self):
+        super().__init__(name='request_size')
+        self.turn_tokens = 0
+        self.turn_uncached = 0
+        self._previous = {}  # agent -> serialized parts of its previous request
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        config = llm_request.config
+        parts = [json.dumps([str(config.system_instruction), [t.model_dump(mode='json', exclude_none=True) for t in config.tools or []]])]
+        parts += [json.dumps(c.model_dump(mode='json', exclude_none=True)) for c in llm_request.contents]
+        previous = self._previous.get(callback_context.agent_name, [])
+        shared = 0
+        while shared < min(len(parts), len(previous)) and parts[shared] == previous[shared]:
+            shared += 1
+        self._previous[callback_context.agent_name] = parts
+        self.turn_tokens += sum(len(part) for part in parts) // 4
+        self.turn_uncached += sum(len(part) for part in parts[shared:]) // 4
+
+
+async def run_session(app, turns, measure):
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from google.genai import types
+
+    runner = Runner(app=app, session_service=InMemorySessionService())
+    session = await runner.session_service.create_session(app_name=app.name, user_id='bench')
+    per_turn = []
+    for turn in range(turns):
+        prompt = PROMPTS[turn % len(PROMPTS)].format(topic=TOPICS[turn // len(PROMPTS) % len(TOPICS)])
+        measure.turn_tokens = measure.turn_uncached = 0
+        async for _ in runner.run_async(
+            user_id='bench', session_id=session.id,
+            new_message=types.Content(role='user', parts=[types.Part.from_text(text=f'{prompt} (turn {turn + 1})')]),
+        ):
+            pass
+        per_turn.append({'input_tokens': measure.turn_tokens, 'uncached_tokens': measure.turn_uncached})
+    return per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=40, help='Turns in the session')
+    parser.add_argument('--token-budget', type=int, default=8000, help='History tokens before older turns are summarized')
+    parser.add_argument('--keep-turns', type=int, default=3, help='Recent turns always sent verbatim')
+    parser.add_argument('--output-tokens', type=int, default=300, help='Tokens in each fake answer')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'FAKE_GEMINI_LATENCY': '0',
+        'FAKE_GEMINI_TOKENS_PER_SECOND': '1000000',
+        'FAKE_GEMINI_OUTPUT_TOKENS': str(args.output_tokens),
+        'MARKET_CACHE_ENABLED': 'false',
+    })
+    from google.adk.apps import App
+    from google.adk.models import LLMRegistry
+    from fake_gemini import ScriptedGemini
+
+    LLMRegistry.register(ScriptedGemini)
+    from carbon_agent.agent import root_agent
+    from carbon_agent.context_management import ContextManagerPlugin, create_context_cache_config
+
+    results, managers = {}, {}
+    for mode in ('verbatim', 'summarized'):
+        measure = RequestSizePlugin()
+        plugins = [measure]
+        if mode == 'summarized':
+            managers[mode] = ContextManagerPlugin(token_budget=args.token_budget, keep_recent_turns=args.keep_turns)
+            plugins.insert(0, managers[mode])
+        app = App(name='context_bench', root_agent=root_agent, plugins=plugins,
+                  context_cache_config=create_context_cache_config())
+        results[mode] = asyncio.run(run_session(app, args.turns, measure))
+
+    shown = sorted({0, 4, 9, 19, args.turns // 2 - 1, args.turns - 1} & set(range(args.turns)))
+    print(f"{'turn':<6}" + ''.join(f'{mode + " input":>20}{mode + " uncached":>22}' for mode in results))
+    for turn in shown:
+        print(f'{turn + 1:<6}' + ''.join(
+            f"{results[mode][turn]['input_tokens']:>20}{results[mode][turn]['uncached_tokens']:>22}" for mode in results
+        ))
+    print()
+    for mode, turns in results.items():
+        tokens = [t['input_tokens'] for t in turns]
+        uncached = [t['uncached_tokens'] for t in turns]
+        print(f'{mode:<11} input tokens: total {sum(tokens):>8}, last turn {tokens[-1]:>6}, '
+              f'max {max(tokens):>6}; uncached: total {sum(uncached):>7}, mean {statistics.mean(uncached):>6.0f}')
+    verbatim = sum(t['input_tokens'] for t in results['verbatim'])
+    summarized = sum(t['input_tokens'] for t in results['summarized'])
+    print(f'\ninput tokens saved: {verbatim - summarized} ({1 - summarized / verbatim:.1%})')
+    print(f"context manager: {managers['summarized'].metrics()}")
+
+
+if __name__ == "__main__":
+    main()
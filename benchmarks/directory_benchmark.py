@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Recipient lookup benchmark for the local Carbon Voice directory
+Runs "verify the recipient, then send a direct message" against the fake
+Carbon Voice MCP server (stdio, with --latency per call and --users
+generated users), resolving recipients given by id, email, phone or name
+either through MCP lookups (get_user, search_user, or list_users filtered
+by name, plus list_conversations) or through the find_* directory tools.
+Reports MCP calls and latency per send, checks both paths pick the same
+users, then checks that a folder created through MCP is found without a
+re-sync and that an expired collection is served while it refreshes.
+
+Usage: python benchmarks/directory_benchmark.py [--sends 200] [--users 2000] [--latency 0.05]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from google.adk.agents import Agent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.tool_context import ToolContext
+from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
+from mcp import StdioServerParameters
+
+
+def make_toolset(args):
+    from carbon_agent.mcp_pool import PooledMcpToolset
+
+    return PooledMcpToolset(connection_params=StdioConnectionParams(server_params=StdioServerParameters(
+        command=sys.executable,
+        args=[os.path.join(BENCH_DIR, 'fake_carbon_voice_server.py'), '--latency', str(args.latency),
+              '--users', str(args.users)],
+    ), timeout=30), pool_min_size=1, pool_max_size=4)
+
+
+async def make_tool_context():
+    session_service = InMemorySessionService()
+    session = await session_service.create_session(app_name='directory_benchmark', user_id='bench')
+    invocation_context = InvocationContext(
+        session_service=session_service, invocation_id='bench', session=session,
+        agent=Agent(name='directory_benchmark'),
+    )
+    return ToolContext(invocation_context)
+
+
+class McpCalls:
+    """Calls MCP tools by name and counts them"""
+
+    def __init__(self, toolset, tool_context):
+        self.toolset = toolset
+        self.tool_context = tool_context
+        self.calls = 0
+        self._tools = None
+
+    async def __call__(self, tool_name, **args):
+        if self._tools is None:
+            self._tools = {tool.name: tool for tool in await self.toolset.get_tools()}
+        self.calls += 1
+        return await self._tools[tool_name].run_async(args=args, tool_context=self.tool_context)
+
+    def tool(self, tool_name):
+        return self._tools[tool_name]
+
+
+def _records(result):
+    from carbon_agent.directory import parse_records
+
+    return parse_records(result)
+
+
+async def resolve_with_mcp(call, query):
+    """What the agent does without a directory: look the user up, then check for a thread"""
+    if query.startswith('u') and query[1:].isdigit():
+        users = _records(await call('get_user', user_id=query))
+    elif '@' in query:
+        users = _records(await call('search_user', email=query))
+    elif query.startswith('+'):
+        users = _records(await call('search_user', phone=query))
+    else:
+        users = [user for user in _records(await call('list_users')) if user['name'].lower().startswith(query.lower())]
+    await call('list_conversations')
+    return users[0]['id'] if users else None
+
+
+async def resolve_with_directory(find, query):
+    users = (await find('users', query))
+    return users[0]['id'] if users else None
+
+
+def queries(args):
+    """Recipients as a user would name them: by id, email, phone or name"""
+    rng = random.Random(7)
+    first = ['Maria', 'James', 'Wei', 'Priya', 'Olu', 'Sofia', 'Liam', 'Yuki', 'Omar', 'Elena']
+    last = ['Garcia', 'Smith', 'Chen', 'Patel', 'Adeyemi', 'Rossi', 'Murphy', 'Tanaka', 'Haddad', 'Novak']
+    result = []
+    for n in range(args.sends):
+        i = rng.randrange(args.users)
+        user = (first[i % 10], last[i // 10 % 10])
+        result.append([
+            f'u{i + 4}',
+            f'{user[0]}.{user[1]}{i}@example.com'.lower(),
+            f'+1555{i + 4:07d}',
+            f'{user[0]} {user[1]} {i}',
+        ][n % 4])
+    return result
+
+
+async def run_sends(args, resolve, call, send):
+    """Resolve and message each recipient; `send` calls create_direct_message"""
+    latencies, chosen = [], []
+    calls_before = call.calls
+    for n, query in enumerate(queries(args)):
+        start = time.perf_counter()
+        user_id = await resolve(query)
+        if user_id:
+            await send('create_direct_message', user_id=user_id, text=f'Hello {n}')
+        latencies.append(time.perf_counter() - start)
+        chosen.append(user_id)
+    return {
+        'mcp_calls': call.calls - calls_before,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p95_ms': sorted(latencies)[int(len(latencies) * 0.95)] * 1000,
+        'chosen': chosen,
+    }
+
+
+async def run(args):
+    from carbon_agent.directory import CarbonVoiceDirectory
+    from carbon_agent.mcp_pool import close_all_pools
+
+    toolset = make_toolset(args)
+    tool_context = await make_tool_context()
+    call = McpCalls(toolset, tool_context)
+    directory = CarbonVoiceDirectory(toolset, ttl=args.ttl)
+
+    async def find(collection, query):
+        return await directory.find(collection, query, tool_context)
+
+    async def call_and_index(tool_name, **call_args):
+        result = await call(tool_name, **call_args)
+        await directory.after_tool_callback(call.tool(tool_name), call_args, tool_context, result)
+        return result
+
+    try:
+        await call('get_workspace_info')  # Starts the server process
+        mcp = await run_sends(args, lambda query: resolve_with_mcp(call, query), call, call)
+        # Sends go through the directory's after_tool_callback, as in the agent,
+        # so any re-list a send triggers is counted
+        indexed = await run_sends(args, lambda query: resolve_with_directory(find, query), call, call_and_index)
+        indexed['mcp_calls'] += directory.metrics()['upstream_calls']
+
+        start = time.perf_counter()
+        for query in queries(args) * 10:
+            directory._indexes[directory._scope(tool_context)].find('users', query)
+        lookup_us = (time.perf_counter() - start) / (args.sends * 10) * 1e6
+
+        await find('folders', 'Archive')
+        await call_and_index('create_folder', name='Q3 Reports')
+        start = time.perf_counter()
+        found_folder = await find('folders', 'q3')
+        write_check = {'found_after_create': bool(found_folder), 'ms': (time.perf_counter() - start) * 1000}
+        await asyncio.sleep(args.latency * 3)  # Let the background re-list finish
+        write_check['still_found'] = bool(await find('folders', 'q3'))
+
+        await asyncio.sleep(args.ttl)
+        start = time.perf_counter()
+        stale = await find('users', 'ada')
+        stale_ms = (time.perf_counter() - start) * 1000
+        await asyncio.sleep(args.latency * 3)
+        metrics = directory.metrics()
+    finally:
+        await close_all_pools()
+    return mcp, indexed, lookup_us, write_check, (stale, stale_ms), metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sends', type=int, default=200, help='Direct messages to send')
+    parser.add_argument('--users', type=int, default=2000, help='Generated users in the fake workspace')
+    parser.add_argument('--latency', type=float, default=0.05, help='Fake MCP server latency per tool call (s)')
+    parser.add_argument('--ttl', type=float, default=2.0, help='Directory TTL for the staleness check (s)')
+    args = parser.parse_args()
+
+    mcp, indexed, lookup_us, write_check, (stale, stale_ms), metrics = asyncio.run(run(args))
+    agree = sum(a == b for a, b in zip(mcp['chosen'], indexed['chosen']))
+    print(f'{args.sends} direct messages to recipients given by id, email, phone or name '
+          f'({args.users + 3} users, {args.latency * 1000:.0f} ms per MCP call):')
+    print(f"{'recipient lookup':<20}{'MCP calls':>10}{'per send':>10}{'p50 ms':>9}{'p95 ms':>9}")
+    for name, result in (('MCP tools', mcp), ('local directory', indexed)):
+        print(f"{name:<20}{result['mcp_calls']:>10}{result['mcp_calls'] / args.sends:>10.2f}"
+              f"{result['p50_ms']:>9.1f}{result['p95_ms']:>9.1f}")
+    print(f'\nsame recipient chosen: {agree}/{args.sends}; index lookup {lookup_us:.1f} us')
+    print(f"folder created through MCP found at once: {'yes' if write_check['found_after_create'] else 'NO'} "
+          f"({write_check['ms']:.2f} ms), and after the background re-list: "
+          f"{'yes' if write_check['still_found'] else 'NO'}")
+    print(f"after the TTL: answered from the stale index in {stale_ms:.2f} ms ({len(stale)} match), "
+          f"refreshed in the background")
+    print(json.dumps({key: value for key, value in metrics.items() if key != 'indexed'}))
+
+
+if __name__ == "__main__":
+    main()
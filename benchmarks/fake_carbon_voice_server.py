@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Stand-in Carbon Voice MCP server for local testing and benchmarks
+Speaks MCP over stdio (default) and exposes a small Carbon Voice-like tool
+catalog backed by in-memory data. No network or API key is needed.
+
+With --port it serves MCP over StreamableHTTP on http://127.0.0.1:<port>/mcp/
+instead, next to a stand-in OAuth2 authorization server: /oauth/authorize
+approves at once as the account in the `fake_account` cookie (default u1),
+/oauth/token issues access tokens that expire after --token-ttl seconds and
+rotates refresh tokens, and /mcp/ answers 401 without a valid token.
+GET /stats reports token endpoint and rejected-request counts.
+
+Usage: python benchmarks/fake_carbon_voice_server.py [--startup-delay 0.5] [--latency 0.0] [--users 0]
+       [--port 0] [--token-ttl 3600] [--token-latency 0.0]
+"""
+
+import argparse
+import asyncio
+import base64
+import hashlib
+import os
+import secrets
+import time
+from collections import Counter
+from urllib.parse import parse_qs, urlencode
+
+from mcp.server.fastmcp import Context, FastMCP
+from starlette.responses import JSONResponse, RedirectResponse
+
+USERS = {
+    'u1': {'id': 'u1', 'name': 'Ada Lovelace', 'email': 'ada@example.com', 'phone': '+15550001'},
+    'u2': {'id': 'u2', 'name': 'Alan Turing', 'email': 'alan@example.com', 'phone': '+15550002'},
+    'u3': {'id': 'u3', 'name': 'Grace Hopper', 'email': 'grace@example.com', 'phone': '+15550003'},
+}
+CONVERSATIONS = {
+    'c1': {'id': 'c1', 'name': 'Engineering', 'members': ['u1', 'u2']},
+    'c2': {'id': 'c2', 'name': 'Leadership', 'members': ['u1', 'u3']},
+}
+FOLDERS = {'f1': {'id': 'f1', 'name': 'Archive'}}
+MESSAGES = [
+    {'id': f'm{i}', 'conversation_id': 'c1', 'author_id': 'u1', 'text': f'Status update {i}'}
+    for i in range(20)
+]
+
+parser = argparse.ArgumentParser(description='Fake Carbon Voice MCP server')
+parser.add_argument('--startup-delay', type=float, default=float(os.getenv('FAKE_MCP_STARTUP_DELAY', '0')),
+                    help='Seconds to sleep before serving, to mimic npx resolution')
+parser.add_argument('--latency', type=float, default=float(os.getenv('FAKE_MCP_LATENCY', '0')),
+                    help='Seconds added to every tool call')
+parser.add_argument('--users', type=int, default=int(os.getenv('FAKE_CV_USERS', '0')),
+                    help='Extra generated users (each in a generated conversation), for a realistic directory')
+parser.add_argument('--port', type=int, default=int(os.getenv('FAKE_CV_PORT', '0')),
+                    help='Serve StreamableHTTP and the OAuth endpoints on this port instead of stdio')
+parser.add_argument('--token-ttl', type=float, default=3600.0, help='Access token lifetime (s)')
+parser.add_argument('--token-latency', type=float, default=0.0, help='Seconds added to every token request')
+parser.add_argument('--client-id', default='fake-client')
+parser.add_argument('--client-secret', default='fake-secret')
+args, _ = parser.parse_known_args()
+
+FIRST_NAMES = ['Maria', 'James', 'Wei', 'Priya', 'Olu', 'Sofia', 'Liam', 'Yuki', 'Omar', 'Elena']
+LAST_NAMES = ['Garcia', 'Smith', 'Chen', 'Patel', 'Adeyemi', 'Rossi', 'Murphy', 'Tanaka', 'Haddad', 'Novak']
+for i in range(args.users):
+    first, last = FIRST_NAMES[i % len(FIRST_NAMES)], LAST_NAMES[i // len(FIRST_NAMES) % len(LAST_NAMES)]
+    user_id = f'u{i + 4}'
+    USERS[user_id] = {'id': user_id, 'name': f'{first} {last} {i}', 'email': f'{first}.{last}{i}@example.com'.lower(),
+                      'phone': f'+1555{i + 4:07d}'}
+    CONVERSATIONS[f'c{i + 3}'] = {'id': f'c{i + 3}', 'name': f'{last} team {i}', 'members': ['u1', user_id]}
+
+mcp = FastMCP('fake-carbon-voice', log_level='WARNING', port=args.port or 8000, streamable_http_path='/mcp/',
+              stateless_http=True, json_response=True)
+
+# OAuth state: code -> (account, redirect_uri, code_challenge), token -> account (and expiry)
+CODES = {}
+ACCESS_TOKENS = {}
+REFRESH_TOKENS = {}
+OAUTH_STATS = Counter()
+
+
+async def _simulate_latency():
+    if args.latency:
+        await asyncio.sleep(args.latency)
+
+
+@mcp.tool()
+async def list_messages(conversation_id: str = '', limit: int = 10) -> list:
+    """List recent messages, optionally filtered by conversation"""
+    await _simulate_latency()
+    messages = [m for m in MESSAGES if not conversation_id or m['conversation_id'] == conversation_id]
+    return messages[:limit]
+
+
+@mcp.tool()
+async def get_message(message_id: str) -> dict:
+    """Get a message by ID"""
+    await _simulate_latency()
+    return next((m for m in MESSAGES if m['id'] == message_id), {})
+
+
+@mcp.tool()
+async def create_direct_message(user_id: str, text: str) -> dict:
+    """Send a direct message to a user"""
+    await _simulate_latency()
+    message = {'id': f'm{len(MESSAGES)}', 'conversation_id': f'dm-{user_id}', 'author_id': 'u1', 'text': text}
+    MESSAGES.append(message)
+    return message
+
+
+@mcp.tool()
+async def get_user(user_id: str) -> dict:
+    """Get a workspace user by ID"""
+    await _simulate_latency()
+    return USERS.get(user_id, {})
+
+
+@mcp.tool()
+async def search_user(email: str = '', phone: str = '') -> dict:
+    """Find a workspace user by email or phone"""
+    await _simulate_latency()
+    for user in USERS.values():
+        if (email and user['email'] == email) or (phone and user['phone'] == phone):
+            return user
+    return {}
+
+
+@mcp.tool()
+async def list_users() -> list:
+    """List workspace users"""
+    await _simulate_latency()
+    return list(USERS.values())
+
+
+@mcp.tool()
+async def list_conversations() -> list:
+    """List conversations the user belongs to"""
+    await _simulate_latency()
+    return list(CONVERSATIONS.values())
+
+
+@mcp.tool()
+async def list_folders() -> list:
+    """List workspace folders"""
+    await _simulate_latency()
+    return list(FOLDERS.values())
+
+
+@mcp.tool()
+async def create_folder(name: str) -> dict:
+    """Create a workspace folder"""
+    await _simulate_latency()
+    folder = {'id': f'f{len(FOLDERS) + 1}', 'name': name}
+    FOLDERS[folder['id']] = folder
+    return folder
+
+
+@mcp.tool()
+async def get_workspace_info(ctx: Context) -> dict:
+    """Get workspace information and statistics"""
+    await _simulate_latency()
+    return {'name': 'Fake Workspace', 'users': len(USERS), 'messages': len(MESSAGES), 'account': _caller(ctx)}
+
+
+def _account(authorization):
+    """Account of a valid bearer token, or None"""
+    token = authorization[len('Bearer '):] if authorization.startswith('Bearer ') else ''
+    account, expires_at = ACCESS_TOKENS.get(token, (None, 0))
+    return account if expires_at > time.time() else None
+
+
+def _caller(ctx):
+    request = ctx.request_context.request
+    return _account(request.headers.get('authorization', '')) if request is not None else 'u1'
+
+
+def _issue(account):
+    access_token, refresh_token = secrets.token_urlsafe(24), secrets.token_urlsafe(24)
+    ACCESS_TOKENS[access_token] = (account, time.time() + args.token_ttl)
+    REFRESH_TOKENS[refresh_token] = account
+    return JSONResponse({'access_token': access_token, 'refresh_token': refresh_token, 'token_type': 'Bearer',
+                         'expires_in': args.token_ttl, 'scope': 'read,write'})
+
+
+@mcp.custom_route('/oauth/authorize', methods=['GET'])
+async def authorize(request):
+    params = request.query_params
+    if params.get('client_id') != args.client_id:
+        return JSONResponse({'error': 'invalid_client'}, status_code=400)
+    code = secrets.token_urlsafe(16)
+    CODES[code] = (request.cookies.get('fake_account', 'u1'), params['redirect_uri'], params.get('code_challenge'))
+    OAUTH_STATS['authorizations'] += 1
+    return RedirectResponse(f"{params['redirect_uri']}?{urlencode({'code': code, 'state': params.get('state', '')})}",
+                            status_code=302)
+
+
+@mcp.custom_route('/oauth/token', methods=['POST'])
+async def token(request):
+    if args.token_latency:
+        await asyncio.sleep(args.token_latency)
+    form = {key: values[0] for key, values in parse_qs((await request.body()).decode()).items()}
+    if form.get('client_id') != args.client_id or form.get('client_secret') != args.client_secret:
+        return JSONResponse({'error': 'invalid_client'}, status_code=401)
+    if form.get('grant_type') == 'authorization_code':
+        account, redirect_uri, challenge = CODES.pop(form.get('code'), (None, None, None))
+        verifier = form.get('code_verifier', '')
+        expected = base64.urlsafe_b64encode(hashlib.sha256(verifier.encode()).digest()).rstrip(b'=').decode()
+        if account is None or redirect_uri != form.get('redirect_uri') or (challenge and challenge != expected):
+            OAUTH_STATS['rejected_codes'] += 1
+            return JSONResponse({'error': 'invalid_grant'}, status_code=400)
+        OAUTH_STATS['exchanges'] += 1
+        return _issue(account)
+    if form.get('grant_type') == 'refresh_token':
+        account = REFRESH_TOKENS.pop(form.get('refresh_token'), None)  # Rotated: each one works once
+        if account is None:
+            OAUTH_STATS['rejected_refreshes'] += 1
+            return JSONResponse({'error': 'invalid_grant'}, status_code=400)
+        OAUTH_STATS['refreshes'] += 1
+        return _issue(account)
+    return JSONResponse({'error': 'unsupported_grant_type'}, status_code=400)
+
+
+@mcp.custom_route('/stats', methods=['GET'])
+async def stats(request):
+    return JSONResponse(dict(OAUTH_STATS))
+
+
+def require_token(app):
+    """Answers 401 to MCP requests without a valid, unexpired access token"""
+    async def wrapped(scope, receive, send):
+        if scope['type'] == 'http' and scope['path'].startswith('/mcp'):
+            headers = dict(scope['headers'])
+            if _account(headers.get(b'authorization', b'').decode()) is None:
+                OAUTH_STATS['rejected_requests'] += 1
+                await JSONResponse({'error': 'invalid_token'}, status_code=401)(scope, receive, send)
+                return
+            OAUTH_STATS['mcp_requests'] += 1
+        await app(scope, receive, send)
+    return wrapped
+
+
+if __name__ == "__main__":
+    if args.startup_delay:
+        time.sleep(args.startup_delay)
+    if args.port:
+        import uvicorn
+
+        uvicorn.run(require_token(mcp.streamable_http_app()), host='127.0.0.1', port=args.port, log_level='warning')
+    else:
+        mcp.run()
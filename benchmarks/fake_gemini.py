@@ -0,0 +1,186 @@
+"""
+Deterministic stand-ins for Gemini models used by the offline benchmarks
+FakeGemini replies after a fixed delay with text derived from the request;
+ScriptedGemini plays the orchestrator and sub-agents (transfers, fan-out,
+MCP tool calls) for load tests. Runs are repeatable and need no network or
+API key.
+"""
+
+import asyncio
+import json
+import os
+import zlib
+
+from google.adk.models import BaseLlm, LLMRegistry, LlmResponse
+from google.genai import types
+from pydantic import Field
+
+
+class FakeGemini(BaseLlm):
+    """BaseLlm that sleeps for `latency` seconds and echoes the last user text"""
+
+    model: str = 'fake-gemini'
+    latency: float = 0.0
+    reply_prefix: str = ''
+
+    async def generate_content_async(self, llm_request, stream=False):
+        await asyncio.sleep(self.latency)
+        last_text = ''
+        for content in reversed(llm_request.contents):
+            texts = [part.text for part in content.parts or [] if part.text]
+            if content.role == 'user' and texts:
+                last_text = ' '.join(texts)
+                break
+        yield LlmResponse(
+            content=types.Content(
+                role='model',
+                parts=[types.Part.from_text(text=f'{self.reply_prefix}{last_text[:200]}')],
+            ),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=len(last_text) // 4,
+                candidates_token_count=len(last_text[:200]) // 4 + len(self.reply_prefix) // 4,
+            ),
+        )
+
+
+# Keywords the scripted orchestrator uses to pick sub-agents
+DOMAIN_KEYWORDS = {
+    'github_agent': ('github', 'repo', 'issue', 'pull request'),
+    'market_analyzer': ('market', 'stock', 'sector', 'invest'),
+    'carbon_voice_agent': ('message', 'team', 'conversation', 'folder'),
+}
+
+# Read-only calls the scripted sub-agents make when the tool is available
+FAKE_TOOL_CALLS = [
+    ('list_issues', {'owner': 'octo', 'repo': 'demo'}),
+    ('get_file_contents', {'owner': 'octo', 'repo': 'demo', 'path': 'README.md'}),
+    ('list_pull_requests', {'owner': 'octo', 'repo': 'demo'}),
+    ('list_messages', {'limit': 5}),
+    ('list_conversations', {}),
+    ('search_user', {'query': 'ada'}),
+]
+
+
+def _env_float(name, default):
+    return float(os.getenv(name, default))
+
+
+# (model, instruction and tools) prefixes a context-cached request has sent
+_cached_prefixes = set()
+
+
+def _cached_tokens(llm_request):
+    """Prefix tokens a Gemini context cache would serve for `llm_request`.
+
+    Requests with a cache_config reuse the instruction and tools prefix the
+    same model was sent before; a cache belongs to the model that created it.
+    """
+    if llm_request.cache_config is None or llm_request.config is None:
+        return 0
+    config = llm_request.config
+    prefix = json.dumps([
+        str(config.system_instruction),
+        [tool.model_dump(mode='json', exclude_none=True) for tool in config.tools or []],
+    ], sort_keys=True)
+    key = (llm_request.model, zlib.crc32(prefix.encode()))
+    if key not in _cached_prefixes:
+        _cached_prefixes.add(key)
+        return 0
+    return len(prefix) // 4
+
+
+class ScriptedGemini(BaseLlm):
+    """BaseLlm that plays the agents' parts deterministically, for load tests.
+
+    The orchestrator transfers to the sub-agent named by keywords in the
+    request, or fans out with run_parallel_subtasks when several match.
+    Sub-agents with MCP tools make one read-only tool call, then answer.
+    Replies take `latency` seconds to the first token and then stream
+    `output_tokens` tokens at `tokens_per_second` (in chunks of
+    `stream_chunk_tokens` when streaming). Requests with a cache_config
+    report their repeated instruction and tools prefix as cached tokens, the
+    way Gemini context caching bills them. Defaults come from
+    FAKE_GEMINI_* environment variables so every agent picks them up when the
+    class is registered for gemini-* model names.
+    """
+
+    model: str = 'fake-gemini'
+    latency: float = Field(default_factory=lambda: _env_float('FAKE_GEMINI_LATENCY', '0.05'))
+    tokens_per_second: float = Field(default_factory=lambda: _env_float('FAKE_GEMINI_TOKENS_PER_SECOND', '2000'))
+    output_tokens: int = Field(default_factory=lambda: int(_env_float('FAKE_GEMINI_OUTPUT_TOKENS', '100')))
+    # Tokens per streamed chunk; 0 streams each answer in four chunks
+    stream_chunk_tokens: int = Field(default_factory=lambda: int(_env_float('FAKE_GEMINI_STREAM_CHUNK_TOKENS', '0')))
+
+    @classmethod
+    def supported_models(cls):
+        return [r'gemini-.*']
+
+    def _plan(self, llm_request):
+        last = llm_request.contents[-1] if llm_request.contents else None
+        after_tool = bool(last and any(part.function_response for part in last.parts or []))
+        user_text = ''
+        for content in llm_request.contents:
+            texts = [part.text for part in content.parts or [] if part.text and not part.text.startswith('For context')]
+            if content.role == 'user' and texts:
+                user_text = ' '.join(texts)
+        if after_tool:
+            return None
+
+        tools = llm_request.tools_dict
+        labels = llm_request.config.labels if llm_request.config else None
+        if (labels or {}).get('adk_agent_name') == 'root_agent':
+            lowered = user_text.lower()
+            targets = [agent for agent, words in DOMAIN_KEYWORDS.items() if any(w in lowered for w in words)]
+            if len(targets) > 1 and 'run_parallel_subtasks' in tools:
+                return types.FunctionCall(name='run_parallel_subtasks', args={'subtasks': [
+                    {'id': agent, 'agent': agent, 'request': user_text} for agent in targets
+                ]})
+            if targets and 'transfer_to_agent' in tools:
+                return types.FunctionCall(name='transfer_to_agent', args={'agent_name': targets[0]})
+            return None
+
+        available = [(name, args) for name, args in FAKE_TOOL_CALLS if name in tools]
+        if available:
+            name, args = available[zlib.crc32(user_text.encode()) % len(available)]
+            return types.FunctionCall(name=name, args=dict(args))
+        return None
+
+    async def generate_content_async(self, llm_request, stream=False):
+        await asyncio.sleep(self.latency)
+        prompt_tokens = sum(
+            len(part.text or '') for content in llm_request.contents for part in content.parts or []
+        ) // 4
+        cached_tokens = _cached_tokens(llm_request)
+        prompt_tokens += cached_tokens
+        function_call = self._plan(llm_request)
+        if function_call is not None:
+            yield LlmResponse(
+                content=types.Content(role='model', parts=[types.Part(function_call=function_call)]),
+                usage_metadata=types.GenerateContentResponseUsageMetadata(
+                    prompt_token_count=prompt_tokens, candidates_token_count=20,
+                    cached_content_token_count=cached_tokens or None,
+                ),
+            )
+            return
+
+        words = [f'token{i}' for i in range(self.output_tokens)]
+        chunk_size = (self.stream_chunk_tokens or max(1, self.output_tokens // 4)) if stream else self.output_tokens
+        text = ''
+        for start in range(0, len(words), chunk_size):
+            chunk = ' '.join(words[start:start + chunk_size]) + ' '
+            await asyncio.sleep(len(words[start:start + chunk_size]) / self.tokens_per_second)
+            text += chunk
+            if stream and start + chunk_size < len(words):
+                yield LlmResponse(content=types.Content(role='model', parts=[types.Part.from_text(text=chunk)]), partial=True)
+        yield LlmResponse(
+            content=types.Content(role='model', parts=[types.Part.from_text(text=text.strip())]),
+            usage_metadata=types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_tokens, candidates_token_count=self.output_tokens,
+                cached_content_token_count=cached_tokens or None,
+            ),
+        )
+
+
+def register_scripted():
+    """Serve every gemini-* model with ScriptedGemini (an initializer for batch_runner.py --init)"""
+    LLMRegistry.register(ScriptedGemini)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Stand-in GitHub MCP server for local testing and benchmarks
+Speaks MCP over StreamableHTTP on http://127.0.0.1:<port>/mcp/ and exposes a
+small GitHub-like tool catalog backed by in-memory data. Upstream tool calls
+are counted per tool and served as JSON from GET /stats, so caching and
+coalescing layers can be checked against the number of calls that reached
+the server. --max-concurrency and --rate-limit make it answer HTTP 429 when
+more requests are in flight, or arrive faster, than it accepts, like a
+rate-limited upstream; rejected requests are counted under "throttled".
+
+Usage: python benchmarks/fake_github_server.py [--port 8765] [--latency 0.0] [--max-concurrency 0] [--rate-limit 0]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+from collections import Counter
+
+import uvicorn
+from mcp.server.fastmcp import FastMCP
+from starlette.responses import JSONResponse, Response
+
+parser = argparse.ArgumentParser(description='Fake GitHub MCP server')
+parser.add_argument('--port', type=int, default=int(os.getenv('FAKE_GITHUB_PORT', '8765')))
+parser.add_argument('--latency', type=float, default=float(os.getenv('FAKE_MCP_LATENCY', '0')),
+                    help='Seconds added to every tool call')
+parser.add_argument('--max-concurrency', type=int, default=int(os.getenv('FAKE_MCP_MAX_CONCURRENCY', '0')),
+                    help='Requests in flight before answering 429 (0 = unlimited)')
+parser.add_argument('--rate-limit', type=float, default=float(os.getenv('FAKE_MCP_RATE_LIMIT', '0')),
+                    help='Requests per second before answering 429 (0 = unlimited)')
+args, _ = parser.parse_known_args()
+
+mcp = FastMCP('fake-github', host='127.0.0.1', port=args.port, streamable_http_path='/mcp/', stateless_http=True, json_response=True)
+
+CALLS = Counter()
+ISSUES = {
+    ('octo', 'demo'): [
+        {'number': n, 'title': f'Issue {n}', 'state': 'open' if n % 3 else 'closed', 'labels': ['bug'] if n % 2 else []}
+        for n in range(1, 26)
+    ],
+}
+PULLS = {
+    ('octo', 'demo'): [
+        {'number': 100 + n, 'title': f'Pull request {n}', 'state': 'open', 'head': f'feature-{n}'}
+        for n in range(1, 6)
+    ],
+}
+FILES = {
+    ('octo', 'demo', 'README.md'): '# demo\n\nA demo repository used by the fake GitHub MCP server.\n',
+    ('octo', 'demo', 'src/app.py'): 'def main():\n    return "hello"\n' * 40,
+}
+
+
+async def _record(tool):
+    CALLS[tool] += 1
+    if args.latency:
+        await asyncio.sleep(args.latency)
+
+
+@mcp.tool()
+async def get_me() -> dict:
+    """Get details of the authenticated GitHub user"""
+    await _record('get_me')
+    return {'login': 'octo', 'name': 'Octo Cat'}
+
+
+@mcp.tool()
+async def search_repositories(query: str) -> list:
+    """Search for GitHub repositories"""
+    await _record('search_repositories')
+    return [{'full_name': f'{owner}/{repo}'} for owner, repo in ISSUES if query.lower() in repo]
+
+
+@mcp.tool()
+async def get_file_contents(owner: str, repo: str, path: str) -> dict:
+    """Get the contents of a file in a GitHub repository"""
+    await _record('get_file_contents')
+    return {'path': path, 'content': FILES.get((owner, repo, path), '')}
+
+
+@mcp.tool()
+async def search_code(query: str) -> list:
+    """Search for code across GitHub repositories"""
+    await _record('search_code')
+    return [{'path': path, 'repository': f'{owner}/{repo}'}
+            for (owner, repo, path), content in FILES.items() if query in content]
+
+
+@mcp.tool()
+async def list_issues(owner: str, repo: str, state: str = 'open') -> list:
+    """List issues in a GitHub repository"""
+    await _record('list_issues')
+    return [i for i in ISSUES.get((owner, repo), []) if state == 'all' or i['state'] == state]
+
+
+@mcp.tool()
+async def get_issue(owner: str, repo: str, issue_number: int) -> dict:
+    """Get details of a specific issue in a GitHub repository"""
+    await _record('get_issue')
+    return next((i for i in ISSUES.get((owner, repo), []) if i['number'] == issue_number), {})
+
+
+@mcp.tool()
+async def create_issue(owner: str, repo: str, title: str, body: str = '') -> dict:
+    """Create a new issue in a GitHub repository"""
+    await _record('create_issue')
+    issues = ISSUES.setdefault((owner, repo), [])
+    issue = {'number': len(issues) + 1, 'title': title, 'body': body, 'state': 'open', 'labels': []}
+    issues.append(issue)
+    return issue
+
+
+@mcp.tool()
+async def update_issue(owner: str, repo: str, issue_number: int, state: str = '', title: str = '') -> dict:
+    """Update an existing issue in a GitHub repository"""
+    await _record('update_issue')
+    for issue in ISSUES.get((owner, repo), []):
+        if issue['number'] == issue_number:
+            issue.update({k: v for k, v in {'state': state, 'title': title}.items() if v})
+            return issue
+    return {}
+
+
+@mcp.tool()
+async def add_issue_comment(owner: str, repo: str, issue_number: int, body: str) -> dict:
+    """Add a comment to an issue"""
+    await _record('add_issue_comment')
+    return {'issue_number': issue_number, 'body': body}
+
+
+@mcp.tool()
+async def list_pull_requests(owner: str, repo: str, state: str = 'open') -> list:
+    """List pull requests in a GitHub repository"""
+    await _record('list_pull_requests')
+    return [p for p in PULLS.get((owner, repo), []) if state == 'all' or p['state'] == state]
+
+
+@mcp.tool()
+async def get_pull_request(owner: str, repo: str, pull_number: int) -> dict:
+    """Get details of a specific pull request"""
+    await _record('get_pull_request')
+    return next((p for p in PULLS.get((owner, repo), []) if p['number'] == pull_number), {})
+
+
+@mcp.tool()
+async def get_pull_request_diff(owner: str, repo: str, pull_number: int) -> str:
+    """Get the diff of a pull request"""
+    await _record('get_pull_request_diff')
+    return ''.join(f'+line {n} of pull request {pull_number}\n' for n in range(400))
+
+
+@mcp.tool()
+async def create_pull_request(owner: str, repo: str, title: str, head: str, base: str = 'main') -> dict:
+    """Create a new pull request"""
+    await _record('create_pull_request')
+    pulls = PULLS.setdefault((owner, repo), [])
+    pull = {'number': 100 + len(pulls) + 1, 'title': title, 'state': 'open', 'head': head, 'base': base}
+    pulls.append(pull)
+    return pull
+
+
+@mcp.tool()
+async def list_dependabot_alerts(owner: str, repo: str) -> list:
+    """List Dependabot alerts for a repository"""
+    await _record('list_dependabot_alerts')
+    return [{'number': n, 'package': f'package-{n}', 'severity': 'high' if n % 4 == 0 else 'medium'}
+            for n in range(1, 31)]
+
+
+@mcp.tool()
+async def list_code_scanning_alerts(owner: str, repo: str) -> list:
+    """List code scanning alerts for a repository"""
+    await _record('list_code_scanning_alerts')
+    return [{'number': n, 'rule': f'rule-{n}'} for n in range(1, 6)]
+
+
+@mcp.tool()
+async def list_notifications() -> list:
+    """List notifications for the authenticated user"""
+    await _record('list_notifications')
+    return [{'id': str(n), 'reason': 'mention'} for n in range(5)]
+
+
+@mcp.tool()
+async def list_discussions(owner: str, repo: str) -> list:
+    """List discussions in a repository"""
+    await _record('list_discussions')
+    return [{'number': n, 'title': f'Discussion {n}'} for n in range(1, 4)]
+
+
+@mcp.tool()
+async def list_labels(owner: str, repo: str) -> list:
+    """List labels in a repository"""
+    await _record('list_labels')
+    return [{'name': 'bug'}, {'name': 'enhancement'}]
+
+
+@mcp.tool()
+async def list_stargazers(owner: str, repo: str) -> list:
+    """List stargazers of a repository"""
+    await _record('list_stargazers')
+    return [{'login': f'user{n}'} for n in range(10)]
+
+
+@mcp.custom_route('/stats', methods=['GET'])
+async def stats(request):
+    return JSONResponse({
+        'calls': dict(CALLS), 'total': sum(CALLS.values()),
+        'throttled': THROTTLED['total'], 'peak_in_flight': THROTTLED['peak'],
+    })
+
+
+@mcp.custom_route('/stats/reset', methods=['POST'])
+async def reset_stats(request):
+    CALLS.clear()
+    THROTTLED.clear()
+    return JSONResponse({'calls': {}, 'total': 0})
+
+
+THROTTLED = Counter()
+
+
+class OverloadMiddleware:
+    """Answers 429 to MCP requests beyond --max-concurrency or --rate-limit"""
+
+    def __init__(self, app):
+        self.app = app
+        self.in_flight = 0
+        self.tokens = args.rate_limit
+        self.refilled = time.monotonic()
+
+    def _take_token(self):
+        if not args.rate_limit:
+            return True
+        now = time.monotonic()
+        self.tokens = min(args.rate_limit, self.tokens + (now - self.refilled) * args.rate_limit)
+        self.refilled = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not scope['path'].startswith('/mcp'):
+            return await self.app(scope, receive, send)
+        if (args.max_concurrency and self.in_flight >= args.max_concurrency) or not self._take_token():
+            THROTTLED['total'] += 1
+            return await Response('rate limited', status_code=429)(scope, receive, send)
+        self.in_flight += 1
+        THROTTLED['peak'] = max(THROTTLED['peak'], self.in_flight)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+
+if __name__ == "__main__":
+    if args.max_concurrency or args.rate_limit:
+        uvicorn.run(OverloadMiddleware(mcp.streamable_http_app()), host='127.0.0.1', port=args.port, log_level='warning')
+    else:
+        mcp.run(transport='streamable-http')
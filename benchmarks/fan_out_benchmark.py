@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Fan-out benchmark for multi-domain requests
+Runs three sub-agents backed by a fake Gemini model with different latencies,
+once as a dependency chain (what sequential transfer_to_agent hops cost) and
+once as independent branches under FanOutExecutor. Parallel wall time should
+be close to the slowest branch instead of the sum of all branches.
+
+Usage: python benchmarks/fan_out_benchmark.py [--latencies 0.3 0.5 0.8]
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google.adk.agents import Agent
+
+from carbon_agent.fan_out import FanOutExecutor, SubTask
+from fake_gemini import FakeGemini
+
+AGENT_NAMES = ['market_analyzer', 'github_agent', 'carbon_voice_agent']
+
+
+def build_root(latencies):
+    sub_agents = [
+        Agent(name=name, model=FakeGemini(latency=latency, reply_prefix=f'[{name}] '), instruction=f'You are {name}.')
+        for name, latency in zip(AGENT_NAMES, latencies)
+    ]
+    return Agent(name='root_agent', model=FakeGemini(), sub_agents=sub_agents)
+
+
+async def timed(executor, subtasks):
+    start = time.perf_counter()
+    results = await executor.execute(subtasks)
+    assert all(result.status == 'ok' for result in results), results
+    return time.perf_counter() - start
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latencies', type=float, nargs=3, default=[0.3, 0.5, 0.8],
+                        help='Model latency in seconds for market_analyzer, github_agent and carbon_voice_agent')
+    args = parser.parse_args()
+
+    executor = FanOutExecutor(build_root(args.latencies), branch_timeout=30)
+    requests = {
+        'market_analyzer': 'Analyze the AI semiconductor market',
+        'github_agent': 'List open security issues in octo/demo',
+        'carbon_voice_agent': 'Draft a status update for the team',
+    }
+    chained = [
+        SubTask(id=f'step{i}', agent=name, request=requests[name], depends_on=[f'step{i - 1}'] if i else [])
+        for i, name in enumerate(AGENT_NAMES)
+    ]
+    parallel = [SubTask(id=f'step{i}', agent=name, request=requests[name]) for i, name in enumerate(AGENT_NAMES)]
+
+    await timed(executor, parallel)  # Warm-up: builds the detached agents once
+    sequential_s = await timed(executor, chained)
+    parallel_s = await timed(executor, parallel)
+
+    print(f'branch latencies:   {", ".join(f"{latency:.2f}s" for latency in args.latencies)}')
+    print(f'sequential (chain): {sequential_s:.2f}s  (sum of branches {sum(args.latencies):.2f}s)')
+    print(f'parallel fan-out:   {parallel_s:.2f}s  (longest branch {max(args.latencies):.2f}s)')
+    print(f'speed-up:           {sequential_s / parallel_s:.1f}x')
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
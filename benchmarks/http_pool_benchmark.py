@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Throughput benchmark for the shared StreamableHTTP connection pools
+Starts the local fake GitHub MCP server and runs bursts of concurrent MCP
+sessions against it, first with ADK's default transport (a new connection
+pool per session) and then with the shared per-host pools.
+
+Usage: python benchmarks/http_pool_benchmark.py [--sessions 20] [--calls 10] [--latency 0.01]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager
+from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnectionParams
+
+from carbon_agent.http_pool import PooledHTTPSessionManager, close_all_transports, pool_metrics
+
+FAKE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_github_server.py')
+DEVNULL = open(os.devnull, 'w')
+
+
+def start_fake_server(port, latency):
+    process = subprocess.Popen(
+        [sys.executable, FAKE_SERVER, '--port', str(port), '--latency', str(latency)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{port}/stats')
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('Fake GitHub MCP server did not start')
+
+
+async def run_session(manager_cls, url, session_id, calls, latencies):
+    params = StreamableHTTPConnectionParams(url=url, headers={'Authorization': f'Bearer user-{session_id}'})
+    manager = manager_cls(connection_params=params, errlog=DEVNULL)
+    try:
+        session = await manager.create_session()
+        for n in range(calls):
+            start = time.perf_counter()
+            await session.call_tool('get_issue', arguments={'owner': 'octo', 'repo': 'demo', 'issue_number': n % 25 + 1})
+            latencies.append((time.perf_counter() - start) * 1000)
+    finally:
+        await manager.close()
+
+
+async def measure(manager_cls, url, sessions, calls):
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(manager_cls, url, i, calls, latencies) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+
+    return {
+        'calls_per_sec': len(latencies) / elapsed,
+        'p50': statistics.median(latencies),
+        'p95': percentile(0.95),
+        'p99': percentile(0.99),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20, help='Concurrent MCP sessions per burst')
+    parser.add_argument('--calls', type=int, default=10, help='Tool calls per session')
+    parser.add_argument('--latency', type=float, default=0.01, help='Server-side latency per tool call')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    url = f'http://127.0.0.1:{args.port}/mcp/'
+    server = start_fake_server(args.port, args.latency)
+    try:
+        default = await measure(MCPSessionManager, url, args.sessions, args.calls)
+        pooled = await measure(PooledHTTPSessionManager, url, args.sessions, args.calls)
+        metrics = pool_metrics()
+        await close_all_transports()
+    finally:
+        server.kill()
+
+    print(f"{'transport':<10}{'calls/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in (('default', default), ('pooled', pooled)):
+        print(f"{name:<10}{result['calls_per_sec']:>10.1f}{result['p50']:>10.1f}{result['p95']:>10.1f}{result['p99']:>10.1f}")
+    print('\nShared pool metrics:')
+    print(json.dumps(metrics, indent=2))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,245 @@
+#!/usr/bin/env python3
+"""
+Offline load test for the carbon_agent package
+Runs the real root_agent tree against ScriptedGemini (registered for every
+gemini-* model) and the local fake MCP servers: Carbon Voice over stdio
+through the warm server pool and GitHub over StreamableHTTP. N concurrent
+simulated sessions each send --turns requests drawn from a fixed mix of
+GitHub, market, Carbon Voice, multi-domain and general prompts. Reports
+requests/sec, latency percentiles, memory per session and tool-call counts.
+--save writes the results as JSON; --compare checks them against a saved
+baseline and exits with status 1 on a regression beyond --tolerance.
+
+Usage: python benchmarks/load_test.py [--sessions 20] [--turns 3] [--model-latency 0.05]
+       [--tokens-per-second 2000] [--mcp-latency 0.01] [--save FILE] [--compare FILE]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import resource
+import sys
+import time
+import urllib.request
+from collections import Counter, defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from google.adk.plugins.base_plugin import BasePlugin
+
+PROMPTS = [
+    ('github', 'List the open issues in the octo/demo repo'),
+    ('market', 'Analyze Tesla stock'),
+    ('carbon_voice', 'Show my latest Carbon Voice messages'),
+    ('github', 'Show me the README of the demo repository'),
+    ('multi', 'Research the AI chip market and list open issues in the octo/demo repo'),
+    ('market', 'What is the outlook for the semiconductor sector?'),
+    ('carbon_voice', 'Who is in the engineering conversation with the team?'),
+    ('general', 'Hello! What can you help me with?'),
+]
+
+
+class CallCounterPlugin(BasePlugin):
+    """Counts model and tool calls across the agent tree, fan-out branches included"""
+
+    def __init__(self):
+        super().__init__(name='load_test_counter')
+        self.llm_calls = Counter()
+        self.tool_calls = Counter()
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        self.llm_calls[callback_context.agent_name] += 1
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        self.tool_calls[tool.name] += 1
+
+
+def current_rss_mb():
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except OSError:
+        # Peak RSS is the best we can do without /proc
+        scale = 2 ** 20 if sys.platform == 'darwin' else 2 ** 10
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] * 1000 if values else None
+
+
+def configure_environment(args):
+    """Point every agent at the fakes; must run before carbon_agent is imported"""
+    os.environ.update({
+        'GITHUB_TOKEN': 'load_test_github_token',
+        'CARBON_VOICE_API_KEY': 'load_test_carbon_voice_key',
+        'GITHUB_MCP_URL': f'http://127.0.0.1:{args.port}/mcp/',
+        'CARBON_VOICE_MCP_COMMAND': sys.executable,
+        'CARBON_VOICE_MCP_ARGS': f"{os.path.join(BENCH_DIR, 'fake_carbon_voice_server.py')} --latency {args.mcp_latency}",
+        'FAKE_GEMINI_LATENCY': str(args.model_latency),
+        'FAKE_GEMINI_TOKENS_PER_SECOND': str(args.tokens_per_second),
+        'FAKE_GEMINI_OUTPUT_TOKENS': str(args.output_tokens),
+    })
+    from google.adk.models import LLMRegistry
+    from fake_gemini import ScriptedGemini
+
+    LLMRegistry.register(ScriptedGemini)
+
+
+async def run_session(runner, session_index, turns, latencies, failures):
+    from google.genai import types
+
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id=f'user{session_index}')
+    for turn in range(turns):
+        kind, prompt = PROMPTS[(session_index + turn) % len(PROMPTS)]
+        start = time.perf_counter()
+        try:
+            async for _ in runner.run_async(
+                user_id=session.user_id,
+                session_id=session.id,
+                new_message=types.Content(role='user', parts=[types.Part.from_text(text=prompt)]),
+            ):
+                pass
+        except Exception as e:
+            failures[kind] += 1
+            print(f'❌ Session {session_index} turn {turn} ({kind}) failed: {e}', file=sys.stderr)
+            continue
+        latencies[kind].append(time.perf_counter() - start)
+    return session
+
+
+async def run_load(args):
+    from google.adk.apps import App
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    import carbon_agent
+    from carbon_agent.http_pool import close_all_transports
+    from carbon_agent.mcp_pool import close_all_pools
+
+    counter = CallCounterPlugin()
+    base_app = carbon_agent.agent.app
+    app = App(name=base_app.name, root_agent=base_app.root_agent, plugins=[*base_app.plugins, counter])
+    session_service = InMemorySessionService()
+    runner = Runner(app=app, session_service=session_service)
+
+    try:
+        # Warm-up: builds the sub-agents, starts the stdio pool, fills catalogs
+        await asyncio.gather(*(run_session(runner, i, 1, defaultdict(list), Counter()) for i in range(len(PROMPTS))))
+        counter.llm_calls.clear()
+        counter.tool_calls.clear()
+        urllib.request.urlopen(urllib.request.Request(f'http://127.0.0.1:{args.port}/stats/reset', method='POST'))
+
+        rss_before = current_rss_mb()
+        latencies, failures = defaultdict(list), Counter()
+        start = time.perf_counter()
+        created = await asyncio.gather(*(
+            run_session(runner, i, args.turns, latencies, failures) for i in range(args.sessions)
+        ))
+        elapsed = time.perf_counter() - start
+        rss_after = current_rss_mb()
+
+        with urllib.request.urlopen(f'http://127.0.0.1:{args.port}/stats') as response:
+            github_upstream = json.load(response)['total']
+        sessions = [
+            await session_service.get_session(app_name=runner.app_name, user_id=s.user_id, session_id=s.id)
+            for s in created
+        ]
+    finally:
+        await close_all_pools()
+        await close_all_transports()
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'sessions': args.sessions,
+        'requests': len(all_latencies),
+        'failures': sum(failures.values()),
+        'requests_per_sec': len(all_latencies) / elapsed,
+        'latency_ms': {
+            kind: {'p50': percentile(values, 0.50), 'p95': percentile(values, 0.95), 'p99': percentile(values, 0.99)}
+            for kind, values in sorted({**latencies, 'all': all_latencies}.items())
+        },
+        'memory_per_session_kb': max(0.0, rss_after - rss_before) * 1024 / args.sessions,
+        'events_per_session': sum(len(s.events) for s in sessions) / max(1, len(sessions)),
+        'llm_calls': dict(counter.llm_calls),
+        'tool_calls': dict(counter.tool_calls),
+        'github_upstream_calls': github_upstream,
+    }
+
+
+def print_results(results):
+    print(f"requests: {results['requests']} in {results['sessions']} sessions, "
+          f"{results['failures']} failed, {results['requests_per_sec']:.1f} req/s")
+    print(f"memory per session: {results['memory_per_session_kb']:.1f} KB, "
+          f"events per session: {results['events_per_session']:.1f}\n")
+    print(f"{'prompt kind':<14}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for kind, stats in results['latency_ms'].items():
+        print(f"{kind:<14}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['p99']:>10.1f}")
+    print('\nLLM calls:  ' + ', '.join(f'{name} {count}' for name, count in sorted(results['llm_calls'].items())))
+    print('Tool calls: ' + ', '.join(f'{name} {count}' for name, count in sorted(results['tool_calls'].items())))
+    print(f"GitHub MCP upstream calls: {results['github_upstream_calls']}")
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of regressions against `baseline`"""
+    regressions = []
+    if results['requests_per_sec'] < baseline['requests_per_sec'] * (1 - tolerance):
+        regressions.append(f"throughput {results['requests_per_sec']:.1f} < {baseline['requests_per_sec']:.1f} req/s")
+    for p in ('p50', 'p95'):
+        now, then = results['latency_ms']['all'][p], baseline['latency_ms']['all'][p]
+        if now > then * (1 + tolerance):
+            regressions.append(f'{p} latency {now:.1f} > {then:.1f} ms')
+    if results['failures'] > baseline['failures']:
+        regressions.append(f"failures {results['failures']} > {baseline['failures']}")
+    for name, count in baseline['tool_calls'].items():
+        if results['tool_calls'].get(name, 0) > count * (1 + tolerance):
+            regressions.append(f"{name} calls {results['tool_calls'][name]} > {count}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20, help='Concurrent simulated sessions')
+    parser.add_argument('--turns', type=int, default=3, help='Requests per session')
+    parser.add_argument('--model-latency', type=float, default=0.05, help='Fake model time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=2000, help='Fake model output rate')
+    parser.add_argument('--output-tokens', type=int, default=100, help='Tokens in each fake text answer')
+    parser.add_argument('--mcp-latency', type=float, default=0.01, help='Fake MCP server latency per tool call (s)')
+    parser.add_argument('--port', type=int, default=8767, help='Port for the fake GitHub MCP server')
+    parser.add_argument('--save', help='Write results as JSON to this file')
+    parser.add_argument('--compare', help='Baseline JSON from an earlier --save run')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative regression')
+    args = parser.parse_args()
+
+    configure_environment(args)
+    # Imports carbon_agent, so only after the environment points at the fakes
+    from http_pool_benchmark import start_fake_server
+
+    server = start_fake_server(args.port, args.mcp_latency)
+    try:
+        results = asyncio.run(run_load(args))
+    finally:
+        server.kill()
+
+    print_results(results)
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'\n💾 Results saved to {args.save}')
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        if regressions:
+            print('\n❌ Regressions against baseline:')
+            for regression in regressions:
+                print(f'   - {regression}')
+            sys.exit(1)
+        print('\n✅ No regressions against baseline')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Latency benchmark for the stdio MCP server pool
+Compares a tool call that spawns a fresh server process (what happens whenever
+a session starts cold) with the same call on a warm pooled server. Runs
+against the local fake Carbon Voice server, so no network is needed.
+
+Usage: python benchmarks/mcp_pool_benchmark.py [--calls 20] [--concurrency 4] [--startup-delay 0.5]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager
+from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
+from mcp import StdioServerParameters
+
+from carbon_agent.mcp_pool import PooledMCPSessionManager, close_all_pools
+
+FAKE_SERVER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fake_carbon_voice_server.py')
+
+# Server logs and ADK cleanup warnings would drown out the report
+DEVNULL = open(os.devnull, 'w')
+
+
+def connection_params(startup_delay):
+    return StdioConnectionParams(
+        server_params=StdioServerParameters(
+            command=sys.executable,
+            args=[FAKE_SERVER, '--startup-delay', str(startup_delay)],
+        ),
+        timeout=30,
+    )
+
+
+async def cold_call(params):
+    manager = MCPSessionManager(connection_params=params, errlog=DEVNULL)
+    try:
+        session = await manager.create_session()
+        await session.call_tool('list_messages', arguments={'limit': 5})
+    finally:
+        await manager.close()
+
+
+async def pooled_call(manager):
+    session = await manager.create_session()
+    await session.call_tool('list_messages', arguments={'limit': 5})
+
+
+async def measure(make_call, calls, concurrency):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await make_call()
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        'p50': statistics.median(latencies),
+        'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+        'calls_per_sec': calls / elapsed,
+    }
+
+
+def report(name, result):
+    print(f"{name:<8}{result['p50']:>10.1f}{result['p95']:>10.1f}{result['calls_per_sec']:>12.1f}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--calls', type=int, default=20)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--startup-delay', type=float, default=0.5,
+                        help='Simulated server start cost (npx resolution + Node startup)')
+    args = parser.parse_args()
+
+    params = connection_params(args.startup_delay)
+    cold = await measure(lambda: cold_call(params), args.calls, args.concurrency)
+
+    manager = PooledMCPSessionManager(connection_params=params, errlog=DEVNULL, min_size=1, max_size=args.concurrency)
+    await pooled_call(manager)  # Warm the pool once, as a long-running worker would be
+    pooled = await measure(lambda: pooled_call(manager), args.calls, args.concurrency)
+    pool_size = manager.pool.size
+    await close_all_pools()
+
+    print(f"{'mode':<8}{'p50 ms':>10}{'p95 ms':>10}{'calls/s':>12}")
+    report('cold', cold)
+    report('pooled', pooled)
+    print(f"\nPool size after run: {pool_size}")
+    print(f"p50 speed-up: {cold['p50'] / pooled['p50']:.1f}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Offline evaluation of the per-agent model cascade
+Runs the load test's prompt mix through the real root_agent tree and the
+local fake MCP servers with TieredGemini: ScriptedGemini with a latency and
+output rate per model, where the light models (gemini-2.5-flash-lite,
+gemini-1.5-flash) also make a mistake on --mistake-rate of their answers:
+a transfer to an agent that does not exist, a tool call missing required
+arguments, a hedge, a truncated analysis or a low-confidence answer. Each
+mode runs in its own process: "single" gives every agent its one model
+(CASCADE_ENABLED=false), "cascade" uses the default per-agent policies.
+Pre-routing is off so routing turns reach the orchestrator model. Reports
+throughput, latency, model cost per request (at DEFAULT_PRICES), mistakes
+that reached the session, escalations, and per-model telemetry.
+
+Usage: python benchmarks/model_cascade_benchmark.py [--sessions 16] [--turns 4] [--mistake-rate 0.15]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import zlib
+from collections import Counter, defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from google.adk.models import LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from fake_gemini import ScriptedGemini
+
+# model prefix -> (time to first token s, output tokens/s, makes mistakes)
+MODEL_PROFILES = {
+    'gemini-2.5-flash-lite': (0.08, 600, True),
+    'gemini-1.5-flash': (0.12, 400, True),
+    'gemini-2.5-flash': (0.30, 200, False),
+}
+MISTAKES = ('invalid_transfer', 'missing_arguments', 'hedge', 'short_answer', 'low_confidence')
+
+
+class TieredGemini(ScriptedGemini):
+    """ScriptedGemini with per-model speed and, for light models, injected mistakes"""
+
+    def _profile(self):
+        name = max((prefix for prefix in MODEL_PROFILES if self.model.startswith(prefix)), key=len)
+        return MODEL_PROFILES[name]
+
+    def _mistake(self, llm_request):
+        """Which mistake this model makes on this request, if any"""
+        if not self._profile()[2]:
+            return None
+        key = f'{self.model}|{len(llm_request.contents)}|{llm_request.contents[-1].model_dump_json()}'
+        draw = zlib.crc32(key.encode()) % 10000
+        if draw >= float(os.environ['CASCADE_BENCH_MISTAKE_RATE']) * 10000:
+            return None
+        return MISTAKES[draw % len(MISTAKES)]
+
+    async def generate_content_async(self, llm_request, stream=False):
+        self.latency, self.tokens_per_second, _ = self._profile()
+        mistake = self._mistake(llm_request)
+        planned = self._plan(llm_request)
+        if mistake in ('invalid_transfer', 'missing_arguments') and planned is not None:
+            await asyncio.sleep(self.latency)
+            if planned.name == 'transfer_to_agent':
+                call = types.FunctionCall(name='transfer_to_agent', args={'agent_name': 'research_agent'})
+            else:
+                call = types.FunctionCall(name=planned.name, args={})
+            yield self._marked(LlmResponse(content=types.Content(role='model', parts=[types.Part(function_call=call)])), mistake)
+            return
+        if mistake in ('hedge', 'short_answer') and planned is None:
+            await asyncio.sleep(self.latency)
+            text = "I'm not sure I can answer that." if mistake == 'hedge' else 'Markets are mixed.'
+            yield self._marked(LlmResponse(content=types.Content(role='model', parts=[types.Part.from_text(text=text)])), mistake)
+            return
+        async for response in super().generate_content_async(llm_request, stream=stream):
+            if not response.partial:
+                if mistake == 'low_confidence':
+                    response.avg_logprobs = -1.8
+                    self._marked(response, mistake)
+                else:
+                    response.avg_logprobs = -0.2
+            yield response
+
+    @staticmethod
+    def _marked(response, mistake):
+        response.custom_metadata = {'stub_mistake': mistake}
+        return response
+
+
+class QualityPlugin(BasePlugin):
+    """Counts model responses that reached the session with an injected mistake"""
+
+    def __init__(self):
+        super().__init__(name='cascade_quality')
+        self.delivered = Counter()
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        mistake = (llm_response.custom_metadata or {}).get('stub_mistake')
+        if mistake:
+            self.delivered[mistake] += 1
+
+
+async def run_mode(args):
+    from google.adk.apps import App
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    import carbon_agent
+    from carbon_agent.http_pool import close_all_transports
+    from carbon_agent.mcp_pool import close_all_pools
+    from carbon_agent.model_cascade import get_cascade_telemetry
+    from load_test import PROMPTS, run_session
+
+    quality = QualityPlugin()
+    base_app = carbon_agent.agent.app
+    app = App(name=base_app.name, root_agent=base_app.root_agent, plugins=[*base_app.plugins, quality])
+    runner = Runner(app=app, session_service=InMemorySessionService())
+    telemetry = get_cascade_telemetry()
+    try:
+        # Warm-up builds the sub-agents and starts the MCP servers
+        await asyncio.gather(*(run_session(runner, i, 1, defaultdict(list), Counter()) for i in range(len(PROMPTS))))
+        quality.delivered.clear()
+        telemetry.reset()
+        latencies, failures = defaultdict(list), Counter()
+        start = time.perf_counter()
+        await asyncio.gather(*(run_session(runner, i, args.turns, latencies, failures) for i in range(args.sessions)))
+        elapsed = time.perf_counter() - start
+    finally:
+        await close_all_pools()
+        await close_all_transports()
+
+    all_latencies = sorted(value for values in latencies.values() for value in values)
+    requests = len(all_latencies)
+    snapshot = telemetry.snapshot()
+    return {
+        'requests': requests,
+        'failures': sum(failures.values()),
+        'requests_per_sec': requests / elapsed,
+        'latency_ms_p50': all_latencies[requests // 2] * 1000 if requests else None,
+        'latency_ms_p95': all_latencies[min(requests - 1, int(requests * 0.95))] * 1000 if requests else None,
+        'cost_per_1k_requests_usd': snapshot['cost_usd'] / max(1, requests) * 1000,
+        'mistakes_delivered': dict(quality.delivered),
+        'telemetry': snapshot,
+    }
+
+
+def child(args):
+    os.environ['CASCADE_ENABLED'] = 'true' if args.mode == 'cascade' else 'false'
+    os.environ['PRE_ROUTER_ENABLED'] = 'false'
+    os.environ['MARKET_CACHE_ENABLED'] = 'false'
+    os.environ['CASCADE_BENCH_MISTAKE_RATE'] = str(args.mistake_rate)
+    from google.adk.models import LLMRegistry
+    from load_test import configure_environment
+
+    args.model_latency, args.tokens_per_second = 0.1, 1000
+    configure_environment(args)
+    # Every gemini-* model name resolves to the tiered stub instead
+    LLMRegistry.register(TieredGemini)
+    from http_pool_benchmark import start_fake_server
+
+    server = start_fake_server(args.port, args.mcp_latency)
+    try:
+        results = asyncio.run(run_mode(args))
+    finally:
+        server.kill()
+    print('CASCADE_RESULTS ' + json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=16, help='Concurrent simulated sessions')
+    parser.add_argument('--turns', type=int, default=4, help='Requests per session')
+    parser.add_argument('--mistake-rate', type=float, default=0.15, help='Share of light-model answers with a mistake')
+    parser.add_argument('--output-tokens', type=int, default=150, help='Tokens in each fake text answer')
+    parser.add_argument('--mcp-latency', type=float, default=0.01, help='Fake MCP server latency per tool call (s)')
+    parser.add_argument('--port', type=int, default=8773, help='Port for the fake GitHub MCP server')
+    parser.add_argument('--mode', choices=['single', 'cascade'], help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.mode:
+        child(args)
+        return
+
+    results = {}
+    for mode in ('single', 'cascade'):
+        output = subprocess.run(
+            [sys.executable, __file__, *sys.argv[1:], '--mode', mode], capture_output=True, text=True, check=True,
+        ).stdout
+        results[mode] = json.loads(output.split('CASCADE_RESULTS ', 1)[1])
+
+    print(f"{'mode':<9}{'requests':>9}{'failed':>8}{'req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'$/1k req':>10}{'mistakes delivered':>20}")
+    for mode, r in results.items():
+        print(f"{mode:<9}{r['requests']:>9}{r['failures']:>8}{r['requests_per_sec']:>8.1f}{r['latency_ms_p50']:>9.0f}"
+              f"{r['latency_ms_p95']:>9.0f}{r['cost_per_1k_requests_usd']:>10.4f}{sum(r['mistakes_delivered'].values()):>20}")
+    for mode, r in results.items():
+        print(f'\n{mode}: per model')
+        for model, stats in sorted(r['telemetry']['models'].items()):
+            print(f"  {model:<24} calls {stats['calls']:>4}, accepted {stats.get('accepted', 0):>4}, "
+                  f"escalated {stats.get('escalated', 0):>3}, p50 {stats['latency_ms_p50']:>6} ms, ${stats['cost_usd']:.5f}")
+        for agent, stats in sorted(r['telemetry']['agents'].items()):
+            print(f"  {agent:<24} " + ', '.join(f'{key} {count}' for key, count in sorted(stats.items())))
+    single, cascade = results['single'], results['cascade']
+    print(f"\ncascade: {single['cost_per_1k_requests_usd'] / max(cascade['cost_per_1k_requests_usd'], 1e-9):.1f}x cheaper, "
+          f"{cascade['requests_per_sec'] / single['requests_per_sec']:.2f}x throughput, "
+          f"{sum(single['mistakes_delivered'].values())} -> {sum(cascade['mistakes_delivered'].values())} mistakes delivered")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+#!/usr/bin/env python3
+"""
+Authorization and token refresh benchmark for the Carbon Voice OAuth broker
+Starts the fake Carbon Voice server in HTTP mode (stand-in authorization
+server with short-lived, rotating tokens) and the broker's callback routes,
+then authorizes many users through the full browser redirect chain, one
+flow at a time (as the old oauth_helper.py did) and all at once. Sessions of
+those users then call Carbon Voice through the OAuth agent's tools for
+several token lifetimes, first with one token for the whole process (the
+old behaviour) and then with per-session tokens from the broker. Reports
+rejected calls, calls answered for another user's account, refreshes and
+latency, checks that a request not authenticated as a user cannot use or
+link that user's account, and checks the encrypted store survives a restart.
+
+Usage: python benchmarks/oauth_broker_benchmark.py [--users 50] [--token-ttl 4] [--duration 12] [--token-latency 0.1]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+import httpx
+from google.adk.agents import Agent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPServerParams
+from google.adk.tools.tool_context import ToolContext
+
+
+def start_fake_server(args):
+    process = subprocess.Popen(
+        [sys.executable, os.path.join(BENCH_DIR, 'fake_carbon_voice_server.py'), '--port', str(args.port),
+         '--token-ttl', str(args.token_ttl), '--token-latency', str(args.token_latency),
+         '--latency', str(args.mcp_latency)],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    for _ in range(100):
+        try:
+            urllib.request.urlopen(f'http://127.0.0.1:{args.port}/stats')
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError('Fake Carbon Voice server did not start')
+
+
+def server_stats(args):
+    with urllib.request.urlopen(f'http://127.0.0.1:{args.port}/stats') as response:
+        return json.loads(response.read())
+
+
+async def tool_context(session_service, user_id):
+    session = await session_service.create_session(app_name='oauth_broker_benchmark', user_id=user_id)
+    return ToolContext(InvocationContext(
+        session_service=session_service, invocation_id=f'bench-{user_id}', session=session,
+        agent=Agent(name='oauth_broker_benchmark'),
+    ))
+
+
+async def authorize(broker, user_id, account):
+    """What a user's browser does: open the start link, approve, follow the redirect back"""
+    start = time.perf_counter()
+    async with httpx.AsyncClient(follow_redirects=True, cookies={'fake_account': account}) as browser:
+        response = await browser.get(broker.start_url(user_id))
+    assert response.status_code == 200 and 'Success' in response.text, response.text
+    return time.perf_counter() - start
+
+
+def as_user(user_id, coroutine):
+    """Run `coroutine` in its own task, as a request the API authenticated as `user_id`"""
+    from carbon_agent.oauth_broker import authenticate
+
+    async def run():
+        authenticate(user_id)
+        return await coroutine
+
+    return asyncio.ensure_future(run())
+
+
+async def call_loop(tools_for, context, account, until, interval, results):
+    """Call get_workspace_info for one session until `until`; records latency and outcome"""
+    while time.monotonic() < until:
+        start = time.perf_counter()
+        try:
+            tools = {tool.name: tool for tool in await tools_for(context)}
+            result = await tools['get_workspace_info'].run_async(args={}, tool_context=context)
+            info = result.get('structuredContent') or json.loads(result['content'][0]['text'])
+            outcome = 'ok' if info.get('account') == account else 'wrong_account'
+        except Exception:
+            outcome = 'rejected'
+        results['latencies'].append(time.perf_counter() - start)
+        results[outcome] = results.get(outcome, 0) + 1
+        await asyncio.sleep(interval)
+
+
+async def run(args, workdir):
+    import uvicorn
+    from fastapi import FastAPI
+
+    from carbon_agent.carbon_voice_oauth_agent import create_carbon_voice_oauth_agent
+    from carbon_agent.http_pool import PooledHttpMcpToolset, close_all_transports
+    from carbon_agent.oauth_broker import EncryptedTokenStore, create_oauth_router, get_oauth_broker
+
+    broker = get_oauth_broker()
+    api = FastAPI()
+    api.include_router(create_oauth_router(broker))
+    server = uvicorn.Server(uvicorn.Config(api, host='127.0.0.1', port=args.callback_port, log_level='warning'))
+    serving = asyncio.ensure_future(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    users = [(f'user{i}', f'u{i % 3 + 1}' if i < 3 else f'acct{i}') for i in range(args.users)]
+    session_service = InMemorySessionService()
+    contexts = {user_id: await tool_context(session_service, user_id) for user_id, _ in users}
+    try:
+        start = time.perf_counter()
+        sequential = [await authorize(broker, f'seq-{user_id}', account) for user_id, account in users]
+        flows = {'one flow at a time': (time.perf_counter() - start, sequential)}
+        start = time.perf_counter()
+        concurrent = await asyncio.gather(*(authorize(broker, user_id, account) for user_id, account in users))
+        flows['all at once'] = (time.perf_counter() - start, concurrent)
+
+        # Before: the token of whoever ran the helper last, for every session, never refreshed
+        static = PooledHttpMcpToolset(connection_params=StreamableHTTPServerParams(
+            url=f'http://127.0.0.1:{args.port}/mcp/',
+            headers={'Authorization': f"Bearer {broker.token(users[0][0])}"},
+        ))
+        before = {'latencies': []}
+        until = time.monotonic() + args.duration
+        await asyncio.gather(*(call_loop(lambda context: static.get_tools(ReadonlyContext(context._invocation_context)),
+                                         contexts[user_id], account, until, args.interval, before) for user_id, account in users))
+
+        agent = create_carbon_voice_oauth_agent()
+        authorized = agent.tools[0]
+        stats_before = server_stats(args)
+        metrics_before = broker.metrics()
+        after = {'latencies': []}
+        until = time.monotonic() + args.duration
+        await asyncio.gather(*(as_user(user_id, call_loop(
+            lambda context: authorized.get_tools(ReadonlyContext(context._invocation_context)),
+            contexts[user_id], account, until, args.interval, after,
+        )) for user_id, account in users))
+        stats = server_stats(args)
+        metrics = broker.metrics()
+
+        start = time.perf_counter()
+        for _ in range(10000):
+            broker.token(users[0][0])
+        lookup_us = (time.perf_counter() - start) / 10000 * 1e6
+
+        async def authorization_tool(context):
+            tools = await authorized.get_tools(ReadonlyContext(context._invocation_context))
+            return [tool.name for tool in tools], await tools[0].run_async(args={}, tool_context=context)
+
+        stranger = await tool_context(session_service, 'stranger')
+        stranger_tools, link = await as_user('stranger', authorization_tool(stranger))
+        # Names a connected user without being authenticated as them
+        impostor = await authorization_tool(contexts[users[0][0]])
+
+        await broker.close()
+        with open(broker.store.path, 'rb') as f:
+            stored = f.read()
+        reloaded = EncryptedTokenStore(broker.store.path).load()
+        restart = {
+            'tokens': len(reloaded),
+            'plaintext': sum(token.access_token.encode() in stored or token.refresh_token.encode() in stored
+                             for token in reloaded.values()),
+            'unexpired': sum(token.expires_in() > 0 for token in reloaded.values()),
+        }
+        await authorized.close()
+        await static.close()
+    finally:
+        server.should_exit = True
+        await serving
+        await close_all_transports()
+    refresh = {
+        'refreshes': metrics['refreshes'] - metrics_before['refreshes'],
+        'server_refreshes': stats.get('refreshes', 0) - stats_before.get('refreshes', 0),
+        'rejected_requests': stats.get('rejected_requests', 0) - stats_before.get('rejected_requests', 0),
+        'retries': metrics['refresh_retries'],
+        'expired_lookups': metrics['expired'] - metrics_before['expired'],
+    }
+    return flows, before, after, refresh, lookup_us, (stranger_tools, link), impostor, restart
+
+
+def summary(results):
+    latencies = sorted(results['latencies'])
+    return (sum(results.get(key, 0) for key in ('ok', 'wrong_account', 'rejected')), results.get('ok', 0),
+            results.get('rejected', 0), results.get('wrong_account', 0),
+            statistics.median(latencies) * 1000, latencies[int(len(latencies) * 0.99)] * 1000)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=50, help='Users authorizing, then calling concurrently')
+    parser.add_argument('--token-ttl', type=float, default=4.0, help='Access token lifetime (s)')
+    parser.add_argument('--refresh-margin', type=float, default=1.5, help='Refresh this long before expiry (s)')
+    parser.add_argument('--duration', type=float, default=12.0, help='Seconds each phase of calls runs')
+    parser.add_argument('--interval', type=float, default=0.2, help='Pause between the calls of a session (s)')
+    parser.add_argument('--token-latency', type=float, default=0.1, help='Token endpoint latency (s)')
+    parser.add_argument('--mcp-latency', type=float, default=0.005, help='Fake MCP server latency per tool call (s)')
+    parser.add_argument('--port', type=int, default=8781, help='Port for the fake Carbon Voice server')
+    parser.add_argument('--callback-port', type=int, default=8782, help='Port for the broker callback routes')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.environ.update({
+            'CARBON_VOICE_CLIENT_ID': 'fake-client',
+            'CARBON_VOICE_CLIENT_SECRET': 'fake-secret',
+            'CARBON_VOICE_AUTHORIZE_URL': f'http://127.0.0.1:{args.port}/oauth/authorize',
+            'CARBON_VOICE_TOKEN_URL': f'http://127.0.0.1:{args.port}/oauth/token',
+            'CARBON_VOICE_REDIRECT_URI': f'http://127.0.0.1:{args.callback_port}/oauth/callback',
+            'CARBON_VOICE_MCP_URL': f'http://127.0.0.1:{args.port}/mcp/',
+            'CARBON_VOICE_TOKEN_STORE': os.path.join(workdir, 'tokens'),
+            'CARBON_VOICE_TOKEN_REFRESH_MARGIN': str(args.refresh_margin),
+            'CARBON_VOICE_DIRECTORY_ENABLED': 'false',
+            'MCP_TOOL_CATALOG_DIR': '',
+        })
+        server = start_fake_server(args)
+        try:
+            flows, before, after, refresh, lookup_us, (stranger_tools, link), impostor, restart = asyncio.run(
+                run(args, workdir))
+        finally:
+            server.kill()
+
+    print(f'{args.users} users authorizing through the browser redirect chain '
+          f'(token endpoint {args.token_latency * 1000:.0f} ms):')
+    for name, (elapsed, times) in flows.items():
+        print(f'  {name:<20}{elapsed:>7.2f} s total, {args.users / elapsed:>7.1f} flows/s, '
+              f'p50 {statistics.median(times) * 1000:.0f} ms per flow')
+    print(f'\n{args.users} sessions calling get_workspace_info for {args.duration:.0f} s each, '
+          f'tokens expiring every {args.token_ttl:.0f} s:')
+    print(f"  {'':<28}{'calls':>7}{'ok':>7}{'401':>7}{'wrong account':>15}{'p50 ms':>8}{'p99 ms':>8}")
+    for name, results in (('one token per process', before), ('per-session broker tokens', after)):
+        calls, ok, rejected, wrong, p50, p99 = summary(results)
+        print(f'  {name:<28}{calls:>7}{ok:>7}{rejected:>7}{wrong:>15}{p50:>8.1f}{p99:>8.1f}')
+    print(f"\nrefreshed in the background: {refresh['refreshes']} ({refresh['server_refreshes']} at the server, "
+          f"{refresh['retries']} retries); requests rejected by the server: {refresh['rejected_requests']}; "
+          f"expired tokens looked up: {refresh['expired_lookups']}; token lookup {lookup_us:.1f} us")
+    print(f'user without a token sees: {stranger_tools} -> {link.get("status")} {link.get("authorization_url", "")[:60]}...')
+    print(f'unauthenticated request naming user0 sees: {impostor[0]} -> {impostor[1].get("status")}')
+    print(f"after a restart: {restart['tokens']} tokens read back from the encrypted store, "
+          f"{restart['unexpired']} unexpired, {restart['plaintext']} found in plaintext in the file")
+
+
+if __name__ == "__main__":
+    main()
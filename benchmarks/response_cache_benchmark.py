@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Response cache benchmark for the market analyzer
+Replays a workload of repeated, paraphrased and look-alike market questions
+against market_analyzer backed by a fake Gemini model, each question in a new
+session, with the response cache disabled, exact-only and exact + semantic.
+Reports hit rates, model calls, latency and wrong answers (a cached answer
+served for a question from a different group, e.g. Ford for Tesla), then
+whether each paraphrase and look-alike of a cached question is served.
+
+Usage: python benchmarks/response_cache_benchmark.py [--latency 0.2] [--threshold 0.8] [--rounds 3]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from carbon_agent.response_cache import ModelResponseCache, ResponseCache, hashed_embedding
+from carbon_agent.search_agent import create_market_analyzer
+from fake_gemini import FakeGemini
+
+# Questions in the same group may share an answer; different groups may not
+GROUPS = {
+    'tesla': ['Analyze Tesla stock', 'analyze tesla stock!', 'Tesla stock analysis', 'Tesla stock analysis this quarter',
+              'tesla stock overview', 'what about tesla stocks?'],
+    'ford': ['Analyze Ford stock', 'Ford stock analysis'],
+    'semis': ['What is the outlook for the semiconductor sector?', 'semiconductor sector outlook', 'Semiconductor sector outlook please'],
+    'software': ['software sector outlook', 'What is the outlook for the software sector?'],
+    'rates': ['How do rising interest rates affect bank stocks?', 'Impact of rising interest rates on bank stocks'],
+    'tesla_q3': ['Tesla Q3 earnings', 'Summarize Tesla Q3 earnings'],
+    'tesla_q4': ['Tesla Q4 earnings'],
+    'nvda_amd': ['Compare Nvidia and AMD', 'Compare AMD and Nvidia'],
+    # Lowercase look-alikes: no capitalized word tells these apart
+    'tesla_targets': ['long term outlook and price targets for tesla stock'],
+    'nvidia_targets': ['long term outlook and price targets for nvidia stock'],
+    'tesla_bonds': ['long term outlook and price targets for tesla bonds'],
+    'semis_this_year': ['semiconductor sector growth outlook for this year'],
+    'semis_next_year': ['semiconductor sector growth outlook for next year'],
+    'tesla_nvidia': ['Tesla and Nvidia stock', 'tesla and nvidia stocks'],
+    'tesla_2025': ['Tesla stock outlook for 2025'],
+}
+
+# (cached question, new question, whether the cached answer should be served)
+PAIRS = [
+    ('Analyze Tesla stock', 'tesla stock overview', True),
+    ('Analyze Tesla stock', 'what about tesla stocks?', True),
+    ('Analyze Tesla stock', 'Tesla stock analysis this quarter', True),
+    ('What is the outlook for the semiconductor sector?', 'semiconductor sector outlook', True),
+    ('Compare Nvidia and AMD', 'Compare AMD and Nvidia', True),
+    ('Analyze Tesla stock', 'analyze nvidia stock', False),
+    ('Analyze Tesla stock', 'tesla and nvidia stock', False),
+    ('Analyze Tesla stock', 'Tesla stock next year', False),
+    ('Analyze Tesla stock', 'Tesla stock 2025', False),
+    ('Tesla Q3 earnings', 'Tesla Q4 earnings', False),
+    ('semiconductor sector growth outlook for this year', 'semiconductor sector growth outlook for next year', False),
+]
+
+
+async def run(prompts, latency, cache):
+    agent = create_market_analyzer().clone(update={
+        'model': FakeGemini(latency=latency, reply_prefix='ANSWER: '),
+        'before_model_callback': cache.before_model_callback if cache else None,
+        'after_model_callback': cache.after_model_callback if cache else None,
+    })
+    runner = InMemoryRunner(agent=agent, app_name='bench')
+    group_of = {prompt: group for group, members in GROUPS.items() for prompt in members}
+    latencies, wrong = [], 0
+    for prompt in prompts:
+        session = await runner.session_service.create_session(app_name='bench', user_id='u')
+        start = time.perf_counter()
+        answer = ''
+        async for event in runner.run_async(
+            user_id='u', session_id=session.id,
+            new_message=types.Content(role='user', parts=[types.Part.from_text(text=prompt)]),
+        ):
+            if event.content and event.content.parts:
+                answer = event.content.parts[0].text or ''
+        latencies.append(time.perf_counter() - start)
+        # The fake model echoes the question, so the answer names its source
+        source = answer.removeprefix('ANSWER: ')
+        if group_of.get(source) != group_of[prompt]:
+            wrong += 1
+    return latencies, wrong
+
+
+def report(label, latencies, wrong, cache):
+    latencies = sorted(latencies)
+    metrics = cache.cache.metrics() if cache else {'hit_rate': 0.0, 'exact_hits': 0, 'semantic_hits': 0, 'stores': 0}
+    model_calls = metrics['stores'] if cache else len(latencies)
+    print(f'{label:<16} hit rate {metrics["hit_rate"]:5.1%}  '
+          f'(exact {metrics["exact_hits"]}, semantic {metrics["semantic_hits"]})  '
+          f'model calls {model_calls:3d}  '
+          f'p50 {latencies[len(latencies) // 2] * 1000:6.1f}ms  '
+          f'total {sum(latencies):5.2f}s  wrong answers {wrong}')
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.2, help='Fake model latency in seconds')
+    parser.add_argument('--threshold', type=float, default=0.8, help='Semantic similarity threshold')
+    parser.add_argument('--rounds', type=int, default=3, help='How many times the workload is replayed')
+    args = parser.parse_args()
+
+    prompts = [prompt for members in GROUPS.values() for prompt in members] * args.rounds
+    random.Random(0).shuffle(prompts)
+    print(f'{len(prompts)} questions in {len(GROUPS)} groups, model latency {args.latency * 1000:.0f}ms')
+
+    latencies, wrong = await run(prompts, args.latency, None)
+    report('no cache', latencies, wrong, None)
+
+    exact = ModelResponseCache(ResponseCache())
+    latencies, wrong = await run(prompts, args.latency, exact)
+    report('exact', latencies, wrong, exact)
+
+    semantic = ModelResponseCache(ResponseCache(embed_fn=hashed_embedding, similarity_threshold=args.threshold))
+    latencies, wrong = await run(prompts, args.latency, semantic)
+    report('exact + semantic', latencies, wrong, semantic)
+
+    print()
+    for cached, prompt, expected in PAIRS:
+        cache = ResponseCache(embed_fn=hashed_embedding, similarity_threshold=args.threshold)
+        await cache.store('bench', cached, None, 0)
+        hit = await cache.lookup('bench', prompt)
+        outcome = f'{hit.kind} hit ({hit.similarity:.2f})' if hit else 'miss'
+        verdict = 'ok' if bool(hit) == expected else 'WRONG'
+        print(f'{cached!r:<52} -> {prompt!r:<52} {outcome:<22} {verdict}')
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Prompt growth benchmark for tool-result compaction
+Runs one long github_agent session against the local fake GitHub MCP server,
+first with every tool result placed verbatim in the conversation and then
+with large results compacted into the blob store. A scripted model calls the
+tool each turn asks for (pull request diffs, Dependabot alert lists, issue
+lists, file contents), reads one page of a compacted result, then answers.
+The model's delay grows with its prompt (--prefill-tokens-per-second), so
+turn latency follows prompt size as it would with Gemini. Reports prompt
+tokens (estimated at 4 characters per token) and latency per turn.
+
+Usage: python benchmarks/result_compaction_benchmark.py [--turns 20] [--prefill-tokens-per-second 20000]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import statistics
+import sys
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from google.adk.models import BaseLlm, LLMRegistry, LlmResponse
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from pydantic import Field
+
+REPO = {'owner': 'octo', 'repo': 'demo'}
+TURNS = [
+    ('get_pull_request_diff', {**REPO, 'pull_number': 101}),
+    ('list_dependabot_alerts', REPO),
+    ('list_issues', {**REPO, 'state': 'all'}),
+    ('get_file_contents', {**REPO, 'path': 'src/app.py'}),
+    ('get_pull_request_diff', {**REPO, 'pull_number': 102}),
+    ('list_code_scanning_alerts', REPO),
+]
+
+# Prompt tokens of each model call in the current turn
+PROMPT_TOKENS = []
+
+
+class ScriptedToolCaller(BaseLlm):
+    """Calls the tool named in the user's message, reads one page of a compacted result, then answers"""
+
+    model: str = 'scripted-tool-caller'
+    base_latency: float = 0.05
+    prefill_tokens_per_second: float = Field(
+        default_factory=lambda: float(os.getenv('FAKE_GEMINI_PREFILL_TOKENS_PER_SECOND', '20000'))
+    )
+
+    @classmethod
+    def supported_models(cls):
+        return [r'gemini-.*']
+
+    async def generate_content_async(self, llm_request, stream=False):
+        tokens = len(json.dumps([c.model_dump(mode='json', exclude_none=True) for c in llm_request.contents])) // 4
+        PROMPT_TOKENS.append(tokens)
+        await asyncio.sleep(self.base_latency + tokens / self.prefill_tokens_per_second)
+
+        last = llm_request.contents[-1]
+        responses = [part.function_response for part in last.parts or [] if part.function_response]
+        if not responses:
+            text = ' '.join(part.text for part in last.parts or [] if part.text)
+            match = re.search(r'CALL (\w+) (\{.*\})', text)
+            call = types.FunctionCall(name=match.group(1), args=json.loads(match.group(2)))
+        elif responses[0].name != 'read_tool_result' and (responses[0].response or {}).get('compacted'):
+            call = types.FunctionCall(name='read_tool_result', args={
+                'handle': responses[0].response['handle'], 'max_chars': 2000,
+            })
+        else:
+            call = None
+        if call is not None:
+            content = types.Content(role='model', parts=[types.Part(function_call=call)])
+        else:
+            content = types.Content(role='model', parts=[types.Part.from_text(text='Here is what I found. ' * 10)])
+        yield LlmResponse(content=content)
+
+
+async def run_session(turns):
+    from carbon_agent.github_agent import create_github_agent
+
+    agent = create_github_agent()
+    runner = Runner(app_name='compaction_bench', agent=agent, session_service=InMemorySessionService())
+    session = await runner.session_service.create_session(app_name='compaction_bench', user_id='bench')
+    per_turn = []
+    for turn in range(turns):
+        name, args = TURNS[turn % len(TURNS)]
+        message = f'Turn {turn}: CALL {name} {json.dumps(args)}'
+        PROMPT_TOKENS.clear()
+        start = time.perf_counter()
+        async for _ in runner.run_async(
+            user_id='bench', session_id=session.id,
+            new_message=types.Content(role='user', parts=[types.Part.from_text(text=message)]),
+        ):
+            pass
+        per_turn.append({
+            'latency_ms': (time.perf_counter() - start) * 1000,
+            'prompt_tokens': max(PROMPT_TOKENS),
+            'model_calls': len(PROMPT_TOKENS),
+        })
+    return per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--turns', type=int, default=20, help='Turns in the session')
+    parser.add_argument('--prefill-tokens-per-second', type=float, default=20000, help='Modelled prompt processing rate')
+    parser.add_argument('--port', type=int, default=8768, help='Port for the fake GitHub MCP server')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'GITHUB_TOKEN': 'bench_token',
+        'GITHUB_MCP_URL': f'http://127.0.0.1:{args.port}/mcp/',
+        'GITHUB_TOOL_SELECTION_ENABLED': 'false',
+        'FAKE_GEMINI_PREFILL_TOKENS_PER_SECOND': str(args.prefill_tokens_per_second),
+    })
+    LLMRegistry.register(ScriptedToolCaller)
+    from carbon_agent.http_pool import close_all_transports
+    from carbon_agent.result_compaction import get_blob_store
+    from http_pool_benchmark import start_fake_server
+
+    async def run_both():
+        results = {}
+        try:
+            for mode, enabled in (('verbatim', 'false'), ('compacted', 'true')):
+                os.environ['TOOL_RESULT_COMPACTION_ENABLED'] = enabled
+                results[mode] = await run_session(args.turns)
+        finally:
+            await close_all_transports()
+        return results
+
+    server = start_fake_server(args.port, 0.0)
+    try:
+        results = asyncio.run(run_both())
+    finally:
+        server.kill()
+
+    shown = sorted({0, 4, 9, args.turns // 2 - 1, args.turns - 1} & set(range(args.turns)))
+    print(f"{'turn':<6}" + ''.join(f'{mode + " tokens":>20}{mode + " ms":>16}' for mode in results))
+    for turn in shown:
+        print(f'{turn + 1:<6}' + ''.join(
+            f"{results[mode][turn]['prompt_tokens']:>20}{results[mode][turn]['latency_ms']:>16.0f}" for mode in results
+        ))
+    print()
+    for mode, turns in results.items():
+        tokens = [t['prompt_tokens'] for t in turns]
+        print(f"{mode:<10} total prompt tokens {sum(tokens):>8}, last turn {tokens[-1]:>6}, "
+              f"mean turn {statistics.mean(t['latency_ms'] for t in turns):.0f} ms, "
+              f"model calls {sum(t['model_calls'] for t in turns)}")
+    print(f"\nblob store: {get_blob_store().metrics()}")
+
+
+if __name__ == "__main__":
+    main()
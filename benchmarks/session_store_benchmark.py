@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Write throughput and load latency benchmark for the append-only session store
+Appends the same synthetic agent event stream (user messages, transfers,
+tool calls and results, replies, some with state deltas, and a rolling
+summary every few turns) to ADK's SqliteSessionService, ADK's
+DatabaseSessionService on sqlite+aiosqlite and AppendOnlySessionService
+(waiting for each group commit, and not). Reports events/sec with many
+sessions written concurrently and get_session latency as one session grows.
+Then runs real root_agent turns (ScriptedGemini and the local fake MCP
+servers) on the append-only store with a small summary budget, reopens the
+database and continues the session to check nothing was lost.
+
+Usage: python benchmarks/session_store_benchmark.py [--sessions 20] [--events 200] [--lengths 100,1000,5000]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+from google.adk.events import Event, EventActions
+from google.genai import types
+
+REPLY = ('Tesla shares rose 3% on strong deliveries; analysts see margin pressure from price cuts but '
+         'expect energy storage growth to offset it. ') * 6
+
+
+def make_services(workdir):
+    from google.adk.sessions.sqlite_session_service import SqliteSessionService
+
+    from carbon_agent.session_store import AppendOnlySessionService
+
+    services = {'adk sqlite': lambda: SqliteSessionService(os.path.join(workdir, 'adk_sqlite.db'))}
+    try:
+        from google.adk.sessions import DatabaseSessionService
+
+        database_url = f"sqlite+aiosqlite:///{os.path.join(workdir, 'adk_db.db')}"
+        DatabaseSessionService(database_url)
+        services['adk database'] = lambda: DatabaseSessionService(database_url)
+    except ImportError as e:
+        print(f'Skipping adk database: {e}', file=sys.stderr)
+    services['append-only'] = lambda: AppendOnlySessionService(os.path.join(workdir, 'append.db'))
+    services['append-only no wait'] = lambda: AppendOnlySessionService(
+        os.path.join(workdir, 'append_nowait.db'), wait_for_commit=False,
+    )
+    return services
+
+
+def turn_events(turn, session_events, summary_every):
+    """The events of one conversation turn, as root_agent and a specialist produce them"""
+    invocation = Event.new_id()
+    user = Event(author='user', invocation_id=invocation, content=types.Content(
+        role='user', parts=[types.Part.from_text(text=f'Analyze Tesla stock, question {turn}')]))
+    yield user
+    yield Event(author='root_agent', invocation_id=invocation, content=types.Content(role='model', parts=[
+        types.Part.from_function_call(name='transfer_to_agent', args={'agent_name': 'market_analyzer'})]))
+    yield Event(author='root_agent', invocation_id=invocation, content=types.Content(role='user', parts=[
+        types.Part.from_function_response(name='transfer_to_agent', response={'result': None})]),
+        actions=EventActions(transfer_to_agent='market_analyzer'))
+    yield Event(author='market_analyzer', invocation_id=invocation, content=types.Content(role='model', parts=[
+        types.Part.from_function_call(name='google_search', args={'query': f'Tesla stock news {turn}'})]))
+    yield Event(author='market_analyzer', invocation_id=invocation, content=types.Content(role='user', parts=[
+        types.Part.from_function_response(name='google_search', response={'result': REPLY})]))
+    yield Event(author='market_analyzer', invocation_id=invocation, content=types.Content(
+        role='model', parts=[types.Part.from_text(text=REPLY)]),
+        actions=EventActions(state_delta={'last_ticker': 'TSLA', 'turns': turn, 'user:last_topic': 'Tesla'}))
+    if summary_every and turn % summary_every == summary_every - 1:
+        # Keep the last three turns verbatim, like ContextManagerPlugin
+        kept = [event for event in session_events if event.author == 'user'][-3:]
+        yield Event(author='market_analyzer', invocation_id=invocation, actions=EventActions(state_delta={
+            'context_summary': {'text': 'The user asked about Tesla repeatedly. ' * 20,
+                                'first_kept_event_id': kept[0].id, 'turns': turn - 2}}))
+
+
+async def append_turns(service, session, events, summary_every=5):
+    """Append `events` events to `session`; returns how many appends failed"""
+    turn = failed = 0
+    while events > 0:
+        for event in turn_events(turn, session.events, summary_every):
+            try:
+                await service.append_event(session, event)
+            except Exception as e:
+                failed += 1
+                if failed == 1:
+                    print(f'append to {session.id} failed: {e}', file=sys.stderr)
+                if not any(e.id == event.id for e in session.events):
+                    session.events.append(event)  # Keep the turn structure for later summaries
+            events -= 1
+        turn += 1
+    return failed
+
+
+async def write_throughput(service, sessions, events):
+    created = [await service.create_session(app_name='bench', user_id=f'user{i}') for i in range(sessions)]
+    start = time.perf_counter()
+    failed = sum(await asyncio.gather(*(append_turns(service, session, events) for session in created)))
+    if hasattr(service, 'flush'):
+        await service.flush()
+    elapsed = time.perf_counter() - start
+    return (sessions * events - failed) / elapsed, failed
+
+
+async def load_latency(factory, lengths, loads):
+    service = factory()
+    results = {}
+    for length in lengths:
+        session = await service.create_session(app_name='bench', user_id='loader')
+        await append_turns(service, session, length)
+        if hasattr(service, 'close'):
+            await service.close()
+            service = factory()  # A cold reopen, as a new server process would
+        timings = []
+        for _ in range(loads):
+            start = time.perf_counter()
+            loaded = await service.get_session(app_name='bench', user_id='loader', session_id=session.id)
+            timings.append(time.perf_counter() - start)
+        assert loaded.state['turns'] == session.state['turns'], 'state lost on reload'
+        results[length] = (statistics.median(timings) * 1000, len(loaded.events))
+    if hasattr(service, 'close'):
+        await service.close()
+    return results
+
+
+async def agent_check(args, workdir):
+    from google.adk.runners import Runner
+    from load_test import PROMPTS
+
+    import carbon_agent
+    from carbon_agent.context_management import SUMMARY_STATE_KEY
+    from carbon_agent.http_pool import close_all_transports
+    from carbon_agent.mcp_pool import close_all_pools
+    from carbon_agent.session_store import AppendOnlySessionService
+
+    path = os.path.join(workdir, 'agent.db')
+    app = carbon_agent.agent.app
+
+    async def run_turns(service, session_id, turns):
+        runner = Runner(app=app, session_service=service)
+        for turn in range(turns):
+            _, prompt = PROMPTS[turn % len(PROMPTS)]
+            async for _ in runner.run_async(user_id='agent', session_id=session_id, new_message=types.Content(
+                    role='user', parts=[types.Part.from_text(text=prompt)])):
+                pass
+
+    try:
+        service = AppendOnlySessionService(path)
+        session = await service.create_session(app_name=app.name, user_id='agent')
+        await run_turns(service, session.id, args.agent_turns)
+        await service.close()
+
+        service = AppendOnlySessionService(path)
+        loaded = await service.get_session(app_name=app.name, user_id='agent', session_id=session.id)
+        service.trim_summarized = False
+        full = await service.get_session(app_name=app.name, user_id='agent', session_id=session.id)
+        service.trim_summarized = True
+        summarized_before = carbon_agent.agent.context_manager.metrics()['requests_summarized']
+        await run_turns(service, session.id, 2)
+        summarized = carbon_agent.agent.context_manager.metrics()['requests_summarized'] - summarized_before
+        service.trim_summarized = False
+        after = await service.get_session(app_name=app.name, user_id='agent', session_id=session.id)
+        await service.close()
+    finally:
+        await close_all_pools()
+        await close_all_transports()
+    summary = loaded.state.get(SUMMARY_STATE_KEY) or {}
+    return {
+        'events_stored': len(full.events),
+        'events_loaded': len(loaded.events),
+        'summarized_turns': summary.get('turns', 0),
+        'continued': len(after.events) > len(full.events) and summarized > 0,
+    }
+
+
+async def run(args, workdir):
+    factories = make_services(workdir)
+    throughput = {}
+    for name, factory in factories.items():
+        service = factory()
+        throughput[name] = await write_throughput(service, args.sessions, args.events)
+        if hasattr(service, 'close'):
+            await service.close()
+    from carbon_agent.session_store import AppendOnlySessionService
+
+    factories.pop('append-only no wait')
+    # Loads every event instead of starting at the summary, so only snapshots help
+    factories['append-only full history'] = lambda: AppendOnlySessionService(
+        os.path.join(workdir, 'append_full.db'), trim_summarized=False,
+    )
+    latency = {}
+    for name, factory in factories.items():
+        latency[name] = await load_latency(factory, args.lengths, args.loads)
+    check = await agent_check(args, workdir) if args.agent_turns else None
+    return throughput, latency, check
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20, help='Sessions written concurrently')
+    parser.add_argument('--events', type=int, default=200, help='Events appended to each session')
+    parser.add_argument('--lengths', default='100,1000,5000', help='Session lengths (events) to load')
+    parser.add_argument('--loads', type=int, default=10, help='get_session calls per length')
+    parser.add_argument('--agent-turns', type=int, default=12, help='root_agent turns for the end-to-end check (0 skips it)')
+    parser.add_argument('--model-latency', type=float, default=0.01, help='Fake model time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=5000, help='Fake model output rate')
+    parser.add_argument('--mcp-latency', type=float, default=0.005, help='Fake MCP server latency per tool call (s)')
+    parser.add_argument('--port', type=int, default=8775, help='Port for the fake GitHub MCP server')
+    args = parser.parse_args()
+    args.lengths = [int(length) for length in args.lengths.split(',')]
+    args.output_tokens = 300
+
+    os.environ.update({'CONTEXT_SUMMARY_TOKEN_BUDGET': '1500', 'CONTEXT_CACHE_ENABLED': 'false'})
+    from load_test import configure_environment
+
+    configure_environment(args)
+    from http_pool_benchmark import start_fake_server
+
+    server = start_fake_server(args.port, args.mcp_latency) if args.agent_turns else None
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            throughput, latency, check = asyncio.run(run(args, workdir))
+    finally:
+        if server:
+            server.kill()
+
+    print(f'write throughput, {args.sessions} sessions x {args.events} events appended concurrently:')
+    for name, (events_per_sec, failed) in throughput.items():
+        print(f"  {name:<26}{events_per_sec:>9.0f} events/s "
+              f"({events_per_sec / throughput['adk sqlite'][0]:.1f}x adk sqlite), {failed} appends failed")
+    print('\nget_session p50 after a cold reopen (events loaded):')
+    print(f"  {'events in session':<26}" + ''.join(f'{length:>16}' for length in args.lengths))
+    for name, results in latency.items():
+        print(f'  {name:<26}' + ''.join(f'{ms:>9.1f} ms{loaded:>5}' for ms, loaded in results.values()))
+    if check:
+        print(f"\nroot_agent on the append-only store: {check['events_stored']} events stored, "
+              f"{check['events_loaded']} loaded after reopening ({check['summarized_turns']} turns summarized), "
+              f"continued with the summary after reopening: {'yes' if check['continued'] else 'NO'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark for the carbon_agent package
+Measures import time and peak RSS with lazy sub-agents (the default) and with
+every sub-agent built up front, which is what the package used to do on import.
+
+Usage: python benchmarks/startup_benchmark.py [--runs 5]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter so every measurement is a cold start
+CHILD_SCRIPT = '''
+import json, resource, sys, time
+start = time.perf_counter()
+import carbon_agent
+if sys.argv[1] == 'eager':
+    from carbon_agent.registry import materialize_all
+    materialize_all(carbon_agent.agent.root_agent)
+elapsed = time.perf_counter() - start
+print(json.dumps({
+    'seconds': elapsed,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+}))
+'''
+
+# Placeholder credentials so every sub-agent is registered; nothing is called
+BENCH_ENV = {
+    'GITHUB_TOKEN': 'bench_github_token',
+    'CARBON_VOICE_API_KEY': 'bench_carbon_voice_key',
+}
+
+
+def run_once(mode):
+    env = dict(os.environ, **BENCH_ENV)
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD_SCRIPT, mode],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stdout
+    # The package may print status lines; the measurement is the last line
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def summarize(mode, runs):
+    results = [run_once(mode) for _ in range(runs)]
+    return {
+        'mode': mode,
+        'import_ms_median': statistics.median(r['seconds'] for r in results) * 1000,
+        'max_rss_mb_median': statistics.median(r['max_rss_kb'] for r in results) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    eager = summarize('eager', args.runs)
+    lazy = summarize('lazy', args.runs)
+
+    print(f"{'mode':<8}{'import (ms)':>14}{'peak RSS (MB)':>16}")
+    for row in (eager, lazy):
+        print(f"{row['mode']:<8}{row['import_ms_median']:>14.1f}{row['max_rss_mb_median']:>16.1f}")
+    print(f"\nImport time saved: {eager['import_ms_median'] - lazy['import_ms_median']:.1f} ms")
+    print(f"Peak RSS saved:    {eager['max_rss_mb_median'] - lazy['max_rss_mb_median']:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""
+Time-to-first-token benchmark for the SSE streaming endpoint
+Serves carbon_agent.streaming's FastAPI app with uvicorn on localhost, with
+every gemini-* model replaced by ScriptedGemini and GitHub pointed at the
+local fake MCP server, then sends a mix of market analyses, GitHub requests
+and multi-domain (fan-out) requests over POST /run_stream, first with
+streaming off and then on. Reports client-side time to first token (first
+text received), time to first event and total time per prompt kind, then
+repeats the streamed run with a slow client (--slow-client-ms per event) to
+show backpressure. The slow client reads stream_run in-process, so the
+agent run, not a socket buffer, is what has to wait: deltas are merged
+while it lags and nothing is dropped.
+
+Usage: python benchmarks/streaming_benchmark.py [--requests 4] [--output-tokens 400] [--tokens-per-second 100]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+from collections import defaultdict
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+sys.path.insert(0, BENCH_DIR)
+
+PROMPTS = [
+    ('market', 'Analyze Tesla stock'),
+    ('github', 'List the open issues in the octo/demo repo'),
+    ('multi', 'Research the AI chip market and list open issues in the octo/demo repo'),
+]
+
+
+async def run_request(client, url, prompt, streaming):
+    from httpx_sse import aconnect_sse
+
+    start = time.perf_counter()
+    first_event = first_token = None
+    types_seen = defaultdict(int)
+    text = 0
+    async with aconnect_sse(client, 'POST', url, json={'message': prompt, 'streaming': streaming}) as source:
+        async for sse in source.aiter_sse():
+            elapsed = (time.perf_counter() - start) * 1000
+            item = json.loads(sse.data)
+            types_seen[item['type']] += 1
+            if first_event is None and item['type'] != 'session':
+                first_event = elapsed
+            if item['type'] in ('delta', 'message'):
+                first_token = first_token or elapsed
+                text += len(item['text'])
+    return {
+        'ttft_ms': first_token, 'first_event_ms': first_event,
+        'total_ms': (time.perf_counter() - start) * 1000, 'events': dict(types_seen), 'text_chars': text,
+    }
+
+
+async def run_slow_client(runner, prompt, delay_ms):
+    from carbon_agent.streaming import stream_run
+
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id='slow')
+    start = time.perf_counter()
+    first_token = None
+    deltas = text = 0
+    async for item in stream_run(runner, 'slow', session.id, prompt, max_buffered_events=8):
+        if item['type'] in ('delta', 'message'):
+            first_token = first_token or (time.perf_counter() - start) * 1000
+            deltas += item['type'] == 'delta'
+            text += len(item['text'])
+        if item['type'] == 'done':
+            coalesced = item['coalesced_deltas']
+        await asyncio.sleep(delay_ms / 1000)
+    return {
+        'ttft_ms': first_token, 'first_event_ms': None, 'total_ms': (time.perf_counter() - start) * 1000,
+        'events': {'delta': deltas}, 'text_chars': text, 'coalesced': coalesced,
+    }
+
+
+async def run_all(args):
+    import httpx
+    import uvicorn
+
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    from carbon_agent.agent import app
+    from carbon_agent.http_pool import close_all_transports
+    from carbon_agent.streaming import create_streaming_api
+
+    # Keep idle connections past the client's, or a request can race the server closing one
+    server = uvicorn.Server(uvicorn.Config(
+        create_streaming_api(), port=args.api_port, log_level='warning', timeout_keep_alive=30,
+    ))
+    serving = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    url = f'http://127.0.0.1:{args.api_port}/run_stream'
+    results = {}
+    try:
+        async with httpx.AsyncClient(timeout=120) as client:
+            # Warm-up builds the sub-agents and fills the tool catalogs
+            await asyncio.gather(*(run_request(client, url, prompt, True) for _, prompt in PROMPTS))
+            for mode, streaming in (('buffered', False), ('streamed', True)):
+                rows = await asyncio.gather(*(
+                    run_request(client, url, prompt, streaming) for _ in range(args.requests) for _, prompt in PROMPTS
+                ))
+                results[mode] = [(kind, row) for (kind, _), row in zip(PROMPTS * args.requests, rows)]
+            runner = Runner(app=app, session_service=InMemorySessionService())
+            rows = await asyncio.gather(*(
+                run_slow_client(runner, prompt, args.slow_client_ms) for _ in range(args.requests) for _, prompt in PROMPTS
+            ))
+            results['slow client'] = [(kind, row) for (kind, _), row in zip(PROMPTS * args.requests, rows)]
+            metrics = (await client.get(f'http://127.0.0.1:{args.api_port}/stream_metrics')).json()
+    finally:
+        server.should_exit = True
+        await serving
+        await close_all_transports()
+    return results, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=4, help='Concurrent requests per prompt kind')
+    parser.add_argument('--model-latency', type=float, default=0.3, help='Fake model time to first token (s)')
+    parser.add_argument('--tokens-per-second', type=float, default=100, help='Fake model output rate')
+    parser.add_argument('--output-tokens', type=int, default=400, help='Tokens in each fake text answer')
+    parser.add_argument('--chunk-tokens', type=int, default=5, help='Tokens per streamed chunk')
+    parser.add_argument('--slow-client-ms', type=float, default=200, help='Delay per event for the slow client run')
+    parser.add_argument('--api-port', type=int, default=8790, help='Port for the streaming API')
+    parser.add_argument('--port', type=int, default=8769, help='Port for the fake GitHub MCP server')
+    args = parser.parse_args()
+
+    os.environ.update({
+        'GITHUB_TOKEN': 'bench_token',
+        'GITHUB_MCP_URL': f'http://127.0.0.1:{args.port}/mcp/',
+        'FAKE_GEMINI_LATENCY': str(args.model_latency),
+        'FAKE_GEMINI_TOKENS_PER_SECOND': str(args.tokens_per_second),
+        'FAKE_GEMINI_OUTPUT_TOKENS': str(args.output_tokens),
+        'FAKE_GEMINI_STREAM_CHUNK_TOKENS': str(args.chunk_tokens),
+        'MARKET_CACHE_ENABLED': 'false',
+        'CONTEXT_CACHE_ENABLED': 'false',
+        'SESSION_STORE_ENABLED': os.getenv('SESSION_STORE_ENABLED', 'false'),
+        # Local clients name their user in the request body
+        'STREAM_API_ALLOW_UNAUTHENTICATED': 'true',
+    })
+    from google.adk.models import LLMRegistry
+    from fake_gemini import ScriptedGemini
+    from http_pool_benchmark import start_fake_server
+
+    LLMRegistry.register(ScriptedGemini)
+    server = start_fake_server(args.port, 0.01)
+    try:
+        results, server_metrics = asyncio.run(run_all(args))
+    finally:
+        server.kill()
+
+    print(f"{'mode':<13}{'kind':<9}{'ttft p50':>10}{'first event':>13}{'total p50':>11}{'deltas':>8}{'merged':>8}")
+    for mode, rows in results.items():
+        by_kind = defaultdict(list)
+        for kind, row in rows:
+            by_kind[kind].append(row)
+        for kind, kind_rows in by_kind.items():
+            print(f"{mode:<13}{kind:<9}"
+                  f"{statistics.median(r['ttft_ms'] for r in kind_rows):>10.0f}"
+                  f"{statistics.median(r['first_event_ms'] or 0 for r in kind_rows):>13.0f}"
+                  f"{statistics.median(r['total_ms'] for r in kind_rows):>11.0f}"
+                  f"{statistics.mean(r['events'].get('delta', 0) for r in kind_rows):>8.0f}"
+                  f"{statistics.mean(r.get('coalesced', 0) for r in kind_rows):>8.0f}")
+    buffered = statistics.median(r['ttft_ms'] for _, r in results['buffered'])
+    streamed = statistics.median(r['ttft_ms'] for _, r in results['streamed'])
+    print(f'\nmedian time to first token: {buffered:.0f} ms buffered, {streamed:.0f} ms streamed '
+          f'({buffered / streamed:.1f}x sooner)')
+    chars = {mode: sum(r['text_chars'] for _, r in rows) for mode, rows in results.items()}
+    print(f"text received: streamed {chars['streamed']} chars, slow client {chars['slow client']} chars")
+    print(f'server metrics: {server_metrics}')
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Upstream call benchmark for the GitHub tool result cache
+Starts the local fake GitHub MCP server and runs concurrent simulated
+sessions that read the same repository (issues, pull requests, files), after
+which some of them create an issue and list issues again, first through the plain pooled toolset and then
+through the read-through cache. Reports upstream calls counted by the fake
+server, latency, and how many writers did not see their new issue listed
+(stale reads).
+
+Usage: python benchmarks/tool_result_cache_benchmark.py [--sessions 50] [--latency 0.05] [--writers 5]
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from google.adk.agents import Agent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnectionParams
+from google.adk.tools.tool_context import ToolContext
+
+from carbon_agent.github_agent import GITHUB_TOOL_TTLS
+from carbon_agent.http_pool import PooledHttpMcpToolset, close_all_transports
+from carbon_agent.tool_result_cache import CachedResultsHttpMcpToolset, ToolResultCache
+from http_pool_benchmark import DEVNULL, start_fake_server
+
+REPO = {'owner': 'octo', 'repo': 'demo'}
+READS = [
+    ('list_issues', REPO),
+    ('list_pull_requests', REPO),
+    ('get_file_contents', {**REPO, 'path': 'README.md'}),
+    ('get_issue', {**REPO, 'issue_number': 3}),
+    ('list_dependabot_alerts', REPO),
+]
+
+
+def server_stats(port, reset=False):
+    url = f'http://127.0.0.1:{port}/stats' + ('/reset' if reset else '')
+    request = urllib.request.Request(url, method='POST' if reset else 'GET')
+    with urllib.request.urlopen(request) as response:
+        return json.load(response)
+
+
+async def tool_context():
+    session_service = InMemorySessionService()
+    session = await session_service.create_session(app_name='bench', user_id='u')
+    context = InvocationContext(
+        session_service=session_service,
+        invocation_id='bench',
+        agent=Agent(name='github_agent', model='gemini-2.5-flash'),
+        session=session,
+    )
+    return ToolContext(context)
+
+
+async def run_session(tools, context, session_id, writers, latencies, stale):
+    async def call(name, args):
+        start = time.perf_counter()
+        result = await tools[name].run_async(args=args, tool_context=context)
+        latencies.append((time.perf_counter() - start) * 1000)
+        return result
+
+    for name, args in READS:
+        await call(name, args)
+    if session_id < writers:
+        title = f'Created by session {session_id}'
+        await call('create_issue', {**REPO, 'title': title})
+        issues = await call('list_issues', REPO)
+        if title not in json.dumps(issues):
+            stale.append(session_id)
+
+
+async def measure(toolset, port, sessions, writers):
+    server_stats(port, reset=True)
+    context = await tool_context()
+    tools = {tool.name: tool for tool in await toolset.get_tools()}
+    latencies, stale = [], []
+    start = time.perf_counter()
+    await asyncio.gather(*(run_session(tools, context, i, writers, latencies, stale) for i in range(sessions)))
+    elapsed = time.perf_counter() - start
+    await toolset.close()
+    return {
+        'upstream_calls': server_stats(port)['total'],
+        'tool_calls': len(latencies),
+        'p50': statistics.median(latencies),
+        'wall_s': elapsed,
+        'stale_reads': len(stale),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=50, help='Concurrent simulated sessions')
+    parser.add_argument('--writers', type=int, default=5, help='Sessions that create an issue before reading')
+    parser.add_argument('--latency', type=float, default=0.05, help='Server-side latency per tool call')
+    parser.add_argument('--port', type=int, default=8766)
+    args = parser.parse_args()
+
+    params = StreamableHTTPConnectionParams(
+        url=f'http://127.0.0.1:{args.port}/mcp/', headers={'Authorization': 'Bearer test'}
+    )
+    server = start_fake_server(args.port, args.latency)
+    try:
+        plain = await measure(PooledHttpMcpToolset(connection_params=params, errlog=DEVNULL),
+                              args.port, args.sessions, args.writers)
+        cache = ToolResultCache(ttls=GITHUB_TOOL_TTLS)
+        cached_toolset = CachedResultsHttpMcpToolset(result_cache=cache, connection_params=params, errlog=DEVNULL)
+        cached = await measure(cached_toolset, args.port, args.sessions, args.writers)
+        await close_all_transports()
+    finally:
+        server.kill()
+
+    print(f"{'toolset':<8}{'tool calls':>12}{'upstream':>10}{'p50 ms':>10}{'wall s':>9}{'stale':>7}")
+    for name, result in (('plain', plain), ('cached', cached)):
+        print(f"{name:<8}{result['tool_calls']:>12}{result['upstream_calls']:>10}"
+              f"{result['p50']:>10.1f}{result['wall_s']:>9.2f}{result['stale_reads']:>7}")
+    metrics = cache.metrics()
+    print(f"\ncache: hits {metrics['hits']}, coalesced {metrics['coalesced']}, misses {metrics['misses']}, "
+          f"invalidated {metrics['invalidated']}, in-flight reads not stored after a write {metrics['stale_skipped']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
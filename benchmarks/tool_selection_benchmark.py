@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+Prompt size and latency benchmark for per-request GitHub tool selection
+Loads a GitHub MCP tool catalog (benchmarks/github_tool_catalog.json, the
+tools behind github_agent's X-MCP-Toolsets header) as MCP tools, builds the
+function declarations github_agent sends with every model call and runs the
+ToolSelector on a fixed, labelled query set. Reports the declaration tokens
+sent per call (estimated at 4 characters per token), how often the tools a
+query needs were kept (fallbacks to the full catalog count as kept), the
+fallback rate, the selection overhead and the time to first token modelled
+as --base-ttft-ms plus prompt tokens at --prefill-tokens-per-second.
+
+Usage: python benchmarks/tool_selection_benchmark.py [--top-k 10] [--min-score 3.5] [--prefill-tokens-per-second 4000]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from google.adk.models import LlmRequest
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager, StreamableHTTPConnectionParams
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
+from google.genai import types
+from mcp.types import Tool
+
+from carbon_agent.github_agent import GITHUB_TOOL_SYNONYMS
+from carbon_agent.tool_selection import ToolSelector
+
+CATALOG_PATH = os.path.join(BENCH_DIR, 'github_tool_catalog.json')
+
+# Query -> tools a correct answer needs; an empty list means the query is too
+# vague to narrow down and a fallback to the full catalog is the right call
+QUERIES = [
+    ('List the open issues in octo/demo', ['list_issues']),
+    ('Show me issue #42 in the octo/demo repo', ['get_issue']),
+    ('Create an issue titled "Login broken" in octo/demo', ['create_issue']),
+    ('Close issue 17 in octo/demo', ['update_issue']),
+    ('Comment on issue 5 saying the fix is deployed', ['add_issue_comment']),
+    ('What are the comments on issue 12?', ['get_issue_comments']),
+    ('Find bugs about memory leaks across octo repos', ['search_issues']),
+    ('Break issue 8 down into sub-issues', ['add_sub_issue', 'list_sub_issues']),
+    ('List open PRs in octo/demo', ['list_pull_requests']),
+    ('Show the diff of pull request 101', ['get_pull_request_diff']),
+    ('Which files changed in PR 103?', ['get_pull_request_files']),
+    ('Open a pull request from feature-x into main', ['create_pull_request']),
+    ('Merge PR 104 with squash', ['merge_pull_request']),
+    ('Approve pull request 102', ['create_and_submit_pull_request_review']),
+    ('Leave a review comment on line 10 of app.py in PR 101', ['create_pending_pull_request_review', 'add_comment_to_pending_review']),
+    ('Are the checks passing on PR 105?', ['get_pull_request_status']),
+    ('Find pull requests by alice that touch the parser', ['search_pull_requests']),
+    ('Request a Copilot review on PR 101', ['request_copilot_review']),
+    ('Show me the README of octo/demo', ['get_file_contents']),
+    ('What does src/app.py contain?', ['get_file_contents']),
+    ('Update the README file on main with a new install section', ['create_or_update_file']),
+    ('Create a branch called release-2 in octo/demo', ['create_branch']),
+    ('List the branches of octo/demo', ['list_branches']),
+    ('Show the last commits on main', ['list_commits']),
+    ('What changed in commit abc123?', ['get_commit']),
+    ('Fork octo/demo into my account', ['fork_repository']),
+    ('Search for repositories about machine learning agents', ['search_repositories']),
+    ('Where is the parse_config function defined?', ['search_code']),
+    ('What is the latest release of octo/demo?', ['get_latest_release']),
+    ('List the tags in octo/demo', ['list_tags']),
+    ('Show Dependabot alerts for octo/demo', ['list_dependabot_alerts']),
+    ('Are there any vulnerable dependencies in octo/demo?', ['list_dependabot_alerts']),
+    ('List code scanning alerts in octo/demo', ['list_code_scanning_alerts']),
+    ('Did we leak any secrets in octo/demo?', ['list_secret_scanning_alerts']),
+    ('Why did the CI fail on the last run?', ['list_workflow_runs', 'get_job_logs']),
+    ('Rerun the failed jobs of workflow run 991', ['rerun_failed_jobs']),
+    ('Trigger the deploy workflow on main', ['run_workflow']),
+    ('List the GitHub Actions workflows in octo/demo', ['list_workflows']),
+    ('What are my unread notifications?', ['list_notifications']),
+    ('Mark all my notifications as read', ['mark_all_notifications_read']),
+    ('List discussions in octo/demo', ['list_discussions']),
+    ('Show the project board items for project 3 in octo', ['list_project_items']),
+    ('Create a label called needs-triage in octo/demo', ['create_label']),
+    ('What labels does octo/demo have?', ['list_label']),
+    ('Star the octo/demo repository', ['star_repository']),
+    ('Which repositories have I starred?', ['list_starred_repositories']),
+    ('Who am I logged in as on GitHub?', ['get_me']),
+    ('Find GitHub users named Ada', ['search_users']),
+    ('Who is on the platform team in octo?', ['get_team_members']),
+    ('Create a gist with this snippet', ['create_gist']),
+    ('What should I work on next?', ['list_notifications']),
+    ('Help me with GitHub', []),
+    ('Do the usual', []),
+]
+
+
+def load_tools():
+    manager = MCPSessionManager(StreamableHTTPConnectionParams(url='http://127.0.0.1:1/mcp/'))
+    with open(CATALOG_PATH) as f:
+        catalog = [Tool.model_validate(tool) for tool in json.load(f)]
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', DeprecationWarning)
+        return [McpTool(mcp_tool=tool, mcp_session_manager=manager) for tool in catalog]
+
+
+class _Context:
+    """The parts of a CallbackContext the selector reads"""
+
+    def __init__(self, text):
+        self.user_content = types.Content(role='user', parts=[types.Part.from_text(text=text)])
+
+
+def build_request(tools, context):
+    request = LlmRequest(model='gemini-2.5-flash', contents=[context.user_content])
+    request.append_tools(tools)
+    return request
+
+
+def declaration_tokens(request):
+    declarations = [d for tool in request.config.tools for d in tool.function_declarations]
+    return len(json.dumps([d.model_dump(mode='json', exclude_none=True) for d in declarations])) / 4
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--top-k', type=int, default=10, help='Most tools sent per model call')
+    parser.add_argument('--min-score', type=float, default=3.5, help='Best BM25 score needed to send a subset')
+    parser.add_argument('--prefill-tokens-per-second', type=float, default=4000, help='Modelled prompt processing rate')
+    parser.add_argument('--base-ttft-ms', type=float, default=300, help='Modelled time to first token without tools')
+    parser.add_argument('--verbose', action='store_true', help='Print the tools kept for every query')
+    args = parser.parse_args()
+
+    tools = load_tools()
+    selector = ToolSelector(synonyms=GITHUB_TOOL_SYNONYMS, top_k=args.top_k, min_score=args.min_score)
+    full_tokens = declaration_tokens(build_request(tools, _Context('')))
+
+    sent_tokens, overheads, misses, kept_counts = [], [], [], []
+    fallbacks = wrong_fallbacks = 0
+    for query, expected in QUERIES:
+        context = _Context(query)
+        request = build_request(tools, context)
+        start = time.perf_counter()
+        selector.before_model_callback(context, request)
+        overheads.append((time.perf_counter() - start) * 1000)
+        kept = [d.name for tool in request.config.tools for d in tool.function_declarations]
+        kept_counts.append(len(kept))
+        sent_tokens.append(declaration_tokens(request))
+        if len(kept) == len(tools):
+            fallbacks += 1
+            wrong_fallbacks += bool(expected)
+        elif not set(expected) <= set(kept):
+            misses.append((query, sorted(set(expected) - set(kept))))
+        if args.verbose:
+            print(f'{query!r}: {len(kept)} tools {kept if len(kept) < len(tools) else "(full catalog)"}')
+
+    def ttft(tokens):
+        return args.base_ttft_ms + tokens / args.prefill_tokens_per_second * 1000
+
+    mean_sent = statistics.mean(sent_tokens)
+    print(f'{len(QUERIES)} queries, {len(tools)} tools in the catalog\n')
+    print(f"{'':<22}{'tools/call':>12}{'tool tokens':>13}{'ttft ms':>10}")
+    print(f"{'full catalog':<22}{len(tools):>12}{full_tokens:>13.0f}{ttft(full_tokens):>10.0f}")
+    print(f"{'selected':<22}{statistics.mean(kept_counts):>12.1f}{mean_sent:>13.0f}{ttft(mean_sent):>10.0f}")
+    print(f'\ntool tokens saved: {1 - mean_sent / full_tokens:.1%}, '
+          f'modelled ttft saved: {ttft(full_tokens) - ttft(mean_sent):.0f} ms per call')
+    labelled = sum(1 for _, expected in QUERIES if expected)
+    print(f'needed tools kept: {labelled - len(misses)}/{labelled} labelled queries')
+    print(f'fallbacks to the full catalog: {fallbacks} ({wrong_fallbacks} on queries that could be narrowed)')
+    print(f'selection overhead: p50 {statistics.median(overheads):.2f} ms, max {max(overheads):.2f} ms')
+    for query, missing in misses:
+        print(f'   missed {missing} for {query!r}')
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,7 @@
 from . import agent
-from . import search_agent
 
-# Conditionally import github_agent if token is available
-try:
-    from . import github_agent
-    github_agent_available = True
-except ValueError as e:
-    if "GITHUB_TOKEN" in str(e):
-        github_agent_available = False
-    else:
-        raise
-
-# Conditionally import carbon_voice_agent if API key is available
-try:
-    from . import carbon_voice_agent
-    carbon_voice_agent_available = True
-except ValueError as e:
-    if "CARBON_VOICE_API_KEY" in str(e):
-        carbon_voice_agent_available = False
-    else:
-        raise
-
-# Import OAuth-based agent for HTTP transport
-try:
-    from . import carbon_voice_oauth_agent
-    carbon_voice_oauth_available = True
-except (ValueError, ImportError) as e:
-    carbon_voice_oauth_available = False
-    print(f"OAuth agent not available: {e}")
+# Sub-agent availability is decided from configuration only; the agents
+# themselves are built on first use (see registry.py)
+github_agent_available = agent.github_available
+carbon_voice_agent_available = agent.CARBON_VOICE_AGENT_SPEC.is_configured()
+carbon_voice_oauth_available = agent.CARBON_VOICE_OAUTH_AGENT_SPEC.is_configured()
@@ -0,0 +1,487 @@
+import asyncio
+import contextlib
+import contextvars
+import copy
+import heapq
+import itertools
+import logging
+import os
+import random
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field, fields, replace
+from email.utils import parsedate_to_datetime
+from typing import Optional
+from urllib.parse import urlsplit
+
+from google.adk.models import BaseLlm, LLMRegistry
+from pydantic import PrivateAttr
+
+logger = logging.getLogger(__name__)
+
+# Priority classes; lower values are admitted first
+INTERACTIVE = 0
+BATCH = 1
+PRIORITY_NAMES = {INTERACTIVE: 'interactive', BATCH: 'batch'}
+
+# HTTP statuses that mean "slow down" rather than "this request is wrong"
+OVERLOAD_STATUSES = frozenset([429, 503])
+# HTTP statuses that a reconnect or retry with the same credentials cannot fix
+AUTH_STATUSES = frozenset([401, 403])
+
+_priority = contextvars.ContextVar('carbon_admission_priority', default=INTERACTIVE)
+
+
+@contextlib.contextmanager
+def priority(level):
+    """Run upstream calls made in this context (and tasks it starts) at `level`"""
+    token = _priority.set(level)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+def current_priority():
+    return _priority.get()
+
+
+class AdmissionRejected(Exception):
+    """The upstream's queue was full, or the wait for a slot timed out"""
+
+
+class UpstreamOverloaded(Exception):
+    """An upstream answered with a rate limit or overload error"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def _env(group, name, default):
+    return os.getenv(f'ADMISSION_{group.upper()}_{name}', default)
+
+
+@dataclass
+class AdmissionSettings:
+    """Concurrency, rate and retry limits for one upstream.
+
+    Defaults come from ADMISSION_<GROUP>_* environment variables (e.g.
+    ADMISSION_GEMINI_MAX_LIMIT), so every Gemini model or every MCP server
+    can be tuned at once; `configure_upstream` overrides single upstreams.
+    """
+
+    initial_limit: float = 8
+    min_limit: float = 1
+    max_limit: float = 64
+    backoff_ratio: float = 0.5  # multiplicative decrease on overload
+    latency_tolerance: float = 0.0  # >0: also back off when latency exceeds this multiple of the best seen
+    rate: float = 0.0  # requests per second, 0 for no rate limit
+    burst: float = 0.0  # token bucket size, defaults to one second of `rate`
+    max_queue: int = 1000
+    queue_timeout: float = 60.0
+    max_attempts: int = 3
+    base_delay: float = 0.2
+    max_delay: float = 10.0
+    retry_budget_ratio: float = 0.2  # retries earned per request
+    retry_budget_min: float = 10.0  # retries available before any request has earned them
+
+    @classmethod
+    def from_env(cls, group):
+        defaults = cls()
+        values = {}
+        for f in fields(cls):
+            raw = _env(group, f.name.upper(), None)
+            if raw is not None:
+                values[f.name] = type(getattr(defaults, f.name))(float(raw))
+        return replace(defaults, **values)
+
+
+class AdmissionController:
+    """Admission control for one upstream (a Gemini model or an MCP server).
+
+    Calls wait in a priority queue (interactive before batch, FIFO within a
+    class) for one of `limit` concurrency slots and, when `rate` is set, a
+    token from a token bucket. The limit adapts AIMD-style: each success
+    while the limit is in use adds 1/limit, an overload signal (429, 503,
+    timeout) multiplies it by `backoff_ratio`, at most once per round trip.
+    Overloaded calls are retried with full-jitter exponential backoff
+    (honouring Retry-After) while the retry budget, earned as a fraction of
+    requests, lasts, so a burst of 429s cannot turn into a retry storm. A
+    Retry-After also pauses admission of every call to the upstream until
+    it has passed.
+    """
+
+    def __init__(self, name, settings=None):
+        self.name = name
+        self.settings = settings or AdmissionSettings()
+        self.limit = float(self.settings.initial_limit)
+        self.in_flight = 0
+        self.stats = Counter()
+        self._waiters = []  # heap of (priority, seq, future)
+        self._queued = Counter()
+        self._seq = itertools.count()
+        self._tokens = self.settings.burst or self.settings.rate
+        self._refilled = time.monotonic()
+        self._wake_handle = None
+        self._retry_tokens = self.settings.retry_budget_min
+        self._last_decrease = 0.0
+        self._paused_until = 0.0
+        self._latencies = deque(maxlen=200)
+        self._waits = deque(maxlen=1000)
+
+    # -- token bucket --------------------------------------------------------
+
+    def _refill(self):
+        if not self.settings.rate:
+            return
+        now = time.monotonic()
+        capacity = self.settings.burst or self.settings.rate
+        self._tokens = min(capacity, self._tokens + (now - self._refilled) * self.settings.rate)
+        self._refilled = now
+
+    def _take_token(self):
+        if not self.settings.rate:
+            return True
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return True
+        return False
+
+    # -- queueing ------------------------------------------------------------
+
+    def _has_capacity(self):
+        return self.in_flight < max(1, int(self.limit)) and time.monotonic() >= self._paused_until
+
+    async def acquire(self, level=None):
+        """Wait for a slot; returns the time spent queueing in seconds"""
+        level = current_priority() if level is None else level
+        start = time.perf_counter()
+        if not self._waiters and self._has_capacity() and self._take_token():
+            self.in_flight += 1
+            self.stats['admitted'] += 1
+            self._waits.append(0.0)
+            return 0.0
+        if len(self._waiters) >= self.settings.max_queue:
+            self.stats['rejected'] += 1
+            raise AdmissionRejected(f'{self.name}: {len(self._waiters)} calls already queued')
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (level, next(self._seq), future))
+        self._queued[level] += 1
+        self.stats['peak_queued'] = max(self.stats['peak_queued'], len(self._waiters))
+        self._wake()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout=self.settings.queue_timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # Admitted just as we gave up: hand the slot back
+                self.release('cancelled')
+            else:
+                future.cancel()
+                self._queued[level] -= 1
+            if isinstance(e, asyncio.TimeoutError):
+                self.stats['rejected'] += 1
+                raise AdmissionRejected(
+                    f'{self.name}: no slot within {self.settings.queue_timeout:g}s'
+                ) from None
+            raise
+        wait = time.perf_counter() - start
+        self._waits.append(wait)
+        return wait
+
+    def _wake(self):
+        """Admit queued calls while there is capacity and rate"""
+        if self._wake_handle is not None:
+            self._wake_handle.cancel()
+            self._wake_handle = None
+        paused = self._paused_until - time.monotonic()
+        if self._waiters and paused > 0:
+            self._wake_handle = asyncio.get_running_loop().call_later(paused, self._wake)
+            return
+        while self._waiters and self._has_capacity():
+            level, _, future = self._waiters[0]
+            if future.cancelled():
+                heapq.heappop(self._waiters)
+                continue
+            if not self._take_token():
+                delay = (1 - self._tokens) / self.settings.rate
+                self._wake_handle = asyncio.get_running_loop().call_later(delay, self._wake)
+                return
+            heapq.heappop(self._waiters)
+            self._queued[level] -= 1
+            self.in_flight += 1
+            self.stats['admitted'] += 1
+            future.set_result(None)
+
+    def release(self, outcome='ok', latency=None, retry_after=None):
+        """Return a slot; `outcome` is 'ok', 'overload', 'error' or 'cancelled'.
+
+        `retry_after` (seconds, from an overload's Retry-After) holds back
+        every queued and new call until it has passed, capped at max_delay.
+        """
+        self.in_flight -= 1
+        settings = self.settings
+        if outcome == 'overload':
+            self.stats['overloaded'] += 1
+            now = time.monotonic()
+            if retry_after:
+                self.stats['paused'] += 1
+                self._paused_until = max(self._paused_until, now + min(retry_after, settings.max_delay))
+            round_trip = max(self._latencies) if self._latencies else 0.0
+            if now - self._last_decrease >= max(0.05, round_trip):
+                self.limit = max(settings.min_limit, self.limit * settings.backoff_ratio)
+                self._last_decrease = now
+        elif outcome == 'ok' and latency is not None:
+            best = min(self._latencies) if self._latencies else latency
+            self._latencies.append(latency)
+            if settings.latency_tolerance and latency > best * settings.latency_tolerance:
+                self.limit = max(settings.min_limit, self.limit * 0.9)
+            elif self.in_flight + 1 >= self.limit / 2:
+                # Only grow while the current limit is actually being used
+                self.limit = min(settings.max_limit, self.limit + 1 / self.limit)
+        self._wake()
+
+    # -- retries -------------------------------------------------------------
+
+    def _earn_retry(self):
+        cap = self.settings.retry_budget_min + 100 * self.settings.retry_budget_ratio
+        self._retry_tokens = min(cap, self._retry_tokens + self.settings.retry_budget_ratio)
+
+    def retry_delay(self, attempt, error=None):
+        """Seconds to wait before retry `attempt` (1-based), or None to give up"""
+        if attempt >= self.settings.max_attempts:
+            return None
+        if self._retry_tokens < 1:
+            self.stats['retry_budget_exhausted'] += 1
+            return None
+        self._retry_tokens -= 1
+        self.stats['retries'] += 1
+        delay = random.uniform(0, min(self.settings.max_delay, self.settings.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after:
+            delay = max(delay, min(retry_after, self.settings.max_delay))
+        return delay
+
+    async def call(self, fn, level=None, is_overload_result=None):
+        """Run `await fn()` under admission control, retrying overloads.
+
+        `is_overload_result(result)` flags results that report a rate limit
+        without raising (e.g. MCP tool errors); the last such result is
+        returned when retries run out.
+        """
+        self._earn_retry()
+        attempt = 0
+        while True:
+            await self.acquire(level)
+            start = time.perf_counter()
+            try:
+                result = await fn()
+            except asyncio.CancelledError:
+                self.release('cancelled')
+                raise
+            except Exception as e:
+                overloaded = is_overload(e)
+                self.release('overload' if overloaded or isinstance(e, asyncio.TimeoutError) else 'error',
+                             retry_after=_retry_after(e) if overloaded else None)
+                delay = self.retry_delay(attempt + 1, e) if overloaded else None
+                if delay is None:
+                    raise
+            else:
+                if not (is_overload_result and is_overload_result(result)):
+                    self.release('ok', time.perf_counter() - start)
+                    return result
+                self.release('overload')
+                delay = self.retry_delay(attempt + 1)
+                if delay is None:
+                    return result
+            attempt += 1
+            logger.debug('%s overloaded, retry %d in %.2fs', self.name, attempt, delay)
+            await asyncio.sleep(delay)
+
+    def metrics(self):
+        waits = sorted(self._waits)
+
+        def percentile(p):
+            return round(waits[min(len(waits) - 1, int(len(waits) * p))] * 1000, 1) if waits else None
+
+        return {
+            'upstream': self.name,
+            'limit': round(self.limit, 2),
+            'in_flight': self.in_flight,
+            'queued': {PRIORITY_NAMES.get(level, str(level)): count for level, count in sorted(self._queued.items())},
+            'peak_queued': self.stats['peak_queued'],
+            'admitted': self.stats['admitted'],
+            'rejected': self.stats['rejected'],
+            'overloaded': self.stats['overloaded'],
+            'retries': self.stats['retries'],
+            'paused': self.stats['paused'],
+            'retry_budget_exhausted': self.stats['retry_budget_exhausted'],
+            'queue_wait_ms_p50': percentile(0.50),
+            'queue_wait_ms_p95': percentile(0.95),
+        }
+
+
+def error_status(error):
+    """HTTP status an error carries, or None"""
+    for attribute in ('code', 'status_code'):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int) and 100 <= value < 600:
+            return value
+    status = getattr(getattr(error, 'response', None), 'status_code', None)
+    if status is not None:
+        return status
+    # MCP errors produced by http_pool for 401/403/429/503 answers
+    data = getattr(getattr(error, 'error', None), 'data', None)
+    return data.get('status') if isinstance(data, dict) else None
+
+
+def is_overload(error):
+    """True for errors that mean the upstream is rate limiting or overloaded"""
+    return isinstance(error, UpstreamOverloaded) or error_status(error) in OVERLOAD_STATUSES
+
+
+def _retry_after(error):
+    value = getattr(error, 'retry_after', None)
+    data = getattr(getattr(error, 'error', None), 'data', None)
+    if value is None and isinstance(data, dict):
+        value = data.get('retry_after')
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+    # HTTP-date form
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def upstream_name(connection_params):
+    """Admission key for an MCP server: its host, or its stdio command"""
+    url = getattr(connection_params, 'url', None)
+    if url:
+        return urlsplit(url).netloc
+    server_params = getattr(connection_params, 'server_params', connection_params)
+    parts = [os.path.basename(server_params.command)] + [os.path.basename(arg) for arg in server_params.args[:1]]
+    return 'stdio:' + ' '.join(parts)
+
+
+# Process-wide controllers keyed by upstream name
+_controllers = {}
+_overrides = {}
+
+
+def configure_upstream(name, **settings):
+    """Override settings for one upstream; takes effect for controllers created afterwards"""
+    _overrides[name] = settings
+
+
+def get_admission_controller(name, group):
+    """Shared AdmissionController for upstream `name`, or None when ADMISSION_ENABLED is false"""
+    if os.getenv('ADMISSION_ENABLED', 'true').lower() == 'false':
+        return None
+    controller = _controllers.get(name)
+    if controller is None:
+        settings = replace(AdmissionSettings.from_env(group), **_overrides.get(name, {}))
+        controller = _controllers[name] = AdmissionController(name, settings)
+    return controller
+
+
+def admission_metrics():
+    """Limits, queue depth and retry counters of every upstream seen so far"""
+    return {name: controller.metrics() for name, controller in _controllers.items()}
+
+
+def copy_request(llm_request):
+    """Deep copy of an LlmRequest for one model call, sharing its tool objects.
+
+    Gemini's context cache manager rewrites the request it is sent (cached
+    contents trimmed, instruction and tools cleared), so every retried or
+    escalated call must start from a fresh copy. Tools hold locks and
+    sessions and cannot be copied, so `tools_dict` is shared.
+    """
+    return copy.deepcopy(llm_request, {id(llm_request.tools_dict): llm_request.tools_dict})
+
+
+class AdmittedLlm(BaseLlm):
+    """BaseLlm that sends a registered model's calls through its AdmissionController.
+
+    The wrapped model is resolved from the registry by name on first use, so
+    anything registered for the name (e.g. a test double) is what runs.
+    Calls that fail with 429/503 before producing any output are retried;
+    a stream that fails midway is not.
+    """
+
+    _llm: Optional[BaseLlm] = PrivateAttr(default=None)
+
+    def _resolve(self):
+        if self._llm is None:
+            self._llm = LLMRegistry.new_llm(self.model)
+        return self._llm
+
+    async def generate_content_async(self, llm_request, stream=False):
+        llm = self._resolve()
+        controller = get_admission_controller(self.model, 'gemini')
+        if controller is None:
+            async for response in llm.generate_content_async(llm_request, stream=stream):
+                yield response
+            return
+
+        controller._earn_retry()
+        attempt = 0
+        while True:
+            await controller.acquire()
+            start = time.perf_counter()
+            produced = released = False
+            outcome = 'error'
+            retry_after = None
+            # Complete responses are held until the next one arrives, so the
+            # slot is released before the last one is handed over: ADK runs
+            # its function calls (transfers and sub-agent runs included)
+            # while this generator is suspended, and they may need a slot
+            pending = None
+            try:
+                async for response in llm.generate_content_async(copy_request(llm_request), stream=stream):
+                    if not produced and response.error_code in ('429', '503', 'RESOURCE_EXHAUSTED', 'UNAVAILABLE'):
+                        raise UpstreamOverloaded(response.error_message or response.error_code)
+                    produced = True
+                    if pending is not None:
+                        yield pending
+                        pending = None
+                    if response.partial:
+                        yield response
+                    else:
+                        pending = response
+                outcome = 'ok'
+                released = True
+                controller.release(outcome, time.perf_counter() - start)
+                if pending is not None:
+                    yield pending
+                return
+            except Exception as e:
+                if not is_overload(e) or produced:
+                    raise
+                outcome = 'overload'
+                retry_after = _retry_after(e)
+                delay = controller.retry_delay(attempt + 1, e)
+                if delay is None:
+                    raise
+            finally:
+                if not released:
+                    controller.release(outcome, retry_after=retry_after)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    def connect(self, llm_request):
+        return self._resolve().connect(llm_request)
+
+
+def admitted_model(model):
+    """`model` wrapped in an AdmittedLlm, or the name itself when admission control is off"""
+    if os.getenv('ADMISSION_ENABLED', 'true').lower() == 'false':
+        return model
+    return AdmittedLlm(model=model)
@@ -1,56 +1,85 @@
+import os
+
+from dotenv import load_dotenv
 from google.adk.agents.llm_agent import Agent
+from google.adk.apps import App
 
-# Import the specialized agents with error handling
-try:
-    from .github_agent import github_agent
-    github_available = True
-except ValueError as e:
-    if "GITHUB_TOKEN" in str(e):
-        github_available = False
-        github_agent = None
-    else:
-        raise
-
-# Try to import Carbon Voice agents (regular first, OAuth as fallback)
-carbon_voice_agent = None
-carbon_voice_available = False
-
-# Try regular stdio agent first
-try:
-    from .carbon_voice_agent import carbon_voice_agent as stdio_agent
-    carbon_voice_agent = stdio_agent
-    carbon_voice_available = True
-    print("✅ Carbon Voice stdio agent loaded")
-except ValueError as e:
-    if "CARBON_VOICE_API_KEY" in str(e):
-        print("⚠️  Stdio agent needs CARBON_VOICE_API_KEY, trying OAuth agent...")
-        # Try OAuth agent as fallback
-        try:
-            from .carbon_voice_oauth_agent import carbon_voice_oauth_agent as oauth_agent
-            carbon_voice_agent = oauth_agent
-            carbon_voice_available = True
-            print("✅ Carbon Voice OAuth agent loaded")
-        except (ValueError, ImportError) as oauth_e:
-            print(f"❌ Both Carbon Voice agents unavailable")
-            carbon_voice_available = False
-    else:
-        raise
-
-from .search_agent import market_analyzer
+from .context_management import create_context_cache_config, create_context_manager
+from .fan_out import FanOutTool
+from .model_cascade import cascade_model
+from .registry import SubAgentSpec, build_sub_agents
+from .router import create_pre_router
+from .tracing import create_tracing_plugin
 
-# Create sub_agents list for orchestration
-sub_agents = [market_analyzer]
+# Load environment variables once so the config checks below can see them
+load_dotenv()
+
+# Sub-agents are registered by name, description and required settings only.
+# Each one is built, together with its MCP toolset, the first time root_agent
+# transfers to it.
+MARKET_ANALYZER_SPEC = SubAgentSpec(
+    name='market_analyzer',
+    description='A professional market analysis expert specializing in financial markets, trends, and investment research.',
+    module='search_agent',
+    factory='create_market_analyzer',
+)
+
+GITHUB_AGENT_SPEC = SubAgentSpec(
+    name='github_agent',
+    description='A GitHub assistant powered by MCP tools for repository management, issues, and pull requests.',
+    module='github_agent',
+    factory='create_github_agent',
+    required_env=('GITHUB_TOKEN',),
+)
+
+CARBON_VOICE_AGENT_SPEC = SubAgentSpec(
+    name='carbon_voice_agent',
+    description='A communication specialist for Carbon Voice messaging platform operations.',
+    module='carbon_voice_agent',
+    factory='create_carbon_voice_agent',
+    required_env=('CARBON_VOICE_API_KEY',),
+)
 
-# Only add GitHub agent if token is available
-if github_available:
-    sub_agents.append(github_agent)
+CARBON_VOICE_OAUTH_AGENT_SPEC = SubAgentSpec(
+    name='carbon_voice_oauth_agent',
+    description='A communication specialist for Carbon Voice messaging platform using OAuth2 authentication.',
+    module='carbon_voice_oauth_agent',
+    factory='create_carbon_voice_oauth_agent',
+    # Tokens are per user, from the OAuth broker (oauth_broker.py)
+    required_env=('CARBON_VOICE_CLIENT_ID', 'CARBON_VOICE_CLIENT_SECRET'),
+)
+
+github_available = GITHUB_AGENT_SPEC.is_configured()
 
-# Only add Carbon Voice agent if API key is available
+# Prefer the stdio Carbon Voice agent; the OAuth agent is the fallback
+carbon_voice_spec = None
+if CARBON_VOICE_AGENT_SPEC.is_configured():
+    carbon_voice_spec = CARBON_VOICE_AGENT_SPEC
+elif CARBON_VOICE_OAUTH_AGENT_SPEC.is_configured():
+    carbon_voice_spec = CARBON_VOICE_OAUTH_AGENT_SPEC
+carbon_voice_available = carbon_voice_spec is not None
+carbon_voice_agent_name = carbon_voice_spec.name if carbon_voice_available else 'carbon_voice_agent'
+
+SUB_AGENT_SPECS = [MARKET_ANALYZER_SPEC, GITHUB_AGENT_SPEC]
 if carbon_voice_available:
-    sub_agents.append(carbon_voice_agent)
+    SUB_AGENT_SPECS.append(carbon_voice_spec)
+
+# Create sub_agents list for orchestration
+sub_agents = build_sub_agents(SUB_AGENT_SPECS)
+
+# Obvious requests are routed locally instead of spending an LLM round trip on
+# transfer_to_agent; anything ambiguous still goes to the orchestrator model
+pre_router = None
+if os.getenv('PRE_ROUTER_ENABLED', 'true').lower() != 'false':
+    pre_router = create_pre_router(
+        targets=[agent.name for agent in sub_agents],
+        aliases={'carbon_voice_agent': carbon_voice_agent_name},
+        use_classifier=os.getenv('PRE_ROUTER_CLASSIFIER', 'true').lower() != 'false',
+        threshold=float(os.getenv('PRE_ROUTER_THRESHOLD', '0.99')),
+    )
 
 root_agent = Agent(
-    model='gemini-2.5-flash',
+    model=cascade_model('root_agent', 'gemini-2.5-flash'),
     name='root_agent',
     description='An intelligent orchestrator that coordinates specialized sub-agents for comprehensive task completion.',
     instruction='''You are an intelligent orchestrator agent that coordinates multiple specialized sub-agents to help users accomplish complex tasks.
@@ -58,7 +87,7 @@ root_agent = Agent(
     You have access to specialized sub-agents that can help with different types of tasks:
     - market_analyzer: Professional market analysis, financial research, and investment insights
     ''' + ('- github_agent: GitHub repository management, issues, pull requests, and code analysis\n    ' if github_available else '- github_agent: Not available (configure GITHUB_TOKEN to enable GitHub operations)\n    ') + '''
-    ''' + ('- carbon_voice_agent: Carbon Voice messaging platform operations, communication, and organization\n    ' if carbon_voice_available else '- carbon_voice_agent: Not available (configure CARBON_VOICE_API_KEY for stdio or complete OAuth2 setup for HTTP transport)\n    ') + '''
+    ''' + (f'- {carbon_voice_agent_name}: Carbon Voice messaging platform operations, communication, and organization\n    ' if carbon_voice_available else '- carbon_voice_agent: Not available (configure CARBON_VOICE_API_KEY for stdio or complete OAuth2 setup for HTTP transport)\n    ') + '''
     When you need to delegate a task to a sub-agent, use the transfer_to_agent function with the appropriate agent name.
 
     Your role is to:
@@ -70,9 +99,26 @@ root_agent = Agent(
     Examples:
     - For questions about code repositories, issues, or pull requests: transfer_to_agent('github_agent')
     - For market analysis, financial research, or investment insights: transfer_to_agent('market_analyzer')
-    - For messaging, communication, or workspace organization: transfer_to_agent('carbon_voice_agent')
-    - For complex tasks combining multiple domains: break it down and transfer to appropriate agents sequentially
+    - For messaging, communication, or workspace organization: transfer_to_agent(\'''' + carbon_voice_agent_name + '''\')
+    - For complex tasks combining multiple domains: break it down and call run_parallel_subtasks with one self-contained sub-task per agent, then combine the results into one answer. Only list a sub-task in depends_on when it needs another sub-task's output (e.g. a GitHub issue that must contain the market findings)
 
     Always explain what you're doing and why you're transferring to a specific agent.''',
     sub_agents=sub_agents,
+    # Multi-domain requests fan out to several sub-agents concurrently
+    tools=[FanOutTool()] if os.getenv('FAN_OUT_ENABLED', 'true').lower() != 'false' else [],
+    before_model_callback=pre_router.before_model_callback if pre_router else None,
+)
+
+# Spans for agent runs, LLM calls, transfers and tool calls are recorded when
+# TRACE_JSONL_PATH or TRACE_OTLP_ENDPOINT is set; `adk web` and `adk run`
+# load the plugin through `app`
+tracing_plugin = create_tracing_plugin()
+# Older turns are folded into a rolling summary above a token budget, and the
+# stable instruction/tool/summary prefix of each agent is cached by Gemini
+context_manager = create_context_manager()
+app = App(
+    name='carbon_agent',
+    root_agent=root_agent,
+    plugins=[plugin for plugin in (tracing_plugin, context_manager) if plugin],
+    context_cache_config=create_context_cache_config(),
 )
@@ -0,0 +1,430 @@
+import asyncio
+import importlib
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import time
+from collections import Counter, OrderedDict
+
+logger = logging.getLogger(__name__)
+
+# Fields read from each input line, in order of preference
+TEXT_FIELDS = ('message', 'prompt', 'text', 'query', 'body')
+ID_FIELDS = ('id', 'request_id')
+
+
+def parse_request(line, text):
+    """Request dict for one input line; raises ValueError when the line has no usable prompt.
+
+    A line is a JSON string or an object with one of TEXT_FIELDS and
+    optionally an id (ID_FIELDS) and `user_id`. A `title` is sent ahead of a
+    `body`, so files like the repo's requests.jsonl work as they are.
+    """
+    try:
+        record = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f'invalid JSON: {e.msg}') from None
+    if isinstance(record, str):
+        record = {'message': record}
+    if not isinstance(record, dict):
+        raise ValueError('expected a JSON object or string')
+    field = next((f for f in TEXT_FIELDS if isinstance(record.get(f), str) and record[f].strip()), None)
+    if field is None:
+        raise ValueError(f"no {'/'.join(TEXT_FIELDS)} field")
+    message = record[field]
+    if field == 'body' and isinstance(record.get('title'), str):
+        message = f"{record['title']}\n\n{message}"
+    request_id = next((record[f] for f in ID_FIELDS if record.get(f) not in (None, '')), line)
+    return {'line': line, 'id': str(request_id), 'message': message, 'user_id': str(record.get('user_id') or 'batch')}
+
+
+def read_lines(path, offset=0, line=0):
+    """Yield (line number, start offset, end offset, text) for non-blank lines from byte `offset`"""
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        for raw in f:
+            start, offset = offset, offset + len(raw)
+            if raw.strip():
+                yield line, start, offset, raw.decode('utf-8', errors='replace')
+            line += 1
+
+
+class ResultLog:
+    """Incremental JSONL output plus the checkpoint a killed run resumes from.
+
+    Every result is appended and flushed as soon as it is known, so the
+    output file is the record of what is done: on resume, input lines that
+    already have a result are skipped (failed ones are run again with
+    `retry_failed`). The checkpoint file holds the input offset below which
+    every line has a result, so a resumed run seeks past the finished part
+    of a large input instead of re-reading it, and the run totals so far.
+    It is replaced atomically at most every `checkpoint_seconds`.
+    """
+
+    def __init__(self, input_path, output_path, checkpoint_path=None, retry_failed=False, checkpoint_seconds=1.0):
+        self.input_path = os.path.abspath(input_path)
+        self.output_path = output_path
+        self.checkpoint_path = checkpoint_path or output_path + '.checkpoint'
+        self.retry_failed = retry_failed
+        self.checkpoint_seconds = checkpoint_seconds
+        self.done = set()
+        self.totals = Counter()
+        self._open = OrderedDict()  # dispatched line -> start offset, in input order
+        self._position = (0, 0)  # (offset, line) just past the last line read
+        self._saved_at = 0.0
+        self._file = None
+
+    def load(self):
+        """Read the checkpoint and existing output; returns (offset, line) to resume reading from"""
+        offset = line = 0
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                checkpoint = json.load(f)
+            if checkpoint.get('input') == self.input_path:
+                offset, line = checkpoint['offset'], checkpoint['line']
+                self.totals.update(checkpoint.get('totals', {}))
+            else:
+                logger.warning('Ignoring checkpoint %s written for %s', self.checkpoint_path, checkpoint.get('input'))
+        if os.path.exists(self.output_path):
+            with open(self.output_path, 'rb+') as f:
+                data = f.read()
+                # A run killed mid-write leaves a partial last line
+                end = data.rfind(b'\n') + 1
+                if end < len(data):
+                    f.truncate(end)
+            for raw in data[:end].splitlines():
+                try:
+                    result = json.loads(raw)
+                except json.JSONDecodeError:
+                    continue
+                if result.get('status') == 'ok' or not self.retry_failed:
+                    self.done.add(result['line'])
+                else:
+                    self.done.discard(result['line'])
+        if self.retry_failed:
+            # Failed lines may lie before the checkpoint offset, and are
+            # counted again when retried: only the finished lines count so far
+            offset = line = 0
+            self.totals = Counter(ok=len(self.done)) if self.done else Counter()
+        self._position = (offset, line)
+        self._file = open(self.output_path, 'a', encoding='utf-8')
+        return offset, line
+
+    def skip(self, line, end):
+        """Whether `line` already has a result; advances the read position either way"""
+        self._position = (end, line + 1)
+        return line in self.done
+
+    def dispatch(self, line, start):
+        self._open[line] = start
+
+    def write(self, result):
+        self._file.write(json.dumps(result, ensure_ascii=False, default=str) + '\n')
+        self._file.flush()
+        self._open.pop(result['line'], None)
+        self.done.add(result['line'])
+        self.totals[result['status']] += 1
+        if time.monotonic() - self._saved_at >= self.checkpoint_seconds:
+            self.save()
+
+    def save(self):
+        if self._open:
+            line, offset = next(iter(self._open.items()))
+        else:
+            offset, line = self._position
+        checkpoint = {'input': self.input_path, 'offset': offset, 'line': line, 'totals': dict(self.totals)}
+        tmp = self.checkpoint_path + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(checkpoint, f)
+        os.replace(tmp, self.checkpoint_path)
+        self._saved_at = time.monotonic()
+
+    def close(self):
+        if self._file is not None:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self.save()
+            self._file.close()
+            self._file = None
+
+
+async def run_request(runner, request, timeout=300.0):
+    """Run one request in a fresh session; returns its result record"""
+    from google.genai import types
+
+    from .admission import BATCH, priority
+
+    start = time.perf_counter()
+    agents, tool_calls, texts = [], Counter(), []
+    session = await runner.session_service.create_session(app_name=runner.app_name, user_id=request['user_id'])
+
+    async def consume():
+        async for event in runner.run_async(
+            user_id=request['user_id'], session_id=session.id,
+            new_message=types.Content(role='user', parts=[types.Part.from_text(text=request['message'])]),
+        ):
+            if event.author != 'user' and event.author not in agents:
+                agents.append(event.author)
+            for call in event.get_function_calls():
+                tool_calls[call.name] += 1
+            if event.is_final_response() and event.content:
+                text = ''.join(part.text or '' for part in event.content.parts or [] if not part.thought)
+                if text.strip():
+                    texts.append(text)
+
+    status, error = 'ok', None
+    try:
+        # Batch work queues behind interactive requests for shared upstreams
+        with priority(BATCH):
+            await asyncio.wait_for(consume(), timeout)
+    except asyncio.TimeoutError:
+        status, error = 'failed', f'timed out after {timeout:g}s'
+    except Exception as e:
+        status, error = 'failed', f'{type(e).__name__}: {e}'
+    finally:
+        await runner.session_service.delete_session(
+            app_name=runner.app_name, user_id=request['user_id'], session_id=session.id,
+        )
+    return {
+        'line': request['line'],
+        'id': request['id'],
+        'status': status,
+        'response': '\n\n'.join(texts),
+        'error': error,
+        'latency_ms': round((time.perf_counter() - start) * 1000, 1),
+        'agents': agents,
+        'tool_calls': dict(tool_calls),
+    }
+
+
+def _initialize(initializer):
+    """Call a 'module:function' initializer, e.g. to register test models"""
+    if initializer:
+        module, _, name = initializer.partition(':')
+        getattr(importlib.import_module(module), name)()
+
+
+def _create_runner(app=None):
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+
+    if app is None:
+        from .agent import app
+    return Runner(app=app, session_service=InMemorySessionService())
+
+
+async def _close_connections():
+    from .http_pool import close_all_transports
+    from .mcp_pool import close_all_pools
+
+    await close_all_pools()
+    await close_all_transports()
+
+
+async def _run_workers(runner, requests, workers, timeout, emit):
+    """Run requests from the asyncio queue `requests` on `workers` tasks until a None per worker"""
+
+    async def worker():
+        while True:
+            request = await requests.get()
+            if request is None:
+                return
+            emit(await run_request(runner, request, timeout))
+
+    await asyncio.gather(*(worker() for _ in range(workers)))
+
+
+def _process_main(tasks, results, workers, timeout, initializer):
+    """Entry point of a pool process: run requests from `tasks`, send results to `results`"""
+    _initialize(initializer)
+
+    async def main():
+        runner = _create_runner()
+        local = asyncio.Queue(maxsize=workers)
+
+        async def feed():
+            while True:
+                request = await asyncio.to_thread(tasks.get)
+                await local.put(request)
+                if request is None:
+                    for _ in range(workers - 1):
+                        await local.put(None)
+                    return
+
+        try:
+            await asyncio.gather(feed(), _run_workers(runner, local, workers, timeout, results.put))
+        finally:
+            await _close_connections()
+
+    try:
+        asyncio.run(main())
+    finally:
+        results.put(None)
+
+
+class BatchReport:
+    """Throughput, latency and failures of one batch run"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.counts = Counter()
+        self.errors = Counter()
+        self.agents = Counter()
+        self.latencies = []
+
+    def add(self, result):
+        self.counts[result['status']] += 1
+        if result['error']:
+            self.errors[result['error'][:120]] += 1
+        self.agents.update(result.get('agents', []))
+        if result['status'] == 'ok':
+            self.latencies.append(result['latency_ms'])
+
+    def snapshot(self, skipped=0):
+        elapsed = time.perf_counter() - self.started
+        processed = sum(self.counts.values())
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] if latencies else None
+
+        return {
+            'processed': processed,
+            'ok': self.counts['ok'],
+            'failed': self.counts['failed'],
+            'invalid': self.counts['invalid'],
+            'skipped': skipped,
+            'elapsed_seconds': round(elapsed, 2),
+            'requests_per_sec': round(processed / elapsed, 2) if elapsed else None,
+            'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99)},
+            'top_errors': self.errors.most_common(5),
+            'agents': dict(self.agents),
+        }
+
+
+async def run_batch(input_path, output_path, workers=8, processes=1, timeout=300.0, retry_failed=False,
+                    checkpoint_path=None, limit=None, initializer=None, app=None, progress_seconds=10.0):
+    """Run every request in a JSONL file through the agent tree; returns the run report.
+
+    The input is read lazily, line by line, and at most `workers` requests
+    run concurrently per process (`processes` > 1 starts that many pool
+    processes, each with its own agent tree and MCP connections). Results
+    are appended to `output_path` as they finish (in completion order, with
+    the input `line` and `id`), and a rerun with the same paths resumes
+    where a killed run stopped. `limit` caps the requests run this time;
+    `initializer` ('module:function') runs first in every process.
+    """
+    _initialize(initializer)
+    log = ResultLog(input_path, output_path, checkpoint_path, retry_failed=retry_failed)
+    offset, first_line = log.load()
+    report = BatchReport()
+    skipped = len(log.done)
+    last_progress = time.monotonic()
+
+    def emit(result):
+        nonlocal last_progress
+        log.write(result)
+        report.add(result)
+        if time.monotonic() - last_progress >= progress_seconds:
+            last_progress = time.monotonic()
+            snapshot = report.snapshot(skipped)
+            logger.info('Batch progress: %d done (%d failed), %.1f req/s',
+                        snapshot['processed'], snapshot['failed'] + snapshot['invalid'], snapshot['requests_per_sec'])
+
+    def pending_requests():
+        """Parsed requests still to run; invalid lines are reported directly"""
+        started = 0
+        for line, start, end, text in read_lines(input_path, offset, first_line):
+            # Before skip(): a line past the limit must not move the checkpoint
+            if limit is not None and started >= limit:
+                return
+            if log.skip(line, end):
+                continue
+            started += 1
+            try:
+                request = parse_request(line, text)
+            except ValueError as e:
+                emit({'line': line, 'id': str(line), 'status': 'invalid', 'response': '', 'error': str(e),
+                      'latency_ms': 0.0, 'agents': [], 'tool_calls': {}})
+                continue
+            log.dispatch(line, start)
+            yield request
+
+    try:
+        if processes <= 1:
+            runner = _create_runner(app)
+            requests = asyncio.Queue(maxsize=workers * 2)
+
+            async def produce():
+                for request in pending_requests():
+                    await requests.put(request)
+                for _ in range(workers):
+                    await requests.put(None)
+
+            try:
+                await asyncio.gather(produce(), _run_workers(runner, requests, workers, timeout, emit))
+            finally:
+                await _close_connections()
+        else:
+            await _run_process_pool(pending_requests(), emit, workers, processes, timeout, initializer)
+    finally:
+        log.close()
+    return report.snapshot(skipped)
+
+
+async def _run_process_pool(requests, emit, workers, processes, timeout, initializer):
+    context = multiprocessing.get_context('spawn')
+    tasks = context.Queue(maxsize=processes * workers * 2)
+    results = context.Queue()
+    pool = [
+        context.Process(target=_process_main, args=(tasks, results, workers, timeout, initializer), daemon=True)
+        for _ in range(processes)
+    ]
+    for process in pool:
+        process.start()
+    stopped = False
+
+    def put(item):
+        while not stopped:
+            try:
+                tasks.put(item, timeout=1.0)
+                return
+            except queue.Full:
+                continue
+
+    async def produce():
+        # Input is read and ResultLog updated on the event loop; only the
+        # blocking queue puts run in a thread
+        for request in requests:
+            await asyncio.to_thread(put, request)
+        for _ in pool:
+            await asyncio.to_thread(put, None)
+
+    def collect():
+        """Emit results until every process has finished; runs in a thread"""
+        finished = 0
+        while finished < len(pool):
+            try:
+                result = results.get(timeout=1.0)
+            except queue.Empty:
+                if sum(not process.is_alive() for process in pool) > finished:
+                    raise RuntimeError('a batch pool process exited unexpectedly')
+                continue
+            if result is None:
+                finished += 1
+            else:
+                loop.call_soon_threadsafe(emit, result)
+
+    loop = asyncio.get_running_loop()
+    try:
+        await asyncio.gather(produce(), asyncio.to_thread(collect))
+        # Let the last emit callbacks run
+        await asyncio.sleep(0)
+    finally:
+        stopped = True
+        for process in pool:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
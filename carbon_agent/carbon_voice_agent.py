@@ -1,69 +1,111 @@
 import os
+import shlex
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from google.adk.tools.mcp_tool import McpToolset
 from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
 from mcp import StdioServerParameters
 
-# Load environment variables from .env file
-load_dotenv()
+from .directory import create_directory
+from .mcp_pool import PooledMcpToolset
+from .model_cascade import cascade_model
+from .result_compaction import create_result_compactor
 
-# Get Carbon Voice API key from environment variable
-CARBON_VOICE_API_KEY = os.getenv('CARBON_VOICE_API_KEY')
-if not CARBON_VOICE_API_KEY:
-    raise ValueError("CARBON_VOICE_API_KEY environment variable is required. Please add it to your .env file.")
 
-# Create Carbon Voice agent with MCP tools
-carbon_voice_agent = Agent(
-    model='gemini-2.5-flash',
-    name='carbon_voice_agent',
-    description='A communication specialist for Carbon Voice messaging platform operations.',
-    instruction='''You are a Carbon Voice communication specialist with expertise in messaging, user management, and workspace organization.
+def create_carbon_voice_agent():
+    """Build the Carbon Voice agent and its stdio MCP toolset"""
+    # Load environment variables from .env file
+    load_dotenv()
 
-    Your capabilities include:
-    - Message management: listing, retrieving, and creating messages (conversation, direct, voice memos)
-    - User operations: finding and retrieving user information by ID, email, or phone
-    - Conversation handling: listing and managing conversation threads
-    - Folder organization: creating, managing, and organizing workspace folders
-    - Workspace management: accessing workspace information and statistics
-    - AI actions: running AI prompts and actions on messages and content
+    # Get Carbon Voice API key from environment variable
+    CARBON_VOICE_API_KEY = os.getenv('CARBON_VOICE_API_KEY')
+    if not CARBON_VOICE_API_KEY:
+        raise ValueError("CARBON_VOICE_API_KEY environment variable is required. Please add it to your .env file.")
 
-    When communicating via Carbon Voice:
-    - Use appropriate message types (conversation, direct, voice memo) based on context
-    - Respect conversation threads and maintain message organization
-    - Utilize folders for proper message categorization and archival
-    - Leverage AI actions for content analysis and summarization when appropriate
-    - Always verify recipient information before sending direct messages
-    - Provide clear, professional communication in all messages
+    # Large results (message listings) are summarized and paged
+    compactor = create_result_compactor('TOOL_RESULT_COMPACTION')
 
-    Communication guidelines:
-    - Be concise but complete in message content
-    - Use appropriate urgency levels for different types of communication
-    - Maintain professional tone in business communications
-    - Respect privacy and data security in user operations
-    - Organize content logically using folders and categories
+    # Server processes come from a process-wide warm pool so sessions
+    # don't pay npx resolution and Node startup on every conversation
+    toolset = PooledMcpToolset(
+        connection_params=StdioConnectionParams(
+            server_params=StdioServerParameters(
+                # Overridable so tests and benchmarks can run a local stand-in server
+                command=os.getenv('CARBON_VOICE_MCP_COMMAND', 'npx'),
+                args=shlex.split(os.getenv('CARBON_VOICE_MCP_ARGS', '-y @carbonvoice/cv-mcp-server')),
+                env={
+                    "CARBON_VOICE_API_KEY": CARBON_VOICE_API_KEY,
+                    "LOG_LEVEL": "info"
+                },
+            ),
+        ),
+        pool_min_size=int(os.getenv('CARBON_VOICE_MCP_POOL_MIN', '1')),
+        pool_max_size=int(os.getenv('CARBON_VOICE_MCP_POOL_MAX', '4')),
+        pool_idle_timeout=float(os.getenv('CARBON_VOICE_MCP_POOL_IDLE_TIMEOUT', '300')),
+    )
+    # Recipient checks are answered from a local index of users, conversations and folders
+    directory = create_directory(toolset)
+    after_tool_callbacks = [
+        callback for callback in (
+            directory.after_tool_callback if directory else None,
+            compactor.after_tool_callback if compactor else None,
+        ) if callback
+    ]
 
-    Focus areas:
-    - Team communication and collaboration
-    - Message archival and organization
-    - User directory management
-    - Workspace productivity tools
-    - AI-assisted content processing
-    - Voice communication capabilities
+    # Create Carbon Voice agent with MCP tools
+    return Agent(
+        model=cascade_model('carbon_voice_agent', 'gemini-2.5-flash'),
+        name='carbon_voice_agent',
+        description='A communication specialist for Carbon Voice messaging platform operations.',
+        instruction='''You are a Carbon Voice communication specialist with expertise in messaging, user management, and workspace organization.
 
-    Provide efficient, organized communication solutions using Carbon Voice platform features.''',
-    tools=[
-        McpToolset(
-            connection_params=StdioConnectionParams(
-                server_params=StdioServerParameters(
-                    command='npx',
-                    args=["-y", "@carbonvoice/cv-mcp-server"],
-                    env={
-                        "CARBON_VOICE_API_KEY": CARBON_VOICE_API_KEY,
-                        "LOG_LEVEL": "info"
-                    },
-                ),
-            ),
-        )
-    ],
-)
+        Your capabilities include:
+        - Message management: listing, retrieving, and creating messages (conversation, direct, voice memos)
+        - User operations: finding and retrieving user information by ID, email, or phone
+        - Conversation handling: listing and managing conversation threads
+        - Folder organization: creating, managing, and organizing workspace folders
+        - Workspace management: accessing workspace information and statistics
+        - AI actions: running AI prompts and actions on messages and content
+
+        When communicating via Carbon Voice:
+        - Use appropriate message types (conversation, direct, voice memo) based on context
+        - Respect conversation threads and maintain message organization
+        - Utilize folders for proper message categorization and archival
+        - Leverage AI actions for content analysis and summarization when appropriate
+        - Always verify recipient information before sending direct messages
+        - Look users, conversations and folders up with find_users, find_conversations and find_folders first; they answer from a local directory without an API call
+        - Provide clear, professional communication in all messages
+
+        Communication guidelines:
+        - Be concise but complete in message content
+        - Use appropriate urgency levels for different types of communication
+        - Maintain professional tone in business communications
+        - Respect privacy and data security in user operations
+        - Organize content logically using folders and categories
+
+        Focus areas:
+        - Team communication and collaboration
+        - Message archival and organization
+        - User directory management
+        - Workspace productivity tools
+        - AI-assisted content processing
+        - Voice communication capabilities
+
+        Provide efficient, organized communication solutions using Carbon Voice platform features.''',
+        before_model_callback=compactor.before_model_callback if compactor else None,
+        after_tool_callback=after_tool_callbacks or None,
+        tools=[
+            toolset,
+            *(directory.tools() if directory else []),
+            *([compactor.read_tool] if compactor else []),
+        ],
+    )
+
+
+def __getattr__(name):
+    # Keep `from .carbon_voice_agent import carbon_voice_agent` working; the agent is only
+    # built the first time it is asked for.
+    global carbon_voice_agent
+    if name == 'carbon_voice_agent':
+        carbon_voice_agent = create_carbon_voice_agent()
+        return carbon_voice_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
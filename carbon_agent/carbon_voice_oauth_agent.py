@@ -0,0 +1,109 @@
+import os
+from dotenv import load_dotenv
+from google.adk.agents import Agent
+from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPServerParams
+
+from .directory import create_directory
+from .http_pool import PooledHttpMcpToolset
+from .model_cascade import cascade_model
+from .oauth_broker import AuthorizedToolset, get_oauth_broker
+
+
+def create_carbon_voice_oauth_agent():
+    """Build the Carbon Voice agent with HTTP transport and OAuth2"""
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Get Carbon Voice OAuth2 credentials from environment variables
+    CLIENT_ID = os.getenv('CARBON_VOICE_CLIENT_ID')
+    CLIENT_SECRET = os.getenv('CARBON_VOICE_CLIENT_SECRET')
+    ACCESS_TOKEN = os.getenv('CARBON_VOICE_API_KEY')  # Shared token for sessions without their own
+
+    # Validate required OAuth2 credentials
+    missing_creds = []
+    if not CLIENT_ID:
+        missing_creds.append('CARBON_VOICE_CLIENT_ID')
+    if not CLIENT_SECRET:
+        missing_creds.append('CARBON_VOICE_CLIENT_SECRET')
+    broker = get_oauth_broker()
+    if broker is None and not ACCESS_TOKEN:
+        missing_creds.append('CARBON_VOICE_API_KEY')
+
+    if missing_creds:
+        raise ValueError(f"Missing required OAuth2 credentials: {', '.join(missing_creds)}. Please add them to your .env file.")
+
+    headers = {"Content-Type": "application/json", "X-Client-ID": CLIENT_ID}
+    if ACCESS_TOKEN:
+        headers["Authorization"] = f"Bearer {ACCESS_TOKEN}"
+    # Connections to the MCP host are shared across sessions and tool calls. With the broker, the
+    # requests of an authenticated user with a token carry that token instead of the API key,
+    # refreshed in the background before it expires.
+    toolset = PooledHttpMcpToolset(
+        connection_params=StreamableHTTPServerParams(
+            url=os.getenv('CARBON_VOICE_MCP_URL', "https://api.carbonvoice.app"),  # Update with actual Carbon Voice API endpoint
+            headers=headers,
+        ),
+        header_provider=broker.header_provider if broker else None,
+        http_auth=broker.auth() if broker else None,
+    )
+    # Recipient checks are answered from a local index of users, conversations and folders
+    directory = create_directory(toolset)
+    tools = [toolset, *(directory.tools() if directory else [])]
+
+    # Create Carbon Voice agent with HTTP transport and OAuth2
+    return Agent(
+        model=cascade_model('carbon_voice_oauth_agent', 'gemini-1.5-flash'),
+        name='carbon_voice_oauth_agent',
+        description='A communication specialist for Carbon Voice messaging platform using OAuth2 authentication.',
+        instruction='''You are a Carbon Voice communication specialist with expertise in messaging, user management, and workspace organization using OAuth2 authentication.
+
+        Your capabilities include:
+        - Message management: listing, retrieving, and creating messages (conversation, direct, voice memos)
+        - User operations: finding and retrieving user information by ID, email, or phone
+        - Conversation handling: listing and managing conversation threads
+        - Folder organization: creating, managing, and organizing workspace folders
+        - Workspace management: accessing workspace information and statistics
+        - AI actions: running AI prompts and actions on messages and content
+
+        When communicating via Carbon Voice:
+        - Use appropriate message types (conversation, direct, voice memo) based on context
+        - Respect conversation threads and maintain message organization
+        - Utilize folders for proper message categorization and archival
+        - Leverage AI actions for content analysis and summarization when appropriate
+        - Always verify recipient information before sending direct messages
+        - Look users, conversations and folders up with find_users, find_conversations and find_folders first; they answer from a local directory without an API call
+        - Provide clear, professional communication in all messages
+        - If only authorize_carbon_voice is available, give the user its link to connect their Carbon Voice account
+
+        Communication guidelines:
+        - Be concise but complete in message content
+        - Use appropriate urgency levels for different types of communication
+        - Maintain professional tone in business communications
+        - Respect privacy and data security in user operations
+        - Organize content logically using folders and categories
+
+        Focus areas:
+        - Team communication and collaboration
+        - Message archival and organization
+        - User directory management
+        - Workspace productivity tools
+        - AI-assisted content processing
+        - Voice communication capabilities
+
+        Note: This agent uses OAuth2 authentication for secure API access.
+
+        Provide efficient, organized communication solutions using Carbon Voice platform features.''',
+        after_tool_callback=directory.after_tool_callback if directory else None,
+        # Users who have not connected their account yet only get the authorization tool
+        tools=[AuthorizedToolset(broker, tools, fallback=bool(ACCESS_TOKEN))] if broker else tools,
+    )
+
+
+def __getattr__(name):
+    # Keep `from .carbon_voice_oauth_agent import carbon_voice_oauth_agent` working; the agent is only
+    # built the first time it is asked for.
+    global carbon_voice_oauth_agent
+    if name == 'carbon_voice_oauth_agent':
+        carbon_voice_oauth_agent = create_carbon_voice_oauth_agent()
+        return carbon_voice_oauth_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,281 @@
+import hashlib
+import json
+import logging
+import os
+import warnings
+from collections import Counter, defaultdict
+
+from google.adk.agents.context_cache_config import ContextCacheConfig
+from google.adk.events import Event, EventActions
+from google.adk.models import BaseLlm, LLMRegistry, LlmRequest
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from .admission import BATCH, admitted_model, priority
+
+logger = logging.getLogger(__name__)
+
+# Session state key holding the rolling summary and where verbatim history resumes
+SUMMARY_STATE_KEY = 'context_summary'
+
+SUMMARY_PREFIX = 'Summary of the earlier conversation:\n'
+
+SUMMARY_PROMPT = '''Update the running summary of a conversation between a user and a team of assistant agents (an orchestrator with GitHub, market analysis and Carbon Voice specialists).
+
+Keep everything the user may refer back to: names, repositories, issue and pull request numbers, message and conversation ids, figures, decisions, results and open tasks. Drop greetings, restated instructions and tool call mechanics. Reply with the updated summary only, in at most {max_words} words.
+
+Summary so far:
+{summary}
+
+New turns:
+{transcript}'''
+
+
+def estimate_tokens(contents):
+    """Rough token count of a list of Contents (4 characters per token)"""
+    return len(json.dumps([c.model_dump(mode='json', exclude_none=True) for c in contents if c])) // 4
+
+
+def _text(content):
+    if not content or not content.parts:
+        return ''
+    return ' '.join(part.text for part in content.parts if part.text)
+
+
+def _clip(value, limit):
+    text = value if isinstance(value, str) else json.dumps(value, default=str)
+    return text if len(text) <= limit else text[:limit] + '...'
+
+
+def _is_user_message(event):
+    return event.author == 'user' and bool(_text(event.content))
+
+
+def format_transcript(events):
+    """Plain-text transcript of `events` for the summarization prompt"""
+    lines = []
+    for event in events:
+        for part in (event.content.parts if event.content else None) or []:
+            if part.text and not part.thought:
+                lines.append(f'{event.author}: {part.text.strip()}')
+            elif part.function_call:
+                call = part.function_call
+                lines.append(f'{event.author} called {call.name}({_clip(call.args or {}, 200)})')
+            elif part.function_response:
+                response = part.function_response
+                lines.append(f'{response.name} returned: {_clip(response.response or {}, 300)}')
+    return '\n'.join(lines)
+
+
+def _prefix_fingerprint(llm_request):
+    config = llm_request.config
+    prefix = json.dumps([
+        config.system_instruction if isinstance(config.system_instruction, str)
+        else _text(config.system_instruction),
+        [tool.model_dump(mode='json', exclude_none=True) for tool in config.tools or []],
+    ], sort_keys=True)
+    return hashlib.sha256(prefix.encode()).hexdigest(), len(prefix) // 4
+
+
+class ContextManagerPlugin(BasePlugin):
+    """ADK plugin that keeps the history sent to every agent near a token budget.
+
+    After each run, when the history not yet summarized exceeds
+    `token_budget`, every turn except the last `keep_recent_turns` is folded
+    into a rolling summary by `summary_model` (the previous summary plus the
+    new turns, so there is only ever one). The summary is stored in session
+    state, so it survives with whatever session service is in use, and
+    before each model call the turns it covers are replaced by it. The
+    prefix of instruction, tools and summary only changes when the summary
+    does, which is what lets provider-side context caching (see
+    `create_context_cache_config`) reuse it across turns.
+
+    `metrics()` reports tokens dropped from requests, prompt and cached
+    tokens from the provider and how often each agent's instruction and
+    tool prefix was identical to its previous call.
+    """
+
+    def __init__(self, name='carbon_context', token_budget=8000, keep_recent_turns=3,
+                 summary_model='gemini-2.5-flash', max_summary_words=250):
+        super().__init__(name=name)
+        self.token_budget = token_budget
+        self.keep_recent_turns = keep_recent_turns
+        self.summary_model = summary_model
+        self.max_summary_words = max_summary_words
+        self.stats = Counter()
+        self.agent_stats = defaultdict(Counter)
+        self._prefixes = {}  # agent -> fingerprint of its last instruction and tools
+        self._llm = None
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        agent_stats = self.agent_stats[callback_context.agent_name]
+        agent_stats['model_calls'] += 1
+        fingerprint, prefix_tokens = _prefix_fingerprint(llm_request)
+        agent_stats['prefix_tokens'] += prefix_tokens
+        if self._prefixes.get(callback_context.agent_name) == fingerprint:
+            agent_stats['prefix_tokens_reused'] += prefix_tokens
+        self._prefixes[callback_context.agent_name] = fingerprint
+
+        summary = callback_context.state.get(SUMMARY_STATE_KEY)
+        if summary:
+            self._apply_summary(callback_context.session.events, summary, llm_request, agent_stats)
+        return None
+
+    def _apply_summary(self, events, summary, llm_request, agent_stats):
+        """Replace the contents before the first kept user message with the summary"""
+        first_kept = summary.get('first_kept_event_id')
+        position = next((i for i, event in enumerate(events) if event.id == first_kept), None)
+        if position is None:
+            return
+        text = _text(events[position].content)
+        # Earlier user messages with the same text also appear in the contents
+        skip = sum(1 for event in events[:position] if event.author == 'user' and _text(event.content) == text)
+        for index, content in enumerate(llm_request.contents):
+            if content.role == 'user' and _text(content) == text:
+                if skip == 0:
+                    break
+                skip -= 1
+        else:
+            return  # e.g. agents that do not see the conversation history
+        if index == 0 and position:
+            return
+        # At position 0 the summarized turns were not loaded with the session
+        # (see session_store.py), so the summary goes in front of the contents
+        dropped = estimate_tokens(llm_request.contents[:index])
+        summary_content = types.Content(
+            role='user', parts=[types.Part.from_text(text=SUMMARY_PREFIX + summary['text'])]
+        )
+        llm_request.contents[:index] = [summary_content]
+        added = estimate_tokens([summary_content])
+        agent_stats['requests_summarized'] += 1
+        agent_stats['history_tokens_dropped'] += dropped
+        agent_stats['summary_tokens_added'] += added
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        usage = llm_response.usage_metadata
+        if usage is not None and not llm_response.partial:
+            agent_stats = self.agent_stats[callback_context.agent_name]
+            agent_stats['prompt_tokens'] += usage.prompt_token_count or 0
+            agent_stats['cached_tokens'] += usage.cached_content_token_count or 0
+        return None
+
+    async def after_run_callback(self, *, invocation_context):
+        session = invocation_context.session
+        try:
+            await self.maybe_summarize(invocation_context.session_service, session, invocation_context.invocation_id)
+        except Exception as e:
+            # The verbatim history is still there; the next run tries again
+            self.stats['summary_failures'] += 1
+            logger.warning('Summarizing session %s failed: %s', session.id, e)
+
+    async def maybe_summarize(self, session_service, session, invocation_id=None):
+        """Fold older turns of `session` into the rolling summary when over budget.
+
+        Returns True when a new summary was stored.
+        """
+        events = session.events
+        summary = session.state.get(SUMMARY_STATE_KEY) or {}
+        start = 0
+        if summary.get('first_kept_event_id'):
+            start = next((i for i, event in enumerate(events) if event.id == summary['first_kept_event_id']), 0)
+        history_tokens = estimate_tokens([event.content for event in events[start:]])
+        if history_tokens + len(summary.get('text', '')) // 4 <= self.token_budget:
+            return False
+
+        turn_starts = [i for i in range(start, len(events)) if _is_user_message(events[i])]
+        if len(turn_starts) <= self.keep_recent_turns:
+            return False
+        cut = turn_starts[-self.keep_recent_turns] if self.keep_recent_turns else len(events)
+        if cut >= len(events):
+            return False
+
+        text = await self._summarize(summary.get('text') or '(none yet)', format_transcript(events[start:cut]))
+        if not text:
+            return False
+        # Authored by the last agent to reply so the runner still resumes with it
+        author = next((event.author for event in reversed(events) if event.author != 'user'), 'user')
+        await session_service.append_event(session, Event(
+            author=author,
+            invocation_id=invocation_id or Event.new_id(),
+            actions=EventActions(state_delta={SUMMARY_STATE_KEY: {
+                'text': text,
+                'first_kept_event_id': events[cut].id,
+                'turns': summary.get('turns', 0) + len(turn_starts) - self.keep_recent_turns,
+            }}),
+        ))
+        self.stats['summaries'] += 1
+        self.stats['history_tokens_summarized'] += estimate_tokens([event.content for event in events[start:cut]])
+        logger.debug('Summarized %d events of session %s', cut - start, session.id)
+        return True
+
+    async def _summarize(self, summary, transcript):
+        if self._llm is None:
+            llm = admitted_model(self.summary_model)
+            self._llm = llm if isinstance(llm, BaseLlm) else LLMRegistry.new_llm(llm)
+        prompt = SUMMARY_PROMPT.format(max_words=self.max_summary_words, summary=summary, transcript=transcript)
+        request = LlmRequest(
+            model=self.summary_model,
+            contents=[types.Content(role='user', parts=[types.Part.from_text(text=prompt)])],
+        )
+        texts = []
+        # Summaries are background work: user-facing calls are admitted first
+        with priority(BATCH):
+            async for response in self._llm.generate_content_async(request, stream=False):
+                if response.error_code:
+                    raise RuntimeError(response.error_message or response.error_code)
+                if response.content and not response.partial:
+                    texts.append(_text(response.content))
+        return ' '.join(texts).strip()
+
+    def metrics(self):
+        totals = Counter()
+        for agent_stats in self.agent_stats.values():
+            totals.update(agent_stats)
+        prompt_tokens = totals['prompt_tokens']
+        return {
+            'summaries': self.stats['summaries'],
+            'summary_failures': self.stats['summary_failures'],
+            'requests_summarized': totals['requests_summarized'],
+            'tokens_saved': totals['history_tokens_dropped'] - totals['summary_tokens_added'],
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': totals['cached_tokens'],
+            'cached_ratio': totals['cached_tokens'] / prompt_tokens if prompt_tokens else 0.0,
+            'prefix_reuse_ratio': {
+                agent: stats['prefix_tokens_reused'] / stats['prefix_tokens'] if stats['prefix_tokens'] else 0.0
+                for agent, stats in sorted(self.agent_stats.items())
+            },
+        }
+
+
+def create_context_manager():
+    """ContextManagerPlugin configured from CONTEXT_SUMMARY_* environment variables.
+
+    Returns None when CONTEXT_SUMMARY_ENABLED is false.
+    """
+    if os.getenv('CONTEXT_SUMMARY_ENABLED', 'true').lower() == 'false':
+        return None
+    return ContextManagerPlugin(
+        token_budget=int(os.getenv('CONTEXT_SUMMARY_TOKEN_BUDGET', '8000')),
+        keep_recent_turns=int(os.getenv('CONTEXT_SUMMARY_KEEP_TURNS', '3')),
+        summary_model=os.getenv('CONTEXT_SUMMARY_MODEL', 'gemini-2.5-flash'),
+        max_summary_words=int(os.getenv('CONTEXT_SUMMARY_MAX_WORDS', '250')),
+    )
+
+
+def create_context_cache_config():
+    """ADK ContextCacheConfig from CONTEXT_CACHE_* environment variables.
+
+    Gemini then caches each agent's instruction, tools and stable history
+    prefix server-side and bills them as cached tokens. Returns None when
+    CONTEXT_CACHE_ENABLED is false.
+    """
+    if os.getenv('CONTEXT_CACHE_ENABLED', 'true').lower() == 'false':
+        return None
+    with warnings.catch_warnings():
+        # ADK flags context caching as experimental on every construction
+        warnings.simplefilter('ignore', UserWarning)
+        return ContextCacheConfig(
+            cache_intervals=int(os.getenv('CONTEXT_CACHE_INTERVALS', '10')),
+            ttl_seconds=int(os.getenv('CONTEXT_CACHE_TTL_SECONDS', '1800')),
+            min_tokens=int(os.getenv('CONTEXT_CACHE_MIN_TOKENS', '4096')),
+        )
@@ -0,0 +1,427 @@
+import asyncio
+import bisect
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+
+from google.adk.agents.readonly_context import ReadonlyContext
+from google.adk.tools import FunctionTool
+
+from .tool_result_cache import is_read_only
+
+logger = logging.getLogger(__name__)
+
+COLLECTIONS = ('users', 'conversations', 'folders')
+
+# MCP tools listing each collection
+DEFAULT_SOURCES = {'users': 'list_users', 'conversations': 'list_conversations', 'folders': 'list_folders'}
+
+# Mutating tools (by name pattern) and the collections they can change
+DEFAULT_INVALIDATIONS = {
+    '*folder*': ('folders',),
+    '*conversation*': ('conversations',),
+    '*user*': ('users',),
+    '*workspace*': COLLECTIONS,
+}
+
+# Writes that create or change messages: sending to a conversation or moving
+# a message to a folder leaves the directory as it is
+DEFAULT_MESSAGE_WRITES = ('*message*', '*voicememo*', '*attachment*')
+
+# Fields that mark a record as a message rather than a user, conversation or folder
+MESSAGE_FIELDS = frozenset(['text', 'body', 'transcript', 'author_id', 'conversation_id', 'message_id'])
+
+# Keys under which list results may wrap their records
+LIST_KEYS = ('result', 'users', 'conversations', 'folders', 'data', 'items', 'results')
+
+
+def parse_records(result):
+    """Records (dicts with an id) in an MCP tool result"""
+    if not isinstance(result, dict) or result.get('isError'):
+        return []
+    values = []
+    structured = result.get('structuredContent')
+    if structured is not None:
+        values.append(structured)
+    else:
+        for item in result.get('content') or []:
+            if isinstance(item, dict) and item.get('type') == 'text':
+                try:
+                    values.append(json.loads(item['text']))
+                except (TypeError, ValueError):
+                    continue
+    records = []
+    while values:
+        value = values.pop(0)
+        if isinstance(value, list):
+            values[:0] = value
+        elif isinstance(value, dict):
+            nested = next((value[key] for key in LIST_KEYS if isinstance(value.get(key), (list, dict))), None)
+            if value.get('id') is not None:
+                records.append(value)
+            elif nested is not None:
+                values.insert(0, nested)
+    return records
+
+
+def fits(collection, record):
+    """Whether a write result record can be indexed as a `collection` record"""
+    if MESSAGE_FIELDS & record.keys() or not _name(record):
+        return False
+    if collection == 'users':
+        return 'members' not in record
+    return not (_emails(record) or _phones(record))
+
+
+def normalize_email(value):
+    return value.strip().lower() if isinstance(value, str) and '@' in value else None
+
+
+def normalize_phone(value):
+    digits = re.sub(r'\D', '', value) if isinstance(value, str) else ''
+    return digits if len(digits) >= 5 else None
+
+
+def _emails(record):
+    return {normalize_email(value) for value in [record.get('email'), *(record.get('emails') or [])]} - {None}
+
+
+def _phones(record):
+    values = [record.get('phone'), record.get('phone_number'), *(record.get('phones') or [])]
+    return {normalize_phone(value) for value in values} - {None}
+
+
+def _name(record):
+    name = record.get('name') or record.get('full_name') or record.get('title')
+    if not name and (record.get('first_name') or record.get('last_name')):
+        name = f"{record.get('first_name') or ''} {record.get('last_name') or ''}"
+    return (name or '').strip()
+
+
+def _name_keys(record):
+    """Lowercase full name and each word of it, for prefix search"""
+    name = _name(record).lower()
+    if not name:
+        return set()
+    return {name, *name.split()}
+
+
+class DirectoryIndex:
+    """In-memory index of one workspace's users, conversations and folders.
+
+    Records are looked up by id, by normalized email or phone in O(1), and
+    by name prefix (any word of the name, or the whole name) with a binary
+    search over sorted name keys. Each collection is replaced as a whole by
+    `replace()` when it is re-listed and patched record by record by
+    `upsert()` from write results. `synced_at` and `invalid` track how old
+    each collection is and whether a write may have changed it.
+    """
+
+    def __init__(self):
+        self.records = {collection: {} for collection in COLLECTIONS}
+        self.synced_at = {collection: None for collection in COLLECTIONS}
+        self.invalid = set()
+        self.invalidated_at = {}
+        self._by_email = {}
+        self._by_phone = {}
+        self._names = {collection: [] for collection in COLLECTIONS}  # sorted (key, id)
+
+    def replace(self, collection, records):
+        self.records[collection] = {}
+        self._names[collection] = []
+        if collection == 'users':
+            self._by_email, self._by_phone = {}, {}
+        for record in records:
+            self._add(collection, record)
+        self._names[collection].sort()
+        self.synced_at[collection] = time.monotonic()
+        self.invalid.discard(collection)
+
+    def invalidate(self, collection):
+        self.invalid.add(collection)
+        self.invalidated_at[collection] = time.monotonic()
+
+    def upsert(self, collection, record):
+        record_id = str(record['id'])
+        old = self.records[collection].get(record_id)
+        if old is not None:
+            record = {**old, **record}
+            self._remove(collection, record_id, old)
+        self._add(collection, record, insort=True)
+
+    def _add(self, collection, record, insort=False):
+        record_id = str(record['id'])
+        self.records[collection][record_id] = record
+        for key in _name_keys(record):
+            if insort:
+                bisect.insort(self._names[collection], (key, record_id))
+            else:
+                self._names[collection].append((key, record_id))
+        if collection == 'users':
+            self._by_email.update(dict.fromkeys(_emails(record), record_id))
+            self._by_phone.update(dict.fromkeys(_phones(record), record_id))
+
+    def _remove(self, collection, record_id, record):
+        names = self._names[collection]
+        for key in _name_keys(record):
+            position = bisect.bisect_left(names, (key, record_id))
+            if position < len(names) and names[position] == (key, record_id):
+                del names[position]
+        if collection == 'users':
+            for lookup, keys in ((self._by_email, _emails(record)), (self._by_phone, _phones(record))):
+                for key in keys:
+                    if lookup.get(key) == record_id:
+                        del lookup[key]
+        del self.records[collection][record_id]
+
+    def get(self, collection, record_id):
+        return self.records[collection].get(str(record_id))
+
+    def user_by_email(self, email):
+        record_id = self._by_email.get(normalize_email(email))
+        return self.records['users'].get(record_id) if record_id else None
+
+    def user_by_phone(self, phone):
+        record_id = self._by_phone.get(normalize_phone(phone))
+        return self.records['users'].get(record_id) if record_id else None
+
+    def search(self, collection, prefix, limit=10):
+        """Records whose name, or a word of it, starts with `prefix`"""
+        prefix = prefix.strip().lower()
+        if not prefix:
+            return []
+        names = self._names[collection]
+        found = {}
+        position = bisect.bisect_left(names, (prefix, ''))
+        while position < len(names) and names[position][0].startswith(prefix) and len(found) < limit:
+            record_id = names[position][1]
+            found.setdefault(record_id, self.records[collection][record_id])
+            position += 1
+        return list(found.values())
+
+    def find(self, collection, query, limit=10):
+        """Look `query` up as an id, then (users) an email or phone, then a name prefix"""
+        query = str(query).strip()
+        record = self.get(collection, query)
+        if record is None and collection == 'users':
+            record = self.user_by_email(query) if '@' in query else self.user_by_phone(query)
+        if record is not None:
+            return [record]
+        return self.search(collection, query, limit)
+
+    def size(self):
+        return {collection: len(records) for collection, records in self.records.items()}
+
+
+class CarbonVoiceDirectory:
+    """Local directory of Carbon Voice users, conversations and folders behind `toolset`.
+
+    Serves the find_users / find_conversations / find_folders tools from a
+    DirectoryIndex per caller scope (a hash of the request headers, so
+    workspaces seen with different credentials never mix). A collection is
+    listed through the toolset's own MCP tools on first use. After `ttl`
+    seconds it is still served while one background refresh re-lists it.
+    A lookup that finds nothing re-lists the collection first, at most
+    every `miss_refresh_interval` seconds.
+
+    `after_tool_callback` keeps the index consistent with writes the agent
+    makes through MCP: records returned by a mutating tool are upserted at
+    once, and the collections the tool can change (`invalidations`) are
+    refreshed, in the background if the write result was indexed and
+    before the next lookup otherwise. Returned records that do not look
+    like the collection's (a message returned by a send) are not indexed,
+    and message writes (`message_writes`) change no collection at all.
+    """
+
+    def __init__(self, toolset, ttl=300.0, miss_refresh_interval=30.0, max_results=10,
+                 sources=None, invalidations=None, message_writes=DEFAULT_MESSAGE_WRITES):
+        self.toolset = toolset
+        self.ttl = ttl
+        self.miss_refresh_interval = miss_refresh_interval
+        self.max_results = max_results
+        self.sources = {**DEFAULT_SOURCES, **(sources or {})}
+        self.invalidations = list((invalidations or DEFAULT_INVALIDATIONS).items())
+        self.message_writes = message_writes
+        self.stats = Counter()
+        self._indexes = {}  # scope -> DirectoryIndex
+        self._refreshes = {}  # (scope, collection) -> task
+
+    def _readonly_context(self, tool_context):
+        invocation_context = getattr(tool_context, '_invocation_context', None)
+        return ReadonlyContext(invocation_context) if invocation_context is not None else None
+
+    def _scope(self, tool_context):
+        readonly_context = self._readonly_context(tool_context)
+        provider = getattr(self.toolset, '_header_provider', None)
+        headers = provider(readonly_context) if provider and readonly_context else None
+        merged = self.toolset._mcp_session_manager._merge_headers(headers)
+        return hashlib.sha256(json.dumps(merged or {}, sort_keys=True).encode()).hexdigest()[:16]
+
+    async def _list(self, collection, tool_context):
+        tools = {tool.name: tool for tool in await self.toolset.get_tools(self._readonly_context(tool_context))}
+        tool = tools.get(self.sources[collection])
+        if tool is None:
+            raise LookupError(f'The Carbon Voice server has no {self.sources[collection]} tool')
+        self.stats['upstream_calls'] += 1
+        result = await tool.run_async(args={}, tool_context=tool_context)
+        if isinstance(result, dict) and result.get('isError'):
+            raise RuntimeError(f'{tool.name} failed: {result.get("content")}')
+        return parse_records(result)
+
+    def _refresh(self, scope, index, collection, tool_context):
+        """Start (or join) the one re-listing of `collection` for `scope`"""
+        task = self._refreshes.get((scope, collection))
+        if task is None:
+            async def run():
+                started = time.monotonic()
+                records = await self._list(collection, tool_context)
+                # A write while listing may not be in the list; keep it invalid
+                still_invalid = index.invalidated_at.get(collection, 0) > started
+                index.replace(collection, records)
+                if still_invalid:
+                    index.invalid.add(collection)
+                self.stats['syncs'] += 1
+
+            task = asyncio.ensure_future(run())
+            self._refreshes[(scope, collection)] = task
+            task.add_done_callback(lambda done: self._finish_refresh((scope, collection), done))
+        return task
+
+    def _finish_refresh(self, key, task):
+        if self._refreshes.get(key) is task:
+            del self._refreshes[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.stats['sync_failures'] += 1
+            logger.warning('Refreshing the Carbon Voice %s directory failed: %s', key[1], task.exception())
+
+    async def _index(self, collection, tool_context):
+        scope = self._scope(tool_context)
+        index = self._indexes.get(scope)
+        if index is None:
+            index = self._indexes[scope] = DirectoryIndex()
+        synced_at = index.synced_at[collection]
+        if synced_at is None or collection in index.invalid:
+            await asyncio.shield(self._refresh(scope, index, collection, tool_context))
+        elif time.monotonic() - synced_at > self.ttl:
+            self.stats['stale_served'] += 1
+            self._refresh(scope, index, collection, tool_context)
+        return scope, index
+
+    async def find(self, collection, query, tool_context):
+        """Directory records in `collection` matching `query`"""
+        scope, index = await self._index(collection, tool_context)
+        matches = index.find(collection, query, self.max_results)
+        if not matches and time.monotonic() - index.synced_at[collection] > self.miss_refresh_interval:
+            # Maybe created since the last listing
+            self.stats['miss_refreshes'] += 1
+            await asyncio.shield(self._refresh(scope, index, collection, tool_context))
+            matches = index.find(collection, query, self.max_results)
+        self.stats['lookups'] += 1
+        self.stats['hits' if matches else 'misses'] += 1
+        return matches
+
+    def _affected(self, tool_name):
+        if any(fnmatch.fnmatchcase(tool_name, pattern) for pattern in self.message_writes):
+            return set()
+        collections = set()
+        for pattern, affected in self.invalidations:
+            if fnmatch.fnmatchcase(tool_name, pattern):
+                collections.update(affected)
+        return collections
+
+    async def after_tool_callback(self, tool, args, tool_context, tool_response):
+        mcp_tool = getattr(tool, '_mcp_tool', None)
+        if mcp_tool is None or is_read_only(mcp_tool):
+            return None
+        affected = self._affected(tool.name)
+        if not affected:
+            return None
+        scope = self._scope(tool_context)
+        index = self._indexes.get(scope)
+        if index is None:
+            return None
+        records = parse_records(tool_response)
+        for collection in affected:
+            if index.synced_at[collection] is None:
+                continue
+            self.stats['invalidations'] += 1
+            if len(affected) == 1 and records and all(fits(collection, record) for record in records):
+                for record in records:
+                    index.upsert(collection, record)
+                self.stats['upserts'] += len(records)
+                self._refresh(scope, index, collection, tool_context)
+            else:
+                index.invalidate(collection)
+        return None
+
+    def tools(self):
+        """The find_* FunctionTools for an agent"""
+
+        async def find_users(query: str, tool_context) -> dict:
+            """Look up workspace users in the local Carbon Voice directory, without an API round trip.
+
+            Args:
+              query: A user ID, email address, phone number, or the start of a first, last or full name.
+
+            Returns:
+              The matching users (id, name, email, phone).
+            """
+            users = await self.find('users', query, tool_context)
+            return {'users': users, 'count': len(users)}
+
+        async def find_conversations(query: str, tool_context) -> dict:
+            """Look up conversations in the local Carbon Voice directory, without an API round trip.
+
+            Args:
+              query: A conversation ID or the start of its name (or of any word in it).
+
+            Returns:
+              The matching conversations with their members.
+            """
+            conversations = await self.find('conversations', query, tool_context)
+            return {'conversations': conversations, 'count': len(conversations)}
+
+        async def find_folders(query: str, tool_context) -> dict:
+            """Look up folders in the local Carbon Voice directory, without an API round trip.
+
+            Args:
+              query: A folder ID or the start of its name (or of any word in it).
+
+            Returns:
+              The matching folders.
+            """
+            folders = await self.find('folders', query, tool_context)
+            return {'folders': folders, 'count': len(folders)}
+
+        return [FunctionTool(find_users), FunctionTool(find_conversations), FunctionTool(find_folders)]
+
+    def metrics(self):
+        lookups = self.stats['lookups']
+        return {
+            **{name: self.stats[name] for name in (
+                'lookups', 'hits', 'misses', 'syncs', 'sync_failures', 'stale_served', 'miss_refreshes',
+                'invalidations', 'upserts', 'upstream_calls',
+            )},
+            'hit_rate': self.stats['hits'] / lookups if lookups else 0.0,
+            'indexed': {scope: index.size() for scope, index in self._indexes.items()},
+        }
+
+
+def create_directory(toolset, prefix='CARBON_VOICE_DIRECTORY'):
+    """CarbonVoiceDirectory over `toolset` configured from `<prefix>_*` environment variables.
+
+    Returns None when `<prefix>_ENABLED` is false.
+    """
+    if os.getenv(f'{prefix}_ENABLED', 'true').lower() == 'false':
+        return None
+    return CarbonVoiceDirectory(
+        toolset,
+        ttl=float(os.getenv(f'{prefix}_TTL', '300')),
+        miss_refresh_interval=float(os.getenv(f'{prefix}_MISS_REFRESH', '30')),
+        max_results=int(os.getenv(f'{prefix}_MAX_RESULTS', '10')),
+    )
@@ -0,0 +1,253 @@
+import asyncio
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+
+from google.adk.agents import LlmAgent
+from google.adk.agents.run_config import RunConfig
+from google.adk.apps import App
+from google.adk.memory import InMemoryMemoryService
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.adk.tools import BaseTool
+from google.genai import types
+
+from .registry import LazySubAgent
+from .streaming import current_streaming_mode, publish
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SubTask:
+    """One branch of a fanned-out request"""
+
+    id: str
+    agent: str
+    request: str
+    depends_on: list = field(default_factory=list)
+
+
+@dataclass
+class BranchResult:
+    id: str
+    agent: str
+    status: str  # 'ok', 'error', 'timeout', 'skipped' or 'cancelled'
+    output: str = ''
+    elapsed_ms: float = 0.0
+
+
+def parse_subtasks(raw_subtasks):
+    """Validate the planner's sub-tasks and return them as SubTask objects"""
+    if not isinstance(raw_subtasks, list):
+        raise ValueError('subtasks must be a list of objects')
+    subtasks = []
+    for i, raw in enumerate(raw_subtasks):
+        if not isinstance(raw, dict):
+            raise ValueError(f'Sub-task {i + 1} must be an object with "agent" and "request", not {raw!r}')
+        missing = [key for key in ('agent', 'request') if not raw.get(key)]
+        if missing:
+            raise ValueError(f'Sub-task {i + 1} is missing {" and ".join(missing)}')
+        subtasks.append(SubTask(
+            id=str(raw.get('id') or f'task{i + 1}'),
+            agent=raw['agent'],
+            request=raw['request'],
+            depends_on=[str(dep) for dep in raw.get('depends_on') or []],
+        ))
+
+    ids = {task.id for task in subtasks}
+    if len(ids) != len(subtasks):
+        raise ValueError('Sub-task ids must be unique')
+    for task in subtasks:
+        unknown = set(task.depends_on) - ids
+        if unknown:
+            raise ValueError(f'Sub-task {task.id} depends on unknown tasks: {sorted(unknown)}')
+
+    # Reject cycles, which would otherwise wait forever
+    resolved = set()
+    pending = list(subtasks)
+    while pending:
+        ready = [task for task in pending if set(task.depends_on) <= resolved]
+        if not ready:
+            raise ValueError(f'Sub-task dependencies form a cycle: {sorted(t.id for t in pending)}')
+        resolved.update(task.id for task in ready)
+        pending = [task for task in pending if task.id not in resolved]
+    return subtasks
+
+
+class FanOutExecutor:
+    """Runs sub-tasks on sub-agents concurrently, in dependency order.
+
+    Each branch runs a detached copy of its sub-agent (no transfers back to
+    the orchestrator) in its own in-memory session, under its own timeout.
+    Branches whose dependencies failed are skipped; cancelling `execute`
+    cancels every branch still running.
+    """
+
+    def __init__(self, root_agent, branch_timeout=120.0):
+        self.root_agent = root_agent
+        self.branch_timeout = branch_timeout
+        self._detached = {}
+
+    def _detached_agent(self, name):
+        agent = self.root_agent.find_sub_agent(name)
+        if agent is None:
+            raise ValueError(f'Unknown agent: {name}')
+        if isinstance(agent, LazySubAgent):
+            agent = agent.materialize()
+        cached = self._detached.get(name)
+        if cached is None or cached[0] is not agent:
+            update = {'sub_agents': []}
+            if isinstance(agent, LlmAgent):
+                update.update(disallow_transfer_to_parent=True, disallow_transfer_to_peers=True)
+            cached = (agent, agent.clone(update=update))
+            self._detached[name] = cached
+        return cached[1]
+
+    async def _run_branch(self, task, request, user_id, credential_service, state, plugins):
+        agent = self._detached_agent(task.agent)
+        runner = Runner(
+            app=App(name=agent.name, root_agent=agent, plugins=list(plugins)),
+            session_service=InMemorySessionService(),
+            memory_service=InMemoryMemoryService(),
+            credential_service=credential_service,
+        )
+        session = await runner.session_service.create_session(
+            app_name=agent.name, user_id=user_id, state=dict(state)
+        )
+        last_content = None
+        async for event in runner.run_async(
+            user_id=user_id,
+            session_id=session.id,
+            new_message=types.Content(role='user', parts=[types.Part.from_text(text=request)]),
+            # Branches stream too when the orchestrator's caller is streaming
+            run_config=RunConfig(streaming_mode=current_streaming_mode()),
+        ):
+            await publish(event, branch=task.id)
+            if event.content and event.author == agent.name and not event.partial:
+                last_content = event.content
+        if not last_content:
+            return ''
+        return '\n'.join(part.text for part in last_content.parts if part.text)
+
+    async def execute(self, subtasks, user_id='user', credential_service=None, state=None, plugins=()):
+        """Run every sub-task and return BranchResults in the planner's order"""
+        state = state or {}
+        futures = {task.id: asyncio.get_running_loop().create_future() for task in subtasks}
+
+        async def run(task):
+            start = time.perf_counter()
+            result = BranchResult(task.id, task.agent, 'ok')
+            try:
+                dependencies = [await futures[dep] for dep in task.depends_on]
+                failed = [dep.id for dep in dependencies if dep.status != 'ok']
+                if failed:
+                    result.status = 'skipped'
+                    result.output = f'Skipped because {", ".join(failed)} did not complete'
+                    return result
+
+                request = task.request
+                if dependencies:
+                    context = '\n\n'.join(f'[{dep.id} from {dep.agent}]\n{dep.output}' for dep in dependencies)
+                    request = f'{request}\n\nResults from earlier steps:\n{context}'
+                result.output = await asyncio.wait_for(
+                    self._run_branch(task, request, user_id, credential_service, state, plugins),
+                    timeout=self.branch_timeout,
+                )
+            except asyncio.TimeoutError:
+                result.status = 'timeout'
+                result.output = f'Timed out after {self.branch_timeout:g}s'
+            except asyncio.CancelledError:
+                result.status = 'cancelled'
+                raise
+            except Exception as e:
+                logger.warning('Sub-task %s on %s failed: %s', task.id, task.agent, e)
+                result.status = 'error'
+                result.output = str(e)
+            finally:
+                result.elapsed_ms = (time.perf_counter() - start) * 1000
+                if not futures[task.id].done():
+                    futures[task.id].set_result(result)
+            return result
+
+        tasks = [asyncio.create_task(run(task)) for task in subtasks]
+        try:
+            return await asyncio.gather(*tasks)
+        finally:
+            for pending in tasks:
+                if not pending.done():
+                    pending.cancel()
+
+
+class FanOutTool(BaseTool):
+    """Lets the orchestrator run independent sub-tasks on sub-agents in parallel"""
+
+    def __init__(self, root_agent=None, branch_timeout=None):
+        super().__init__(
+            name='run_parallel_subtasks',
+            description=(
+                'Run several sub-tasks on specialized sub-agents at the same time and '
+                'return all of their results. Use it for requests that span several '
+                'domains. Sub-tasks without depends_on run concurrently; list a '
+                "sub-task's id in depends_on only when its output is needed."
+            ),
+        )
+        self.root_agent = root_agent
+        self.branch_timeout = branch_timeout or float(os.getenv('FAN_OUT_BRANCH_TIMEOUT', '120'))
+        self._executor = None
+
+    def _get_declaration(self):
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    'subtasks': types.Schema(
+                        type=types.Type.ARRAY,
+                        items=types.Schema(
+                            type=types.Type.OBJECT,
+                            properties={
+                                'id': types.Schema(type=types.Type.STRING, description='Short unique id, e.g. "research"'),
+                                'agent': types.Schema(type=types.Type.STRING, description='Name of the sub-agent to run'),
+                                'request': types.Schema(type=types.Type.STRING, description='Self-contained instruction for the sub-agent'),
+                                'depends_on': types.Schema(
+                                    type=types.Type.ARRAY,
+                                    items=types.Schema(type=types.Type.STRING),
+                                    description='Ids of sub-tasks whose results this one needs',
+                                ),
+                            },
+                            required=['id', 'agent', 'request'],
+                        ),
+                    ),
+                },
+                required=['subtasks'],
+            ),
+        )
+
+    async def run_async(self, *, args, tool_context):
+        invocation_context = tool_context._invocation_context
+        if self._executor is None:
+            root_agent = self.root_agent or invocation_context.agent.root_agent
+            self._executor = FanOutExecutor(root_agent, branch_timeout=self.branch_timeout)
+        try:
+            subtasks = parse_subtasks(args.get('subtasks') or [])
+        except (KeyError, ValueError) as e:
+            return {'error': f'Invalid sub-task plan: {e}'}
+
+        state = {k: v for k, v in tool_context.state.to_dict().items() if not k.startswith('_adk')}
+        start = time.perf_counter()
+        results = await self._executor.execute(
+            subtasks,
+            user_id=invocation_context.user_id,
+            credential_service=invocation_context.credential_service,
+            state=state,
+            # Branches get the same plugins (e.g. tracing) as the orchestrator
+            plugins=invocation_context.plugin_manager.plugins,
+        )
+        return {
+            'results': [result.__dict__ for result in results],
+            'wall_time_ms': round((time.perf_counter() - start) * 1000),
+            'sum_of_branches_ms': round(sum(result.elapsed_ms for result in results)),
+        }
@@ -1,51 +1,129 @@
 import os
 from dotenv import load_dotenv
 from google.adk.agents import Agent
-from google.adk.tools.mcp_tool import McpToolset
 from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPServerParams
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Get GitHub token from environment variable
-GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
-if not GITHUB_TOKEN:
-    raise ValueError("GITHUB_TOKEN environment variable is required. Please add it to your .env file.")
-
-# Create GitHub agent with MCP tools
-github_agent = Agent(
-    model='gemini-2.5-flash',
-    name='github_agent',
-    description='A GitHub assistant powered by MCP tools for repository management, issues, and pull requests.',
-    instruction='''You are a helpful GitHub assistant that can help users with:
-
-    Repository Management:
-    - Browse and query code files across repositories you have access to
-    - Search files and analyze code patterns
-    - Understand project structure and dependencies
-
-    Issue & PR Management:
-    - Create, update, and manage issues and pull requests
-    - Help triage bugs and review code changes
-    - Maintain project boards and track progress
-
-    Code Analysis:
-    - Examine security findings and Dependabot alerts
-    - Analyze code patterns and provide insights
-    - Review code changes and suggest improvements
-
-    Always be helpful, accurate, and provide clear explanations of your actions.
-    When using tools, explain what you're doing and why.''',
-    tools=[
-        McpToolset(
-            connection_params=StreamableHTTPServerParams(
-                url="https://api.githubcopilot.com/mcp/",
-                headers={
-                    "Authorization": f"Bearer {GITHUB_TOKEN}",
-                    "X-MCP-Toolsets": "repos,issues,pull_requests,code_security,dependabot,discussions,projects,labels,notifications,users,orgs,stargazers",
-                    "X-MCP-Readonly": "false"
-                },
+from .model_cascade import cascade_model
+from .result_compaction import create_result_compactor
+from .tool_result_cache import CachedResultsHttpMcpToolset, create_tool_result_cache
+from .tool_selection import create_tool_selector
+
+# Cache lifetime in seconds for read-only GitHub tools; first match wins and
+# unlisted tools use GITHUB_TOOL_CACHE_TTL (default 60). Writes made through
+# this agent invalidate affected entries right away, so TTLs only bound how
+# long changes made elsewhere take to show up.
+GITHUB_TOOL_TTLS = {
+    'get_me': 3600,
+    'list_notifications': 15,
+    'get_file_contents': 300,
+    'get_pull_request_diff': 300,
+    'get_commit': 3600,
+    'list_*alerts': 300,
+    'search_*': 60,
+}
+
+# Words users say for what GitHub tools call something else; applied to both
+# requests and tool descriptions before tool selection
+GITHUB_TOOL_SYNONYMS = {
+    'pr': 'pull request',
+    'prs': 'pull requests',
+    'repo': 'repository',
+    'repos': 'repository',
+    'repositories': 'repository',
+    'readme': 'file contents readme',
+    'file': 'file contents',
+    'contain': 'file contents',
+    'defined': 'code',
+    'bug': 'issue',
+    'bugs': 'issues',
+    'ticket': 'issue',
+    'tickets': 'issues',
+    'close': 'update state close',
+    'reopen': 'update state reopen',
+    'approve': 'submit review approve',
+    'ci': 'workflow run job',
+    'build': 'workflow run',
+    'vulnerable': 'dependabot security alerts',
+    'vulnerabilities': 'dependabot security alerts',
+    'cves': 'dependabot security advisories',
+    'secrets': 'secret scanning alerts',
+    'starred': 'star starred',
+    'unread': 'notifications unread',
+    'logged': 'authenticated user',
+    'trigger': 'run workflow',
+}
+
+
+def create_github_agent():
+    """Build the GitHub agent and its MCP toolset"""
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Get GitHub token from environment variable
+    GITHUB_TOKEN = os.getenv('GITHUB_TOKEN')
+    if not GITHUB_TOKEN:
+        raise ValueError("GITHUB_TOKEN environment variable is required. Please add it to your .env file.")
+
+    # Only the tools relevant to each request are declared to the model
+    tool_selector = create_tool_selector('GITHUB_TOOL_SELECTION', synonyms=GITHUB_TOOL_SYNONYMS)
+    # Large results (diffs, file contents, alert lists) are summarized and paged
+    compactor = create_result_compactor('TOOL_RESULT_COMPACTION')
+
+    # Create GitHub agent with MCP tools
+    return Agent(
+        model=cascade_model('github_agent', 'gemini-2.5-flash'),
+        name='github_agent',
+        description='A GitHub assistant powered by MCP tools for repository management, issues, and pull requests.',
+        instruction='''You are a helpful GitHub assistant that can help users with:
+
+        Repository Management:
+        - Browse and query code files across repositories you have access to
+        - Search files and analyze code patterns
+        - Understand project structure and dependencies
+
+        Issue & PR Management:
+        - Create, update, and manage issues and pull requests
+        - Help triage bugs and review code changes
+        - Maintain project boards and track progress
+
+        Code Analysis:
+        - Examine security findings and Dependabot alerts
+        - Analyze code patterns and provide insights
+        - Review code changes and suggest improvements
+
+        Always be helpful, accurate, and provide clear explanations of your actions.
+        When using tools, explain what you're doing and why.''',
+        before_model_callback=[
+            callback for callback in (
+                tool_selector.before_model_callback if tool_selector else None,
+                compactor.before_model_callback if compactor else None,
+            ) if callback
+        ] or None,
+        after_tool_callback=compactor.after_tool_callback if compactor else None,
+        tools=[
+            # Connections to the MCP host are shared across sessions and tool
+            # calls; read-only calls are cached and coalesced
+            CachedResultsHttpMcpToolset(
+                result_cache=create_tool_result_cache('GITHUB_TOOL_CACHE', ttls=GITHUB_TOOL_TTLS),
+                connection_params=StreamableHTTPServerParams(
+                    url=os.getenv('GITHUB_MCP_URL', "https://api.githubcopilot.com/mcp/"),
+                    headers={
+                        "Authorization": f"Bearer {GITHUB_TOKEN}",
+                        "X-MCP-Toolsets": "repos,issues,pull_requests,code_security,dependabot,discussions,projects,labels,notifications,users,orgs,stargazers",
+                        "X-MCP-Readonly": "false"
+                    },
+                ),
             ),
-        )
-    ],
-)
+            *([compactor.read_tool] if compactor else []),
+        ],
+    )
+
+
+def __getattr__(name):
+    # Keep `from .github_agent import github_agent` working; the agent is only
+    # built the first time it is asked for.
+    global github_agent
+    if name == 'github_agent':
+        github_agent = create_github_agent()
+        return github_agent
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,340 @@
+import asyncio
+import importlib.util
+import json
+import logging
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+import anyio
+import httpx
+from google.adk.tools.mcp_tool import McpToolset
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager
+from google.adk.tools.mcp_tool.mcp_session_manager import StreamableHTTPConnectionParams
+from mcp.client.streamable_http import streamable_http_client
+
+from .mcp_pool import _CountingClientSession
+from .tool_catalog import CachedCatalogMixin
+from .tool_catalog import record_server_version
+
+logger = logging.getLogger(__name__)
+
+# HTTP/2 needs the optional `h2` package; without it we fall back to HTTP/1.1
+# keep-alive, which still reuses connections across sessions.
+HTTP2_AVAILABLE = importlib.util.find_spec('h2') is not None
+
+
+@dataclass
+class HostPoolSettings:
+    """Connection limits and keep-alive tuning for one upstream host"""
+
+    max_connections: int = field(default_factory=lambda: int(os.getenv('MCP_HTTP_MAX_CONNECTIONS', '20')))
+    max_keepalive_connections: int = field(default_factory=lambda: int(os.getenv('MCP_HTTP_MAX_KEEPALIVE', '10')))
+    keepalive_expiry: float = field(default_factory=lambda: float(os.getenv('MCP_HTTP_KEEPALIVE_EXPIRY', '120')))
+    http2: bool = HTTP2_AVAILABLE
+
+
+class _HostTransport(httpx.AsyncBaseTransport):
+    """Shared connection pool for one host, with request metrics.
+
+    Every MCP session to the host gets its own lightweight httpx.AsyncClient
+    (for its headers and timeouts) on top of this transport, so TCP/TLS
+    connections outlive sessions. Closing a client does not close the pool.
+    """
+
+    def __init__(self, host, settings):
+        self.host = host
+        self.settings = settings
+        self.loop = asyncio.get_running_loop()
+        self._transport = httpx.AsyncHTTPTransport(
+            http2=settings.http2,
+            limits=httpx.Limits(
+                max_connections=settings.max_connections,
+                max_keepalive_connections=settings.max_keepalive_connections,
+                keepalive_expiry=settings.keepalive_expiry,
+            ),
+        )
+        self.requests = 0
+        self.in_flight = 0
+        self.errors = 0
+        self.status_counts = {}
+        self._latencies = deque(maxlen=1000)
+
+    async def handle_async_request(self, request):
+        self.requests += 1
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            response = await self._transport.handle_async_request(request)
+        except Exception:
+            self.errors += 1
+            raise
+        finally:
+            self.in_flight -= 1
+        # Time to response headers; streamed bodies are read by the caller
+        self._latencies.append(time.perf_counter() - start)
+        status_class = f'{response.status_code // 100}xx'
+        self.status_counts[status_class] = self.status_counts.get(status_class, 0) + 1
+        if response.status_code in (401, 403, 429, 503) and request.method == 'POST':
+            return await self._jsonrpc_error(request, response)
+        return response
+
+    async def _jsonrpc_error(self, request, response):
+        """Answer a rejected or rate-limited JSON-RPC request with a JSON-RPC error.
+
+        The MCP client raises on a non-2xx answer inside its transport task,
+        which leaves the call waiting for the read timeout; a JSON-RPC error
+        for the request's id fails it promptly. The error data keeps the HTTP
+        status, Retry-After and WWW-Authenticate: admission control retries
+        429/503 and pauses the server for its Retry-After, and 401/403 are
+        not retried (see admission.error_status).
+        """
+        try:
+            message = json.loads(request.content)
+        except ValueError:
+            return response
+        if not isinstance(message, dict) or 'id' not in message:
+            return response
+        await response.aclose()
+        return httpx.Response(200, request=request, json={
+            'jsonrpc': '2.0',
+            'id': message['id'],
+            'error': {
+                'code': -32000,
+                'message': f'HTTP {response.status_code} from {self.host}',
+                'data': {
+                    'status': response.status_code,
+                    'retry_after': response.headers.get('retry-after'),
+                    'www_authenticate': response.headers.get('www-authenticate'),
+                },
+            },
+        })
+
+    async def aclose(self):
+        # Sessions close their clients; the shared pool stays open
+        pass
+
+    async def shutdown(self):
+        await self._transport.aclose()
+
+    def metrics(self):
+        connections = self._transport._pool.connections
+        latencies = sorted(self._latencies)
+
+        def percentile(p):
+            if not latencies:
+                return None
+            return latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000
+
+        return {
+            'host': self.host,
+            'http2': self.settings.http2,
+            'requests': self.requests,
+            'in_flight': self.in_flight,
+            'errors': self.errors,
+            'status_counts': dict(self.status_counts),
+            'open_connections': len(connections),
+            'idle_connections': sum(1 for c in connections if c.is_idle()),
+            'latency_ms_p50': percentile(0.50),
+            'latency_ms_p95': percentile(0.95),
+        }
+
+
+# Process-wide transports keyed by (scheme, host, port)
+_transports = {}
+_host_settings = {}
+
+
+def _host_key(url):
+    parts = urlsplit(url)
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    return f'{parts.scheme}://{parts.hostname}:{port}'
+
+
+def configure_host(url, **settings):
+    """Override pool settings for the host of `url` before it is first used"""
+    _host_settings[_host_key(url)] = HostPoolSettings(**settings)
+
+
+def get_transport(url):
+    """Return the shared transport for the host of `url`, creating it if needed"""
+    key = _host_key(url)
+    transport = _transports.get(key)
+    if transport is None or transport.loop is not asyncio.get_running_loop():
+        transport = _HostTransport(key, _host_settings.get(key, HostPoolSettings()))
+        _transports[key] = transport
+    return transport
+
+
+def pool_metrics():
+    """Metrics for every shared host pool, keyed by host"""
+    return {key: transport.metrics() for key, transport in _transports.items()}
+
+
+async def close_all_transports():
+    """Close every shared connection pool (call on application shutdown)"""
+    transports = list(_transports.values())
+    _transports.clear()
+    for transport in transports:
+        if transport.loop is asyncio.get_running_loop():
+            await transport.shutdown()
+
+
+async def _relay(source, destination):
+    async with destination:
+        async for message in source:
+            await destination.send(message)
+
+
+class _HTTPSession:
+    """One StreamableHTTP MCP session on the shared host pool.
+
+    The client session, and the httpx client with the streamable HTTP
+    transport, are each entered and exited by a dedicated task, because anyio
+    requires both to happen in the same task and ADK closes sessions from
+    whichever task closes the toolset. `stop` lets in-flight requests finish
+    for up to the connection timeout before closing the transport.
+    """
+
+    def __init__(self, params, headers, http_auth):
+        self.session = None
+        self._params = params
+        self._headers = headers
+        self._http_auth = http_auth
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = None
+
+    @property
+    def is_alive(self):
+        return self.session is not None and not self.session.broken and not self._task.done()
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=self._params.timeout)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise ConnectionError(f'MCP session to {self._params.url} did not start within {self._params.timeout}s')
+        if self._error is not None:
+            await self.stop()
+            raise ConnectionError(f'Failed to create MCP session: {self._error}') from self._error
+
+    async def _run(self):
+        # The session talks to the transport through relay streams, so closing
+        # the transport, or losing it, ends the session's read stream while the
+        # session is still up; it then fails the requests still waiting for a
+        # response instead of leaving them hanging
+        to_session, session_read = anyio.create_memory_object_stream()
+        session_write, from_session = anyio.create_memory_object_stream()
+        try:
+            async with _CountingClientSession(session_read, session_write) as session:
+                connection = asyncio.create_task(self._connect(to_session, from_session))
+                try:
+                    result = await session.initialize()
+                    record_server_version(self._params, result.serverInfo.version)
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+                    with anyio.move_on_after(self._params.timeout):
+                        while session.in_flight and not connection.done():
+                            await anyio.sleep(0.01)
+                finally:
+                    await session_write.aclose()
+                    await connection
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    async def _connect(self, to_session, from_session):
+        params = self._params
+        try:
+            async with to_session, from_session:
+                # Same defaults as mcp's create_mcp_http_client, on the shared pool
+                http_client = httpx.AsyncClient(
+                    transport=get_transport(params.url),
+                    headers=self._headers,
+                    auth=self._http_auth,
+                    timeout=httpx.Timeout(params.timeout, read=params.sse_read_timeout),
+                    follow_redirects=True,
+                )
+                async with http_client:
+                    async with streamable_http_client(
+                        params.url,
+                        http_client=http_client,
+                        terminate_on_close=params.terminate_on_close,
+                    ) as (read, write, *_):
+                        async with anyio.create_task_group() as tg:
+                            tg.start_soon(_relay, from_session, write)
+                            await _relay(read, to_session)
+        except Exception as e:
+            if not self._stop.is_set():
+                logger.warning('MCP session to %s closed: %s', params.url, e)
+        finally:
+            self._stop.set()
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=self._params.timeout + 5)
+            except Exception as e:
+                logger.warning('Error while closing MCP session to %s: %s', self._params.url, e)
+
+
+class PooledHTTPSessionManager(MCPSessionManager):
+    """Session manager whose StreamableHTTP sessions share per-host connections.
+
+    Sessions are keyed by their merged headers, like MCPSessionManager's,
+    and each is owned by its own task (see _HTTPSession). `http_auth` (an
+    httpx.Auth) runs on every request, for credentials that change more
+    often than the sessions keyed by their headers.
+    """
+
+    def __init__(self, connection_params, http_auth=None, **kwargs):
+        super().__init__(connection_params=connection_params, **kwargs)
+        self._http_auth = http_auth
+        self._http_sessions = {}
+        if not isinstance(self._connection_params, StreamableHTTPConnectionParams):
+            raise ValueError('PooledHTTPSessionManager only supports StreamableHTTP MCP servers')
+
+    async def create_session(self, headers=None):
+        merged_headers = self._merge_headers(headers)
+        session_key = self._generate_session_key(merged_headers)
+        async with self._session_lock:
+            http_session = self._http_sessions.get(session_key)
+            if http_session is not None:
+                if http_session.is_alive:
+                    return http_session.session
+                logger.info('Replacing disconnected MCP session: %s', session_key)
+                del self._http_sessions[session_key]
+                await http_session.stop()
+            http_session = _HTTPSession(self._connection_params, merged_headers, self._http_auth)
+            await http_session.start()
+            self._http_sessions[session_key] = http_session
+            return http_session.session
+
+    async def close(self):
+        async with self._session_lock:
+            http_sessions, self._http_sessions = list(self._http_sessions.values()), {}
+        await asyncio.gather(*(http_session.stop() for http_session in http_sessions))
+
+
+class PooledHttpMcpToolset(CachedCatalogMixin, McpToolset):
+    """McpToolset whose StreamableHTTP transport uses the shared host pools.
+
+    The tool list is served from the shared catalog cache (tool_catalog.py).
+    `http_auth` is passed to every request's httpx client.
+    """
+
+    def __init__(self, *, connection_params, http_auth=None, **kwargs):
+        super().__init__(connection_params=connection_params, **kwargs)
+        self._mcp_session_manager = PooledHTTPSessionManager(
+            connection_params=self._connection_params,
+            http_auth=http_auth,
+            errlog=self._errlog,
+        )
@@ -0,0 +1,349 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sys
+import time
+from datetime import timedelta
+
+import anyio
+from google.adk.tools.mcp_tool import McpToolset
+from google.adk.tools.mcp_tool.mcp_session_manager import MCPSessionManager
+from google.adk.tools.mcp_tool.mcp_session_manager import StdioConnectionParams
+from mcp import ClientSession
+from mcp import StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.shared.exceptions import McpError
+from mcp.types import CONNECTION_CLOSED
+
+from .tool_catalog import CachedCatalogMixin
+from .tool_catalog import record_server_version
+
+logger = logging.getLogger(__name__)
+
+
+class _CountingClientSession(ClientSession):
+    """ClientSession that tracks in-flight requests and connection failures"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.in_flight = 0
+        self.last_used = time.monotonic()
+        self.broken = False
+
+    async def send_request(self, *args, **kwargs):
+        self.in_flight += 1
+        try:
+            return await super().send_request(*args, **kwargs)
+        except (anyio.ClosedResourceError, anyio.BrokenResourceError, anyio.EndOfStream):
+            self.broken = True
+            raise
+        except McpError as e:
+            if e.error.code == CONNECTION_CLOSED:
+                self.broken = True
+            raise
+        finally:
+            self.in_flight -= 1
+            self.last_used = time.monotonic()
+
+
+class _PooledServer:
+    """One warm MCP server process.
+
+    The stdio transport and client session are entered and exited by a
+    dedicated task, because anyio requires both to happen in the same task and
+    the callers that borrow the session come and go.
+    """
+
+    def __init__(self, server_params, read_timeout, errlog):
+        self.session = None
+        self._server_params = server_params
+        self._read_timeout = read_timeout
+        self._errlog = errlog
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._error = None
+        self._task = None
+
+    @property
+    def in_flight(self):
+        return self.session.in_flight if self.session else 0
+
+    @property
+    def is_alive(self):
+        # A dead process shows up as a broken session once a request or the
+        # health check's ping fails on it
+        return self.session is not None and not self.session.broken and not self._task.done()
+
+    async def start(self, timeout):
+        self._task = asyncio.create_task(self._run())
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            await self.stop()
+            raise ConnectionError(f'MCP server did not start within {timeout}s')
+        if self._error is not None:
+            await self.stop()
+            raise ConnectionError(f'MCP server failed to start: {self._error}') from self._error
+
+    async def _run(self):
+        try:
+            async with stdio_client(self._server_params, errlog=self._errlog) as (read, write):
+                async with _CountingClientSession(
+                    read, write, read_timeout_seconds=timedelta(seconds=self._read_timeout)
+                ) as session:
+                    result = await session.initialize()
+                    record_server_version(self._server_params, result.serverInfo.version)
+                    self.session = session
+                    self._ready.set()
+                    await self._stop.wait()
+        except Exception as e:
+            self._error = e
+        finally:
+            self._ready.set()
+
+    async def ping(self, timeout):
+        # A health check is not real use, so it must not reset the idle clock
+        last_used = self.session.last_used
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout=timeout)
+            return True
+        except Exception as e:
+            logger.info('MCP server failed health check: %s', e)
+            return False
+        finally:
+            self.session.last_used = last_used
+
+    async def stop(self):
+        self._stop.set()
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, timeout=5)
+            except Exception as e:
+                logger.warning('Error while stopping MCP server: %s', e)
+
+
+class StdioServerPool:
+    """Pool of warm stdio MCP server processes shared across sessions.
+
+    Callers borrow the ClientSession of the least-loaded server. When every
+    server is busy and the pool is below `max_size`, another process is started
+    in the background. A maintenance task pings idle servers, replaces the ones
+    that crashed or stopped answering and stops servers idle for longer than
+    `idle_timeout` while keeping `min_size` warm.
+    """
+
+    def __init__(
+        self,
+        server_params,
+        min_size=1,
+        max_size=4,
+        idle_timeout=300.0,
+        health_check_interval=30.0,
+        startup_timeout=60.0,
+        read_timeout=5.0,
+        errlog=sys.stderr,
+    ):
+        if max_size < 1 or min_size > max_size:
+            raise ValueError('Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1')
+        self.server_params = server_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.health_check_interval = health_check_interval
+        self.startup_timeout = startup_timeout
+        self.read_timeout = read_timeout
+        self.errlog = errlog
+        self.loop = asyncio.get_running_loop()
+        self.stats = {'spawned': 0, 'restarted': 0, 'evicted': 0, 'acquired': 0}
+        self._servers = []
+        self._starting = 0
+        self._lock = asyncio.Lock()
+        self._maintenance_task = None
+        self._background = set()
+        self._closed = False
+
+    @property
+    def size(self):
+        return len(self._servers)
+
+    async def acquire(self):
+        """Return the ClientSession of the least-loaded healthy server"""
+        if self._closed:
+            raise ConnectionError('MCP server pool is closed')
+        if self._maintenance_task is None:
+            self._maintenance_task = asyncio.create_task(self._maintain())
+
+        async with self._lock:
+            self._drop_dead()
+            while not self._servers or len(self._servers) < self.min_size:
+                self._servers.append(await self._spawn())
+            server = min(self._servers, key=lambda s: s.in_flight)
+            if server.in_flight > 0 and len(self._servers) + self._starting < self.max_size:
+                self._starting += 1
+                self._run_in_background(self._grow())
+            self.stats['acquired'] += 1
+            return server.session
+
+    async def _spawn(self):
+        server = _PooledServer(self.server_params, self.read_timeout, self.errlog)
+        await server.start(self.startup_timeout)
+        self.stats['spawned'] += 1
+        return server
+
+    async def _grow(self):
+        try:
+            server = await self._spawn()
+        except Exception as e:
+            logger.warning('Could not grow MCP server pool: %s', e)
+            return
+        finally:
+            self._starting -= 1
+        async with self._lock:
+            if self._closed:
+                self._run_in_background(server.stop())
+            else:
+                self._servers.append(server)
+
+    def _drop_dead(self):
+        for server in [s for s in self._servers if not s.is_alive]:
+            logger.info('Replacing crashed MCP server')
+            self._servers.remove(server)
+            self.stats['restarted'] += 1
+            self._run_in_background(server.stop())
+
+    def _run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _maintain(self):
+        while not self._closed:
+            await asyncio.sleep(self.health_check_interval)
+            try:
+                await self.check_health()
+            except Exception as e:
+                logger.warning('MCP server pool maintenance failed: %s', e)
+
+    async def check_health(self):
+        """Ping idle servers, replace dead ones and evict the long-idle ones"""
+        idle = [s for s in self._servers if s.is_alive and s.in_flight == 0]
+        results = await asyncio.gather(*(s.ping(self.read_timeout) for s in idle))
+        for server, healthy in zip(idle, results):
+            if not healthy:
+                server.session.broken = True
+
+        now = time.monotonic()
+        async with self._lock:
+            self._drop_dead()
+            for server in list(self._servers):
+                if len(self._servers) <= self.min_size:
+                    break
+                if server.in_flight == 0 and now - server.session.last_used > self.idle_timeout:
+                    self._servers.remove(server)
+                    self.stats['evicted'] += 1
+                    self._run_in_background(server.stop())
+            while len(self._servers) < self.min_size:
+                self._servers.append(await self._spawn())
+
+    async def close(self):
+        self._closed = True
+        if self._maintenance_task is not None:
+            self._maintenance_task.cancel()
+        async with self._lock:
+            servers, self._servers = self._servers, []
+        await asyncio.gather(*(s.stop() for s in servers))
+        await asyncio.gather(*self._background, return_exceptions=True)
+
+
+# Process-wide pools keyed by the server command line and environment
+_pools = {}
+
+
+def _server_key(server_params):
+    params = server_params.model_dump(mode='json')
+    return hashlib.md5(json.dumps(params, sort_keys=True).encode()).hexdigest()
+
+
+def get_stdio_pool(server_params, **pool_options):
+    """Return the shared pool for `server_params`, creating it if needed.
+
+    Must be called from the event loop that will use the pool.
+    """
+    key = _server_key(server_params)
+    pool = _pools.get(key)
+    if pool is None or pool.loop is not asyncio.get_running_loop() or pool._closed:
+        pool = StdioServerPool(server_params, **pool_options)
+        _pools[key] = pool
+    return pool
+
+
+async def close_all_pools():
+    """Stop every pooled server process (call on application shutdown)"""
+    pools = list(_pools.values())
+    _pools.clear()
+    for pool in pools:
+        if pool.loop is asyncio.get_running_loop():
+            await pool.close()
+
+
+class PooledMCPSessionManager(MCPSessionManager):
+    """Session manager that borrows sessions from the process-wide stdio pool"""
+
+    def __init__(self, connection_params, errlog=sys.stderr, **pool_options):
+        super().__init__(connection_params=connection_params, errlog=errlog)
+        if not isinstance(self._connection_params, StdioConnectionParams):
+            raise ValueError('PooledMCPSessionManager only supports stdio MCP servers')
+        self._pool_options = pool_options
+
+    @property
+    def pool(self):
+        return get_stdio_pool(
+            self._connection_params.server_params,
+            read_timeout=self._connection_params.timeout,
+            errlog=self._errlog,
+            **self._pool_options,
+        )
+
+    async def create_session(self, headers=None):
+        try:
+            return await self.pool.acquire()
+        except ConnectionError:
+            raise
+        except Exception as e:
+            raise ConnectionError(f'Failed to create MCP session: {e}') from e
+
+    async def close(self):
+        # Pooled servers outlive any single toolset; see close_all_pools()
+        pass
+
+
+class PooledMcpToolset(CachedCatalogMixin, McpToolset):
+    """McpToolset whose stdio server processes come from a shared warm pool.
+
+    The tool list is served from the shared catalog cache (tool_catalog.py).
+    """
+
+    def __init__(
+        self,
+        *,
+        connection_params,
+        pool_min_size=1,
+        pool_max_size=4,
+        pool_idle_timeout=300.0,
+        pool_health_check_interval=30.0,
+        pool_startup_timeout=60.0,
+        **kwargs,
+    ):
+        if isinstance(connection_params, StdioServerParameters):
+            connection_params = StdioConnectionParams(server_params=connection_params)
+        super().__init__(connection_params=connection_params, **kwargs)
+        self._mcp_session_manager = PooledMCPSessionManager(
+            connection_params=self._connection_params,
+            errlog=self._errlog,
+            min_size=pool_min_size,
+            max_size=pool_max_size,
+            idle_timeout=pool_idle_timeout,
+            health_check_interval=pool_health_check_interval,
+            startup_timeout=pool_startup_timeout,
+        )
@@ -0,0 +1,372 @@
+import logging
+import os
+import re
+import time
+from collections import Counter, defaultdict, deque
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from google.adk.models import BaseLlm, LLMRegistry
+from google.genai import types
+from pydantic import PrivateAttr
+
+from .admission import admitted_model, copy_request
+
+logger = logging.getLogger(__name__)
+
+# USD per million input and output tokens; MODEL_PRICES overrides or extends
+# them, e.g. MODEL_PRICES='gemini-2.5-flash=0.30/2.50,gemini-2.5-pro=1.25/10'
+DEFAULT_PRICES = {
+    'gemini-2.5-flash-lite': (0.10, 0.40),
+    'gemini-2.5-flash': (0.30, 2.50),
+    'gemini-2.5-pro': (1.25, 10.00),
+    'gemini-1.5-flash-8b': (0.0375, 0.15),
+    'gemini-1.5-flash': (0.075, 0.30),
+}
+
+# Finish reasons that mean the answer is cut off or unusable
+FAILED_FINISH_REASONS = frozenset([
+    types.FinishReason.MAX_TOKENS,
+    types.FinishReason.SAFETY,
+    types.FinishReason.RECITATION,
+    types.FinishReason.MALFORMED_FUNCTION_CALL,
+    types.FinishReason.UNEXPECTED_TOOL_CALL,
+    types.FinishReason.OTHER,
+])
+
+# Phrases a model uses when it cannot answer; a stronger model often can
+HEDGE_PATTERN = re.compile(
+    r"\b(i'?m not (sure|certain)|i am not (sure|certain)|i don'?t know|i do not know|"
+    r"i (can ?not|can'?t|am unable to|'m unable to) (determine|answer|help with|find)|"
+    r"(i|i'?m) (couldn'?t|could not|can'?t|cannot) (tell|work out))\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass
+class CascadePolicy:
+    """Models one agent tries, cheapest first, and when to escalate.
+
+    A response from any model but the last is accepted only when it passes
+    validation: no error or failed finish reason, some text or a function
+    call, calls only to declared tools with their required arguments and
+    allowed enum values (so transfers go to real agents), average token
+    log-probability (when the model reports it) of at least
+    `min_avg_logprob`, no hedging when `escalate_on_hedge`, and at least
+    `min_text_chars` characters in a final text answer.
+
+    When streaming, a cheaper model's text is held back until
+    `stream_commit_chars` characters (and `min_text_chars`) have arrived
+    without a hedge, then streamed live and no longer escalated, so time to
+    first token stays close to the cheaper model's.
+    """
+
+    models: tuple
+    min_avg_logprob: Optional[float] = -1.0
+    escalate_on_hedge: bool = True
+    min_text_chars: int = 0
+    stream_commit_chars: int = 200
+
+
+# Routing and lookup turns rarely need more than the light model; market
+# analyses must be substantial to be kept
+DEFAULT_POLICIES = {
+    'root_agent': CascadePolicy(models=('gemini-2.5-flash-lite', 'gemini-2.5-flash')),
+    'github_agent': CascadePolicy(models=('gemini-2.5-flash-lite', 'gemini-2.5-flash')),
+    'carbon_voice_agent': CascadePolicy(models=('gemini-2.5-flash-lite', 'gemini-2.5-flash')),
+    'market_analyzer': CascadePolicy(models=('gemini-1.5-flash', 'gemini-2.5-flash'), min_text_chars=400),
+    'carbon_voice_oauth_agent': CascadePolicy(models=('gemini-1.5-flash', 'gemini-2.5-flash')),
+}
+
+
+def load_policy(agent_name, model):
+    """Cascade policy for `agent_name`, with CASCADE_<AGENT>_* environment overrides.
+
+    Agents without a default policy use `model` alone. Overrides:
+    CASCADE_<AGENT>_MODELS (comma separated, cheapest first),
+    CASCADE_<AGENT>_MIN_AVG_LOGPROB, CASCADE_<AGENT>_ESCALATE_ON_HEDGE,
+    CASCADE_<AGENT>_MIN_TEXT_CHARS and CASCADE_<AGENT>_STREAM_COMMIT_CHARS.
+    """
+    policy = DEFAULT_POLICIES.get(agent_name) or CascadePolicy(models=(model,))
+    prefix = f'CASCADE_{agent_name.upper()}_'
+    overrides = {}
+    if os.getenv(prefix + 'MODELS'):
+        overrides['models'] = tuple(m.strip() for m in os.getenv(prefix + 'MODELS').split(',') if m.strip())
+    if os.getenv(prefix + 'MIN_AVG_LOGPROB'):
+        raw = os.getenv(prefix + 'MIN_AVG_LOGPROB')
+        overrides['min_avg_logprob'] = None if raw.lower() == 'none' else float(raw)
+    if os.getenv(prefix + 'ESCALATE_ON_HEDGE'):
+        overrides['escalate_on_hedge'] = os.getenv(prefix + 'ESCALATE_ON_HEDGE').lower() != 'false'
+    for name in ('min_text_chars', 'stream_commit_chars'):
+        if os.getenv(prefix + name.upper()):
+            overrides[name] = int(os.getenv(prefix + name.upper()))
+    return replace(policy, **overrides)
+
+
+def _declared_parameters(tool):
+    """(required names, {name: allowed enum values}) from a tool's declaration"""
+    declaration = tool._get_declaration() if hasattr(tool, '_get_declaration') else None
+    if declaration is None:
+        return [], {}
+    if declaration.parameters is not None:
+        schema = declaration.parameters
+        enums = {name: prop.enum for name, prop in (schema.properties or {}).items() if prop.enum}
+        return schema.required or [], enums
+    schema = declaration.parameters_json_schema or {}
+    enums = {name: prop['enum'] for name, prop in (schema.get('properties') or {}).items()
+             if isinstance(prop, dict) and prop.get('enum')}
+    return schema.get('required') or [], enums
+
+
+def _text(response):
+    return ''.join(part.text for part in (response.content.parts if response.content else None) or []
+                   if part.text and not part.thought)
+
+
+def can_commit(policy, text):
+    """Whether streamed text from a cheaper model is enough to stop considering escalation"""
+    text = text.strip()
+    if len(text) < max(policy.stream_commit_chars, policy.min_text_chars):
+        return False
+    return not (policy.escalate_on_hedge and HEDGE_PATTERN.search(text))
+
+
+def escalation_reason(policy, llm_request, responses):
+    """Why `responses` from a cheaper model should not be used, or None to accept them"""
+    final = [response for response in responses if not response.partial]
+    if not final:
+        return 'empty'
+    text = ''
+    calls = []
+    for response in final:
+        if response.error_code:
+            return 'error'
+        if response.finish_reason in FAILED_FINISH_REASONS:
+            return 'finish_reason'
+        if (policy.min_avg_logprob is not None and response.avg_logprobs is not None
+                and response.avg_logprobs < policy.min_avg_logprob):
+            return 'low_confidence'
+        for part in (response.content.parts if response.content else None) or []:
+            if part.function_call:
+                calls.append(part.function_call)
+            elif part.text and not part.thought:
+                text += part.text
+    if not calls and not text.strip():
+        return 'empty'
+    for call in calls:
+        tool = llm_request.tools_dict.get(call.name)
+        if tool is None:
+            return 'unknown_tool'
+        required, enums = _declared_parameters(tool)
+        args = call.args or {}
+        if any(name not in args for name in required):
+            return 'missing_arguments'
+        if any(name in args and args[name] not in allowed for name, allowed in enums.items()):
+            return 'invalid_argument'
+    if policy.escalate_on_hedge and HEDGE_PATTERN.search(text):
+        return 'hedge'
+    if not calls and len(text.strip()) < policy.min_text_chars:
+        return 'short_answer'
+    return None
+
+
+def load_prices():
+    """DEFAULT_PRICES updated from MODEL_PRICES"""
+    prices = dict(DEFAULT_PRICES)
+    for entry in os.getenv('MODEL_PRICES', '').split(','):
+        if '=' in entry:
+            model, _, price = entry.partition('=')
+            input_price, _, output_price = price.partition('/')
+            prices[model.strip()] = (float(input_price), float(output_price or 0))
+    return prices
+
+
+class CascadeTelemetry:
+    """Per-model latency, tokens and cost, and per-agent escalations, process-wide.
+
+    Every attempt is counted, including the ones a cheaper model made before
+    a request was escalated, so `cost_usd` is what the cascade really spent.
+    Prices are matched by the longest known model-name prefix (so dated
+    model versions are priced like their family).
+    """
+
+    def __init__(self, prices=None, window=1000):
+        self.prices = prices or load_prices()
+        self.models = defaultdict(Counter)
+        self.agents = defaultdict(Counter)
+        self.latency = defaultdict(lambda: deque(maxlen=window))
+        self.cost = defaultdict(float)
+
+    def price(self, model):
+        matches = [name for name in self.prices if model.startswith(name)]
+        return self.prices[max(matches, key=len)] if matches else (0.0, 0.0)
+
+    def record(self, agent_name, model, latency, usage, outcome):
+        """Record one attempt; `outcome` is 'accepted', 'error' or an escalation reason"""
+        stats = self.models[model]
+        stats['calls'] += 1
+        stats['accepted' if outcome == 'accepted' else 'errors' if outcome == 'error' else 'escalated'] += 1
+        input_tokens, output_tokens = usage
+        stats['input_tokens'] += input_tokens
+        stats['output_tokens'] += output_tokens
+        input_price, output_price = self.price(model)
+        self.cost[model] += (input_tokens * input_price + output_tokens * output_price) / 1e6
+        self.latency[model].append(latency)
+        agent = self.agents[agent_name]
+        if outcome == 'accepted':
+            agent[f'served_by:{model}'] += 1
+        else:
+            agent[f'escalated:{outcome}'] += 1
+
+    def snapshot(self):
+        def percentile(values, p):
+            values = sorted(values)
+            return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 1) if values else None
+
+        return {
+            'models': {
+                model: {
+                    **dict(stats),
+                    'latency_ms_p50': percentile(self.latency[model], 0.50),
+                    'latency_ms_p95': percentile(self.latency[model], 0.95),
+                    'cost_usd': round(self.cost[model], 6),
+                }
+                for model, stats in self.models.items()
+            },
+            'agents': {agent: dict(stats) for agent, stats in self.agents.items()},
+            'cost_usd': round(sum(self.cost.values()), 6),
+        }
+
+    def reset(self):
+        self.models.clear()
+        self.agents.clear()
+        self.latency.clear()
+        self.cost.clear()
+
+
+_telemetry = None
+
+
+def get_cascade_telemetry():
+    """Process-wide CascadeTelemetry"""
+    global _telemetry
+    if _telemetry is None:
+        _telemetry = CascadeTelemetry()
+    return _telemetry
+
+
+def cascade_metrics():
+    """Per-model calls, latency, tokens and cost, and per-agent escalations"""
+    return get_cascade_telemetry().snapshot()
+
+
+def _usage(responses):
+    """(input, output) tokens reported by the final responses of one attempt"""
+    input_tokens = output_tokens = 0
+    for response in responses:
+        usage = response.usage_metadata
+        if usage is not None and not response.partial:
+            input_tokens += usage.prompt_token_count or 0
+            output_tokens += usage.candidates_token_count or 0
+    return input_tokens, output_tokens
+
+
+class CascadeLlm(BaseLlm):
+    """BaseLlm that tries an agent's models cheapest first.
+
+    Each model but the last runs to completion and its output is checked
+    with `escalation_reason`; an accepted answer is returned as is, and a
+    rejected one (or a failed call) is discarded and the request is sent to
+    the next model. The last model's output is streamed through unchecked,
+    so a single-model policy only adds telemetry. When streaming, a cheaper
+    model's partial text is held back until `can_commit` accepts it, so
+    escalation never shows the user text that is then replaced. Every model
+    goes through admission control.
+
+    Each model gets its own copy of the request. Gemini context caches are
+    bound to the model that created them, and ADK's cache fingerprint does
+    not include the model, so only the first model uses the agent's context
+    cache; escalated requests are sent uncached and their responses carry
+    no cache metadata, so the next turn still finds the first model's cache.
+    """
+
+    agent_name: str
+    _policy: CascadePolicy = PrivateAttr()
+    _llms: dict = PrivateAttr(default_factory=dict)
+
+    def __init__(self, *, agent_name, policy, **kwargs):
+        super().__init__(model=policy.models[-1], agent_name=agent_name, **kwargs)
+        self._policy = policy
+
+    @property
+    def policy(self):
+        return self._policy
+
+    def _llm(self, model):
+        if model not in self._llms:
+            llm = admitted_model(model)
+            self._llms[model] = llm if isinstance(llm, BaseLlm) else LLMRegistry.new_llm(model)
+        return self._llms[model]
+
+    async def generate_content_async(self, llm_request, stream=False):
+        telemetry = get_cascade_telemetry()
+        models = self._policy.models
+        for index, model in enumerate(models):
+            last = index == len(models) - 1
+            request = copy_request(llm_request)
+            request.model = model
+            if index > 0:
+                request.cache_config = None
+                request.cache_metadata = None
+            start = time.perf_counter()
+            responses = []
+            committed = last
+            streamed_text = ''
+            try:
+                async for response in self._llm(model).generate_content_async(request, stream=stream):
+                    if response.model_version is None:
+                        response.model_version = model
+                    responses.append(response)
+                    if committed:
+                        yield response
+                    elif response.partial:
+                        streamed_text += _text(response)
+                        if can_commit(self._policy, streamed_text):
+                            committed = True
+                            for held in responses:
+                                yield held
+            except Exception as e:
+                telemetry.record(self.agent_name, model, time.perf_counter() - start, _usage(responses), 'error')
+                if committed:
+                    raise
+                logger.info('%s: %s failed (%s), escalating to %s', self.agent_name, model, e, models[index + 1])
+                continue
+            reason = None if committed else escalation_reason(self._policy, llm_request, responses)
+            telemetry.record(
+                self.agent_name, model, time.perf_counter() - start, _usage(responses), reason or 'accepted',
+            )
+            if reason is None:
+                if not committed:
+                    for response in responses:
+                        yield response
+                return
+            logger.info('%s: %s answer rejected (%s), escalating to %s', self.agent_name, model, reason, models[index + 1])
+
+    def connect(self, llm_request):
+        # Live sessions cannot be retried transparently; use the strongest model
+        llm_request.model = self._policy.models[-1]
+        return self._llm(self._policy.models[-1]).connect(llm_request)
+
+
+def cascade_model(agent_name, model):
+    """CascadeLlm for `agent_name` following its policy.
+
+    `model` is what the agent used before cascading; it is the only model
+    (still with telemetry) when CASCADE_ENABLED is false or the agent has
+    no default policy or override.
+    """
+    if os.getenv('CASCADE_ENABLED', 'true').lower() == 'false':
+        policy = CascadePolicy(models=(model,))
+    else:
+        policy = load_policy(agent_name, model)
+    return CascadeLlm(agent_name=agent_name, policy=policy)
@@ -0,0 +1,648 @@
+import asyncio
+import base64
+import contextvars
+import fcntl
+import hashlib
+import heapq
+import html
+import itertools
+import json
+import logging
+import os
+import secrets
+import time
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from typing import Optional
+from urllib.parse import urlencode, urlparse
+
+import httpx
+from cryptography.fernet import Fernet, InvalidToken
+from google.adk.tools import FunctionTool
+from google.adk.tools.base_toolset import BaseToolset
+
+logger = logging.getLogger(__name__)
+
+# Names the user whose token a request should carry; BrokerAuth replaces it with the token
+USER_HEADER = 'X-Carbon-Voice-User'
+
+# User the current request was authenticated as, by the API that served it
+_authenticated_user = contextvars.ContextVar('carbon_voice_authenticated_user', default=None)
+
+
+def authenticate(user_id):
+    """Mark the current task, and tasks it starts, as acting for the verified user `user_id`.
+
+    Called by an API after it has checked the caller's identity. The broker
+    only uses or links a user's token for the user a request authenticated
+    as, never for a user id the caller merely named.
+    """
+    _authenticated_user.set(user_id)
+
+
+class OAuthError(Exception):
+    """An authorization flow or token request failed"""
+
+    def __init__(self, message, retryable=False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+@dataclass
+class Token:
+    """One user's Carbon Voice tokens; times are Unix timestamps"""
+
+    access_token: str
+    refresh_token: Optional[str] = None
+    expires_at: Optional[float] = None  # None when the server gave no lifetime
+    scope: str = ''
+    issued_at: float = field(default_factory=time.time)
+
+    @classmethod
+    def from_response(cls, data, previous=None):
+        issued_at = time.time()
+        expires_in = data.get('expires_in')
+        return cls(
+            access_token=data['access_token'],
+            # Servers that do not rotate refresh tokens leave them out of refresh responses
+            refresh_token=data.get('refresh_token') or (previous.refresh_token if previous else None),
+            expires_at=issued_at + float(expires_in) if expires_in else None,
+            scope=data.get('scope') or (previous.scope if previous else ''),
+            issued_at=issued_at,
+        )
+
+    def expires_in(self):
+        return float('inf') if self.expires_at is None else self.expires_at - time.time()
+
+
+def _file_version(stat):
+    # Saves replace the file, so its inode changes even when two saves land
+    # within the filesystem's timestamp granularity
+    return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+class EncryptedTokenStore:
+    """Per-user tokens in a Fernet-encrypted file.
+
+    The table is one encrypted JSON document, replaced atomically on save
+    under a file lock, so a crash never leaves it half written and several
+    processes (the API, oauth_helper.py) can share it: a save first merges
+    tokens another process wrote since this one last read the file.
+
+    The key is `key` (CARBON_VOICE_TOKEN_KEY) or the one in `<path>.key`,
+    generated with mode 0600 on first use.
+    """
+
+    def __init__(self, path='.carbon_voice_tokens', key=None):
+        self.path = path
+        self.fernet = Fernet(key or self._load_key())
+        self._version = None
+
+    def _load_key(self):
+        key_path = f'{self.path}.key'
+        try:
+            fd = os.open(key_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(key_path, 'rb') as f:
+                return f.read().strip()
+        key = Fernet.generate_key()
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        return key
+
+    def changed(self):
+        """Whether the file was written by someone else since this store last read or wrote it"""
+        try:
+            return _file_version(os.stat(self.path)) != self._version
+        except FileNotFoundError:
+            return False
+
+    def load(self):
+        """{user_id: Token} from the file ({} when there is none yet)"""
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+                version = _file_version(os.fstat(f.fileno()))
+        except FileNotFoundError:
+            return {}
+        try:
+            tokens = json.loads(self.fernet.decrypt(data))
+        except InvalidToken:
+            raise ValueError(f'{self.path} cannot be decrypted with the configured token key') from None
+        self._version = version
+        return {user_id: Token(**token) for user_id, token in tokens.items()}
+
+    def save(self, tokens, removed=()):
+        """Write `tokens`, keeping newer ones from the file unless their user is in `removed`.
+
+        Returns the table as written.
+        """
+        with open(f'{self.path}.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            merged = dict(tokens)
+            if self.changed():
+                for user_id, token in self.load().items():
+                    mine = merged.get(user_id)
+                    if (mine is None and user_id not in removed) or (mine and token.issued_at > mine.issued_at):
+                        merged[user_id] = token
+            data = self.fernet.encrypt(json.dumps({
+                user_id: asdict(token) for user_id, token in merged.items()
+            }).encode())
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+            self._version = _file_version(os.stat(self.path))
+        return merged
+
+
+class OAuthBroker:
+    """Runs Carbon Voice OAuth2 flows for many users and keeps their tokens fresh.
+
+    Any number of flows can be in progress at once. Each is keyed by its
+    random `state`, carries its own PKCE verifier and expires after
+    `flow_timeout` seconds; codes are exchanged on the event loop, so a
+    slow token endpoint never holds up another user's callback. Tokens are
+    kept in memory by user id and saved to an EncryptedTokenStore.
+
+    Requests never refresh: `token(user_id)` only reads the cache. A
+    background task refreshes each token `refresh_margin` seconds (or half
+    its lifetime, if shorter) before it expires, at most
+    `max_concurrent_refreshes` at a time, retrying with backoff on network
+    and server errors. Requests keep using the current token meanwhile, so
+    none waits on the token endpoint or retries after a 401. A refresh
+    token the server rejects drops the user's tokens until they authorize
+    again. Tokens another process saved (oauth_helper.py, another worker)
+    are read when a user has no usable token here.
+
+    A session's user id comes from whoever started the run, so tokens are
+    only used, and accounts only linked, for the user the request was
+    authenticated as (`authenticate`) or for `trusted_users`, e.g. the
+    single user of a local `adk web`.
+    """
+
+    def __init__(self, client_id, client_secret, authorize_url, token_url, redirect_uri, store=None,
+                 scope='read,write', refresh_margin=300.0, flow_timeout=600.0, max_concurrent_refreshes=8,
+                 use_pkce=True, timeout=10.0, trusted_users=()):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.authorize_url = authorize_url
+        self.token_url = token_url
+        self.redirect_uri = redirect_uri
+        self.store = store or EncryptedTokenStore()
+        self.scope = scope
+        self.refresh_margin = refresh_margin
+        self.flow_timeout = flow_timeout
+        self.max_concurrent_refreshes = max_concurrent_refreshes
+        self.use_pkce = use_pkce
+        self.timeout = timeout
+        self.trusted_users = frozenset(trusted_users)
+        self.stats = Counter()
+        self._tokens = {}  # user_id -> Token
+        self._removed = set()  # Users dropped since the last save
+        self._flows = {}  # state -> (user_id, code_verifier, started), oldest first
+        self._waiters = {}  # user_id -> [future]
+        self._due = []  # Heap of (refresh_at, n, user_id, token)
+        self._sequence = itertools.count()
+        self._refreshing = {}  # user_id -> task
+        self._refresher = None
+        self._wakeup = None
+        self._refresh_slots = None
+        self._client = None
+        self._saving = None
+        self._dirty = False
+        self._adopt(self.store.load())
+
+    # Flows
+
+    def start_url(self, user_id):
+        """Link that starts a flow for `user_id` on the broker's callback server.
+
+        The user id travels encrypted, so a link cannot be forged for
+        someone else, and it expires with the flow timeout.
+        """
+        parsed = urlparse(self.redirect_uri)
+        ticket = self.store.fernet.encrypt(user_id.encode()).decode()
+        return f'{parsed.scheme}://{parsed.netloc}/oauth/start?{urlencode({"ticket": ticket})}'
+
+    def user_for_ticket(self, ticket):
+        """The user a start_url ticket was made for, or None when it is invalid or expired"""
+        try:
+            return self.store.fernet.decrypt(ticket.encode(), ttl=int(self.flow_timeout)).decode()
+        except (InvalidToken, UnicodeError):
+            return None
+
+    def authorization_url(self, user_id):
+        """Authorization server URL for a new flow that connects `user_id`'s account"""
+        now = time.monotonic()
+        while self._flows:
+            state, (_, _, started) = next(iter(self._flows.items()))
+            if now - started < self.flow_timeout:
+                break
+            del self._flows[state]
+            self.stats['flows_expired'] += 1
+        state = secrets.token_urlsafe(24)
+        verifier = secrets.token_urlsafe(48) if self.use_pkce else None
+        self._flows[state] = (user_id, verifier, now)
+        self.stats['flows_started'] += 1
+        params = {
+            'client_id': self.client_id,
+            'redirect_uri': self.redirect_uri,
+            'response_type': 'code',
+            'scope': self.scope,
+            'state': state,
+        }
+        if verifier:
+            digest = hashlib.sha256(verifier.encode()).digest()
+            params['code_challenge'] = base64.urlsafe_b64encode(digest).rstrip(b'=').decode()
+            params['code_challenge_method'] = 'S256'
+        return f'{self.authorize_url}?{urlencode(params)}'
+
+    async def complete(self, state, code=None, error=None):
+        """Finish the flow `state` from its callback parameters; returns the user it connected"""
+        user_id, verifier, started = self._flows.pop(state, None) or (None, None, None)
+        if user_id is None or time.monotonic() - started > self.flow_timeout:
+            self.stats['flows_failed'] += 1
+            raise OAuthError('Unknown or expired authorization request')
+        if error or not code:
+            self.stats['flows_failed'] += 1
+            raise OAuthError(f'Authorization was not granted: {error or "no code"}')
+        params = {'grant_type': 'authorization_code', 'code': code, 'redirect_uri': self.redirect_uri}
+        if verifier:
+            params['code_verifier'] = verifier
+        try:
+            data = await self._token_request(params)
+        except OAuthError:
+            self.stats['flows_failed'] += 1
+            raise
+        self._set(user_id, Token.from_response(data))
+        self.stats['flows_completed'] += 1
+        return user_id
+
+    async def wait_for(self, user_id):
+        """Wait until `user_id` has a usable token; returns it"""
+        token = self._tokens.get(user_id)
+        if token is not None and token.expires_in() > 0:
+            return token
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, []).append(future)
+        return await future
+
+    # Tokens
+
+    def token(self, user_id):
+        """`user_id`'s current access token, or None; never waits on the token endpoint"""
+        token = self._tokens.get(user_id)
+        if (token is None or token.expires_in() <= 0) and self.store.changed():
+            # Another process authorized or refreshed someone; the file is small
+            self._adopt(self.store.load())
+            token = self._tokens.get(user_id)
+        self._ensure_refresher()
+        if token is None:
+            self.stats['missing'] += 1
+            return None
+        if token.expires_in() <= 0:
+            # Only when it could not be refreshed in time, e.g. while the process was down
+            self.stats['expired'] += 1
+            self._start_refresh(user_id, token)
+            return None
+        self.stats['served'] += 1
+        return token.access_token
+
+    async def current_token(self, user_id):
+        """Like `token`, but waits for the refresh of a token that has already expired"""
+        access_token = self.token(user_id)
+        task = self._refreshing.get(user_id)
+        if access_token is None and task is not None:
+            await asyncio.shield(task)
+            access_token = self.token(user_id)
+        return access_token
+
+    def authenticated(self, user_id):
+        """Whether the current request may use `user_id`'s token"""
+        return user_id is not None and (user_id == _authenticated_user.get() or user_id in self.trusted_users)
+
+    def header_provider(self, readonly_context):
+        """McpToolset header_provider: names the session's user for BrokerAuth, if authenticated"""
+        if not self.authenticated(readonly_context.user_id):
+            self.stats['unauthenticated'] += 1
+            return {}
+        return {USER_HEADER: readonly_context.user_id}
+
+    def auth(self):
+        return BrokerAuth(self)
+
+    def _adopt(self, tokens):
+        """Take tokens read from the store that are newer than the ones in memory"""
+        for user_id, token in tokens.items():
+            mine = self._tokens.get(user_id)
+            if (mine is None and user_id not in self._removed) or (mine and token.issued_at > mine.issued_at):
+                self._tokens[user_id] = token
+                self._schedule(user_id, token)
+                self._notify(user_id, token)
+
+    def _set(self, user_id, token):
+        self._tokens[user_id] = token
+        self._removed.discard(user_id)
+        self._schedule(user_id, token)
+        self._notify(user_id, token)
+        self._save_soon()
+
+    def _remove(self, user_id):
+        self._tokens.pop(user_id, None)
+        self._removed.add(user_id)
+        self._save_soon()
+
+    def _notify(self, user_id, token):
+        for future in self._waiters.pop(user_id, []):
+            if not future.done():
+                future.set_result(token)
+
+    # Refreshing
+
+    def _schedule(self, user_id, token):
+        if not token.refresh_token or token.expires_at is None:
+            return
+        margin = min(self.refresh_margin, (token.expires_at - token.issued_at) / 2)
+        heapq.heappush(self._due, (token.expires_at - margin, next(self._sequence), user_id, token))
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def _ensure_refresher(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        if self._refresher is None or self._refresher.done() or self._refresher.get_loop() is not loop:
+            self._wakeup = asyncio.Event()
+            self._refresh_slots = asyncio.Semaphore(self.max_concurrent_refreshes)
+            self._refreshing = {}
+            self._refresher = loop.create_task(self._refresh_loop())
+
+    async def _refresh_loop(self):
+        while True:
+            now = time.time()
+            while self._due and self._due[0][0] <= now:
+                _, _, user_id, token = heapq.heappop(self._due)
+                self._start_refresh(user_id, token)
+            self._wakeup.clear()
+            timeout = max(0.0, self._due[0][0] - time.time()) if self._due else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _start_refresh(self, user_id, token):
+        if (self._refresher is None or not token.refresh_token or self._tokens.get(user_id) is not token
+                or user_id in self._refreshing):
+            return
+        task = asyncio.ensure_future(self._refresh(user_id, token))
+        self._refreshing[user_id] = task
+        task.add_done_callback(lambda done: self._refreshing.pop(user_id, None))
+
+    async def _refresh(self, user_id, token):
+        delay = 1.0
+        async with self._refresh_slots:
+            while self._tokens.get(user_id) is token:
+                try:
+                    data = await self._token_request({'grant_type': 'refresh_token', 'refresh_token': token.refresh_token})
+                except OAuthError as e:
+                    if self._tokens.get(user_id) is not token:
+                        return
+                    if e.retryable:
+                        self.stats['refresh_retries'] += 1
+                        logger.warning('Refreshing the Carbon Voice token of %s failed, retrying in %.0fs: %s',
+                                       user_id, delay, e)
+                        await asyncio.sleep(delay)
+                        delay = min(delay * 2, 60.0)
+                        continue
+                    # Another process may have refreshed (and so revoked) it first
+                    if self.store.changed():
+                        self._adopt(await asyncio.to_thread(self.store.load))
+                    if self._tokens.get(user_id) is token:
+                        self.stats['refresh_rejected'] += 1
+                        logger.warning('The Carbon Voice refresh token of %s was rejected; they must authorize again: %s',
+                                       user_id, e)
+                        self._remove(user_id)
+                    return
+                if self._tokens.get(user_id) is token:
+                    self._set(user_id, Token.from_response(data, token))
+                    self.stats['refreshes'] += 1
+                return
+
+    async def _token_request(self, params):
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client[0] is not loop:
+            self._client = (loop, httpx.AsyncClient(timeout=self.timeout))
+        self.stats['token_requests'] += 1
+        try:
+            response = await self._client[1].post(self.token_url, headers={'Accept': 'application/json'}, data={
+                **params, 'client_id': self.client_id, 'client_secret': self.client_secret,
+            })
+        except httpx.HTTPError as e:
+            raise OAuthError(f'Token request failed: {e!r}', retryable=True) from e
+        if response.status_code == 429 or response.status_code >= 500:
+            raise OAuthError(f'Token endpoint answered {response.status_code}', retryable=True)
+        try:
+            data = response.json()
+        except ValueError:
+            data = {}
+        if response.status_code != 200 or 'access_token' not in data:
+            raise OAuthError(f"Token endpoint answered {response.status_code}: "
+                             f"{data.get('error_description') or data.get('error') or response.text[:200]}")
+        return data
+
+    # Persistence
+
+    def _save_soon(self):
+        """Save in the background; saves requested while one runs are written together"""
+        self._dirty = True
+        if self._saving is None or self._saving.done():
+            self._saving = asyncio.ensure_future(self._save())
+
+    async def _save(self):
+        while self._dirty:
+            self._dirty = False
+            removed = set(self._removed)
+            try:
+                merged = await asyncio.to_thread(self.store.save, dict(self._tokens), removed)
+            except Exception as e:
+                self.stats['save_failures'] += 1
+                logger.warning('Saving Carbon Voice tokens to %s failed: %s', self.store.path, e)
+                return
+            self.stats['saves'] += 1
+            self._removed -= removed
+            self._adopt(merged)
+
+    async def flush(self):
+        """Wait for pending saves"""
+        while self._saving is not None and not self._saving.done():
+            await self._saving
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
+        for task in list(self._refreshing.values()):
+            task.cancel()
+        await self.flush()
+        if self._client is not None:
+            if self._client[0] is asyncio.get_running_loop():
+                await self._client[1].aclose()
+            self._client = None
+
+    def metrics(self):
+        return {
+            **{name: self.stats[name] for name in (
+                'flows_started', 'flows_completed', 'flows_failed', 'flows_expired', 'served', 'missing',
+                'expired', 'refreshes', 'refresh_retries', 'refresh_rejected', 'token_requests', 'saves',
+                'save_failures', 'unauthenticated',
+            )},
+            'users': len(self._tokens),
+            'pending_flows': len(self._flows),
+            'refreshing': len(self._refreshing),
+        }
+
+
+class BrokerAuth(httpx.Auth):
+    """httpx auth sending the current token of the user named in USER_HEADER.
+
+    The user header stays the same when a token is refreshed, so MCP
+    sessions, tool catalogs and directory indexes keyed by headers are kept;
+    only the Authorization header of each request changes.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def auth_flow(self, request):
+        user_id = request.headers.pop(USER_HEADER, None)
+        if user_id is not None:
+            token = self.broker.token(user_id)
+            if token is not None:
+                request.headers['Authorization'] = f'Bearer {token}'
+        yield request
+
+
+class AuthorizedToolset(BaseToolset):
+    """`tools` for users with a Carbon Voice token, an authorization tool for everyone else.
+
+    Listing MCP tools without a token would fail with a 401, so until a
+    user connects their account the agent only sees authorize_carbon_voice,
+    which returns the link that starts their flow. Requests that were not
+    authenticated as the session's user (see `OAuthBroker.authenticated`)
+    only see it too, and it gives them no link. With `fallback` (the tools
+    carry a shared CARBON_VOICE_API_KEY), both get `tools` instead, which
+    then run with that key.
+    """
+
+    def __init__(self, broker, tools, fallback=False):
+        super().__init__()
+        self.broker = broker
+        self.tools = tools
+        self.fallback = fallback
+
+        def authorize_carbon_voice(tool_context) -> dict:
+            """Get the link the user opens to connect their Carbon Voice account.
+
+            Returns:
+              The authorization link, or that the account is already connected.
+            """
+            if not broker.authenticated(tool_context.user_id):
+                return {'status': 'unauthenticated',
+                        'message': 'Carbon Voice is only available to signed-in users; this request was not '
+                                   'authenticated.'}
+            if broker.token(tool_context.user_id) is not None:
+                return {'status': 'connected'}
+            return {'status': 'authorization_required', 'authorization_url': broker.start_url(tool_context.user_id)}
+
+        self._authorize = FunctionTool(authorize_carbon_voice)
+
+    async def get_tools(self, readonly_context=None):
+        if not self.fallback and (readonly_context is None or not self.broker.authenticated(readonly_context.user_id)
+                                  or await self.broker.current_token(readonly_context.user_id) is None):
+            return [self._authorize]
+        tools = []
+        for tool in self.tools:
+            tools.extend(await tool.get_tools(readonly_context) if isinstance(tool, BaseToolset) else [tool])
+        return tools
+
+    async def close(self):
+        for tool in self.tools:
+            if isinstance(tool, BaseToolset):
+                await tool.close()
+
+
+def create_oauth_router(broker):
+    """FastAPI router serving the broker's /oauth/start, callback and /oauth/metrics routes"""
+    from fastapi import APIRouter
+    from fastapi.responses import HTMLResponse, RedirectResponse
+
+    router = APIRouter()
+
+    def page(title, text, status_code=200):
+        # Error text can echo query parameters (error=...) and token endpoint replies
+        return HTMLResponse(f'<html><body><h1>{html.escape(title)}</h1><p>{html.escape(text)}</p></body></html>',
+                            status_code=status_code)
+
+    @router.get('/oauth/start')
+    async def start(ticket: str = ''):
+        user_id = broker.user_for_ticket(ticket)
+        if user_id is None:
+            return page('Error', 'This authorization link is invalid or has expired.', 400)
+        return RedirectResponse(broker.authorization_url(user_id), status_code=302)
+
+    @router.get(urlparse(broker.redirect_uri).path or '/oauth/callback')
+    async def callback(state: str = '', code: str = '', error: str = ''):
+        try:
+            await broker.complete(state, code, error)
+        except OAuthError as e:
+            return page('Error', f'Carbon Voice authorization failed: {e}', 400)
+        return page('Success!', 'Your Carbon Voice account is connected. You can close this window.')
+
+    @router.get('/oauth/metrics')
+    async def metrics():
+        return broker.metrics()
+
+    return router
+
+
+def create_oauth_broker():
+    """OAuthBroker configured from CARBON_VOICE_* environment variables.
+
+    Returns None when CARBON_VOICE_OAUTH_BROKER_ENABLED is false or the
+    client id or secret is missing.
+    """
+    client_id = os.getenv('CARBON_VOICE_CLIENT_ID')
+    client_secret = os.getenv('CARBON_VOICE_CLIENT_SECRET')
+    if os.getenv('CARBON_VOICE_OAUTH_BROKER_ENABLED', 'true').lower() == 'false' or not client_id or not client_secret:
+        return None
+    return OAuthBroker(
+        client_id,
+        client_secret,
+        authorize_url=os.getenv('CARBON_VOICE_AUTHORIZE_URL', 'https://api.carbonvoice.app/oauth/authorize'),
+        token_url=os.getenv('CARBON_VOICE_TOKEN_URL', 'https://api.carbonvoice.app/oauth/token'),
+        redirect_uri=os.getenv('CARBON_VOICE_REDIRECT_URI', 'http://localhost:3000/oauth/callback'),
+        store=EncryptedTokenStore(
+            os.getenv('CARBON_VOICE_TOKEN_STORE', '.carbon_voice_tokens'),
+            key=os.getenv('CARBON_VOICE_TOKEN_KEY') or None,
+        ),
+        scope=os.getenv('CARBON_VOICE_OAUTH_SCOPE', 'read,write'),
+        refresh_margin=float(os.getenv('CARBON_VOICE_TOKEN_REFRESH_MARGIN', '300')),
+        use_pkce=os.getenv('CARBON_VOICE_OAUTH_PKCE', 'true').lower() != 'false',
+        trusted_users=[user.strip() for user in os.getenv('CARBON_VOICE_TRUSTED_USERS', '').split(',') if user.strip()],
+    )
+
+
+_broker = None
+
+
+def get_oauth_broker():
+    """Process-wide OAuthBroker, configured from the environment on first use (None when disabled)"""
+    global _broker
+    if _broker is None:
+        _broker = create_oauth_broker()
+    return _broker
@@ -0,0 +1,95 @@
+import importlib
+import os
+from dataclasses import dataclass
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
+from pydantic import PrivateAttr
+
+
+@dataclass(frozen=True)
+class SubAgentSpec:
+    """Cheap description of a sub-agent that can be recorded at startup.
+
+    Only the name, description and required environment variables are kept
+    here. The module that defines the agent is not imported until `build()`.
+    """
+
+    name: str
+    description: str
+    module: str  # Module inside carbon_agent that defines the factory
+    factory: str  # Name of the zero-argument function that returns the Agent
+    required_env: tuple = ()
+
+    def missing_env(self):
+        """Return the required environment variables that are not set"""
+        return [var for var in self.required_env if not os.getenv(var)]
+
+    def is_configured(self):
+        """Check the configuration without importing or building anything"""
+        return not self.missing_env()
+
+    def build(self):
+        """Import the agent module and build the Agent with its toolsets"""
+        module = importlib.import_module(f'.{self.module}', __package__)
+        return getattr(module, self.factory)()
+
+
+class LazySubAgent(BaseAgent):
+    """Placeholder sub-agent that builds the real agent on first transfer.
+
+    The placeholder carries the name and description the orchestrator needs to
+    offer `transfer_to_agent`. The first time it runs it builds the real agent,
+    swaps it into its parent's `sub_agents` and hands the invocation over, so
+    later turns talk to the real agent directly.
+    """
+
+    spec: SubAgentSpec
+    _agent: Optional[BaseAgent] = PrivateAttr(default=None)
+
+    @classmethod
+    def from_spec(cls, spec):
+        return cls(name=spec.name, description=spec.description, spec=spec)
+
+    @property
+    def is_built(self):
+        return self._agent is not None
+
+    def materialize(self):
+        """Build the real agent once and replace this placeholder with it"""
+        if self._agent is None:
+            agent = self.spec.build()
+            parent = self.parent_agent
+            if parent is not None:
+                agent.parent_agent = parent
+                for i, sub_agent in enumerate(parent.sub_agents):
+                    if sub_agent is self:
+                        parent.sub_agents[i] = agent
+            self._agent = agent
+        return self._agent
+
+    async def run_async(
+        self, parent_context: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        async for event in self.materialize().run_async(parent_context):
+            yield event
+
+    async def _run_live_impl(
+        self, ctx: InvocationContext
+    ) -> AsyncGenerator[Event, None]:
+        async for event in self.materialize().run_live(ctx):
+            yield event
+
+
+def build_sub_agents(specs):
+    """Create placeholders for every configured spec"""
+    return [LazySubAgent.from_spec(spec) for spec in specs if spec.is_configured()]
+
+
+def materialize_all(agent):
+    """Build every placeholder below `agent` (used by benchmarks and warm-up)"""
+    for sub_agent in list(agent.sub_agents):
+        if isinstance(sub_agent, LazySubAgent):
+            sub_agent.materialize()
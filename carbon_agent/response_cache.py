@@ -0,0 +1,403 @@
+import hashlib
+import inspect
+import logging
+import math
+import os
+import random
+import time
+import zlib
+from collections import OrderedDict, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+from google.adk.models import LlmResponse
+
+from .text import STOPWORDS, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Request verbs and phrasing that do not change what is being asked about.
+# "and" and "or" stay: "tesla and nvidia stock" is not "tesla stock"
+GENERIC_TERMS = (STOPWORDS - {'and', 'or'}) | frozenset('''
+analyze analyse analysis assess compare describe evaluate explain list outline provide review summarize
+summary overview brief briefly quick quickly detail detailed current currently latest recent now today
+'''.split())
+
+# Words that move a question to another period: "this quarter" asks about
+# the same period as an unqualified question, "next quarter" does not
+PERIOD_TERMS = frozenset('''
+next last previous prior past ago future forward ahead tomorrow yesterday
+'''.split())
+
+
+def _terms(words):
+    for word in words:
+        word = word.strip('.')
+        if word and word not in GENERIC_TERMS:
+            yield word[:-1] if len(word) > 3 and word.endswith('s') and not word.endswith('ss') else word
+
+
+def key_terms(text):
+    """Normalized terms of what a prompt asks about.
+
+    Stopwords, request verbs and plural endings are dropped and case is
+    ignored, so "Analyze Tesla stock", "tesla stock overview" and "what about
+    tesla stocks?" all have the key terms {tesla, stock}.
+    """
+    return frozenset(_terms(normalize_text(text).split()))
+
+
+def named_terms(text):
+    """Key terms of `text` that name something: numbers, upper-case words and
+    capitalized words other than the first of a sentence (Q3, AMD, Nvidia)"""
+    names = set()
+    sentence_start = True
+    for word in text.split():
+        bare = word.strip('"\'()[]{},;:!?')
+        if any(c.isdigit() for c in bare) or (len(bare) > 1 and bare.isupper()) or (
+                bare[:1].isupper() and not sentence_start):
+            names.update(_terms(normalize_text(bare).split()))
+        sentence_start = word.endswith(('.', '?', '!'))
+    return frozenset(names)
+
+
+def conflicting(terms, other_terms, names=frozenset()):
+    """Whether prompts with these key terms ask different questions.
+
+    They do when each has a term the other lacks ("tesla stock" and "nvidia
+    stock", "tesla stock" and "tesla bonds"), or when one only adds a number,
+    a period qualifier or one of `names` ("Tesla earnings" and "Tesla Q3
+    earnings", "outlook for this year" and "outlook for next year"). A
+    prompt that only adds a plain word ("Tesla stock analysis this
+    quarter") is left to the similarity threshold.
+    """
+    added, missing = terms - other_terms, other_terms - terms
+    if added and missing:
+        return True
+    return any(
+        term in names or term in PERIOD_TERMS or any(c.isdigit() for c in term)
+        for term in added | missing
+    )
+
+
+def hashed_embedding(text, dim=512):
+    """Local bag-of-key-terms embedding, as a sparse {index: weight} unit vector.
+
+    Built from the same `key_terms` the conflict check uses, so rewordings
+    with the same key terms embed identically. Needs no model or network;
+    any callable returning a dense list or a sparse dict can be used instead.
+    """
+    vector = defaultdict(float)
+    for term in key_terms(text):
+        h = zlib.crc32(term.encode())
+        vector[h % dim] += 1.0 if (h >> 16) & 1 else -1.0
+    return _unit({i: v for i, v in vector.items() if v})
+
+
+def _unit(vector):
+    if not isinstance(vector, dict):
+        vector = {i: float(v) for i, v in enumerate(vector) if v}
+    norm = math.sqrt(sum(v * v for v in vector.values()))
+    return {i: v / norm for i, v in vector.items()} if norm else {}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(i, 0.0) for i, v in a.items())
+
+
+class LshIndex:
+    """Random-hyperplane LSH over unit vectors.
+
+    Each vector gets `num_bands` signatures of `band_bits` bits; vectors that
+    share at least one band signature are candidate neighbours. Only the
+    candidates are compared exactly, so lookups stay cheap as the cache grows.
+    """
+
+    def __init__(self, num_bands=16, band_bits=6, seed=0):
+        self.num_bands = num_bands
+        self.band_bits = band_bits
+        self._rng = random.Random(seed)
+        self._planes = defaultdict(lambda: [self._rng.gauss(0, 1) for _ in range(num_bands * band_bits)])
+        self._buckets = defaultdict(set)
+
+    def _signatures(self, vector):
+        projections = [0.0] * (self.num_bands * self.band_bits)
+        for i, v in vector.items():
+            plane = self._planes[i]
+            for j in range(len(projections)):
+                projections[j] += v * plane[j]
+        bits = [p >= 0 for p in projections]
+        return [
+            (band, tuple(bits[band * self.band_bits:(band + 1) * self.band_bits]))
+            for band in range(self.num_bands)
+        ]
+
+    def add(self, key, vector):
+        signatures = self._signatures(vector)
+        for signature in signatures:
+            self._buckets[signature].add(key)
+        return signatures
+
+    def remove(self, key, signatures):
+        for signature in signatures:
+            bucket = self._buckets.get(signature)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[signature]
+
+    def candidates(self, vector):
+        found = set()
+        for signature in self._signatures(vector):
+            found.update(self._buckets.get(signature, ()))
+        return found
+
+
+@dataclass
+class CacheEntry:
+    namespace: str
+    prompt: str
+    content: object  # google.genai types.Content
+    size: int
+    created_at: float
+    vector: Optional[dict] = None
+    key_terms: frozenset = frozenset()
+    named_terms: frozenset = frozenset()
+    signatures: Optional[list] = None
+
+
+@dataclass
+class CacheHit:
+    entry: CacheEntry
+    kind: str  # 'exact' or 'semantic'
+    similarity: float
+
+
+class ResponseCache:
+    """LRU/TTL cache of model answers keyed by normalized prompt.
+
+    Lookups try the exact normalized prompt first. With an `embed_fn`, misses
+    fall back to the most similar cached prompt in the same namespace whose
+    similarity is at least `similarity_threshold` and whose key terms do not
+    conflict with the prompt's (see `conflicting`).
+    Entries expire after `ttl` seconds; the least recently used ones are
+    evicted beyond `max_entries` entries or `max_chars` characters of answers.
+    """
+
+    def __init__(
+        self,
+        max_entries=1000,
+        max_chars=5_000_000,
+        ttl=6 * 3600.0,
+        embed_fn=None,
+        similarity_threshold=0.8,
+        lsh_bands=16,
+        lsh_band_bits=6,
+    ):
+        self.max_entries = max_entries
+        self.max_chars = max_chars
+        self.ttl = ttl
+        self.embed_fn = embed_fn
+        self.similarity_threshold = similarity_threshold
+        self.stats = {
+            'lookups': 0, 'exact_hits': 0, 'semantic_hits': 0, 'misses': 0,
+            'stores': 0, 'evictions': 0, 'expirations': 0, 'bypassed': 0,
+        }
+        self._entries = OrderedDict()
+        self._chars = 0
+        self._index = LshIndex(lsh_bands, lsh_band_bits) if embed_fn else None
+
+    def __len__(self):
+        return len(self._entries)
+
+    async def _embed(self, text):
+        vector = self.embed_fn(text)
+        if inspect.isawaitable(vector):
+            vector = await vector
+        return _unit(vector)
+
+    def _expired(self, entry, now):
+        return self.ttl is not None and now - entry.created_at > self.ttl
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._chars -= entry.size
+        if self._index is not None and entry.signatures:
+            self._index.remove(key, entry.signatures)
+        return entry
+
+    async def lookup(self, namespace, prompt):
+        """Return a CacheHit for `prompt`, or None"""
+        self.stats['lookups'] += 1
+        now = time.time()
+        key = (namespace, normalize_text(prompt))
+        entry = self._entries.get(key)
+        if entry is not None and self._expired(entry, now):
+            self._remove(key)
+            self.stats['expirations'] += 1
+            entry = None
+        if entry is not None:
+            self._entries.move_to_end(key)
+            self.stats['exact_hits'] += 1
+            return CacheHit(entry, 'exact', 1.0)
+
+        if self._index is not None:
+            hit = await self._nearest(namespace, prompt, now)
+            if hit is not None:
+                self._entries.move_to_end((namespace, normalize_text(hit.entry.prompt)))
+                self.stats['semantic_hits'] += 1
+                return hit
+
+        self.stats['misses'] += 1
+        return None
+
+    async def _nearest(self, namespace, prompt, now):
+        vector = await self._embed(prompt)
+        if not vector:
+            return None
+        terms = key_terms(prompt)
+        names = named_terms(prompt)
+        best = None
+        for key in self._index.candidates(vector):
+            entry = self._entries.get(key)
+            if entry is None or entry.namespace != namespace:
+                continue
+            if conflicting(terms, entry.key_terms, names | entry.named_terms):
+                continue
+            if self._expired(entry, now):
+                self._remove(key)
+                self.stats['expirations'] += 1
+                continue
+            similarity = _cosine(vector, entry.vector)
+            if similarity >= self.similarity_threshold and (best is None or similarity > best.similarity):
+                best = CacheHit(entry, 'semantic', similarity)
+        return best
+
+    async def store(self, namespace, prompt, content, size):
+        """Cache `content` as the answer to `prompt`"""
+        if size > self.max_chars:
+            self.stats['bypassed'] += 1
+            return
+        key = (namespace, normalize_text(prompt))
+        if key in self._entries:
+            self._remove(key)
+        entry = CacheEntry(namespace, prompt, content, size, time.time())
+        if self._index is not None:
+            entry.vector = await self._embed(prompt)
+            entry.key_terms = key_terms(prompt)
+            entry.named_terms = named_terms(prompt)
+            if entry.vector:
+                entry.signatures = self._index.add(key, entry.vector)
+        self._entries[key] = entry
+        self._chars += size
+        self.stats['stores'] += 1
+        while len(self._entries) > self.max_entries or self._chars > self.max_chars:
+            self._remove(next(iter(self._entries)))
+            self.stats['evictions'] += 1
+
+    def clear(self):
+        for key in list(self._entries):
+            self._remove(key)
+
+    def metrics(self):
+        hits = self.stats['exact_hits'] + self.stats['semantic_hits']
+        lookups = self.stats['lookups']
+        return {
+            **self.stats,
+            'entries': len(self._entries),
+            'chars': self._chars,
+            'hit_rate': hits / lookups if lookups else 0.0,
+        }
+
+
+def _request_namespace(llm_request):
+    # Answers are only reusable under the same model, instruction and tools
+    config = llm_request.config
+    instruction = config.system_instruction if config else None
+    if instruction is not None and not isinstance(instruction, str):
+        instruction = repr(instruction)
+    raw = '\n'.join([llm_request.model or '', instruction or '', ','.join(sorted(llm_request.tools_dict))])
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+
+class ModelResponseCache:
+    """ADK model callbacks that serve repeated questions from a ResponseCache.
+
+    Only the first model call for a new conversation is cached: follow-up
+    turns depend on earlier answers, and calls after a tool result depend on
+    that result. Function calls, partial chunks and errors are never stored.
+    """
+
+    def __init__(self, cache):
+        self.cache = cache
+        self._pending = OrderedDict()  # invocation_id -> (namespace, prompt)
+
+    def _cacheable_prompt(self, callback_context, llm_request):
+        user_content = callback_context.user_content
+        if not user_content or not user_content.parts or not llm_request.contents:
+            return None
+        user_turns = sum(
+            1 for event in callback_context.session.events
+            if event.author == 'user' and event.content and event.content.parts
+        )
+        if user_turns > 1:
+            return None
+        last = llm_request.contents[-1]
+        if any(part.function_response for part in last.parts or []):
+            return None
+        text = ' '.join(part.text for part in user_content.parts if part.text)
+        return text or None
+
+    async def before_model_callback(self, callback_context, llm_request):
+        prompt = self._cacheable_prompt(callback_context, llm_request)
+        if prompt is None:
+            self.cache.stats['bypassed'] += 1
+            return None
+        namespace = _request_namespace(llm_request)
+        hit = await self.cache.lookup(namespace, prompt)
+        if hit is not None:
+            logger.info('Response cache %s hit (similarity %.2f)', hit.kind, hit.similarity)
+            return LlmResponse(
+                content=hit.entry.content.model_copy(deep=True),
+                custom_metadata={'response_cache': hit.kind, 'similarity': round(hit.similarity, 3)},
+            )
+        self._pending[callback_context.invocation_id] = (namespace, prompt)
+        while len(self._pending) > 1000:
+            self._pending.popitem(last=False)
+        return None
+
+    async def after_model_callback(self, callback_context, llm_response):
+        if llm_response.partial:
+            return None
+        pending = self._pending.pop(callback_context.invocation_id, None)
+        if pending is None:
+            return None
+        content = llm_response.content
+        if llm_response.error_code or not content or not content.parts:
+            return None
+        if any(part.function_call for part in content.parts):
+            return None
+        text = ''.join(part.text or '' for part in content.parts)
+        if text.strip():
+            await self.cache.store(*pending, content.model_copy(deep=True), len(text))
+        return None
+
+
+def create_response_cache(prefix):
+    """Build callbacks configured from `<prefix>_*` environment variables.
+
+    Returns None when `<prefix>_ENABLED` is false.
+    """
+    if os.getenv(f'{prefix}_ENABLED', 'true').lower() == 'false':
+        return None
+    semantic = os.getenv(f'{prefix}_SEMANTIC', 'true').lower() != 'false'
+    cache = ResponseCache(
+        max_entries=int(os.getenv(f'{prefix}_MAX_ENTRIES', '1000')),
+        max_chars=int(os.getenv(f'{prefix}_MAX_CHARS', '5000000')),
+        ttl=float(os.getenv(f'{prefix}_TTL', str(6 * 3600))),
+        embed_fn=hashed_embedding if semantic else None,
+        similarity_threshold=float(os.getenv(f'{prefix}_SIMILARITY', '0.8')),
+    )
+    return ModelResponseCache(cache)
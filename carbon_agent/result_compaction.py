@@ -0,0 +1,384 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter, OrderedDict
+
+from google.adk.tools.base_tool import BaseTool
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+HANDLE_PREFIX = 'res_'
+
+# Longest string shown as is in an object outline
+OUTLINE_STRING_CHARS = 80
+
+
+class BlobStore:
+    """Content-addressed store for full tool results, backed by SQLite.
+
+    Payloads are keyed by their SHA-256 (the first 128 bits, which keeps
+    handles short), so identical results are stored once, and kept
+    zlib-compressed. The least recently read payloads are
+    dropped once the store holds more than `max_bytes`. `path` defaults to an
+    in-memory database, which lives as long as the process (like ADK's
+    in-memory sessions); pass a file path to keep handles valid across
+    restarts. Recently read payloads are also kept decompressed in memory,
+    since paging reads the same payload several times in a row.
+    """
+
+    def __init__(self, path=':memory:', max_bytes=256 * 2 ** 20, hot_entries=16):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hot_entries = hot_entries
+        self._lock = threading.Lock()
+        self._hot = OrderedDict()
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        if path != ':memory:':
+            self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute(
+            'CREATE TABLE IF NOT EXISTS blobs ('
+            ' digest TEXT PRIMARY KEY, data BLOB NOT NULL, size INTEGER NOT NULL,'
+            ' stored_bytes INTEGER NOT NULL, accessed_at REAL NOT NULL)'
+        )
+        self._db.execute('CREATE INDEX IF NOT EXISTS blobs_accessed ON blobs (accessed_at)')
+        self._stored_bytes = self._db.execute('SELECT COALESCE(SUM(stored_bytes), 0) FROM blobs').fetchone()[0]
+
+    def put(self, text):
+        """Store `text` and return its digest"""
+        raw = text.encode()
+        digest = hashlib.sha256(raw).hexdigest()[:32]
+        data = zlib.compress(raw, 6)
+        with self._lock:
+            cursor = self._db.execute(
+                'INSERT OR IGNORE INTO blobs (digest, data, size, stored_bytes, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (digest, data, len(text), len(data), time.time()),
+            )
+            if cursor.rowcount:
+                self._stored_bytes += len(data)
+                self._evict()
+            else:
+                self._touch(digest)
+            self._remember(digest, text)
+        return digest
+
+    def get(self, digest):
+        """Return the payload stored under `digest`, or None"""
+        with self._lock:
+            text = self._hot.get(digest)
+            if text is not None:
+                self._hot.move_to_end(digest)
+                return text
+            row = self._db.execute('SELECT data FROM blobs WHERE digest = ?', (digest,)).fetchone()
+            if row is None:
+                return None
+            self._touch(digest)
+            text = zlib.decompress(row[0]).decode()
+            self._remember(digest, text)
+            return text
+
+    def _touch(self, digest):
+        self._db.execute('UPDATE blobs SET accessed_at = ? WHERE digest = ?', (time.time(), digest))
+
+    def _remember(self, digest, text):
+        self._hot[digest] = text
+        self._hot.move_to_end(digest)
+        while len(self._hot) > self.hot_entries:
+            self._hot.popitem(last=False)
+
+    def _evict(self):
+        while self._stored_bytes > self.max_bytes:
+            row = self._db.execute('SELECT digest, stored_bytes FROM blobs ORDER BY accessed_at LIMIT 1').fetchone()
+            if row is None:
+                break
+            self._db.execute('DELETE FROM blobs WHERE digest = ?', (row[0],))
+            self._hot.pop(row[0], None)
+            self._stored_bytes -= row[1]
+
+    def metrics(self):
+        with self._lock:
+            count = self._db.execute('SELECT COUNT(*) FROM blobs').fetchone()[0]
+        return {'blobs': count, 'stored_bytes': self._stored_bytes}
+
+    def close(self):
+        self._db.close()
+
+
+_blob_store = None
+
+
+def get_blob_store():
+    """Process-wide blob store, configured from the environment on first use"""
+    global _blob_store
+    if _blob_store is None:
+        _blob_store = BlobStore(
+            path=os.getenv('TOOL_RESULT_STORE_PATH') or ':memory:',
+            max_bytes=int(float(os.getenv('TOOL_RESULT_STORE_MAX_MB', '256')) * 2 ** 20),
+        )
+    return _blob_store
+
+
+def payload_text(tool_response):
+    """Full text of a tool result, in the form that is stored and paged.
+
+    JSON arrays are written one item per line so that `find` returns whole
+    items; other JSON is indented; plain text is kept as is.
+    """
+    data = tool_response
+    if isinstance(tool_response, dict) and 'content' in tool_response:
+        if tool_response.get('structuredContent') is not None:
+            data = tool_response['structuredContent']
+            if isinstance(data, dict) and list(data) == ['result']:
+                data = data['result']
+        else:
+            texts = [item.get('text', '') for item in tool_response['content'] if item.get('type') == 'text']
+            if len(texts) != len(tool_response['content']):
+                data = tool_response['content']
+            elif len(texts) == 1:
+                data = _parse_json(texts[0])
+            else:
+                data = [_parse_json(text) for text in texts]
+    if isinstance(data, str):
+        return data
+    if isinstance(data, list):
+        return '[\n' + ',\n'.join(json.dumps(item, default=str) for item in data) + '\n]'
+    return json.dumps(data, indent=1, default=str)
+
+
+def _parse_json(text):
+    try:
+        return json.loads(text)
+    except ValueError:
+        return text
+
+
+def _shorten(text, limit):
+    return text if len(text) <= limit else text[:limit] + '…'
+
+
+def _describe(value):
+    if isinstance(value, list):
+        return f'array[{len(value)}]'
+    if isinstance(value, dict):
+        return f'object[{len(value)} keys]'
+    if isinstance(value, str) and len(value) > OUTLINE_STRING_CHARS:
+        return f'string[{len(value)} chars]: {value[:OUTLINE_STRING_CHARS]}…'
+    return value
+
+
+def outline(text, budget):
+    """Size-bounded summary of a stored payload: its shape plus a preview"""
+    data = _parse_json(text)
+    if isinstance(data, list):
+        fields = []
+        for item in data[:20]:
+            if isinstance(item, dict):
+                fields.extend(key for key in item if key not in fields)
+        preview, used = [], 0
+        for item in data:
+            line = _shorten(json.dumps(item, default=str), 300)
+            if used + len(line) > budget:
+                break
+            preview.append(line)
+            used += len(line)
+        return {'type': 'array', 'items': len(data), 'fields': fields, 'preview': preview}
+    if isinstance(data, dict):
+        fields = {key: _describe(value) for key, value in data.items()}
+        if len(json.dumps(fields, default=str)) > budget:
+            fields = {key: _describe(value) if not isinstance(value, str) else f'string[{len(value)} chars]'
+                      for key, value in list(data.items())[:50]}
+        return {'type': 'object', 'fields': fields}
+    excerpt = text[:budget]
+    if len(text) > budget and '\n' in excerpt:
+        excerpt = excerpt[:excerpt.rindex('\n')]
+    return {'type': 'text', 'lines': text.count('\n') + 1, 'excerpt': excerpt}
+
+
+class ResultCompactor:
+    """Keeps large tool results out of the conversation.
+
+    Used as an agent's `after_tool_callback`: a result larger than
+    `max_chars` (as JSON) is written to the blob store, and the model gets an
+    outline of it (type, size, fields and a preview or excerpt) plus a handle
+    instead. The `read_tool` (read_tool_result) pages through or searches the
+    full result by handle, so the conversation only carries the parts the
+    model asked for.
+
+    As a `before_model_callback` it also replaces tool results from earlier
+    turns that are larger than `history_chars` (outlines and pages included)
+    with just their handle, so later prompts grow by a few hundred characters
+    per tool call rather than by the results. Session events are not changed.
+    """
+
+    def __init__(self, store, max_chars=4000, page_chars=4000, history_chars=1000):
+        self.store = store
+        self.max_chars = max_chars
+        self.page_chars = page_chars
+        self.history_chars = history_chars
+        self.stats = Counter()
+        self.read_tool = ReadToolResultTool(self)
+
+    def after_tool_callback(self, tool, args, tool_context, tool_response):
+        """ADK after_tool_callback: replace an oversized result with an outline and handle"""
+        if tool.name == self.read_tool.name or not isinstance(tool_response, dict):
+            return None
+        if tool_response.get('isError') or 'error' in tool_response:
+            return None
+        size = len(json.dumps(tool_response, default=str))
+        self.stats['results'] += 1
+        if size <= self.max_chars:
+            return None
+
+        text = payload_text(tool_response)
+        handle = HANDLE_PREFIX + self.store.put(text)
+        compacted = {
+            'compacted': True,
+            'handle': handle,
+            'total_chars': len(text),
+            # Leave room for the keys and the note around the outline
+            'summary': outline(text, max(200, self.max_chars - 600)),
+            'note': (
+                f'Only a summary of this {tool.name} result is shown. Call read_tool_result '
+                f'with handle "{handle}" and an offset to read it in pages, or with find '
+                'to get the lines that contain a word.'
+            ),
+        }
+        self.stats['compacted'] += 1
+        self.stats['chars_in'] += size
+        self.stats['chars_out'] += len(json.dumps(compacted, default=str))
+        return compacted
+
+    def before_model_callback(self, callback_context, llm_request):
+        """ADK before_model_callback: shrink tool results from earlier turns to their handles"""
+        if not self.history_chars:
+            return None
+        for content in llm_request.contents[:_current_turn_start(llm_request.contents)]:
+            for part in content.parts or []:
+                function_response = part.function_response
+                response = function_response.response if function_response else None
+                if not isinstance(response, dict) or response.get('elided') or 'error' in response:
+                    continue
+                size = len(json.dumps(response, default=str))
+                if size <= self.history_chars:
+                    continue
+                handle = response.get('handle')
+                if not handle:
+                    handle = HANDLE_PREFIX + self.store.put(payload_text(response))
+                function_response.response = {
+                    'elided': True,
+                    'handle': handle,
+                    'note': 'Result from an earlier turn; call read_tool_result with this handle to read it again.',
+                }
+                self.stats['elided'] += 1
+                self.stats['elided_chars'] += size
+        return None
+
+    def read(self, handle, offset=0, max_chars=None, find=''):
+        """Page or search a stored result; returns a dict for the model"""
+        text = self.store.get(handle[len(HANDLE_PREFIX):]) if handle.startswith(HANDLE_PREFIX) else None
+        if text is None:
+            self.stats['read_misses'] += 1
+            return {'error': f'Unknown or expired handle {handle!r}; call the original tool again.'}
+        limit = min(max_chars or self.page_chars, self.page_chars)
+        if find:
+            self.stats['finds'] += 1
+            needle = find.lower()
+            matches, used, position = [], 0, 0
+            for line in text.splitlines(keepends=True):
+                if needle in line.lower():
+                    shown = _shorten(line.rstrip('\n'), 500)
+                    if used + len(shown) > limit:
+                        break
+                    matches.append({'offset': position, 'line': shown})
+                    used += len(shown)
+                position += len(line)
+            return {'handle': handle, 'find': find, 'total_chars': len(text), 'matches': matches}
+
+        self.stats['pages'] += 1
+        offset = max(0, int(offset))
+        end = min(len(text), offset + limit)
+        return {
+            'handle': handle,
+            'offset': offset,
+            'content': text[offset:end],
+            'next_offset': end if end < len(text) else None,
+            'total_chars': len(text),
+        }
+
+    def metrics(self):
+        return {
+            **{name: self.stats[name] for name in ('results', 'compacted', 'elided', 'pages', 'finds', 'read_misses')},
+            'chars_saved': self.stats['chars_in'] - self.stats['chars_out'],
+            **self.store.metrics(),
+        }
+
+
+def _current_turn_start(contents):
+    """Index of the latest user message; what follows belongs to the current turn"""
+    for index in range(len(contents) - 1, -1, -1):
+        content = contents[index]
+        if content.role == 'user' and any(part.text for part in content.parts or []):
+            return index
+    return 0
+
+
+class ReadToolResultTool(BaseTool):
+    """Pages through results that ResultCompactor stored out of band"""
+
+    def __init__(self, compactor):
+        super().__init__(
+            name='read_tool_result',
+            description=(
+                'Read more of a large tool result that was replaced by a summary and a '
+                'handle. Returns up to max_chars characters starting at offset, and the '
+                'next_offset to continue from; or, with find, the lines that contain that '
+                'text and their offsets. Read only what the request needs.'
+            ),
+        )
+        self.compactor = compactor
+
+    def _get_declaration(self):
+        return types.FunctionDeclaration(
+            name=self.name,
+            description=self.description,
+            parameters=types.Schema(
+                type=types.Type.OBJECT,
+                properties={
+                    'handle': types.Schema(type=types.Type.STRING, description='Handle from the summarized result'),
+                    'offset': types.Schema(type=types.Type.INTEGER, description='Character offset to start at (default 0)'),
+                    'max_chars': types.Schema(type=types.Type.INTEGER, description='Characters to return'),
+                    'find': types.Schema(type=types.Type.STRING, description='Return the lines containing this text instead of a page'),
+                },
+                required=['handle'],
+            ),
+        )
+
+    async def run_async(self, *, args, tool_context):
+        return self.compactor.read(
+            str(args.get('handle', '')),
+            offset=args.get('offset') or 0,
+            max_chars=args.get('max_chars'),
+            find=str(args.get('find') or ''),
+        )
+
+
+def create_result_compactor(prefix):
+    """Build a ResultCompactor on the shared blob store from `<prefix>_*` environment variables.
+
+    Returns None when `<prefix>_ENABLED` is false.
+    """
+    if os.getenv(f'{prefix}_ENABLED', 'true').lower() == 'false':
+        return None
+    return ResultCompactor(
+        get_blob_store(),
+        max_chars=int(os.getenv(f'{prefix}_MAX_CHARS', '4000')),
+        page_chars=int(os.getenv(f'{prefix}_PAGE_CHARS', '4000')),
+        history_chars=int(os.getenv(f'{prefix}_HISTORY_CHARS', '1000')),
+    )
@@ -0,0 +1,211 @@
+import json
+import math
+import os
+import re
+import zlib
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Optional
+
+from google.adk.models import LlmResponse
+from google.genai import types
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'routing_corpus.jsonl')
+
+# Label used in the corpus for requests the orchestrator must handle itself
+FALLBACK_LABEL = 'none'
+
+# Keyword/regex rules per sub-agent. A request is routed by rules only when
+# exactly one agent matches; requests that mention several domains go to the
+# LLM orchestrator, which can break them down. Every GitHub rule needs a
+# GitHub context anchor (GitHub itself, a repo, a PR, a numbered issue, an
+# owner/name): git words like issue, branch, merge, commit or fork are common
+# outside GitHub, so on their own they are left to the classifier.
+DEFAULT_RULES = {
+    'github_agent': [
+        r'\bgit ?hub\b',
+        r'\brepo(s|sitor(y|ies))?\b',
+        r'\bpull requests?\b|\bprs?\b(?!\s+(team|agency|firm|crisis|campaign|department|strategy))',
+        r'\bissues?\s+#?\d+\b',
+        r'\b(in|on|of|to|from|for)\s+(?!and/or\b)[a-z0-9][a-z0-9-]+/[a-z0-9][a-z0-9_.-]*[a-z0-9]\b',
+        r'\bdependabot\b|\bcode scanning\b|\bstargazers?\b|\bcodebase\b',
+    ],
+    'market_analyzer': [
+        r'\bstocks?\b|\bshares\b|\bequit(y|ies)\b|\bipo\b|\betfs?\b',
+        r'\bmarkets?\b|\bsectors?\b|\beconom(y|ic|ics)\b',
+        r'\binvest(ing|ment|ments|or|ors)?\b|\bportfolio\b|\bvaluations?\b',
+        r'\bearnings\b|\bdividends?\b|\bp/e\b|\bbond yields?\b|\binterest rates?\b',
+        r'\binflation\b|\bnasdaq\b|\bs&p\b|\bdow jones\b|\beconomic indicators?\b',
+    ],
+    'carbon_voice_agent': [
+        r'\bcarbon ?voice\b',
+        r'\bvoice (memos?|messages?|notes?)\b',
+        r'\b(send|post|share)\b.*\b(message|dm|note|update|memo)\b',
+        r'\bdirect messages?\b|\bdms?\b',
+        r'\b(folders?|workspace)\b',
+        r'\bconversations?\b|\bnotify\b|\b(message|ping|tell|update) the team\b',
+    ],
+}
+
+
+@dataclass
+class RouteDecision:
+    """Outcome of pre-routing one request"""
+
+    agent_name: Optional[str]  # None means "let the LLM orchestrator decide"
+    confidence: float
+    source: str  # 'rules', 'classifier' or 'fallback'
+
+
+def _tokens(text):
+    return re.findall(r"[a-z0-9&/#'+.-]+", text.lower())
+
+
+class HashedNgramClassifier:
+    """Multinomial naive Bayes over hashed word uni- and bigrams.
+
+    Small and dependency-free; trains on a few hundred examples in
+    milliseconds, so it is fitted at startup from the routing corpus.
+    """
+
+    def __init__(self, n_features=2 ** 18, alpha=0.1):
+        self.n_features = n_features
+        self.alpha = alpha
+        self.labels = []
+        self._log_priors = {}
+        self._log_likelihoods = {}
+        self._log_unseen = {}
+
+    def _features(self, text):
+        tokens = _tokens(text)
+        grams = tokens + [f'{a} {b}' for a, b in zip(tokens, tokens[1:])]
+        return Counter(zlib.crc32(gram.encode()) % self.n_features for gram in grams)
+
+    def fit(self, texts, labels):
+        counts = defaultdict(Counter)
+        docs = Counter(labels)
+        for text, label in zip(texts, labels):
+            counts[label].update(self._features(text))
+
+        self.labels = sorted(docs)
+        vocabulary = set()
+        for label_counts in counts.values():
+            vocabulary.update(label_counts)
+        vocabulary_size = len(vocabulary) + 1
+
+        for label in self.labels:
+            total = sum(counts[label].values()) + self.alpha * vocabulary_size
+            self._log_priors[label] = math.log(docs[label] / len(labels))
+            self._log_likelihoods[label] = {
+                feature: math.log((count + self.alpha) / total) for feature, count in counts[label].items()
+            }
+            self._log_unseen[label] = math.log(self.alpha / total)
+        return self
+
+    def predict_proba(self, text):
+        features = self._features(text)
+        scores = {}
+        for label in self.labels:
+            likelihoods = self._log_likelihoods[label]
+            unseen = self._log_unseen[label]
+            scores[label] = self._log_priors[label] + sum(
+                count * likelihoods.get(feature, unseen) for feature, count in features.items()
+            )
+        top = max(scores.values())
+        exp_scores = {label: math.exp(score - top) for label, score in scores.items()}
+        norm = sum(exp_scores.values())
+        return {label: value / norm for label, value in exp_scores.items()}
+
+
+def load_corpus(path=CORPUS_PATH):
+    """Load the labelled routing corpus as a list of {'text', 'agent'} dicts"""
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class PreRouter:
+    """Fast local routing stage in front of the LLM orchestrator.
+
+    Keyword rules decide first. When no rule matches, the optional classifier
+    routes requests it is confident about. Everything else falls back to the
+    orchestrator's own `transfer_to_agent` decision.
+    """
+
+    def __init__(self, targets, rules=None, classifier=None, threshold=0.99, aliases=None):
+        self.targets = set(targets)
+        self.aliases = aliases or {}
+        self.threshold = threshold
+        self.classifier = classifier
+        self._rules = {
+            agent: [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
+            for agent, patterns in (rules or DEFAULT_RULES).items()
+        }
+        self.stats = Counter()
+
+    def _resolve(self, agent_name):
+        agent_name = self.aliases.get(agent_name, agent_name)
+        return agent_name if agent_name in self.targets else None
+
+    def route(self, text):
+        """Return a RouteDecision for one user request"""
+        matched = [
+            agent for agent, patterns in self._rules.items()
+            if any(pattern.search(text) for pattern in patterns)
+        ]
+        if len(matched) == 1:
+            agent_name = self._resolve(matched[0])
+            if agent_name:
+                return RouteDecision(agent_name, 1.0, 'rules')
+        if len(matched) > 1:
+            # Multi-domain request: the orchestrator breaks it down
+            return RouteDecision(None, 0.0, 'fallback')
+
+        if self.classifier is not None:
+            probabilities = self.classifier.predict_proba(text)
+            label, confidence = max(probabilities.items(), key=lambda item: item[1])
+            if label != FALLBACK_LABEL and confidence >= self.threshold:
+                agent_name = self._resolve(label)
+                if agent_name:
+                    return RouteDecision(agent_name, confidence, 'classifier')
+        return RouteDecision(None, 0.0, 'fallback')
+
+    def before_model_callback(self, callback_context, llm_request):
+        """ADK before_model_callback: answer with transfer_to_agent when confident.
+
+        Only the first model call of a turn is pre-routed; after a tool call
+        or a transfer back to the orchestrator the LLM decides as usual.
+        """
+        user_content = callback_context.user_content
+        if not llm_request.contents or not user_content or not user_content.parts:
+            return None
+        if llm_request.contents[-1] != user_content:
+            return None
+        text = ' '.join(part.text for part in user_content.parts if part.text)
+        if not text:
+            return None
+
+        decision = self.route(text)
+        self.stats[decision.source] += 1
+        if decision.agent_name is None:
+            return None
+        return LlmResponse(
+            content=types.Content(
+                role='model',
+                parts=[types.Part(function_call=types.FunctionCall(
+                    name='transfer_to_agent',
+                    args={'agent_name': decision.agent_name},
+                ))],
+            ),
+            custom_metadata={'pre_routed': decision.source, 'confidence': decision.confidence},
+        )
+
+
+def create_pre_router(targets, aliases=None, use_classifier=True, threshold=0.99):
+    """Build the default pre-router, training the classifier on the shipped corpus"""
+    classifier = None
+    if use_classifier:
+        corpus = load_corpus()
+        classifier = HashedNgramClassifier().fit(
+            [row['text'] for row in corpus], [row['agent'] for row in corpus]
+        )
+    return PreRouter(targets, classifier=classifier, threshold=threshold, aliases=aliases)
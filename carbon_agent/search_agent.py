@@ -3,45 +3,67 @@ from dotenv import load_dotenv
 from google.adk.agents import Agent
 from google.adk.tools.google_search_tool import GoogleSearchTool
 
-# Load environment variables from .env file
-load_dotenv()
-
-# Create professional market analyzer with Google Search capabilities
-market_analyzer = Agent(
-    model='gemini-1.5-flash',
-    name='market_analyzer',
-    description='A professional market analysis expert specializing in financial markets, trends, and investment research.',
-    instruction='''You are a professional market analyzer with extensive expertise in financial markets, investment strategies, and economic analysis.
-
-    Your capabilities include:
-    - Analyzing stock market trends and performance based on known data
-    - Evaluating company fundamentals and financial strategies
-    - Identifying market opportunities and risks through analysis
-    - Tracking industry developments and competitive dynamics
-    - Providing data-driven investment insights and recommendations
-    - Assessing economic indicators and their market implications
-
-    When conducting market analysis:
-    - Draw from comprehensive knowledge of financial markets
-    - Consider both technical and fundamental analysis approaches
-    - Provide context for market movements and economic events
-    - Include relevant financial metrics and valuation considerations
-    - Evaluate market timing and volatility factors
-    - Assess competitive positioning and industry trends
-
-    Focus areas:
-    - Stock analysis and valuation methodologies
-    - Sector and industry trend analysis
-    - Economic indicators and policy impact assessment
-    - Competitive analysis and market positioning
-    - Risk assessment and portfolio strategy development
-    - Market sentiment and investor behavior analysis
-
-    Note: While web search capabilities are currently unavailable, you provide professional market analysis based on extensive financial knowledge and analytical expertise.
-
-    Provide professional, actionable insights with clear reasoning and analytical framework.''',
-    tools=[
-        # Temporarily disabled GoogleSearchTool due to authentication requirements
-        # GoogleSearchTool()
-    ],
-)
+from .model_cascade import cascade_model
+from .response_cache import create_response_cache
+
+
+def create_market_analyzer():
+    """Build the market analyzer agent"""
+    # Load environment variables from .env file
+    load_dotenv()
+
+    # Answers come from model knowledge only, so repeated and near-duplicate
+    # questions are served from a local response cache
+    response_cache = create_response_cache('MARKET_CACHE')
+
+    # Create professional market analyzer with Google Search capabilities
+    return Agent(
+        model=cascade_model('market_analyzer', 'gemini-1.5-flash'),
+        name='market_analyzer',
+        description='A professional market analysis expert specializing in financial markets, trends, and investment research.',
+        instruction='''You are a professional market analyzer with extensive expertise in financial markets, investment strategies, and economic analysis.
+
+        Your capabilities include:
+        - Analyzing stock market trends and performance based on known data
+        - Evaluating company fundamentals and financial strategies
+        - Identifying market opportunities and risks through analysis
+        - Tracking industry developments and competitive dynamics
+        - Providing data-driven investment insights and recommendations
+        - Assessing economic indicators and their market implications
+
+        When conducting market analysis:
+        - Draw from comprehensive knowledge of financial markets
+        - Consider both technical and fundamental analysis approaches
+        - Provide context for market movements and economic events
+        - Include relevant financial metrics and valuation considerations
+        - Evaluate market timing and volatility factors
+        - Assess competitive positioning and industry trends
+
+        Focus areas:
+        - Stock analysis and valuation methodologies
+        - Sector and industry trend analysis
+        - Economic indicators and policy impact assessment
+        - Competitive analysis and market positioning
+        - Risk assessment and portfolio strategy development
+        - Market sentiment and investor behavior analysis
+
+        Note: While web search capabilities are currently unavailable, you provide professional market analysis based on extensive financial knowledge and analytical expertise.
+
+        Provide professional, actionable insights with clear reasoning and analytical framework.''',
+        tools=[
+            # Temporarily disabled GoogleSearchTool due to authentication requirements
+            # GoogleSearchTool()
+        ],
+        before_model_callback=response_cache.before_model_callback if response_cache else None,
+        after_model_callback=response_cache.after_model_callback if response_cache else None,
+    )
+
+
+def __getattr__(name):
+    # Keep `from .search_agent import market_analyzer` working; the agent is only
+    # built the first time it is asked for.
+    global market_analyzer
+    if name == 'market_analyzer':
+        market_analyzer = create_market_analyzer()
+        return market_analyzer
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,533 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from google.adk.errors.already_exists_error import AlreadyExistsError
+from google.adk.events import Event
+from google.adk.sessions import BaseSessionService, Session
+from google.adk.sessions.base_session_service import ListSessionsResponse
+from google.adk.sessions.state import State
+
+from .context_management import SUMMARY_STATE_KEY
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS app_states (
+    app_name TEXT PRIMARY KEY,
+    state TEXT NOT NULL,
+    update_time REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS user_states (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id)
+);
+CREATE TABLE IF NOT EXISTS sessions (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    snapshot_seq INTEGER NOT NULL DEFAULT 0,
+    history_seq INTEGER NOT NULL DEFAULT 0,
+    last_seq INTEGER NOT NULL DEFAULT 0,
+    create_time REAL NOT NULL,
+    update_time REAL NOT NULL,
+    PRIMARY KEY (app_name, user_id, id)
+);
+CREATE INDEX IF NOT EXISTS sessions_by_update_time ON sessions (update_time);
+CREATE TABLE IF NOT EXISTS events (
+    app_name TEXT NOT NULL,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    invocation_id TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    state_delta TEXT,
+    data TEXT NOT NULL,
+    PRIMARY KEY (app_name, user_id, session_id, seq)
+) WITHOUT ROWID;
+'''
+
+SESSION_KEY = 'app_name=? AND user_id=? AND id=?'
+EVENT_KEY = 'app_name=? AND user_id=? AND session_id=?'
+
+
+def _split_state(state):
+    """Split a state dict into app, user and session deltas (temp: keys dropped)"""
+    parts = {'app': {}, 'user': {}, 'session': {}}
+    for key, value in (state or {}).items():
+        if key.startswith(State.APP_PREFIX):
+            parts['app'][key[len(State.APP_PREFIX):]] = value
+        elif key.startswith(State.USER_PREFIX):
+            parts['user'][key[len(State.USER_PREFIX):]] = value
+        elif not key.startswith(State.TEMP_PREFIX):
+            parts['session'][key] = value
+    return parts
+
+
+def _merge_state(app_state, user_state, session_state):
+    merged = dict(session_state)
+    merged.update({State.APP_PREFIX + key: value for key, value in app_state.items()})
+    merged.update({State.USER_PREFIX + key: value for key, value in user_state.items()})
+    return merged
+
+
+class AppendOnlySessionService(BaseSessionService):
+    """ADK session service storing each session as an append-only event log in SQLite.
+
+    ADK's database services rewrite the session's state JSON and commit on
+    every event. Here an event is one insert into a table clustered by
+    (session, sequence number), carrying only its own state delta. Writes
+    from all sessions are group-committed: while one transaction is being
+    committed, new events queue up and go into the next one, so commits
+    stay short when idle and batch up under load. Every `snapshot_every`
+    state changes the session's full state is written as a snapshot, and
+    loading a session reads the snapshot plus the deltas after it instead
+    of replaying the whole history. When the rolling summary of
+    context_management covers older turns, those events are not loaded at
+    all (`trim_summarized`) since no model request uses them.
+
+    The database runs in WAL mode with one connection, used from a single
+    worker thread. Sessions idle for longer than `ttl_seconds` are deleted by
+    `compact()`, which also runs every `compact_interval` seconds in the
+    background. Several processes may share a database, but each session
+    should be written by one process at a time.
+    """
+
+    def __init__(self, db_path='sessions.db', snapshot_every=50, commit_delay=0.0, max_batch=512,
+                 wait_for_commit=True, trim_summarized=True, ttl_seconds=None, compact_interval=3600.0,
+                 synchronous='NORMAL'):
+        self.db_path = db_path
+        self.snapshot_every = snapshot_every
+        self.commit_delay = commit_delay
+        self.max_batch = max_batch
+        self.wait_for_commit = wait_for_commit
+        self.trim_summarized = trim_summarized
+        self.ttl_seconds = ttl_seconds
+        self.compact_interval = compact_interval
+        self.synchronous = synchronous
+        self.stats = {'events': 0, 'commits': 0, 'snapshots': 0, 'loads': 0, 'events_loaded': 0,
+                      'deltas_replayed': 0, 'sessions_expired': 0}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='session-store')
+        self._conn = None
+        self._pending = []
+        self._flusher = None
+        self._compactor = None
+        # (app, user, session) -> [last seq, state changes since the snapshot]
+        self._cursors = OrderedDict()
+        self._max_cursors = 10000
+        self._lock = threading.Lock()
+
+    # -- worker thread --
+
+    def _connect(self):
+        if self._conn is None:
+            directory = os.path.dirname(os.path.abspath(self.db_path))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, isolation_level=None, check_same_thread=False)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute(f'PRAGMA synchronous={self.synchronous}')
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            conn.execute('PRAGMA busy_timeout=5000')
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    async def _run(self, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, lambda: fn(self._connect(), *args))
+
+    @staticmethod
+    def _transaction(conn, fn, *args):
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            result = fn(conn, *args)
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        conn.execute('COMMIT')
+        return result
+
+    @staticmethod
+    def _merge_stored(conn, table, where, params, delta, timestamp):
+        row = conn.execute(f'SELECT state FROM {table} WHERE {where}', params).fetchone()
+        state = json.loads(row[0]) if row else {}
+        state.update(delta)
+        columns = 'app_name, state, update_time' if table == 'app_states' else 'app_name, user_id, state, update_time'
+        marks = ', '.join('?' * len(columns.split(', ')))
+        conn.execute(f'INSERT OR REPLACE INTO {table} ({columns}) VALUES ({marks})',
+                     (*params, json.dumps(state), timestamp))
+
+    def _apply_writes(self, conn, writes):
+        touched = {}
+        for op in writes:
+            kind = op[0]
+            if kind == 'event':
+                _, key, seq, event_id, invocation_id, timestamp, delta, data = op
+                conn.execute(
+                    'INSERT INTO events (app_name, user_id, session_id, seq, event_id, invocation_id, timestamp,'
+                    ' state_delta, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                    (*key, seq, event_id, invocation_id, timestamp, delta, data),
+                )
+                touched[key] = (seq, timestamp)
+            elif kind == 'session':
+                _, key, state, timestamp = op
+                conn.execute(
+                    'INSERT INTO sessions (app_name, user_id, id, state, create_time, update_time)'
+                    ' VALUES (?, ?, ?, ?, ?, ?)', (*key, state, timestamp, timestamp),
+                )
+            elif kind == 'app_state':
+                _, app_name, delta, timestamp = op
+                self._merge_stored(conn, 'app_states', 'app_name=?', (app_name,), delta, timestamp)
+            elif kind == 'user_state':
+                _, app_name, user_id, delta, timestamp = op
+                self._merge_stored(conn, 'user_states', 'app_name=? AND user_id=?', (app_name, user_id),
+                                   delta, timestamp)
+            elif kind == 'snapshot':
+                _, key, state, seq = op
+                conn.execute(f'UPDATE sessions SET state=?, snapshot_seq=? WHERE {SESSION_KEY}', (state, seq, *key))
+            elif kind == 'history':
+                _, key, seq = op
+                conn.execute(f'UPDATE sessions SET history_seq=? WHERE {SESSION_KEY}', (seq, *key))
+        # One row update per session and commit, however many events it got
+        for key, (seq, timestamp) in touched.items():
+            conn.execute(f'UPDATE sessions SET last_seq=?, update_time=? WHERE {SESSION_KEY}', (seq, timestamp, *key))
+
+    def _commit_batch(self, conn, batch):
+        try:
+            self._transaction(conn, lambda c: [self._apply_writes(c, writes) for writes in batch])
+            return [None] * len(batch)
+        except sqlite3.Error:
+            # Commit the writes one by one so a bad one only fails its own caller
+            results = []
+            for writes in batch:
+                try:
+                    self._transaction(conn, self._apply_writes, writes)
+                    results.append(None)
+                except sqlite3.Error as e:
+                    results.append(e)
+            return results
+
+    @staticmethod
+    def _load_state(conn, key, snapshot, snapshot_seq):
+        state = json.loads(snapshot)
+        rows = conn.execute(
+            f'SELECT state_delta FROM events WHERE {EVENT_KEY} AND seq > ? AND state_delta IS NOT NULL ORDER BY seq',
+            (*key, snapshot_seq),
+        ).fetchall()
+        for (delta,) in rows:
+            state.update(json.loads(delta))
+        return state, len(rows)
+
+    @staticmethod
+    def _stored_state(conn, table, where, params):
+        row = conn.execute(f'SELECT state FROM {table} WHERE {where}', params).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def _read_session(self, conn, key, config, trim):
+        row = conn.execute(
+            f'SELECT state, snapshot_seq, history_seq, last_seq, update_time FROM sessions WHERE {SESSION_KEY}', key,
+        ).fetchone()
+        if row is None:
+            return None
+        snapshot, snapshot_seq, history_seq, last_seq, update_time = row
+        session_state, replayed = self._load_state(conn, key, snapshot, snapshot_seq)
+
+        def select(start):
+            query = f'SELECT event_id, data FROM events WHERE {EVENT_KEY} AND seq >= ?'
+            params = [*key, start]
+            if config and config.after_timestamp:
+                query += ' AND timestamp >= ?'
+                params.append(config.after_timestamp)
+            if config and config.num_recent_events:
+                query += ' ORDER BY seq DESC LIMIT ?'
+                params.append(config.num_recent_events)
+                return conn.execute(query, params).fetchall()[::-1]
+            return conn.execute(query + ' ORDER BY seq', params).fetchall()
+
+        summary = session_state.get(SUMMARY_STATE_KEY) or {}
+        start = history_seq if trim and history_seq and summary.get('first_kept_event_id') else 0
+        rows = select(start)
+        if start and rows and not (config and (config.num_recent_events or config.after_timestamp)) \
+                and rows[0][0] != summary['first_kept_event_id']:
+            rows = select(0)  # The summary's boundary was not where we recorded it
+        events = [Event.model_validate_json(data) for _, data in rows]
+        app_state = self._stored_state(conn, 'app_states', 'app_name=?', (key[0],))
+        user_state = self._stored_state(conn, 'user_states', 'app_name=? AND user_id=?', key[:2])
+        return {
+            'state': _merge_state(app_state, user_state, session_state),
+            'events': events,
+            'update_time': update_time,
+            'last_seq': last_seq,
+            'replayed': replayed,
+        }
+
+    def _read_sessions(self, conn, app_name, user_id):
+        if user_id is None:
+            rows = conn.execute(
+                'SELECT user_id, id, state, snapshot_seq, update_time FROM sessions WHERE app_name=?', (app_name,),
+            ).fetchall()
+        else:
+            rows = conn.execute(
+                'SELECT user_id, id, state, snapshot_seq, update_time FROM sessions WHERE app_name=? AND user_id=?',
+                (app_name, user_id),
+            ).fetchall()
+        app_state = self._stored_state(conn, 'app_states', 'app_name=?', (app_name,))
+        user_states = {}
+        sessions = []
+        for session_user, session_id, snapshot, snapshot_seq, update_time in rows:
+            if session_user not in user_states:
+                user_states[session_user] = self._stored_state(
+                    conn, 'user_states', 'app_name=? AND user_id=?', (app_name, session_user),
+                )
+            session_state, _ = self._load_state(conn, (app_name, session_user, session_id), snapshot, snapshot_seq)
+            sessions.append(Session(
+                app_name=app_name, user_id=session_user, id=session_id, events=[], last_update_time=update_time,
+                state=_merge_state(app_state, user_states[session_user], session_state),
+            ))
+        return sessions
+
+    def _delete(self, conn, key):
+        conn.execute(f'DELETE FROM events WHERE {EVENT_KEY}', key)
+        conn.execute(f'DELETE FROM sessions WHERE {SESSION_KEY}', key)
+
+    def _expire(self, conn, cutoff, limit=500):
+        expired = 0
+        while True:
+            keys = conn.execute(
+                'SELECT app_name, user_id, id FROM sessions WHERE update_time < ? LIMIT ?', (cutoff, limit),
+            ).fetchall()
+            if not keys:
+                break
+            # Short transactions so appends are not held up behind a large expiry
+            self._transaction(conn, lambda c: [self._delete(c, key) for key in keys])
+            expired += len(keys)
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.execute('PRAGMA incremental_vacuum')
+        return expired
+
+    # -- event loop --
+
+    async def _submit(self, writes):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        if not self.wait_for_commit:
+            future.add_done_callback(self._log_failure)
+        self._pending.append((writes, future))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = loop.create_task(self._flush())
+        self._start_compactor()
+        return future
+
+    @staticmethod
+    def _log_failure(future):
+        if not future.cancelled() and future.exception() is not None:
+            logger.warning('Session write failed: %s', future.exception())
+
+    async def _flush(self):
+        if self.commit_delay:
+            await asyncio.sleep(self.commit_delay)
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+            try:
+                results = await self._run(self._commit_batch, [writes for writes, _ in batch])
+            except Exception as e:
+                results = [e] * len(batch)
+            self.stats['commits'] += 1
+            for (_, future), error in zip(batch, results):
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+    async def flush(self):
+        """Wait until every event appended so far is committed"""
+        while self._flusher is not None and not self._flusher.done():
+            await asyncio.shield(self._flusher)
+
+    def _start_compactor(self):
+        if self.ttl_seconds and self.compact_interval and (self._compactor is None or self._compactor.done()):
+            self._compactor = asyncio.get_running_loop().create_task(self._compact_periodically())
+
+    async def _compact_periodically(self):
+        while True:
+            try:
+                await self.compact()
+            except Exception as e:
+                logger.warning('Session compaction failed: %s', e)
+            await asyncio.sleep(self.compact_interval)
+
+    async def compact(self, ttl_seconds=None):
+        """Delete sessions idle for longer than `ttl_seconds` (default: the service TTL).
+
+        Returns the number of sessions deleted.
+        """
+        ttl = ttl_seconds if ttl_seconds is not None else self.ttl_seconds
+        if not ttl:
+            return 0
+        await self.flush()
+        expired = await self._run(self._expire, time.time() - ttl)
+        if expired:
+            with self._lock:
+                self._cursors.clear()
+            logger.info('Expired %d sessions idle for over %.0fs', expired, ttl)
+        self.stats['sessions_expired'] += expired
+        return expired
+
+    async def close(self):
+        """Commit pending events and close the database"""
+        if self._compactor is not None:
+            self._compactor.cancel()
+        await self.flush()
+        if self._conn is not None:
+            await self._run(lambda conn: conn.close())
+            self._conn = None
+        self._executor.shutdown(wait=False)
+
+    def _remember(self, key, last_seq, since_snapshot=0):
+        with self._lock:
+            self._cursors[key] = [last_seq, since_snapshot]
+            self._cursors.move_to_end(key)
+            while len(self._cursors) > self._max_cursors:
+                self._cursors.popitem(last=False)
+
+    async def _cursor(self, key):
+        cursor = self._cursors.get(key)
+        if cursor is None:
+            await self.flush()
+            row = await self._run(
+                lambda conn: conn.execute(f'SELECT last_seq FROM sessions WHERE {SESSION_KEY}', key).fetchone()
+            )
+            if row is None:
+                raise ValueError(f'Session {key[2]} not found.')
+            # Another append may have loaded it while this one waited
+            cursor = self._cursors.get(key)
+            if cursor is None:
+                self._remember(key, row[0], self.snapshot_every)
+                cursor = self._cursors[key]
+        return cursor
+
+    async def create_session(self, *, app_name, user_id, state=None, session_id=None):
+        session_id = (session_id or '').strip() or str(uuid.uuid4())
+        key = (app_name, user_id, session_id)
+        now = time.time()
+        parts = _split_state(state)
+        writes = [('session', key, json.dumps(parts['session']), now)]
+        if parts['app']:
+            writes.append(('app_state', app_name, parts['app'], now))
+        if parts['user']:
+            writes.append(('user_state', app_name, user_id, parts['user'], now))
+        try:
+            await (await self._submit(writes))
+        except sqlite3.IntegrityError:
+            raise AlreadyExistsError(f'Session with id {session_id} already exists.')
+        self._remember(key, 0)
+        loaded = await self._run(self._read_session, key, None, False)
+        return Session(app_name=app_name, user_id=user_id, id=session_id, state=loaded['state'], events=[],
+                       last_update_time=now)
+
+    async def get_session(self, *, app_name, user_id, session_id, config=None):
+        key = (app_name, user_id, session_id)
+        await self.flush()
+        loaded = await self._run(self._read_session, key, config, self.trim_summarized)
+        if loaded is None:
+            return None
+        self.stats['loads'] += 1
+        self.stats['events_loaded'] += len(loaded['events'])
+        self.stats['deltas_replayed'] += loaded['replayed']
+        self._remember(key, loaded['last_seq'], loaded['replayed'])
+        return Session(app_name=app_name, user_id=user_id, id=session_id, state=loaded['state'],
+                       events=loaded['events'], last_update_time=loaded['update_time'])
+
+    async def list_sessions(self, *, app_name, user_id=None):
+        await self.flush()
+        return ListSessionsResponse(sessions=await self._run(self._read_sessions, app_name, user_id))
+
+    async def delete_session(self, *, app_name, user_id, session_id):
+        key = (app_name, user_id, session_id)
+        await self.flush()
+        await self._run(self._transaction, self._delete, key)
+        with self._lock:
+            self._cursors.pop(key, None)
+
+    async def append_event(self, session, event):
+        if event.partial:
+            return event
+        key = (session.app_name, session.user_id, session.id)
+        cursor = await self._cursor(key)
+        event = await super().append_event(session, event)
+        session.last_update_time = event.timestamp
+        cursor[0] += 1
+        seq = cursor[0]
+
+        parts = _split_state(event.actions.state_delta if event.actions else None)
+        writes = [('event', key, seq, event.id, event.invocation_id, event.timestamp,
+                   json.dumps(parts['session']) if parts['session'] else None,
+                   event.model_dump_json(exclude_none=True))]
+        if parts['app']:
+            writes.append(('app_state', session.app_name, parts['app'], event.timestamp))
+        if parts['user']:
+            writes.append(('user_state', session.app_name, session.user_id, parts['user'], event.timestamp))
+        if parts['session']:
+            cursor[1] += 1
+            if cursor[1] >= self.snapshot_every:
+                snapshot = _split_state(session.state)['session']
+                writes.append(('snapshot', key, json.dumps(snapshot), seq))
+                cursor[1] = 0
+                self.stats['snapshots'] += 1
+            summary = parts['session'].get(SUMMARY_STATE_KEY)
+            if isinstance(summary, dict) and summary.get('first_kept_event_id'):
+                # session.events is a gap-free tail of the log ending at seq
+                events = session.events
+                position = next((i for i in range(len(events) - 1, -1, -1)
+                                 if events[i].id == summary['first_kept_event_id']), None)
+                if position is not None:
+                    writes.append(('history', key, seq - (len(events) - 1 - position)))
+
+        self.stats['events'] += 1
+        future = await self._submit(writes)
+        if self.wait_for_commit:
+            try:
+                await future
+            except sqlite3.IntegrityError:
+                # Another process appended to this session; reread its position next time
+                with self._lock:
+                    self._cursors.pop(key, None)
+                raise
+        return event
+
+    def metrics(self):
+        return {**self.stats, 'pending_writes': len(self._pending), 'db_path': self.db_path}
+
+
+def create_session_service():
+    """AppendOnlySessionService configured from SESSION_DB_* environment variables.
+
+    Returns None when SESSION_STORE_ENABLED is false.
+    """
+    if os.getenv('SESSION_STORE_ENABLED', 'true').lower() == 'false':
+        return None
+    ttl_days = float(os.getenv('SESSION_DB_TTL_DAYS', '30'))
+    return AppendOnlySessionService(
+        db_path=os.getenv('SESSION_DB_PATH', 'sessions.db'),
+        snapshot_every=int(os.getenv('SESSION_DB_SNAPSHOT_EVERY', '50')),
+        commit_delay=float(os.getenv('SESSION_DB_COMMIT_DELAY_MS', '0')) / 1000,
+        wait_for_commit=os.getenv('SESSION_DB_WAIT_FOR_COMMIT', 'true').lower() != 'false',
+        trim_summarized=os.getenv('SESSION_DB_TRIM_SUMMARIZED', 'true').lower() != 'false',
+        ttl_seconds=ttl_days * 86400 if ttl_days > 0 else None,
+        compact_interval=float(os.getenv('SESSION_DB_COMPACT_MINUTES', '60')) * 60,
+        synchronous=os.getenv('SESSION_DB_SYNCHRONOUS', 'NORMAL'),
+    )
@@ -0,0 +1,357 @@
+import asyncio
+import base64
+import contextlib
+import contextvars
+import hashlib
+import hmac
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from typing import Optional
+
+from google.adk.agents.run_config import RunConfig, StreamingMode
+from google.genai import types
+
+logger = logging.getLogger(__name__)
+
+# Buffer of the stream being produced in this task, if any; fan-out branches
+# inherit it and publish their own events into it
+_current_buffer = contextvars.ContextVar('carbon_stream_buffer', default=None)
+
+
+def stream_events(event, branch=None):
+    """Convert an ADK Event into the dicts sent to streaming clients.
+
+    `delta` carries partial text as it is generated, `message` the complete
+    text of a response (after its deltas, or on its own when a response was
+    not streamed, e.g. served from a cache). Tool calls, tool results and
+    transfers are reported as progress without their payloads.
+    """
+    out = []
+    base = {'agent': event.author}
+    if branch:
+        base['branch'] = branch
+    if event.error_code:
+        out.append({'type': 'error', **base, 'message': event.error_message or event.error_code})
+    for part in (event.content.parts if event.content else None) or []:
+        if part.text and not part.thought:
+            out.append({'type': 'delta' if event.partial else 'message', **base, 'text': part.text})
+        elif part.function_call and not event.partial:
+            call = part.function_call
+            if call.name == 'transfer_to_agent':
+                out.append({'type': 'transfer', **base, 'to': (call.args or {}).get('agent_name')})
+            else:
+                out.append({'type': 'tool_call', **base, 'tool': call.name, 'args': call.args or {}})
+        elif part.function_response:
+            response = part.function_response.response or {}
+            failed = bool(response.get('isError') or response.get('error'))
+            out.append({'type': 'tool_result', **base, 'tool': part.function_response.name,
+                        'status': 'error' if failed else 'ok'})
+    return out
+
+
+async def publish(event, branch=None):
+    """Forward an event from a nested run (e.g. a fan-out branch) to the current stream, if any"""
+    buffer = _current_buffer.get()
+    if buffer is not None:
+        for item in stream_events(event, branch):
+            await buffer.put(item)
+
+
+def current_streaming_mode():
+    """Streaming mode of the stream being produced in this task"""
+    return StreamingMode.SSE if _current_buffer.get() is not None else StreamingMode.NONE
+
+
+class StreamBuffer:
+    """Bounded buffer between an agent run and a (possibly slow) client.
+
+    Consecutive text deltas from the same agent are merged while they wait,
+    so a slow client receives fewer, larger chunks and nothing is dropped.
+    Any other event waits for space once `max_events` are buffered, which
+    pauses the run until the client catches up.
+    """
+
+    def __init__(self, max_events=64):
+        self.max_events = max_events
+        self.stats = Counter()
+        self._events = deque()
+        self._readable = asyncio.Event()
+        self._writable = asyncio.Event()
+        self._writable.set()
+        self._closed = False
+
+    async def put(self, item):
+        if self._closed:
+            return
+        last = self._events[-1] if self._events else None
+        if (item['type'] == 'delta' and last is not None and last['type'] == 'delta'
+                and last['agent'] == item['agent'] and last.get('branch') == item.get('branch')):
+            last['text'] += item['text']
+            self.stats['coalesced'] += 1
+            return
+        while len(self._events) >= self.max_events and not self._closed:
+            self.stats['producer_waits'] += 1
+            self._writable.clear()
+            await self._writable.wait()
+        self._events.append(item)
+        self.stats['peak'] = max(self.stats['peak'], len(self._events))
+        self._readable.set()
+
+    async def get(self):
+        """Next item, or None once the buffer is closed and drained"""
+        while not self._events:
+            if self._closed:
+                return None
+            self._readable.clear()
+            await self._readable.wait()
+        item = self._events.popleft()
+        self._writable.set()
+        return item
+
+    def close(self):
+        self._closed = True
+        self._readable.set()
+        self._writable.set()
+
+
+class StreamMetrics:
+    """Time to first token and total time of streamed runs, process-wide"""
+
+    def __init__(self, window=1000):
+        self.stats = Counter()
+        self.ttft_ms = deque(maxlen=window)
+        self.first_event_ms = deque(maxlen=window)
+        self.total_ms = deque(maxlen=window)
+
+    def record(self, ttft_ms, first_event_ms, total_ms, outcome):
+        self.stats[outcome] += 1
+        if ttft_ms is not None:
+            self.ttft_ms.append(ttft_ms)
+        if first_event_ms is not None:
+            self.first_event_ms.append(first_event_ms)
+        self.total_ms.append(total_ms)
+
+    def snapshot(self):
+        def percentiles(values):
+            values = sorted(values)
+            if not values:
+                return None
+            return {p: round(values[min(len(values) - 1, int(len(values) * q))], 1)
+                    for p, q in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))}
+
+        return {
+            **dict(self.stats),
+            'ttft_ms': percentiles(self.ttft_ms),
+            'first_event_ms': percentiles(self.first_event_ms),
+            'total_ms': percentiles(self.total_ms),
+        }
+
+
+_metrics = None
+
+
+def get_stream_metrics():
+    """Process-wide StreamMetrics"""
+    global _metrics
+    if _metrics is None:
+        _metrics = StreamMetrics()
+    return _metrics
+
+
+async def stream_run(runner, user_id, session_id, message, streaming=True, max_buffered_events=64, metrics=None):
+    """Run one request and yield stream dicts as they are produced.
+
+    Model output is streamed token by token from whichever agent is
+    answering, transfers and fan-out branches included. The last item is
+    `done`, with the time to first token (first text the client received),
+    time to first event and total time in milliseconds. Closing the
+    generator early (a client disconnect) cancels the run.
+    """
+    metrics = metrics or get_stream_metrics()
+    buffer = StreamBuffer(max_buffered_events)
+    start = time.perf_counter()
+    run_config = RunConfig(streaming_mode=StreamingMode.SSE if streaming else StreamingMode.NONE)
+    new_message = types.Content(role='user', parts=[types.Part.from_text(text=message)])
+
+    async def produce():
+        if streaming:
+            _current_buffer.set(buffer)
+        try:
+            async for event in runner.run_async(
+                user_id=user_id, session_id=session_id, new_message=new_message, run_config=run_config,
+            ):
+                for item in stream_events(event):
+                    await buffer.put(item)
+        except Exception as e:
+            logger.warning('Streamed run for session %s failed: %s', session_id, e)
+            await buffer.put({'type': 'error', 'agent': None, 'message': str(e)})
+            buffer.stats['failed'] += 1
+        finally:
+            buffer.close()
+
+    producer = asyncio.create_task(produce())
+    ttft_ms = first_event_ms = None
+    outcome = 'disconnected'
+    try:
+        while True:
+            item = await buffer.get()
+            if item is None:
+                break
+            elapsed = (time.perf_counter() - start) * 1000
+            if first_event_ms is None:
+                first_event_ms = elapsed
+            if ttft_ms is None and item['type'] in ('delta', 'message'):
+                ttft_ms = elapsed
+            yield item
+        outcome = 'failed' if buffer.stats['failed'] else 'completed'
+        total_ms = (time.perf_counter() - start) * 1000
+        yield {
+            'type': 'done',
+            'ttft_ms': round(ttft_ms, 1) if ttft_ms is not None else None,
+            'first_event_ms': round(first_event_ms, 1) if first_event_ms is not None else None,
+            'total_ms': round(total_ms, 1),
+            'coalesced_deltas': buffer.stats['coalesced'],
+        }
+    finally:
+        if not producer.done():
+            buffer.close()
+            producer.cancel()
+            try:
+                await producer
+            except asyncio.CancelledError:
+                pass
+        metrics.record(ttft_ms, first_event_ms, (time.perf_counter() - start) * 1000, outcome)
+
+
+def user_token(user_id, secret, ttl=3600.0):
+    """Bearer token naming `user_id` for /run_stream, signed with `secret` and valid for `ttl` seconds.
+
+    Minted by whatever signs users in (a web backend, a gateway), with the
+    API's STREAM_API_AUTH_SECRET.
+    """
+    payload = f'{user_id}.{int(time.time() + ttl)}'
+    signature = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    return f"{payload}.{base64.urlsafe_b64encode(signature).decode().rstrip('=')}"
+
+
+def verify_user_token(token, secret):
+    """User id named by a valid, unexpired `user_token`, or None"""
+    payload, _, signature = token.rpartition('.')
+    user_id, _, expires = payload.rpartition('.')
+    if not user_id or not expires.isdigit() or int(expires) < time.time():
+        return None
+    expected = hmac.new(secret.encode(), payload.encode(), hashlib.sha256).digest()
+    if not hmac.compare_digest(base64.urlsafe_b64encode(expected).decode().rstrip('='), signature):
+        return None
+    return user_id
+
+
+def create_streaming_api(app=None, session_service=None):
+    """FastAPI app that streams agent runs to clients over Server-Sent Events.
+
+    POST /run_stream with {"message", "user_id", "session_id", "streaming"}
+    streams one run (a session is created when session_id is omitted; its id
+    is the first event). Callers send `Authorization: Bearer <user_token>`
+    and the run's user is the one the token names, signed with
+    STREAM_API_AUTH_SECRET. Without the secret the API refuses to start
+    unless STREAM_API_ALLOW_UNAUTHENTICATED is true; the body's user_id is
+    then taken as given, so any caller can read and continue any user's
+    sessions, and the Carbon Voice OAuth agent does not use or link
+    per-user tokens for its runs. GET /stream_metrics returns time to
+    first token percentiles. Sessions are kept in the SQLite session store
+    (session_store.py) unless SESSION_STORE_ENABLED is false. When the
+    Carbon Voice OAuth broker is configured (oauth_broker.py), its
+    /oauth/start and callback routes are served too, so users connect their
+    accounts to the process that uses the tokens. Serve it with
+    `uvicorn --factory carbon_agent.streaming:create_streaming_api`.
+    """
+    from fastapi import FastAPI, Header, HTTPException
+    from google.adk.runners import Runner
+    from google.adk.sessions import InMemorySessionService
+    from pydantic import BaseModel
+    from sse_starlette.sse import EventSourceResponse
+
+    from .oauth_broker import authenticate, create_oauth_router, get_oauth_broker
+    from .session_store import create_session_service
+
+    if app is None:
+        from .agent import app
+    session_service = session_service or create_session_service() or InMemorySessionService()
+    runner = Runner(app=app, session_service=session_service)
+    max_buffered_events = int(os.getenv('STREAM_MAX_BUFFERED_EVENTS', '64'))
+    ping_seconds = int(os.getenv('STREAM_PING_SECONDS', '15'))
+    send_timeout = float(os.getenv('STREAM_SEND_TIMEOUT', '30'))
+    auth_secret = os.getenv('STREAM_API_AUTH_SECRET', '')
+    if not auth_secret:
+        if os.getenv('STREAM_API_ALLOW_UNAUTHENTICATED', 'false').lower() != 'true':
+            raise ValueError(
+                'STREAM_API_AUTH_SECRET is required to authenticate /run_stream callers. '
+                'Set STREAM_API_ALLOW_UNAUTHENTICATED=true to take user ids from request bodies instead.'
+            )
+        logger.warning(
+            'STREAM_API_AUTH_SECRET is not set: /run_stream takes the user id from the request body, '
+            "so any caller can read and continue any user's sessions. Only serve it to trusted clients."
+        )
+
+    class RunStreamRequest(BaseModel):
+        message: str
+        user_id: Optional[str] = None
+        session_id: Optional[str] = None
+        streaming: bool = True
+
+    @contextlib.asynccontextmanager
+    async def lifespan(api):
+        yield
+        if hasattr(session_service, 'close'):
+            await session_service.close()  # Commits events still queued
+        if broker is not None:
+            await broker.close()  # Saves tokens refreshed since the last save
+
+    api = FastAPI(title=f'{app.name} streaming', lifespan=lifespan)
+    broker = get_oauth_broker()
+    if broker is not None:
+        api.include_router(create_oauth_router(broker))
+
+    @api.post('/run_stream')
+    async def run_stream(request: RunStreamRequest, authorization: str = Header('')):
+        user_id = request.user_id or 'user'
+        if auth_secret:
+            scheme, _, token = authorization.partition(' ')
+            user_id = verify_user_token(token.strip(), auth_secret) if scheme.lower() == 'bearer' else None
+            if user_id is None:
+                raise HTTPException(status_code=401, detail='Missing, invalid or expired user token')
+            if request.user_id not in (None, user_id):
+                raise HTTPException(status_code=403, detail='user_id does not match the user token')
+        session = None
+        if request.session_id:
+            session = await session_service.get_session(
+                app_name=runner.app_name, user_id=user_id, session_id=request.session_id,
+            )
+            if session is None:
+                raise HTTPException(status_code=404, detail='Session not found')
+        else:
+            session = await session_service.create_session(app_name=runner.app_name, user_id=user_id)
+
+        async def events():
+            if auth_secret:
+                # The response streams from its own task; the run inherits this
+                authenticate(user_id)
+            yield {'event': 'session', 'data': json.dumps({'type': 'session', 'session_id': session.id})}
+            async for item in stream_run(
+                runner, user_id, session.id, request.message,
+                streaming=request.streaming, max_buffered_events=max_buffered_events,
+            ):
+                yield {'event': item['type'], 'data': json.dumps(item, default=str)}
+
+        # Pings keep proxies from closing quiet streams; a client that stops
+        # reading for send_timeout seconds is disconnected
+        return EventSourceResponse(events(), ping=ping_seconds, send_timeout=send_timeout)
+
+    @api.get('/stream_metrics')
+    async def stream_metrics():
+        return get_stream_metrics().snapshot()
+
+    return api
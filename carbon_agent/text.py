@@ -0,0 +1,28 @@
+import re
+import unicodedata
+
+# Words that carry no meaning for lookups and searches
+STOPWORDS = frozenset('''
+a about an and are as at be can could do does for from give how i in is it its me my of on or please
+should show tell that the this to what whats which will with would you your
+'''.split())
+
+
+def normalize_text(text):
+    """Case-, punctuation- and whitespace-insensitive form of a text"""
+    text = unicodedata.normalize('NFKC', text).lower()
+    text = re.sub(r'[^a-z0-9&$%.]+', ' ', text)
+    text = re.sub(r'\.(?!\d)', ' ', text)  # keep decimal points, drop full stops
+    return ' '.join(text.split())
+
+
+def stem(word):
+    """Crude stem of a normalized word: its first five characters"""
+    # Prefix truncation maps analyze/analysis, stock/stocks, etc. to the same
+    # term without a stemming library
+    return word[:5]
+
+
+def content_terms(text, stopwords=STOPWORDS):
+    """Stemmed words of a text, without `stopwords`"""
+    return [stem(word) for word in normalize_text(text).split() if word not in stopwords]
@@ -0,0 +1,317 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from dataclasses import dataclass
+
+from google.adk.tools.mcp_tool.mcp_session_manager import retry_on_errors
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
+from mcp.types import Tool
+
+from .admission import AUTH_STATUSES, error_status, get_admission_controller, is_overload, upstream_name
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk snapshot layout changes; older snapshots are ignored
+CATALOG_FORMAT_VERSION = 2
+
+# serverInfo.version each server last reported at initialize, by server identity
+_server_versions = {}
+
+
+def _server(params):
+    """Server URL or command line of connection params (or of stdio server params)"""
+    if hasattr(params, 'server_params'):
+        params = params.server_params
+    if hasattr(params, 'command'):
+        return params.model_dump(mode='json')
+    return {'url': params.url}
+
+
+def catalog_key(connection_params, headers=None, catalog_version=''):
+    """Key a catalog by server URL or command line, header set and version.
+
+    The key is a hash, so tokens in headers or the server environment never
+    end up in snapshot file names.
+    """
+    raw = json.dumps({'server': _server(connection_params), 'headers': headers or {}, 'version': catalog_version},
+                     sort_keys=True)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def record_server_version(params, version):
+    """Remember the serverInfo.version a server reported at initialize"""
+    _server_versions[json.dumps(_server(params), sort_keys=True)] = version or ''
+
+
+def server_version(params):
+    """serverInfo.version the server last reported in this process, or None before its first session"""
+    return _server_versions.get(json.dumps(_server(params), sort_keys=True))
+
+
+@dataclass
+class CatalogEntry:
+    """Snapshot of one server's tool list"""
+
+    tools: list
+    digest: str
+    fetched_at: float
+    server_version: str = ''
+
+    @classmethod
+    def from_tools(cls, tools, server_version=''):
+        dumped = [tool.model_dump(mode='json', by_alias=True, exclude_none=True) for tool in tools]
+        digest = hashlib.sha256(json.dumps(dumped, sort_keys=True).encode()).hexdigest()
+        return cls(tools=list(tools), digest=digest, fetched_at=time.time(), server_version=server_version or '')
+
+
+class ToolCatalogCache:
+    """In-memory MCP tool catalog cache with optional on-disk snapshots.
+
+    A missing catalog is fetched once, with concurrent callers sharing the
+    fetch. An expired one is returned as is while a background refresh
+    replaces it, so sessions never wait on `list_tools` once a snapshot exists.
+    Each entry records the server version it was listed from; once the
+    server reports a different version (e.g. after `npx -y` picked up an
+    upgrade) the entry is fetched again. A snapshot read from disk before
+    the server has reported its version is served but refreshed in the
+    background, which also brings up a session and learns the version.
+    """
+
+    def __init__(self, ttl=3600.0, cache_dir=None):
+        self.ttl = ttl
+        self.cache_dir = cache_dir
+        self.stats = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'version_misses': 0, 'refreshes': 0,
+                      'refresh_errors': 0}
+        self._entries = {}
+        self._fetches = {}
+
+    async def get(self, key, fetch, server_version=None):
+        """Return the catalog entry for `key`.
+
+        `fetch` returns a list of mcp Tools and the server version they were
+        listed from; `server_version` is the version the server last reported,
+        if known.
+        """
+        entry = self._entries.get(key)
+        unverified = False
+        if entry is None:
+            entry = self._load(key)
+            if entry is not None:
+                self._entries[key] = entry
+                unverified = server_version is None
+
+        if entry is not None and server_version is not None and entry.server_version != server_version:
+            self.stats['version_misses'] += 1
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return await self._fetch(key, fetch)
+
+        if unverified or time.time() - entry.fetched_at > self.ttl:
+            self.stats['stale_hits'] += 1
+            if key not in self._fetches:
+                self._start_fetch(key, fetch).add_done_callback(self._log_refresh_error)
+        else:
+            self.stats['hits'] += 1
+        return entry
+
+    def invalidate(self, key=None):
+        """Drop one catalog, or every catalog when `key` is None"""
+        keys = [key] if key is not None else list(self._entries)
+        for k in keys:
+            self._entries.pop(k, None)
+            path = self._path(k)
+            if path and os.path.exists(path):
+                os.remove(path)
+
+    def _start_fetch(self, key, fetch):
+        async def run():
+            try:
+                tools, version = await fetch()
+                entry = CatalogEntry.from_tools(tools, version)
+                self._entries[key] = entry
+                self._save(key, entry)
+                self.stats['refreshes'] += 1
+                return entry
+            finally:
+                self._fetches.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._fetches[key] = task
+        return task
+
+    async def _fetch(self, key, fetch):
+        task = self._fetches.get(key) or self._start_fetch(key, fetch)
+        return await asyncio.shield(task)
+
+    def _log_refresh_error(self, task):
+        if not task.cancelled() and task.exception() is not None:
+            self.stats['refresh_errors'] += 1
+            logger.warning('Background MCP tool catalog refresh failed: %s', task.exception())
+
+    def _path(self, key):
+        if not self.cache_dir:
+            return None
+        return os.path.join(self.cache_dir, f'{key}.json')
+
+    def _load(self, key):
+        path = self._path(key)
+        if not path or not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r') as f:
+                data = json.load(f)
+            if data.get('format_version') != CATALOG_FORMAT_VERSION:
+                return None
+            return CatalogEntry(
+                tools=[Tool.model_validate(tool) for tool in data['tools']],
+                digest=data['digest'],
+                fetched_at=data['fetched_at'],
+                server_version=data.get('server_version', ''),
+            )
+        except Exception as e:
+            logger.warning('Ignoring unreadable tool catalog snapshot %s: %s', path, e)
+            return None
+
+    def _save(self, key, entry):
+        path = self._path(key)
+        if not path:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        data = {
+            'format_version': CATALOG_FORMAT_VERSION,
+            'digest': entry.digest,
+            'fetched_at': entry.fetched_at,
+            'server_version': entry.server_version,
+            'tools': [tool.model_dump(mode='json', by_alias=True, exclude_none=True) for tool in entry.tools],
+        }
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+_tool_catalog = None
+
+
+def get_tool_catalog():
+    """Process-wide catalog cache, configured from the environment on first use"""
+    global _tool_catalog
+    if _tool_catalog is None:
+        _tool_catalog = ToolCatalogCache(
+            ttl=float(os.getenv('MCP_TOOL_CATALOG_TTL', '3600')),
+            cache_dir=os.getenv('MCP_TOOL_CATALOG_DIR') or None,
+        )
+    return _tool_catalog
+
+
+# McpTool's call without ADK's blanket retry-once, which would resend
+# rate-limited calls immediately
+_call_mcp_tool = getattr(McpTool._run_async_impl, '__wrapped__', McpTool._run_async_impl)
+
+
+def is_rate_limited_result(result):
+    """True for MCP tool errors reporting an upstream rate limit (e.g. GitHub's API limits)"""
+    if not isinstance(result, dict) or not result.get('isError'):
+        return False
+    text = ' '.join(item.get('text', '') for item in result.get('content') or [] if isinstance(item, dict))
+    return 'rate limit' in text.lower()
+
+
+class _CachedDeclarationMCPTool(McpTool):
+    """McpTool that converts its schema to a function declaration only once.
+
+    With an AdmissionController, calls queue for a slot on the server's
+    shared limit and rate-limited calls are retried with backoff.
+    """
+
+    _declaration = None
+
+    def __init__(self, *, admission=None, **kwargs):
+        super().__init__(**kwargs)
+        self._admission = admission
+
+    def _get_declaration(self):
+        if self._declaration is None:
+            self._declaration = super()._get_declaration()
+        return self._declaration
+
+    async def _run_async_impl(self, *, args, tool_context, credential):
+        if self._admission is None:
+            return await super()._run_async_impl(args=args, tool_context=tool_context, credential=credential)
+
+        async def call():
+            try:
+                return await _call_mcp_tool(self, args=args, tool_context=tool_context, credential=credential)
+            except Exception as e:
+                if is_overload(e) or error_status(e) in AUTH_STATUSES:
+                    raise
+                # Keep ADK's single reconnect-and-retry for broken sessions
+                logger.info('Retrying %s due to error: %s', self.name, e)
+                return await _call_mcp_tool(self, args=args, tool_context=tool_context, credential=credential)
+
+        return await self._admission.call(call, is_overload_result=is_rate_limited_result)
+
+
+class CachedCatalogMixin:
+    """McpToolset mixin that serves `get_tools` from the shared catalog cache.
+
+    Built tools, and the function declarations they hold, are reused for as
+    long as the catalog digest is unchanged. Snapshots are tied to the
+    serverInfo.version the server reports at initialize; `catalog_version`
+    additionally pins them to a caller-chosen version. Tool calls go through the
+    server's AdmissionController (keyed by host or command line, or by
+    `upstream`) unless ADMISSION_ENABLED is false.
+    """
+
+    def __init__(self, *, catalog_version='', upstream=None, **kwargs):
+        super().__init__(**kwargs)
+        self._catalog_version = catalog_version
+        self._built_tools = {}
+        # Tool calls share one admission controller per server
+        self._admission = get_admission_controller(upstream or upstream_name(self._connection_params), 'mcp')
+
+    async def get_tools(self, readonly_context=None):
+        headers = (
+            self._header_provider(readonly_context)
+            if self._header_provider and readonly_context
+            else None
+        )
+        key = catalog_key(
+            self._connection_params,
+            self._mcp_session_manager._merge_headers(headers),
+            self._catalog_version,
+        )
+        entry = await get_tool_catalog().get(
+            key, lambda: self._list_tools(headers), server_version(self._connection_params),
+        )
+
+        digest, tools = self._built_tools.get(key, (None, None))
+        if digest != entry.digest:
+            tools = [self._build_tool(tool) for tool in entry.tools]
+            self._built_tools[key] = (entry.digest, tools)
+        return [tool for tool in tools if self._is_tool_selected(tool, readonly_context)]
+
+    def _build_tool(self, mcp_tool):
+        return _CachedDeclarationMCPTool(
+            admission=self._admission,
+            mcp_tool=mcp_tool,
+            mcp_session_manager=self._mcp_session_manager,
+            auth_scheme=self._auth_scheme,
+            auth_credential=self._auth_credential,
+            require_confirmation=self._require_confirmation,
+            header_provider=self._header_provider,
+        )
+
+    @retry_on_errors
+    async def _list_tools(self, headers):
+        session = await self._mcp_session_manager.create_session(headers=headers)
+        timeout = getattr(self._connection_params, 'timeout', None)
+        try:
+            result = await asyncio.wait_for(session.list_tools(), timeout=timeout)
+        except Exception as e:
+            raise ConnectionError('Failed to get tools from MCP server.') from e
+        return result.tools, server_version(self._connection_params)
@@ -0,0 +1,236 @@
+import asyncio
+import copy
+import fnmatch
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+
+from google.adk.agents.readonly_context import ReadonlyContext
+
+from .http_pool import PooledHttpMcpToolset
+from .tool_catalog import _CachedDeclarationMCPTool
+
+logger = logging.getLogger(__name__)
+
+# Tools whose MCP annotations do not say whether they are read-only are
+# classified by name; anything else is treated as mutating and never cached
+READ_ONLY_PREFIXES = ('get_', 'list_', 'search_')
+
+# Matches every repository, for tools that are not scoped to one
+GLOBAL_TAG = 'global'
+
+
+def is_read_only(mcp_tool, overrides=None):
+    """Whether calling `mcp_tool` (an mcp.types.Tool) has no side effects"""
+    if overrides and mcp_tool.name in overrides:
+        return overrides[mcp_tool.name]
+    annotations = mcp_tool.annotations
+    if annotations is not None and annotations.readOnlyHint is not None:
+        return annotations.readOnlyHint
+    return mcp_tool.name.startswith(READ_ONLY_PREFIXES)
+
+
+def resource_tags(args):
+    """Resources a call touches: its repository, or GLOBAL_TAG"""
+    owner, repo = args.get('owner'), args.get('repo')
+    if owner and repo:
+        return frozenset([f'repo:{owner}/{repo}'.lower()])
+    return frozenset([GLOBAL_TAG])
+
+
+@dataclass
+class _Entry:
+    result: dict
+    tags: frozenset
+    expires_at: float
+
+
+class ToolResultCache:
+    """Read-through cache for read-only MCP tool calls.
+
+    Results are keyed by caller scope (a hash of the headers, so tokens never
+    share results), tool name and arguments, and expire after the TTL of the
+    first pattern in `ttls` matching the tool name. Concurrent identical
+    calls share one upstream request. A mutating call on a repository drops
+    cached reads of that repository and of unscoped tools such as searches;
+    one without a repository drops everything in its scope. Reads that were
+    in flight across a mutation are returned but not stored.
+    """
+
+    def __init__(self, ttls=None, default_ttl=60.0, max_entries=2000):
+        self.ttls = list((ttls or {}).items())
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.stats = Counter()
+        self.tool_stats = {}
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._generations = Counter()
+
+    def ttl_for(self, tool_name):
+        for pattern, ttl in self.ttls:
+            if fnmatch.fnmatchcase(tool_name, pattern):
+                return ttl
+        return self.default_ttl
+
+    def _count(self, tool_name, outcome):
+        self.stats[outcome] += 1
+        self.tool_stats.setdefault(tool_name, Counter())[outcome] += 1
+
+    def _generation(self, scope, tags):
+        return tuple(self._generations[(scope, tag)] for tag in sorted(tags | {'*'}))
+
+    async def get(self, scope, tool_name, args, fetch):
+        """Return the cached result of a read-only call, or `await fetch()` it"""
+        ttl = self.ttl_for(tool_name)
+        if ttl <= 0:
+            self._count(tool_name, 'uncached')
+            return await fetch()
+
+        key = (scope, tool_name, json.dumps(args, sort_keys=True, default=str))
+        entry = self._entries.get(key)
+        if entry is not None:
+            if entry.expires_at > time.monotonic():
+                self._entries.move_to_end(key)
+                self._count(tool_name, 'hits')
+                return copy.deepcopy(entry.result)
+            del self._entries[key]
+
+        # Only join a request started after the last write to these resources
+        tags = resource_tags(args)
+        generation = self._generation(scope, tags)
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[0] == generation:
+            self._count(tool_name, 'coalesced')
+            task = inflight[1]
+        else:
+            self._count(tool_name, 'misses')
+            task = asyncio.ensure_future(self._fetch(key, tags, generation, ttl, fetch))
+            self._inflight[key] = (generation, task)
+            task.add_done_callback(lambda done: self._forget(key, done))
+        return copy.deepcopy(await asyncio.shield(task))
+
+    def _forget(self, key, task):
+        inflight = self._inflight.get(key)
+        if inflight is not None and inflight[1] is task:
+            del self._inflight[key]
+
+    async def _fetch(self, key, tags, generation, ttl, fetch):
+        scope, tool_name, _ = key
+        result = await fetch()
+        self.stats['upstream_calls'] += 1
+        if isinstance(result, dict) and result.get('isError'):
+            return result
+        if self._generation(scope, tags) != generation:
+            self.stats['stale_skipped'] += 1
+            return result
+        self._entries[key] = _Entry(result, tags, time.monotonic() + ttl)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+        return result
+
+    def invalidate(self, scope, args):
+        """Drop cached reads affected by a mutating call with `args`"""
+        tags = resource_tags(args)
+        if tags == {GLOBAL_TAG}:
+            affected = {'*'}
+        else:
+            affected = tags | {GLOBAL_TAG}
+        for tag in affected:
+            self._generations[(scope, tag)] += 1
+        for key, entry in list(self._entries.items()):
+            if key[0] == scope and ('*' in affected or entry.tags & affected):
+                del self._entries[key]
+                self.stats['invalidated'] += 1
+
+    def clear(self):
+        self._entries.clear()
+
+    def metrics(self):
+        lookups = self.stats['hits'] + self.stats['misses'] + self.stats['coalesced']
+        return {
+            **{name: self.stats[name] for name in (
+                'hits', 'coalesced', 'misses', 'uncached', 'upstream_calls',
+                'invalidated', 'stale_skipped', 'evictions',
+            )},
+            'entries': len(self._entries),
+            'hit_rate': (self.stats['hits'] + self.stats['coalesced']) / lookups if lookups else 0.0,
+            'tools': {name: dict(counts) for name, counts in self.tool_stats.items()},
+        }
+
+
+class _ResultCachingMCPTool(_CachedDeclarationMCPTool):
+    """McpTool that reads through a ToolResultCache and invalidates it on writes"""
+
+    def __init__(self, *, result_cache, read_only, **kwargs):
+        super().__init__(**kwargs)
+        self._result_cache = result_cache
+        self._read_only = read_only
+
+    async def _scope(self, tool_context, credential):
+        headers = dict(await self._get_headers(tool_context, credential) or {})
+        if self._header_provider:
+            headers.update(self._header_provider(ReadonlyContext(tool_context._invocation_context)) or {})
+        merged = self._mcp_session_manager._merge_headers(headers)
+        return hashlib.sha256(json.dumps(merged or {}, sort_keys=True).encode()).hexdigest()[:16]
+
+    async def _run_async_impl(self, *, args, tool_context, credential):
+        scope = await self._scope(tool_context, credential)
+        upstream = super()._run_async_impl
+        if not self._read_only:
+            try:
+                return await upstream(args=args, tool_context=tool_context, credential=credential)
+            finally:
+                # Also on failure: the write may have reached the server
+                self._result_cache.invalidate(scope, args)
+        return await self._result_cache.get(
+            scope, self.name, args,
+            lambda: upstream(args=args, tool_context=tool_context, credential=credential),
+        )
+
+
+class CachedResultsHttpMcpToolset(PooledHttpMcpToolset):
+    """PooledHttpMcpToolset whose read-only tool calls go through a ToolResultCache.
+
+    `result_cache` may be None to disable caching; `read_only_overrides` maps
+    tool names to True/False where annotations and name prefixes are wrong.
+    """
+
+    def __init__(self, *, result_cache, read_only_overrides=None, **kwargs):
+        super().__init__(**kwargs)
+        self.result_cache = result_cache
+        self._read_only_overrides = read_only_overrides or {}
+
+    def _build_tool(self, mcp_tool):
+        if self.result_cache is None:
+            return super()._build_tool(mcp_tool)
+        return _ResultCachingMCPTool(
+            result_cache=self.result_cache,
+            read_only=is_read_only(mcp_tool, self._read_only_overrides),
+            admission=self._admission,
+            mcp_tool=mcp_tool,
+            mcp_session_manager=self._mcp_session_manager,
+            auth_scheme=self._auth_scheme,
+            auth_credential=self._auth_credential,
+            require_confirmation=self._require_confirmation,
+            header_provider=self._header_provider,
+        )
+
+
+def create_tool_result_cache(prefix, ttls=None):
+    """Build a ToolResultCache configured from `<prefix>_*` environment variables.
+
+    Returns None when `<prefix>_ENABLED` is false.
+    """
+    if os.getenv(f'{prefix}_ENABLED', 'true').lower() == 'false':
+        return None
+    return ToolResultCache(
+        ttls=ttls,
+        default_ttl=float(os.getenv(f'{prefix}_TTL', '60')),
+        max_entries=int(os.getenv(f'{prefix}_MAX_ENTRIES', '2000')),
+    )
@@ -0,0 +1,229 @@
+import logging
+import math
+import os
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional
+
+from google.adk.tools.mcp_tool.mcp_tool import McpTool
+
+from .text import STOPWORDS, content_terms, normalize_text
+
+logger = logging.getLogger(__name__)
+
+# Parameters nearly every tool takes; they say nothing about what a tool does
+COMMON_PARAMETERS = frozenset(['owner', 'repo', 'page', 'perpage', 'per_page', 'sort', 'order'])
+
+# Words in requests and tool descriptions that do not tell tools apart
+TOOL_STOPWORDS = STOPWORDS | frozenset('help need tool use used using usual usually want'.split())
+
+
+def _expand(text, synonyms):
+    words = normalize_text(text).split()
+    return ' '.join(synonyms.get(word, word) for word in words)
+
+
+def _terms(text, synonyms=None):
+    if synonyms:
+        text = _expand(text, synonyms)
+    return content_terms(text, TOOL_STOPWORDS)
+
+
+def declaration_text(declaration):
+    """Searchable text of a function declaration: name, description and parameter names"""
+    name = declaration.name.replace('_', ' ')
+    parameters = []
+    schema = declaration.parameters_json_schema or {}
+    if declaration.parameters is not None and declaration.parameters.properties:
+        parameters = list(declaration.parameters.properties)
+    elif isinstance(schema, dict):
+        parameters = list(schema.get('properties') or {})
+    parameters = [p.replace('_', ' ') for p in parameters if p.lower() not in COMMON_PARAMETERS]
+    # The name is repeated so that it outweighs words in long descriptions
+    return ' '.join([name, name, declaration.description or '', *parameters])
+
+
+class ToolIndex:
+    """BM25 index over tool names, descriptions and parameter names.
+
+    Built once per catalog; scoring a query against a hundred tools takes
+    well under a millisecond.
+    """
+
+    def __init__(self, documents, synonyms=None, k1=1.2, b=0.75):
+        self.synonyms = synonyms or {}
+        self.k1 = k1
+        self.b = b
+        self._docs = {name: Counter(_terms(text, self.synonyms)) for name, text in documents.items()}
+        self._lengths = {name: sum(terms.values()) for name, terms in self._docs.items()}
+        self._avg_length = sum(self._lengths.values()) / max(1, len(self._docs))
+        frequencies = Counter(term for terms in self._docs.values() for term in terms)
+        n = len(self._docs)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in frequencies.items()}
+
+    @classmethod
+    def from_declarations(cls, declarations, synonyms=None):
+        return cls({d.name: declaration_text(d) for d in declarations}, synonyms=synonyms)
+
+    def search(self, query):
+        """Return [(tool name, score)] for tools sharing a term with `query`, best first"""
+        query_terms = set(_terms(query, self.synonyms)) & self._idf.keys()
+        scores = {}
+        for name, terms in self._docs.items():
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[name] / self._avg_length)
+            score = 0.0
+            for term in query_terms:
+                tf = terms.get(term)
+                if tf:
+                    score += self._idf[term] * tf * (self.k1 + 1) / (tf + norm)
+            if score > 0:
+                scores[name] = score
+        return sorted(scores.items(), key=lambda item: -item[1])
+
+
+@dataclass
+class ToolSelection:
+    """Outcome of selecting tools for one request"""
+
+    tools: Optional[list]  # None means "send the full catalog"
+    top_score: float
+    reason: str  # 'subset', 'low_confidence' or 'small_catalog'
+
+
+class ToolSelector:
+    """Per-request tool subsetting in front of an agent's model calls.
+
+    Each model call is sent only the MCP tools that best match the user's
+    request (BM25 over tool names, descriptions and parameter names, with
+    domain synonyms such as "PR" -> "pull request"). When the best match
+    scores below `min_score`, even after adding the previous user message
+    for follow-ups like "and the closed ones?", the full catalog is sent.
+    Tools already called in the conversation, the names in `always_include`
+    and tools that are not MCP tools (e.g. `transfer_to_agent`) are always
+    kept. Only declarations are trimmed: the model can still call any tool
+    of the catalog if it names one.
+    """
+
+    def __init__(self, synonyms=None, top_k=10, min_score=3.5, relative_cutoff=0.25,
+                 always_include=(), min_catalog_size=15):
+        self.synonyms = synonyms or {}
+        self.top_k = top_k
+        self.min_score = min_score
+        self.relative_cutoff = relative_cutoff
+        self.always_include = frozenset(always_include)
+        self.min_catalog_size = min_catalog_size
+        self.stats = Counter()
+        self._indexes = {}
+
+    def _index(self, declarations):
+        key = frozenset((d.name, d.description) for d in declarations)
+        index = self._indexes.get(key)
+        if index is None:
+            # Catalogs only change when the server's tool list does
+            if len(self._indexes) >= 8:
+                self._indexes.clear()
+            index = self._indexes[key] = ToolIndex.from_declarations(declarations, self.synonyms)
+        return index
+
+    def select(self, declarations, query, previous_query=None):
+        """Return a ToolSelection of names from `declarations` for `query`"""
+        if len(declarations) < self.min_catalog_size:
+            return ToolSelection(None, 0.0, 'small_catalog')
+        index = self._index(declarations)
+        ranked = index.search(query)
+        if (not ranked or ranked[0][1] < self.min_score) and previous_query:
+            ranked = index.search(f'{previous_query} {query}')
+        if not ranked or ranked[0][1] < self.min_score:
+            return ToolSelection(None, ranked[0][1] if ranked else 0.0, 'low_confidence')
+        top_score = ranked[0][1]
+        tools = [name for name, score in ranked[:self.top_k] if score >= top_score * self.relative_cutoff]
+        return ToolSelection(tools, top_score, 'subset')
+
+    def before_model_callback(self, callback_context, llm_request):
+        """ADK before_model_callback: trim the function declarations sent to the model"""
+        user_content = callback_context.user_content
+        query = _text(user_content)
+        function_tools = [tool for tool in llm_request.config.tools or [] if tool.function_declarations]
+        if not query or not function_tools:
+            return None
+
+        candidates = [
+            declaration for tool in function_tools for declaration in tool.function_declarations
+            if isinstance(llm_request.tools_dict.get(declaration.name), McpTool)
+        ]
+        selection = self.select(candidates, query, _previous_user_text(llm_request, user_content))
+        self.stats[selection.reason] += 1
+        self.stats['declarations_total'] += len(candidates)
+        if selection.tools is None:
+            self.stats['declarations_sent'] += len(candidates)
+            return None
+
+        keep = set(selection.tools) | self.always_include | _called_tools(llm_request)
+        candidate_names = {declaration.name for declaration in candidates}
+        sent = 0
+        for tool in function_tools:
+            tool.function_declarations = [
+                declaration for declaration in tool.function_declarations
+                if declaration.name not in candidate_names or declaration.name in keep
+            ]
+            sent += sum(1 for declaration in tool.function_declarations if declaration.name in candidate_names)
+        self.stats['declarations_sent'] += sent
+        logger.debug('Sending %d of %d tools (top score %.1f)', sent, len(candidates), selection.top_score)
+        return None
+
+    def metrics(self):
+        calls = self.stats['subset'] + self.stats['low_confidence'] + self.stats['small_catalog']
+        total = self.stats['declarations_total']
+        return {
+            'model_calls': calls,
+            'subset': self.stats['subset'],
+            'fallback': self.stats['low_confidence'],
+            'declarations_sent_ratio': self.stats['declarations_sent'] / total if total else 1.0,
+        }
+
+
+def _text(content):
+    if not content or not content.parts:
+        return ''
+    return ' '.join(part.text for part in content.parts if part.text)
+
+
+def _previous_user_text(llm_request, user_content):
+    """Text of the last user message before the current one, if any"""
+    current = _text(user_content)
+    seen_current = False
+    for content in reversed(llm_request.contents):
+        if content.role != 'user':
+            continue
+        text = _text(content)
+        if not text:
+            continue  # function responses
+        if not seen_current and text == current:
+            seen_current = True
+            continue
+        return text
+    return None
+
+
+def _called_tools(llm_request):
+    return {
+        part.function_call.name
+        for content in llm_request.contents
+        for part in content.parts or []
+        if part.function_call
+    }
+
+
+def create_tool_selector(prefix, synonyms=None, always_include=()):
+    """Build a ToolSelector configured from `<prefix>_*` environment variables.
+
+    Returns None when `<prefix>_ENABLED` is false.
+    """
+    if os.getenv(f'{prefix}_ENABLED', 'true').lower() == 'false':
+        return None
+    return ToolSelector(
+        synonyms=synonyms,
+        top_k=int(os.getenv(f'{prefix}_TOP_K', '10')),
+        min_score=float(os.getenv(f'{prefix}_MIN_SCORE', '3.5')),
+        always_include=always_include,
+    )
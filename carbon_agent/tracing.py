@@ -0,0 +1,276 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from google.adk.plugins.base_plugin import BasePlugin
+from opentelemetry import trace
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import TracerProvider
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, SpanExporter, SpanExportResult
+from opentelemetry.trace import Status, StatusCode
+
+logger = logging.getLogger(__name__)
+
+TRACER_NAME = 'carbon_agent'
+
+# Span names written by TracingPlugin
+AGENT_SPAN = 'agent_run'
+LLM_SPAN = 'llm_call'
+TOOL_SPAN = 'tool_call'
+TRANSFER_SPAN = 'agent_transfer'
+
+
+def _json_size(value):
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _mcp_server(tool):
+    # MCPTools know their server; other tools run in-process
+    manager = getattr(tool, '_mcp_session_manager', None)
+    params = getattr(manager, '_connection_params', None)
+    if params is None:
+        return None
+    if hasattr(params, 'url'):
+        return params.url
+    server_params = getattr(params, 'server_params', params)
+    return ' '.join([server_params.command, *server_params.args])
+
+
+class JsonlSpanExporter(SpanExporter):
+    """Appends finished spans to a JSONL file, one span per line.
+
+    Only spans from this package are written unless `include_all` is set, so
+    the file stays readable next to ADK's own, more verbose spans.
+    """
+
+    def __init__(self, path, include_all=False):
+        self.path = path
+        self.include_all = include_all
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, spans):
+        lines = []
+        for span in spans:
+            scope = span.instrumentation_scope
+            if not self.include_all and (scope is None or scope.name != TRACER_NAME):
+                continue
+            context = span.get_span_context()
+            lines.append(json.dumps({
+                'name': span.name,
+                'trace_id': format(context.trace_id, '032x'),
+                'span_id': format(context.span_id, '016x'),
+                'parent_id': format(span.parent.span_id, '016x') if span.parent else None,
+                'start_time': span.start_time / 1e9,
+                'duration_ms': (span.end_time - span.start_time) / 1e6,
+                'status': span.status.status_code.name.lower(),
+                'attributes': dict(span.attributes or {}),
+            }, default=str))
+        if lines:
+            with self._lock, open(self.path, 'a') as f:
+                f.write('\n'.join(lines) + '\n')
+        return SpanExportResult.SUCCESS
+
+    def shutdown(self):
+        pass
+
+    def force_flush(self, timeout_millis=30000):
+        return True
+
+
+def configure_tracing(jsonl_path=None, otlp_endpoint=None, service_name=TRACER_NAME):
+    """Attach the JSONL and/or OTLP exporters to the global tracer provider.
+
+    Reuses the provider when one is already installed (e.g. by `adk web
+    --otel_to_cloud`), otherwise installs one. Returns the provider.
+    """
+    provider = trace.get_tracer_provider()
+    if not isinstance(provider, TracerProvider):
+        provider = TracerProvider(resource=Resource.create({'service.name': service_name}))
+        trace.set_tracer_provider(provider)
+    if jsonl_path:
+        provider.add_span_processor(BatchSpanProcessor(JsonlSpanExporter(jsonl_path)))
+    if otlp_endpoint:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+
+        provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter(endpoint=otlp_endpoint)))
+    return provider
+
+
+class TracingPlugin(BasePlugin):
+    """ADK plugin that records spans for agent runs, LLM calls and tool calls.
+
+    Spans nest as agent_run -> llm_call / tool_call / agent_transfer, with
+    the agent a sub-agent was transferred from as its parent. LLM spans carry
+    the model, token counts, time to first response and latency (including
+    calls answered locally by a callback); tool spans carry the MCP server,
+    payload sizes and latency. Every span has a `carbon.agent` attribute.
+    """
+
+    def __init__(self, name='carbon_tracing', tracer_provider=None):
+        super().__init__(name=name)
+        self.tracer = trace.get_tracer(TRACER_NAME, tracer_provider=tracer_provider)
+        self._agent_spans = defaultdict(list)  # (invocation_id, agent) -> open spans
+        self._llm_calls = {}  # (invocation_id, agent) -> [span, start, first_response]
+        self._tool_spans = {}  # function_call_id -> (invocation_id, span)
+
+    def _start(self, name, parent, attributes):
+        context = trace.set_span_in_context(parent) if parent is not None else None
+        return self.tracer.start_span(name, context=context, attributes=attributes)
+
+    def _agent_span(self, invocation_id, agent_name):
+        spans = self._agent_spans.get((invocation_id, agent_name))
+        return spans[-1] if spans else None
+
+    async def before_agent_callback(self, *, agent, callback_context):
+        invocation_id = callback_context.invocation_id
+        parent = None
+        ancestor = agent.parent_agent
+        while parent is None and ancestor is not None:
+            parent = self._agent_span(invocation_id, ancestor.name)
+            ancestor = ancestor.parent_agent
+        span = self._start(AGENT_SPAN, parent, {'carbon.agent': agent.name})
+        self._agent_spans[(invocation_id, agent.name)].append(span)
+
+    async def after_agent_callback(self, *, agent, callback_context):
+        key = (callback_context.invocation_id, agent.name)
+        spans = self._agent_spans.get(key)
+        if spans:
+            spans.pop().end()
+            if not spans:
+                del self._agent_spans[key]
+
+    async def before_model_callback(self, *, callback_context, llm_request):
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        self._finish_llm(key)
+        span = self._start(LLM_SPAN, self._agent_span(*key), {
+            'carbon.agent': callback_context.agent_name,
+            'gen_ai.request.model': llm_request.model or '',
+        })
+        self._llm_calls[key] = [span, time.perf_counter(), None]
+
+    async def after_model_callback(self, *, callback_context, llm_response):
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        call = self._llm_calls.get(key)
+        if call is None:
+            return None
+        span, start, first_response = call
+        if first_response is None:
+            call[2] = time.perf_counter()
+            span.set_attribute('llm.ttft_ms', (call[2] - start) * 1000)
+        if llm_response.model_version:
+            # The model that answered, which differs from the requested one
+            # when a model cascade escalated
+            span.set_attribute('gen_ai.response.model', llm_response.model_version)
+        usage = llm_response.usage_metadata
+        if usage is not None:
+            for attribute, value in (
+                ('gen_ai.usage.input_tokens', usage.prompt_token_count),
+                ('gen_ai.usage.output_tokens', usage.candidates_token_count),
+                ('gen_ai.usage.cached_tokens', usage.cached_content_token_count),
+            ):
+                if value is not None:
+                    span.set_attribute(attribute, value)
+        if llm_response.error_code:
+            span.set_status(Status(StatusCode.ERROR, llm_response.error_message or llm_response.error_code))
+        if not llm_response.partial:
+            self._finish_llm(key)
+        return None
+
+    async def on_model_error_callback(self, *, callback_context, llm_request, error):
+        key = (callback_context.invocation_id, callback_context.agent_name)
+        call = self._llm_calls.get(key)
+        if call is not None:
+            call[0].record_exception(error)
+            call[0].set_status(Status(StatusCode.ERROR, str(error)))
+            self._finish_llm(key)
+        return None
+
+    def _finish_llm(self, key):
+        call = self._llm_calls.pop(key, None)
+        if call is None:
+            return
+        span, start, first_response = call
+        if first_response is None:
+            # A before_model_callback (pre-router, response cache) answered
+            span.set_attribute('llm.served_locally', True)
+            span.set_attribute('llm.ttft_ms', (time.perf_counter() - start) * 1000)
+        span.set_attribute('llm.latency_ms', (time.perf_counter() - start) * 1000)
+        span.end()
+
+    async def on_event_callback(self, *, invocation_context, event):
+        # Responses from before_model_callbacks skip after_model_callback
+        key = (invocation_context.invocation_id, event.author)
+        if key in self._llm_calls and not event.partial:
+            self._finish_llm(key)
+        return None
+
+    async def before_tool_callback(self, *, tool, tool_args, tool_context):
+        parent = self._agent_span(tool_context.invocation_id, tool_context.agent_name)
+        if tool.name == 'transfer_to_agent':
+            span = self._start(TRANSFER_SPAN, parent, {
+                'carbon.agent': tool_context.agent_name,
+                'transfer.from': tool_context.agent_name,
+                'transfer.to': str(tool_args.get('agent_name', '')),
+            })
+        else:
+            attributes = {
+                'carbon.agent': tool_context.agent_name,
+                'tool.name': tool.name,
+                'tool.request_bytes': _json_size(tool_args),
+            }
+            server = _mcp_server(tool)
+            if server:
+                attributes['mcp.server'] = server
+            span = self._start(TOOL_SPAN, parent, attributes)
+        self._tool_spans[tool_context.function_call_id] = (tool_context.invocation_id, span)
+        return None
+
+    async def after_tool_callback(self, *, tool, tool_args, tool_context, result):
+        _, span = self._tool_spans.pop(tool_context.function_call_id, (None, None))
+        if span is not None:
+            span.set_attribute('tool.response_bytes', _json_size(result))
+            if isinstance(result, dict) and (result.get('isError') or 'error' in result):
+                span.set_status(Status(StatusCode.ERROR))
+            span.end()
+        return None
+
+    async def on_tool_error_callback(self, *, tool, tool_args, tool_context, error):
+        _, span = self._tool_spans.pop(tool_context.function_call_id, (None, None))
+        if span is not None:
+            span.record_exception(error)
+            span.set_status(Status(StatusCode.ERROR, str(error)))
+            span.end()
+        return None
+
+    async def after_run_callback(self, *, invocation_context):
+        # Close whatever an error or cancellation left open in this invocation
+        invocation_id = invocation_context.invocation_id
+        for key in [k for k in self._llm_calls if k[0] == invocation_id]:
+            self._finish_llm(key)
+        for call_id in [c for c, (i, _) in self._tool_spans.items() if i == invocation_id]:
+            self._tool_spans.pop(call_id)[1].end()
+        for key in [k for k in self._agent_spans if k[0] == invocation_id]:
+            for span in reversed(self._agent_spans.pop(key)):
+                span.set_status(Status(StatusCode.ERROR, 'Agent run did not finish'))
+                span.end()
+
+
+def create_tracing_plugin():
+    """TracingPlugin with exporters from TRACE_JSONL_PATH / TRACE_OTLP_ENDPOINT.
+
+    Returns None when neither is set.
+    """
+    jsonl_path = os.getenv('TRACE_JSONL_PATH')
+    otlp_endpoint = os.getenv('TRACE_OTLP_ENDPOINT')
+    if not jsonl_path and not otlp_endpoint:
+        return None
+    configure_tracing(jsonl_path=jsonl_path, otlp_endpoint=otlp_endpoint)
+    return TracingPlugin()
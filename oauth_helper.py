@@ -1,149 +1,113 @@
 #!/usr/bin/env python3
 """
 Carbon Voice OAuth2 Helper
-Helps obtain API key through OAuth2 flow with redirect URL handling
+Serves the OAuth broker (carbon_agent/oauth_broker.py) on the redirect URI's
+port and connects Carbon Voice accounts. Tokens are kept per user in the
+encrypted token store, where the agent picks them up, and refreshed before
+they expire for as long as the helper runs.
+
+Usage: python oauth_helper.py [--user user] [--serve] [--save-env]
 """
 
+import argparse
+import asyncio
 import os
 import webbrowser
-import http.server
-import socketserver
-import urllib.parse
-import urllib.request
-import json
+from urllib.parse import urlparse
+
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
-# OAuth2 Configuration
-CLIENT_ID = os.getenv('CARBON_VOICE_CLIENT_ID')
-CLIENT_SECRET = os.getenv('CARBON_VOICE_CLIENT_SECRET')
-REDIRECT_URI = os.getenv('CARBON_VOICE_REDIRECT_URI', 'http://localhost:3000/oauth/callback')
-AUTHORIZATION_ENDPOINT = 'https://api.carbonvoice.app/oauth/authorize'  # Update with actual endpoint
-TOKEN_ENDPOINT = 'https://api.carbonvoice.app/oauth/token'  # Update with actual endpoint
-
-class OAuthCallbackHandler(http.server.BaseHTTPRequestHandler):
-    """Handles OAuth2 callback"""
-
-    # Class variable to signal when we're done
-    auth_complete = False
-
-    def do_GET(self):
-        """Handle the OAuth2 callback"""
-        self.send_response(200)
-        self.send_header('Content-type', 'text/html')
-        self.end_headers()
-
-        # Parse the authorization code from the URL
-        parsed_path = urllib.parse.urlparse(self.path)
-        query_params = urllib.parse.parse_qs(parsed_path.query)
-
-        if 'code' in query_params:
-            authorization_code = query_params['code'][0]
-            print(f"\n✅ Authorization code received: {authorization_code}")
-
-            # Exchange code for access token
-            access_token = self.exchange_code_for_token(authorization_code)
-
-            if access_token:
-                # Save to .env file
-                self.save_token_to_env(access_token)
-                OAuthCallbackHandler.auth_complete = True
-
-                self.wfile.write(b'<html><body><h1>Success!</h1><p>Your Carbon Voice API key has been saved to .env file.</p><p>You can close this window and return to the terminal.</p></body></html>')
-            else:
-                self.wfile.write(b'<html><body><h1>Error</h1><p>Failed to exchange authorization code for access token.</p></body></html>')
-        else:
-            self.wfile.write(b'<html><body><h1>Error</h1><p>No authorization code received.</p></body></html>')
-
-    def exchange_code_for_token(self, authorization_code):
-        """Exchange authorization code for access token"""
-        try:
-            data = urllib.parse.urlencode({
-                'grant_type': 'authorization_code',
-                'code': authorization_code,
-                'redirect_uri': REDIRECT_URI,
-                'client_id': CLIENT_ID,
-                'client_secret': CLIENT_SECRET
-            }).encode()
-
-            req = urllib.request.Request(TOKEN_ENDPOINT, data=data, method='POST')
-            req.add_header('Content-Type', 'application/x-www-form-urlencoded')
-
-            with urllib.request.urlopen(req) as response:
-                token_data = json.loads(response.read().decode())
-                return token_data.get('access_token')
-
-        except Exception as e:
-            print(f"❌ Error exchanging code for token: {e}")
-            return None
-
-    def save_token_to_env(self, access_token):
-        """Save the access token to .env file"""
-        env_file = '.env'
-
-        # Read existing .env file
-        env_content = {}
-        if os.path.exists(env_file):
-            with open(env_file, 'r') as f:
-                for line in f:
-                    if '=' in line:
-                        key, value = line.strip().split('=', 1)
-                        env_content[key] = value
-
-        # Update or add CARBON_VOICE_API_KEY
-        env_content['CARBON_VOICE_API_KEY'] = access_token
-
-        # Write back to .env file
-        with open(env_file, 'w') as f:
-            for key, value in env_content.items():
-                f.write(f'{key}={value}\n')
-
-        print(f"✅ API key saved to {env_file}")
-
-def start_oauth_flow():
-    """Start the OAuth2 authorization flow"""
-    if not CLIENT_ID:
-        print("❌ CARBON_VOICE_CLIENT_ID not found in .env")
-        return
-
-    # Build authorization URL
-    auth_url = (
-        f"{AUTHORIZATION_ENDPOINT}?"
-        f"client_id={CLIENT_ID}&"
-        f"redirect_uri={urllib.parse.quote(REDIRECT_URI)}&"
-        f"response_type=code&"
-        f"scope=read,write"  # Adjust scopes as needed
-    )
-
-    print("🌐 Opening browser for OAuth2 authorization...")
-    print(f"📱 If browser doesn't open, visit: {auth_url}")
-    print("🔄 Waiting for authorization callback...")
-
-    # Open browser
-    webbrowser.open(auth_url)
-
-    # Start local server to handle callback
-    port = 3000
-    with socketserver.TCPServer(("", port), OAuthCallbackHandler) as httpd:
-        print(f"🚀 Local server listening on port {port}")
-        print("🔄 Complete authorization in your browser...")
-        print("⏳ Waiting for callback...")
-
-        # Handle requests until we get the authorization code
-        while not OAuthCallbackHandler.auth_complete:
-            httpd.handle_request()
-
-        print("✅ Authorization completed!")
 
-if __name__ == "__main__":
+def save_token_to_env(access_token):
+    """Save the access token to .env file, for the stdio Carbon Voice agent"""
+    env_file = '.env'
+
+    # Read existing .env file
+    env_content = {}
+    if os.path.exists(env_file):
+        with open(env_file, 'r') as f:
+            for line in f:
+                if '=' in line:
+                    key, value = line.strip().split('=', 1)
+                    env_content[key] = value
+
+    # Update or add CARBON_VOICE_API_KEY
+    env_content['CARBON_VOICE_API_KEY'] = access_token
+
+    # Write back to .env file
+    with open(env_file, 'w') as f:
+        for key, value in env_content.items():
+            f.write(f'{key}={value}\n')
+
+    print(f"✅ API key saved to {env_file}")
+
+
+async def run(args, broker):
+    import uvicorn
+    from fastapi import FastAPI
+
+    from carbon_agent.oauth_broker import create_oauth_router
+
+    api = FastAPI(title='Carbon Voice OAuth broker')
+    api.include_router(create_oauth_router(broker))
+    port = urlparse(broker.redirect_uri).port or 80
+    server = uvicorn.Server(uvicorn.Config(api, host=args.host, port=port, log_level='warning'))
+    serving = asyncio.ensure_future(server.serve())
+    print(f"🚀 Local server listening on port {port}")
+    try:
+        if args.user:
+            url = broker.start_url(args.user)
+            print("🌐 Opening browser for OAuth2 authorization...")
+            print(f"📱 If browser doesn't open, visit: {url}")
+            webbrowser.open(url)
+            print("⏳ Waiting for callback...")
+            token = await broker.wait_for(args.user)
+            print(f"✅ Authorization completed for {args.user}; token saved to {broker.store.path}")
+            if args.user not in broker.trusted_users:
+                print(f"ℹ️  adk web does not authenticate users; set CARBON_VOICE_TRUSTED_USERS={args.user} "
+                      f"for its sessions to use this token")
+            if args.save_env:
+                save_token_to_env(token.access_token)
+        if args.serve:
+            print("🔄 Serving authorization links and refreshing tokens (Ctrl-C to stop)...")
+            await serving
+    finally:
+        server.should_exit = True
+        await serving
+        await broker.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Connect Carbon Voice accounts through OAuth2')
+    parser.add_argument('--user', default='user',
+                        help="Agent user id to connect (ADK's default is 'user'); empty with --serve to only serve")
+    parser.add_argument('--serve', action='store_true',
+                        help='Keep serving /oauth/start links for any user and refreshing their tokens')
+    parser.add_argument('--save-env', action='store_true',
+                        help="Also write the user's access token to .env as CARBON_VOICE_API_KEY, for the stdio "
+                             "agent (which does not refresh it)")
+    parser.add_argument('--host', default='localhost', help='Interface to listen on')
+    args = parser.parse_args()
+
+    from carbon_agent.oauth_broker import create_oauth_broker
+
     print("🚀 Carbon Voice OAuth2 Helper")
     print("=" * 40)
 
-    if not CLIENT_ID or not CLIENT_SECRET:
-        print("❌ Missing OAuth2 credentials in .env")
+    broker = create_oauth_broker()
+    if broker is None:
+        print("❌ Missing OAuth2 credentials in .env (or CARBON_VOICE_OAUTH_BROKER_ENABLED=false)")
         print("   Required: CARBON_VOICE_CLIENT_ID, CARBON_VOICE_CLIENT_SECRET")
         exit(1)
 
-    start_oauth_flow()
+    try:
+        asyncio.run(run(args, broker))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,27 @@
+"""
+Custom ADK services
+Loaded by `adk web` / `adk api_server` from the agents directory. Registers
+the sessionlog:// scheme for the append-only SQLite session store in
+carbon_agent/session_store.py.
+
+Usage: adk web --session_service_uri sessionlog:///sessions.db
+"""
+
+import os
+from urllib.parse import urlparse
+
+from google.adk.cli.service_registry import get_service_registry
+
+
+def session_store_factory(uri, **kwargs):
+    from carbon_agent.session_store import AppendOnlySessionService, create_session_service
+
+    path = urlparse(uri).path
+    # Like sqlite://, sessionlog:///sessions.db is relative and sessionlog:////tmp/s.db absolute
+    path = path[1:] if path.startswith('/') else path
+    service = create_session_service() or AppendOnlySessionService()
+    service.db_path = path or os.getenv('SESSION_DB_PATH', 'sessions.db')
+    return service
+
+
+get_service_registry().register_session_service('sessionlog', session_store_factory)
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Trace Summary
+Summarizes a JSONL trace file written by carbon_agent's tracing plugin
+(TRACE_JSONL_PATH) into latency percentiles per agent, per model call and
+per tool, plus token totals.
+
+Usage: python trace_summary.py traces.jsonl [--since 2025-01-01T00:00] [--json]
+"""
+
+import argparse
+import json
+import math
+from collections import defaultdict
+from datetime import datetime
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[max(0, math.ceil(len(values) * p / 100) - 1)]
+
+
+def load_spans(path, since=None):
+    spans = []
+    with open(path, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            span = json.loads(line)
+            if since is None or span['start_time'] >= since:
+                spans.append(span)
+    return spans
+
+
+def summarize(spans):
+    """Group spans into {section: {key: stats}}"""
+    groups = defaultdict(lambda: defaultdict(list))
+    tokens = defaultdict(lambda: defaultdict(int))
+    for span in spans:
+        attributes = span['attributes']
+        agent = attributes.get('carbon.agent', '?')
+        name = span['name']
+        if name == 'agent_run':
+            groups['agents'][agent].append(span)
+        elif name == 'llm_call':
+            model = attributes.get('gen_ai.response.model') or attributes.get('gen_ai.request.model', '?')
+            groups['llm calls'][f'{agent} ({model})'].append(span)
+            tokens[agent]['input'] += attributes.get('gen_ai.usage.input_tokens', 0)
+            tokens[agent]['output'] += attributes.get('gen_ai.usage.output_tokens', 0)
+            tokens[agent]['cached'] += attributes.get('gen_ai.usage.cached_tokens', 0)
+        elif name == 'tool_call':
+            groups['tools'][attributes.get('tool.name', '?')].append(span)
+        elif name == 'agent_transfer':
+            groups['transfers'][f"{attributes.get('transfer.from')} -> {attributes.get('transfer.to')}"].append(span)
+
+    summary = {}
+    for section, by_key in groups.items():
+        summary[section] = {}
+        for key, members in sorted(by_key.items()):
+            durations = sorted(span['duration_ms'] for span in members)
+            stats = {
+                'count': len(members),
+                'errors': sum(1 for span in members if span['status'] == 'error'),
+                'p50_ms': percentile(durations, 50),
+                'p95_ms': percentile(durations, 95),
+                'p99_ms': percentile(durations, 99),
+            }
+            if section == 'llm calls':
+                ttft = sorted(span['attributes']['llm.ttft_ms'] for span in members if 'llm.ttft_ms' in span['attributes'])
+                stats['ttft_p50_ms'] = percentile(ttft, 50)
+                stats['local'] = sum(1 for span in members if span['attributes'].get('llm.served_locally'))
+            if section == 'tools':
+                stats['response_bytes'] = sum(span['attributes'].get('tool.response_bytes', 0) for span in members)
+            summary[section][key] = stats
+    summary['tokens'] = {agent: dict(counts) for agent, counts in sorted(tokens.items())}
+    return summary
+
+
+def _ms(value):
+    return f'{value:.1f}' if value is not None else '-'
+
+
+def print_summary(summary):
+    for section in ('agents', 'llm calls', 'transfers', 'tools'):
+        rows = summary.get(section)
+        if not rows:
+            continue
+        extra = {'llm calls': ['ttft p50', 'local'], 'tools': ['resp bytes']}.get(section, [])
+        width = max(len(key) for key in rows) + 2
+        header = f"{section.upper():<{width}}{'count':>7}{'errors':>8}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+        print(header + ''.join(f'{column:>12}' for column in extra))
+        for key, stats in rows.items():
+            line = (f"{key:<{width}}{stats['count']:>7}{stats['errors']:>8}"
+                    f"{_ms(stats['p50_ms']):>10}{_ms(stats['p95_ms']):>10}{_ms(stats['p99_ms']):>10}")
+            if section == 'llm calls':
+                line += f"{_ms(stats['ttft_p50_ms']):>12}{stats['local']:>12}"
+            if section == 'tools':
+                line += f"{stats['response_bytes']:>12}"
+            print(line)
+        print()
+    if summary['tokens']:
+        print(f"{'TOKENS':<24}{'input':>10}{'output':>10}{'cached':>10}")
+        for agent, counts in summary['tokens'].items():
+            print(f"{agent:<24}{counts['input']:>10}{counts['output']:>10}{counts['cached']:>10}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Summarize a carbon_agent JSONL trace file')
+    parser.add_argument('trace_file', help='JSONL file written via TRACE_JSONL_PATH')
+    parser.add_argument('--since', help='Only include spans started at or after this ISO timestamp')
+    parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+    args = parser.parse_args()
+
+    since = datetime.fromisoformat(args.since).timestamp() if args.since else None
+    spans = load_spans(args.trace_file, since)
+    if not spans:
+        print(f"❌ No spans found in {args.trace_file}")
+        exit(1)
+
+    summary = summarize(spans)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print(f"📊 {len(spans)} spans from {args.trace_file}\n")
+        print_summary(summary)